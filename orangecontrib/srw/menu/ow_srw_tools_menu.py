@@ -1,5 +1,7 @@
 __author__ = 'labx'
 
+from PyQt5.QtWidgets import QDialog, QDialogButtonBox, QFileDialog, QFormLayout, QHBoxLayout, QLineEdit, QPushButton
+
 from orangecanvas.scheme.link import SchemeLink
 from oasys.menus.menu import OMenu
 
@@ -8,6 +10,8 @@ from wofrysrw.propagator.propagators2D.srw_fresnel_native import SRW_APPLICATION
 from wofrysrw.propagator.propagators2D.srw_propagation_mode import SRWPropagationMode
 
 from orangecontrib.srw.util.srw_util import showWarningMessage, showCriticalMessage
+from orangecontrib.srw.util.srw_propagation import initialize_propagator_2D
+from orangecontrib.srw.util.srw_propagation_cache import get_propagation_cache, set_propagation_cache
 from orangecontrib.srw.widgets.optical_elements.ow_srw_screen import OWSRWScreen
 from orangecontrib.srw.widgets.native.ow_srw_intensity_plotter import OWSRWIntensityPlotter
 from orangecontrib.srw.widgets.native.ow_srw_me_degcoh_plotter import OWSRWDegCohPlotter
@@ -19,6 +23,8 @@ class SRWToolsMenu(OMenu):
     def __init__(self):
         super().__init__(name="SRW Tools")
 
+        initialize_propagator_2D()
+
         self.openContainer()
         self.addContainer("Propagation Mode")
         self.addSubMenu("Element by Element (Wofry)")
@@ -32,6 +38,11 @@ class SRWToolsMenu(OMenu):
         self.addSubMenu("Select Plots \'No\' on all Source and O.E. widgets")
         self.addSubMenu("Select Plots \'Yes\' on all Source and O.E. widgets")
         self.closeContainer()
+        self.openContainer()
+        self.addContainer("Propagation Cache")
+        self.addSubMenu("Propagation Cache Settings")
+        self.addSubMenu("Clear Propagation Cache (memory)")
+        self.closeContainer()
 
     def executeAction_1(self, action):
         try:
@@ -114,6 +125,28 @@ class SRWToolsMenu(OMenu):
         except Exception as exception:
             showCriticalMessage(exception.args[0])
 
+    def executeAction_7(self, action):
+        try:
+            dialog = PropagationCacheDialog(parent=self.canvas_main_window)
+
+            if dialog.exec_() == QDialog.Accepted:
+                max_memory, disk_cache_directory = dialog.get_values()
+
+                propagation_cache = set_propagation_cache(max_memory, disk_cache_directory)
+
+                if propagation_cache.is_enabled(): showWarningMessage("Propagation Cache: " + str(max_memory) + " MB in memory" +
+                                                                      ("" if propagation_cache.get_disk_cache_directory() is None else ", on disk in " + disk_cache_directory))
+                else: showWarningMessage("Propagation Cache disabled")
+        except Exception as exception:
+            showCriticalMessage(exception.args[0])
+
+    def executeAction_8(self, action):
+        try:
+            get_propagation_cache().clear()
+            showWarningMessage("Propagation Cache (memory) cleared")
+        except Exception as exception:
+            showCriticalMessage(exception.args[0])
+
     #################################################################
 
     def set_srw_live_propagation_mode(self):
@@ -173,3 +206,46 @@ class SRWToolsMenu(OMenu):
             messages.append(exception.args[0])
 
         return widget, node, messages
+
+class PropagationCacheDialog(QDialog):
+
+    def __init__(self, parent=None):
+        QDialog.__init__(self, parent)
+        self.setWindowTitle('Propagation Cache Settings')
+
+        propagation_cache = get_propagation_cache()
+        disk_cache_directory = propagation_cache.get_disk_cache_directory()
+
+        layout = QFormLayout(self)
+
+        self.le_max_memory = QLineEdit(str(propagation_cache.get_max_memory()/1024**2))
+        layout.addRow("Memory (MB, 0 to disable)", self.le_max_memory)
+
+        self.le_disk_cache_directory = QLineEdit("" if disk_cache_directory is None else disk_cache_directory)
+
+        directory_box = QHBoxLayout()
+        directory_box.addWidget(self.le_disk_cache_directory)
+        button = QPushButton("...")
+        button.clicked.connect(self.select_disk_cache_directory)
+        directory_box.addWidget(button)
+        layout.addRow("Disk directory (empty to disable)", directory_box)
+
+        bbox = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        bbox.accepted.connect(self.accept)
+        bbox.rejected.connect(self.reject)
+        layout.addRow(bbox)
+
+    def select_disk_cache_directory(self):
+        directory = QFileDialog.getExistingDirectory(self, "Propagation Cache Directory", self.le_disk_cache_directory.text())
+
+        if directory: self.le_disk_cache_directory.setText(directory)
+
+    def get_values(self):
+        try:
+            max_memory = float(self.le_max_memory.text())
+        except ValueError:
+            raise Exception("Propagation Cache Memory should be a number")
+
+        if max_memory < 0: raise Exception("Propagation Cache Memory should be >= 0")
+
+        return max_memory, self.le_disk_cache_directory.text().strip()
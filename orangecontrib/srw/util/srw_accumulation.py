@@ -0,0 +1,157 @@
+import os
+from array import array
+
+import numpy
+import h5py
+
+from wofrysrw.util.srw import srwl
+
+class AccumulationBackend:
+    MEMORY = 0
+    MEMMAP = 1
+    HDF5 = 2
+
+class SRWIntensityAccumulator(object):
+    '''
+    Per-pixel running mean and variance of the received intensities (Welford's algorithm): memory does
+    not depend on the number of accumulated intensities and the standard error of the mean shows the
+    convergence of the accumulation.
+
+    Intensities are 2D (x, y) or 3D (energy, x, y) arrays. With the MEMMAP (.npy files) and HDF5 (one
+    dataset chunked by energy slice) backends the accumulated arrays stay on disk, in file_name, and
+    are updated in place one energy slice at a time, so that only a slice at a time is loaded in memory.
+    '''
+
+    def __init__(self, backend=AccumulationBackend.MEMORY, file_name=None):
+        if backend != AccumulationBackend.MEMORY and file_name is None: raise ValueError("File name is mandatory for the on-disk accumulation")
+
+        self.backend = backend
+        self.file_name = file_name
+
+        self.__h5_file = None
+
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+
+        if not self.__h5_file is None:
+            self.__h5_file.close()
+            self.__h5_file = None
+
+    def add(self, intensity):
+        if intensity.ndim == 2: self.add_slices(intensity.shape, lambda energy_index: intensity)
+        else:                   self.add_slices(intensity.shape, lambda energy_index: intensity[energy_index])
+
+    def add_slices(self, shape, get_intensity_slice):
+        '''
+        Accumulates an intensity received one energy slice at a time, never holding the whole array
+
+        :param shape: (x, y) or (energy, x, y)
+        :param get_intensity_slice: function of the energy index returning the (x, y) intensity
+        '''
+        shape = tuple(shape)
+
+        if self.mean is None:
+            self.mean = self.__allocate("mean", shape)
+            self.m2 = self.__allocate("m2", shape)
+        elif shape != self.mean.shape:
+            raise ValueError("Accumulated Intensity Shape is different from received one")
+
+        self.count += 1
+
+        if len(shape) == 2:
+            self.__update(get_intensity_slice(0), Ellipsis)
+        else:
+            for energy_index in range(shape[0]):
+                self.__update(get_intensity_slice(energy_index), energy_index)
+
+        if self.backend == AccumulationBackend.MEMMAP:
+            self.mean.flush()
+            self.m2.flush()
+        elif self.backend == AccumulationBackend.HDF5:
+            self.__h5_file.attrs["count"] = self.count
+            self.__h5_file.flush()
+
+    def get_sum(self, energy_index=Ellipsis):
+        return self.get_mean(energy_index)*self.count
+
+    def get_mean(self, energy_index=Ellipsis):
+        return numpy.array(self.mean[energy_index])
+
+    def get_variance(self, energy_index=Ellipsis):
+        if self.count > 1: return numpy.array(self.m2[energy_index])/(self.count - 1)
+        else: return numpy.zeros(self.mean[energy_index].shape)
+
+    def get_standard_error(self, energy_index=Ellipsis):
+        return numpy.sqrt(self.get_variance(energy_index)/self.count)
+
+    def save(self, file_name, h_coordinates, v_coordinates):
+        with h5py.File(file_name + ".tmp", "w") as f:
+            mean = f.create_dataset("mean", shape=self.mean.shape, dtype=numpy.float64)
+            variance = f.create_dataset("variance", shape=self.mean.shape, dtype=numpy.float64)
+
+            if self.mean.ndim == 2:
+                mean[...] = self.get_mean()
+                variance[...] = self.get_variance()
+            else:
+                for energy_index in range(self.mean.shape[0]):
+                    mean[energy_index] = self.get_mean(energy_index)
+                    variance[energy_index] = self.get_variance(energy_index)
+
+            f.create_dataset("h_coordinates", data=h_coordinates)
+            f.create_dataset("v_coordinates", data=v_coordinates)
+
+            f.attrs["count"] = self.count
+
+        os.replace(file_name + ".tmp", file_name)
+
+    def __update(self, intensity, index):
+        mean = self.mean[index]
+        m2 = self.m2[index]
+
+        delta = intensity - mean
+        mean += delta/self.count
+        m2 += delta*(intensity - mean)
+
+        if self.backend == AccumulationBackend.HDF5:
+            self.mean[index] = mean
+            self.m2[index] = m2
+
+    def __allocate(self, name, shape):
+        if self.backend == AccumulationBackend.MEMORY:
+            return numpy.zeros(shape)
+        elif self.backend == AccumulationBackend.MEMMAP:
+            return numpy.lib.format.open_memmap(self.file_name + "." + name + ".npy", mode="w+", dtype=numpy.float64, shape=shape)
+        else:
+            if self.__h5_file is None: self.__h5_file = h5py.File(self.file_name, "w")
+
+            return self.__h5_file.create_dataset(name, shape=shape, dtype=numpy.float64, fillvalue=0.0,
+                                                 chunks=shape if len(shape) == 2 else (1,) + shape[1:])
+
+def get_intensity(wavefront, energy_index=None):
+    '''
+    Single electron total intensity, as an (energy, x, y) array, or as an (x, y) array if only the
+    slice at energy_index is requested
+    '''
+    mesh = wavefront.mesh
+    energies = numpy.linspace(mesh.eStart, mesh.eFin, mesh.ne)
+
+    if not energy_index is None: return _get_intensity_slice(wavefront, energies[energy_index])
+
+    intensity = numpy.zeros((mesh.ne, mesh.nx, mesh.ny))
+
+    for ie, energy in enumerate(energies):
+        intensity[ie] = _get_intensity_slice(wavefront, energy)
+
+    return intensity
+
+def _get_intensity_slice(wavefront, energy):
+    mesh = wavefront.mesh
+    output_array = array('f', [0]*mesh.nx*mesh.ny)
+
+    srwl.CalcIntFromElecField(output_array, wavefront, 6, 0, 3, energy, 0, 0)
+
+    return numpy.frombuffer(output_array, dtype=numpy.float32).reshape(mesh.ny, mesh.nx).T
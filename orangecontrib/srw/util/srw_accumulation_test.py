@@ -0,0 +1,54 @@
+"""
+
+test of the running mean/variance accumulation, in memory and on disk
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+
+from srw_accumulation import SRWIntensityAccumulator, AccumulationBackend
+
+class SRWIntensityAccumulatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.intensities = numpy.random.default_rng(0).random((5, 3, 4, 6)) # wavefronts, energy, x, y
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_accumulator(self, accumulator, intensities):
+        numpy.testing.assert_allclose(accumulator.get_mean(), intensities.mean(axis=0))
+        numpy.testing.assert_allclose(accumulator.get_sum(), intensities.sum(axis=0))
+        numpy.testing.assert_allclose(accumulator.get_variance(), intensities.var(axis=0, ddof=1))
+        if intensities.ndim == 4: numpy.testing.assert_allclose(accumulator.get_mean(1), intensities[:, 1].mean(axis=0))
+
+    def test_backends(self):
+        for backend in [AccumulationBackend.MEMORY, AccumulationBackend.MEMMAP, AccumulationBackend.HDF5]:
+            accumulator = SRWIntensityAccumulator(backend=backend, file_name=None if backend == AccumulationBackend.MEMORY else os.path.join(self.directory, "accumulation" + str(backend)))
+
+            for intensity in self.intensities: accumulator.add(intensity)
+
+            self.assertEqual(accumulator.count, 5)
+            self.check_accumulator(accumulator, self.intensities)
+
+            accumulator.reset()
+
+    def test_slices(self):
+        accumulator = SRWIntensityAccumulator(backend=AccumulationBackend.MEMMAP, file_name=os.path.join(self.directory, "accumulation"))
+
+        for intensity in self.intensities: accumulator.add_slices(intensity.shape, lambda energy_index: intensity[energy_index])
+
+        self.check_accumulator(accumulator, self.intensities)
+
+        accumulator = SRWIntensityAccumulator()
+
+        for intensity in self.intensities[:, 0]: accumulator.add_slices(intensity.shape, lambda energy_index: intensity)
+
+        self.check_accumulator(accumulator, self.intensities[:, 0])
+
+        with self.assertRaises(ValueError): accumulator.add_slices((4, 5), lambda energy_index: numpy.zeros((4, 5)))
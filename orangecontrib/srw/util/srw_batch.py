@@ -0,0 +1,319 @@
+"""
+
+headless execution of SRW workflows, without the OASYS canvas and without importing Qt:
+ - the settings of the widgets of a .ows workflow are read from the file (with the defaults of the widget classes
+   for the missing ones, taken from the widget sources) and the SRW objects are built with the same functions used
+   by the widgets (srw_builders)
+ - alternatively, a pickled SRWBeamline (or SRWData) is loaded: its light source has to be already calculated,
+   since the source wavefront parameters are taken from it (see save_beamline)
+
+the source wavefront is calculated and propagated through the whole beamline in a single SRW call, then it is saved
+in HDF5 by srw_hdf5.
+
+usage: python -m orangecontrib.srw.util.srw_batch input_file output_file [--node ID] [--data-path PATH] [--phase] [--compression gzip|lzf]
+
+"""
+
+import os, sys, io, ast, base64, pickle, argparse, importlib.util
+from array import array
+from xml.etree import ElementTree
+
+import numpy
+
+from wofry.propagator.propagator import PropagationManager, PropagationParameters
+from wofrysrw.beamline.srw_beamline import SRWBeamline
+from wofrysrw.beamline.optical_elements.absorbers.srw_aperture import SRWAperture
+from wofrysrw.beamline.optical_elements.absorbers.srw_obstacle import SRWObstacle
+from wofrysrw.beamline.optical_elements.gratings.srw_plain_grating import SRWPlaneGrating
+from wofrysrw.beamline.optical_elements.ideal_elements.srw_ideal_lens import SRWIdealLens
+from wofrysrw.beamline.optical_elements.ideal_elements.srw_screen import SRWScreen
+from wofrysrw.beamline.optical_elements.mirrors.srw_elliptical_mirror import SRWEllipticalMirror
+from wofrysrw.beamline.optical_elements.mirrors.srw_plane_mirror import SRWPlaneMirror
+from wofrysrw.beamline.optical_elements.mirrors.srw_spherical_mirror import SRWSphericalMirror
+from wofrysrw.beamline.optical_elements.mirrors.srw_toroidal_mirror import SRWToroidalMirror
+from wofrysrw.propagator.propagators2D.srw_fresnel_native import FresnelSRWNative, SRW_APPLICATION
+from wofrysrw.propagator.propagators2D.srw_propagation_mode import SRWPropagationMode
+
+from orangecontrib.srw.util.srw_objects import SRWData
+from orangecontrib.srw.util.srw_builders import get_electron_beam, get_wavefront_parameters, get_undulator_light_source, get_undulator_photon_energy, \
+    get_bending_magnet_light_source, get_boundary_shape, set_mirror_parameters, set_grating_parameters, set_grating_orientation_vectors, \
+    get_beamline_element, set_additional_parameters
+from orangecontrib.srw.util.srw_propagation import initialize_propagator_2D
+
+###############################################################
+#
+# WORKFLOWS
+#
+###############################################################
+
+class SRWWidgetSettings(object):
+    '''
+    Settings of a widget of a workflow, accessed as attributes like in the widget: the settings missing in the
+    file (e.g. added to the widget after the workflow was saved) have the default value of the widget class.
+    '''
+    def __init__(self, qualified_name, saved_settings):
+        self.__dict__.update(get_widget_defaults(qualified_name))
+        self.__dict__.update(saved_settings)
+
+def get_widget_defaults(qualified_name):
+    '''
+    Default values of the settings of a SRW widget class and of its SRW base classes, read from the sources of
+    the modules (importing them would import Qt)
+    '''
+    module_name, class_name = qualified_name.rsplit(".", 1)
+
+    spec = importlib.util.find_spec(module_name)
+    if spec is None or spec.origin is None: raise ValueError("Module " + module_name + " not found")
+
+    with open(spec.origin, "r") as file: tree = ast.parse(file.read())
+
+    imported_names = {}
+    for statement in tree.body:
+        if isinstance(statement, ast.ImportFrom) and statement.level == 0:
+            for alias in statement.names: imported_names[alias.asname or alias.name] = statement.module
+
+    defaults = {}
+
+    for statement in tree.body:
+        if isinstance(statement, ast.ClassDef) and statement.name == class_name:
+            for base in statement.bases:
+                if isinstance(base, ast.Name):
+                    base_module_name = imported_names.get(base.id, module_name)
+
+                    if base_module_name.startswith("orangecontrib.srw."): defaults.update(get_widget_defaults(base_module_name + "." + base.id))
+
+            for assignment in statement.body:
+                if isinstance(assignment, ast.Assign) and isinstance(assignment.value, ast.Call) and \
+                        isinstance(assignment.value.func, ast.Name) and assignment.value.func.id == "Setting" and len(assignment.value.args) > 0:
+                    try:
+                        value = eval(compile(ast.Expression(assignment.value.args[0]), spec.origin, "eval"), {"__builtins__": {}})
+                    except Exception:
+                        continue # not a constant expression
+
+                    for target in assignment.targets:
+                        if isinstance(target, ast.Name): defaults[target.id] = value
+
+            return defaults
+
+    raise ValueError("Class " + class_name + " not found in module " + module_name)
+
+class _NotLoaded(object):
+    def __init__(self, *args, **kwargs): pass
+    def __setstate__(self, state): pass
+
+class _SettingsUnpickler(pickle.Unpickler):
+    # the saved geometry of the widgets is a Qt object, and widgets not run in batch mode can have settings of
+    # any type: these are not loaded, without importing their module
+    def find_class(self, module, name):
+        if module == "sip" or module.startswith("PyQt5"): return _NotLoaded
+
+        try:
+            return super().find_class(module, name)
+        except ImportError:
+            return _NotLoaded
+
+def read_workflow(file_name):
+    '''
+    :return: nodes {id: (qualified name, title)}, enabled SRWData links [(source id, sink id)], saved settings {id: dictionary}
+    '''
+    root = ElementTree.parse(file_name).getroot()
+
+    nodes = {node.get("id"): (node.get("qualified_name"), node.get("title")) for node in root.iter("node")}
+    links = [(link.get("source_node_id"), link.get("sink_node_id")) for link in root.iter("link") \
+             if link.get("enabled", "true") == "true" and link.get("source_channel") == "SRWData" and link.get("sink_channel") == "SRWData"]
+
+    settings = {}
+    for properties in root.iter("properties"):
+        if properties.get("format") == "pickle":
+            settings[properties.get("node_id")] = _SettingsUnpickler(io.BytesIO(base64.b64decode(properties.text))).load()
+        elif properties.get("format") == "literal":
+            settings[properties.get("node_id")] = ast.literal_eval(properties.text)
+
+    return nodes, links, settings
+
+def get_workflow_chain(nodes, links, node_id=None):
+    '''
+    Node ids from the source to node_id: by default node_id is the end of the only SRW branch of the workflow
+    '''
+    if node_id is None:
+        srw_nodes = [id for id, (qualified_name, _) in nodes.items() if qualified_name in LIGHT_SOURCES or qualified_name.startswith("orangecontrib.srw.widgets.optical_elements.")]
+        last_nodes = [id for id in srw_nodes if not any(source == id and sink in srw_nodes for source, sink in links)]
+
+        if len(last_nodes) != 1: raise ValueError("The workflow has " + str(len(last_nodes)) + " SRW branches, ending in the nodes " +
+                                                  ", ".join([id + " (" + nodes[id][1] + ")" for id in last_nodes]) + ": choose the last node")
+        node_id = last_nodes[0]
+    elif not node_id in nodes:
+        raise ValueError("Node " + node_id + " not found in the workflow")
+
+    chain = [node_id]
+
+    while not nodes[chain[0]][0] in LIGHT_SOURCES:
+        if not nodes[chain[0]][0] in OPTICAL_ELEMENTS: raise ValueError("Widget " + nodes[chain[0]][0] + " (" + nodes[chain[0]][1] + ") is not supported in batch mode")
+
+        sources = [source for source, sink in links if sink == chain[0]]
+
+        if len(sources) == 0: raise ValueError("Node " + chain[0] + " (" + nodes[chain[0]][1] + ") has no SRW input")
+        elif sources[0] in chain: raise ValueError("The workflow has a loop of SRW links")
+
+        chain.insert(0, sources[0])
+
+    return chain
+
+def get_workflow_beamline(file_name, node_id=None):
+    '''
+    :return: the beamline from the source to node_id and the source wavefront parameters
+    '''
+    nodes, links, settings = read_workflow(file_name)
+
+    chain = get_workflow_chain(nodes, links, node_id)
+
+    qualified_name, title = nodes[chain[0]]
+
+    srw_source, wavefront_parameters = LIGHT_SOURCES[qualified_name](SRWWidgetSettings(qualified_name, settings.get(chain[0], {})))
+    srw_source.name = title
+
+    srw_beamline = SRWBeamline(light_source=srw_source, beamline_elements_list=[]) # the default list is shared by all the beamlines
+
+    for id in chain[1:]:
+        qualified_name, title = nodes[id]
+        builder, has_oe_wavefront_propagation_parameters = OPTICAL_ELEMENTS[qualified_name]
+
+        oe_settings = SRWWidgetSettings(qualified_name, settings.get(id, {}))
+
+        optical_element = builder(oe_settings, wavefront_parameters._photon_energy_min)
+        optical_element.name = title
+
+        beamline_element = get_beamline_element(oe_settings, optical_element)
+
+        srw_beamline.append_beamline_element(beamline_element)
+        set_additional_parameters(oe_settings, beamline_element, beamline=srw_beamline, has_oe_wavefront_propagation_parameters=has_oe_wavefront_propagation_parameters)
+
+    return srw_beamline, wavefront_parameters
+
+def _get_undulator(settings):
+    srw_source = get_undulator_light_source(settings, get_electron_beam(settings, -0.5*settings.period_length*(settings.number_of_periods + 4)))
+
+    return srw_source, get_wavefront_parameters(settings, get_undulator_photon_energy(settings, srw_source), 1)
+
+def _get_bending_magnet(settings):
+    srw_source = get_bending_magnet_light_source(settings, get_electron_beam(settings, -0.5*settings.length))
+
+    return srw_source, get_wavefront_parameters(settings, settings.wf_photon_energy, 2)
+
+def _get_mirror(mirror_instance):
+    def builder(settings, photon_energy):
+        reflectivity_data = None
+
+        if settings.has_reflectivity == 2:
+            reflectivity_data = array('d')
+            reflectivity_data.frombytes(numpy.ascontiguousarray(numpy.loadtxt(settings.reflectivity_data_file, ndmin=1), dtype=numpy.float64).tobytes())
+
+        return set_mirror_parameters(settings, mirror_instance(settings), reflectivity_data)
+
+    return builder
+
+def _get_plane_grating(settings, photon_energy):
+    grating = set_grating_parameters(settings, SRWPlaneGrating())
+
+    set_grating_orientation_vectors(settings, grating, photon_energy)
+
+    return grating
+
+LIGHT_SOURCES = {
+    "orangecontrib.srw.widgets.light_sources.ow_srw_undulator.OWSRWUndulator"              : _get_undulator,
+    "orangecontrib.srw.widgets.light_sources.ow_srw_bending_magnet.OWSRWBendingMagnet"     : _get_bending_magnet,
+}
+
+# builder(settings, photon energy), has o.e. wavefront propagation parameters
+OPTICAL_ELEMENTS = {
+    "orangecontrib.srw.widgets.optical_elements.ow_srw_aperture.OWSRWAperture"                  : (lambda settings, photon_energy: SRWAperture(boundary_shape=get_boundary_shape(settings)), True),
+    "orangecontrib.srw.widgets.optical_elements.ow_srw_obstacle.OWSRWObstacle"                  : (lambda settings, photon_energy: SRWObstacle(boundary_shape=get_boundary_shape(settings)), True),
+    "orangecontrib.srw.widgets.optical_elements.ow_srw_ideal_lens.OWSRWIdealLens"               : (lambda settings, photon_energy: SRWIdealLens(focal_x=settings.focal_x, focal_y=settings.focal_y, x=settings.x, y=settings.y), True),
+    "orangecontrib.srw.widgets.optical_elements.ow_srw_screen.OWSRWScreen"                      : (lambda settings, photon_energy: SRWScreen(), False),
+    "orangecontrib.srw.widgets.optical_elements.ow_srw_plane_mirror.OWSRWPlaneMirror"           : (_get_mirror(lambda settings: SRWPlaneMirror()), True),
+    "orangecontrib.srw.widgets.optical_elements.ow_srw_spherical_mirror.OWSRWSphericallMirror"  : (_get_mirror(lambda settings: SRWSphericalMirror(radius=settings.radius)), True),
+    "orangecontrib.srw.widgets.optical_elements.ow_srw_toroidal_mirror.OWSRWToroidallMirror"    : (_get_mirror(lambda settings: SRWToroidalMirror(tangential_radius=settings.tangential_radius,
+                                                                                                                                                    sagittal_radius=settings.sagittal_radius)), True),
+    "orangecontrib.srw.widgets.optical_elements.ow_srw_elliptical_mirror.OWSRWEllipticalMirror" : (_get_mirror(lambda settings: SRWEllipticalMirror(distance_from_first_focus_to_mirror_center=settings.distance_from_first_focus_to_mirror_center,
+                                                                                                                                                      distance_from_mirror_center_to_second_focus=settings.distance_from_mirror_center_to_second_focus)), True),
+    "orangecontrib.srw.widgets.optical_elements.ow_srw_plane_grating.OWSRWPlaneGrating"         : (_get_plane_grating, True),
+}
+
+###############################################################
+#
+# EXECUTION
+#
+###############################################################
+
+def save_beamline(srw_beamline, file_name):
+    '''
+    the light source must have been calculated (get_SRW_Wavefront), to keep the source wavefront parameters
+    '''
+    with open(file_name, "wb") as file: pickle.dump(srw_beamline, file)
+
+def load_beamline(file_name):
+    with open(file_name, "rb") as file: srw_beamline = pickle.load(file)
+
+    if isinstance(srw_beamline, SRWData): srw_beamline = srw_beamline.get_srw_beamline()
+
+    if not isinstance(srw_beamline, SRWBeamline): raise ValueError("File " + file_name + " doesn't contain a SRWBeamline")
+
+    return srw_beamline
+
+def run_beamline(srw_beamline, wavefront_parameters=None):
+    '''
+    Calculates the source wavefront and propagates it through the whole beamline
+
+    :param wavefront_parameters: if None, the ones of the last calculation of the light source
+    '''
+    light_source = srw_beamline.get_light_source()
+
+    if wavefront_parameters is None: wavefront_parameters = light_source.get_source_wavefront_parameters()
+    if wavefront_parameters is None: raise ValueError("No wavefront parameters: the light source of the beamline has never been calculated")
+
+    wavefront = light_source.get_SRW_Wavefront(source_wavefront_parameters=wavefront_parameters)
+
+    if srw_beamline.get_beamline_elements_number() == 0: return wavefront
+
+    initialize_propagator_2D()
+
+    propagation_manager = PropagationManager.Instance()
+    propagation_manager.set_propagation_mode(SRW_APPLICATION, SRWPropagationMode.WHOLE_BEAMLINE)
+
+    propagation_parameters = PropagationParameters(wavefront=wavefront, propagation_elements=None)
+    propagation_parameters.set_additional_parameters("working_beamline", srw_beamline)
+
+    return propagation_manager.do_propagation(propagation_parameters=propagation_parameters, handler_name=FresnelSRWNative.HANDLER_NAME)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="srw-batch",
+                                     description="Runs a SRW workflow (.ows) or a pickled SRWBeamline without OASYS and saves the propagated wavefront in HDF5")
+    parser.add_argument("input_file", help="OASYS workflow (.ows) or pickled SRWBeamline/SRWData")
+    parser.add_argument("output_file", help="HDF5 file")
+    parser.add_argument("--node", default=None, help="id of the last node of the workflow to run (default: the end of the only SRW branch)")
+    parser.add_argument("--data-path", default="wfr", help="HDF5 group of the wavefront (default: wfr)")
+    parser.add_argument("--phase", action="store_true", help="save the phase too")
+    parser.add_argument("--compression", choices=["gzip", "lzf"], default=None, help="compression filter of the datasets")
+
+    arguments = parser.parse_args(argv)
+
+    try:
+        if os.path.splitext(arguments.input_file)[1].lower() == ".ows":
+            srw_beamline, wavefront_parameters = get_workflow_beamline(arguments.input_file, arguments.node)
+        else:
+            srw_beamline, wavefront_parameters = load_beamline(arguments.input_file), None
+
+        output_wavefront = run_beamline(srw_beamline, wavefront_parameters)
+    except (ValueError, OSError) as exception:
+        parser.exit(1, "srw-batch: error: " + str(exception) + "\n")
+
+    from orangecontrib.srw.util.srw_hdf5 import save_wfr_2_hdf5
+
+    save_wfr_2_hdf5(output_wavefront, arguments.output_file, subgroupname=arguments.data_path,
+                    intensity=True, phase=arguments.phase, overwrite=True,
+                    compression=arguments.compression, shuffle=not arguments.compression is None, chunks=True if not arguments.compression is None else None)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
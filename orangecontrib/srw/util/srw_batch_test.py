@@ -0,0 +1,81 @@
+"""
+
+test of the batch runner: the beamline of a workflow must be the one built by the widgets
+
+"""
+
+import os
+import copy
+import shutil
+import tempfile
+import unittest
+import numpy
+
+from wofrysrw.beamline.srw_beamline import Where
+from wofrysrw.beamline.optical_elements.gratings.srw_plain_grating import SRWPlaneGrating
+from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUndulatorLightSource
+
+import srw_batch
+import srw_builders
+
+WORKFLOW = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "_test", "SRW Example 12.ows")
+
+class SRWBatchTest(unittest.TestCase):
+
+    def test_widget_classes(self):
+        # every key is the qualified name of an existing widget class
+        for qualified_name in list(srw_batch.LIGHT_SOURCES) + list(srw_batch.OPTICAL_ELEMENTS):
+            self.assertIsInstance(srw_batch.get_widget_defaults(qualified_name), dict, qualified_name)
+
+        self.assertIn("tangential_radius", srw_batch.get_widget_defaults("orangecontrib.srw.widgets.optical_elements.ow_srw_toroidal_mirror.OWSRWToroidallMirror"))
+
+    def test_workflow_beamline(self):
+        srw_beamline, wavefront_parameters = srw_batch.get_workflow_beamline(WORKFLOW)
+
+        self.assertIsInstance(srw_beamline.get_light_source(), SRWUndulatorLightSource)
+        self.assertEqual([srw_beamline.get_beamline_element_at(index).get_optical_element().name for index in range(srw_beamline.get_beamline_elements_number())],
+                         ["M2 Aperture", "Grating Aperture", "VLS PGM", "M3 Aperture", "M3", "Secondary Source Aperture", "M4 Aperture", "M4", "Sample Position"])
+
+        grating_element = srw_beamline.get_beamline_element_at(2)
+        grating = grating_element.get_optical_element()
+
+        self.assertIsInstance(grating, SRWPlaneGrating)
+        self.assertAlmostEqual(grating_element.get_coordinates().angle_radial(), numpy.pi/2 - grating.grazing_angle, places=10)
+
+        orientation_parameters = srw_beamline.get_wavefront_propagation_parameters_at(2, Where.OE)[1]
+        expected_orientation_parameters = srw_builders.get_grating_orientation_parameters(grating, wavefront_parameters._photon_energy_min)
+
+        self.assertEqual(orientation_parameters.orientation_of_the_output_optical_axis_vector_y, expected_orientation_parameters.orientation_of_the_output_optical_axis_vector_y)
+        self.assertEqual(orientation_parameters.orientation_of_the_output_optical_axis_vector_z, expected_orientation_parameters.orientation_of_the_output_optical_axis_vector_z)
+
+        # the end of a branch
+        srw_beamline, _ = srw_batch.get_workflow_beamline(WORKFLOW, node_id=self.get_node_id("VLS PGM"))
+
+        self.assertEqual(srw_beamline.get_beamline_elements_number(), 3)
+
+    def test_run(self):
+        srw_beamline, wavefront_parameters = srw_batch.get_workflow_beamline(WORKFLOW)
+
+        wavefront_parameters = copy.deepcopy(wavefront_parameters)
+        wavefront_parameters._h_slit_points = 31
+        wavefront_parameters._v_slit_points = 31
+
+        wavefront = srw_batch.run_beamline(srw_beamline, wavefront_parameters)
+
+        _, _, _, intensity = wavefront.get_intensity(multi_electron=False)
+
+        self.assertTrue(numpy.all(numpy.isfinite(intensity)))
+        self.assertGreater(intensity.sum(), 0.0)
+
+        directory = tempfile.mkdtemp()
+        try:
+            srw_batch.save_beamline(srw_beamline, os.path.join(directory, "beamline.pkl"))
+
+            self.assertEqual(srw_batch.load_beamline(os.path.join(directory, "beamline.pkl")).get_beamline_elements_number(), 9)
+        finally:
+            shutil.rmtree(directory)
+
+    def get_node_id(self, title):
+        nodes, _, _ = srw_batch.read_workflow(WORKFLOW)
+
+        return [id for id, (_, node_title) in nodes.items() if node_title == title][0]
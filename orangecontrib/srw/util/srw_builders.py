@@ -0,0 +1,354 @@
+"""
+
+SRW objects built from the settings of the widgets: used by the widgets themselves and by the headless execution of
+the workflows (srw_batch), where the settings are read from the .ows file. Qt is not imported.
+
+"""
+
+import numpy
+
+from syned.beamline.beamline_element import BeamlineElement
+from syned.beamline.element_coordinates import ElementCoordinates
+from syned.beamline.shape import Rectangle, Ellipse
+from syned.storage_ring.magnetic_structures.bending_magnet import BendingMagnet
+
+from wofrysrw.beamline.srw_beamline import Where
+from wofrysrw.beamline.optical_elements.srw_optical_element import SRWOpticalElementDisplacement
+from wofrysrw.beamline.optical_elements.mirrors.srw_mirror import ScaleType
+from wofrysrw.propagator.wavefront2D.srw_wavefront import WavefrontParameters, WavefrontPrecisionParameters, WavefrontPropagationParameters, WavefrontPropagationOptionalParameters
+from wofrysrw.storage_ring.srw_electron_beam import SRWElectronBeam
+from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUndulatorLightSource
+from wofrysrw.storage_ring.light_sources.srw_bending_magnet_light_source import SRWBendingMagnetLightSource
+from wofrysrw.storage_ring.magnetic_structures.srw_undulator import SRWUndulator
+from wofrysrw.storage_ring.magnetic_structures.srw_bending_magnet import SRWBendingMagnet
+
+###############################################################
+#
+# SRW OBJECTS FROM THE WIDGET SETTINGS
+#
+# settings is the widget itself or a srw_batch.SRWWidgetSettings
+#
+###############################################################
+
+def get_electron_beam(settings, default_initial_z):
+    if settings.type_of_initialization == 2:
+        electron_beam = SRWElectronBeam(energy_in_GeV=numpy.random.normal(settings.electron_energy_in_GeV,
+                                                                          settings.electron_energy_spread*settings.electron_energy_in_GeV),
+                                        energy_spread=settings.electron_energy_spread,
+                                        current=settings.ring_current)
+    else:
+        electron_beam = SRWElectronBeam(energy_in_GeV=settings.electron_energy_in_GeV,
+                                        energy_spread=settings.electron_energy_spread,
+                                        current=settings.ring_current)
+
+    if settings.type_of_properties == 0:
+        electron_beam._moment_xx = settings.moment_xx
+        electron_beam._moment_xxp = settings.moment_xxp
+        electron_beam._moment_xpxp = settings.moment_xpxp
+        electron_beam._moment_yy = settings.moment_yy
+        electron_beam._moment_yyp = settings.moment_yyp
+        electron_beam._moment_ypyp = settings.moment_ypyp
+
+        x, xp, y, yp = electron_beam.get_sigmas_all()
+
+        settings.electron_beam_size_h = x
+        settings.electron_beam_size_v = y
+        settings.electron_beam_divergence_h = xp
+        settings.electron_beam_divergence_v = yp
+    elif settings.type_of_properties == 1:
+        electron_beam.set_sigmas_all(sigma_x=settings.electron_beam_size_h,
+                                     sigma_y=settings.electron_beam_size_v,
+                                     sigma_xp=settings.electron_beam_divergence_h,
+                                     sigma_yp=settings.electron_beam_divergence_v)
+
+        settings.moment_xx = electron_beam._moment_xx
+        settings.moment_xpxp = electron_beam._moment_xpxp
+        settings.moment_yy = electron_beam._moment_yy
+        settings.moment_ypyp = electron_beam._moment_ypyp
+
+    elif settings.type_of_properties == 2:
+        electron_beam.set_moments_from_twiss(horizontal_emittance = settings.horizontal_emittance,
+                                             horizontal_beta      = settings.horizontal_beta,
+                                             horizontal_alpha     = settings.horizontal_alpha,
+                                             horizontal_eta       = settings.horizontal_eta,
+                                             horizontal_etap      = settings.horizontal_etap,
+                                             vertical_emittance   = settings.vertical_emittance,
+                                             vertical_beta        = settings.vertical_beta,
+                                             vertical_alpha       = settings.vertical_alpha,
+                                             vertical_eta         = settings.vertical_eta,
+                                             vertical_etap        = settings.vertical_etap)
+
+        settings.moment_xx = electron_beam._moment_xx
+        settings.moment_xpxp = electron_beam._moment_xpxp
+        settings.moment_yy = electron_beam._moment_yy
+        settings.moment_ypyp = electron_beam._moment_ypyp
+
+        x, xp, y, yp = electron_beam.get_sigmas_all()
+
+        settings.electron_beam_size_h = round(x, 9)
+        settings.electron_beam_size_v = round(y, 9)
+        settings.electron_beam_divergence_h = round(xp, 10)
+        settings.electron_beam_divergence_v = round(yp, 10)
+
+    if settings.type_of_initialization == 0: # zero
+        settings.moment_x = 0.0
+        settings.moment_y = 0.0
+        settings.moment_z = default_initial_z
+        settings.moment_xp = 0.0
+        settings.moment_yp = 0.0
+    elif settings.type_of_initialization == 2: # sampled
+        settings.moment_x = numpy.random.normal(0.0, settings.electron_beam_size_h)
+        settings.moment_y = numpy.random.normal(0.0, settings.electron_beam_size_v)
+        settings.moment_z = default_initial_z
+        settings.moment_xp = numpy.random.normal(0.0, settings.electron_beam_divergence_h)
+        settings.moment_yp = numpy.random.normal(0.0, settings.electron_beam_divergence_v)
+
+    electron_beam._moment_x = settings.moment_x
+    electron_beam._moment_y = settings.moment_y
+    electron_beam._moment_z = settings.moment_z
+    electron_beam._moment_xp = settings.moment_xp
+    electron_beam._moment_yp = settings.moment_yp
+
+    print("\n", "Electron Trajectory Initialization:")
+    print("X0: ", electron_beam._moment_x)
+    print("Y0: ", electron_beam._moment_y)
+    print("Z0: ", electron_beam._moment_z)
+    print("XP0: ", electron_beam._moment_xp)
+    print("YP0: ", electron_beam._moment_yp)
+    print("E0: ", electron_beam._energy_in_GeV, "\n")
+
+    return electron_beam
+
+def get_wavefront_parameters(settings, photon_energy, automatic_sr_method):
+    return WavefrontParameters(photon_energy_min = photon_energy,
+                               photon_energy_max = photon_energy,
+                               photon_energy_points=1,
+                               h_slit_gap = settings.wf_h_slit_gap,
+                               v_slit_gap = settings.wf_v_slit_gap,
+                               h_slit_points=settings.wf_h_slit_points,
+                               v_slit_points=settings.wf_v_slit_points,
+                               distance = settings.wf_distance,
+                               wavefront_precision_parameters=WavefrontPrecisionParameters(sr_method=0 if settings.wf_sr_method == 0 else automatic_sr_method,
+                                                                                           relative_precision=settings.wf_relative_precision,
+                                                                                           start_integration_longitudinal_position=settings.wf_start_integration_longitudinal_position,
+                                                                                           end_integration_longitudinal_position=settings.wf_end_integration_longitudinal_position,
+                                                                                           number_of_points_for_trajectory_calculation=settings.wf_number_of_points_for_trajectory_calculation,
+                                                                                           use_terminating_terms=settings.wf_use_terminating_terms,
+                                                                                           sampling_factor_for_adjusting_nx_ny=settings.wf_sampling_factor_for_adjusting_nx_ny))
+
+def get_undulator_light_source(settings, electron_beam):
+    symmetry_vs_longitudinal_position_horizontal = 1 if settings.symmetry_vs_longitudinal_position_horizontal == 0 else -1
+    symmetry_vs_longitudinal_position_vertical = 1 if settings.symmetry_vs_longitudinal_position_vertical == 0 else -1
+
+    if settings.magnetic_field_from == 0:
+        undulator_magnetic_structure=SRWUndulator(horizontal_central_position = settings.horizontal_central_position,
+                                                  vertical_central_position = settings.vertical_central_position,
+                                                  longitudinal_central_position=settings.longitudinal_central_position,
+                                                  K_vertical=settings.K_vertical,
+                                                  K_horizontal=settings.K_horizontal,
+                                                  period_length=settings.period_length,
+                                                  number_of_periods=settings.number_of_periods,
+                                                  initial_phase_horizontal=settings.initial_phase_horizontal,
+                                                  initial_phase_vertical=settings.initial_phase_vertical,
+                                                  symmetry_vs_longitudinal_position_horizontal=symmetry_vs_longitudinal_position_horizontal,
+                                                  symmetry_vs_longitudinal_position_vertical=symmetry_vs_longitudinal_position_vertical)
+    else:
+        undulator_magnetic_structure=SRWUndulator(horizontal_central_position = settings.horizontal_central_position,
+                                                  vertical_central_position = settings.vertical_central_position,
+                                                  longitudinal_central_position=settings.longitudinal_central_position,
+                                                  period_length=settings.period_length,
+                                                  number_of_periods=settings.number_of_periods,
+                                                  initial_phase_horizontal=settings.initial_phase_horizontal,
+                                                  initial_phase_vertical=settings.initial_phase_vertical,
+                                                  symmetry_vs_longitudinal_position_horizontal=symmetry_vs_longitudinal_position_horizontal,
+                                                  symmetry_vs_longitudinal_position_vertical=symmetry_vs_longitudinal_position_vertical)
+        undulator_magnetic_structure.set_K_vertical_from_magnetic_field(settings.B_vertical)
+        undulator_magnetic_structure.set_K_horizontal_from_magnetic_field(settings.B_horizontal)
+
+    return SRWUndulatorLightSource(electron_beam=electron_beam,
+                                   undulator_magnetic_structure=undulator_magnetic_structure)
+
+def get_undulator_photon_energy(settings, srw_source):
+    return settings.wf_photon_energy if settings.wf_use_harmonic == 1 else srw_source.get_resonance_energy()*settings.wf_harmonic_number
+
+def get_bending_magnet_light_source(settings, electron_beam):
+    settings.magnetic_radius = BendingMagnet.calculate_magnetic_radius(settings.magnetic_field, electron_beam.electron_energy_in_GeV) if settings.magnetic_radius == 0.0 else settings.magnetic_radius
+    settings.magnetic_field = BendingMagnet.calculate_magnetic_field(settings.magnetic_radius, electron_beam.electron_energy_in_GeV) if settings.magnetic_field == 0.0 else settings.magnetic_field
+
+    return SRWBendingMagnetLightSource(electron_beam=electron_beam,
+                                       bending_magnet_magnetic_structure=SRWBendingMagnet(settings.magnetic_radius,
+                                                                                          settings.magnetic_field,
+                                                                                          settings.length))
+
+def get_boundary_shape(settings):
+    if settings.shape == 0:
+        return Rectangle(x_left=-0.5*settings.width + settings.horizontal_shift,
+                         x_right=0.5*settings.width + settings.horizontal_shift,
+                         y_bottom=-0.5*settings.height + settings.vertical_shift,
+                         y_top=0.5*settings.height + settings.vertical_shift)
+    elif settings.shape == 1:
+        return Ellipse(a_axis_min=-settings.radius + settings.horizontal_shift,
+                       a_axis_max=settings.radius + settings.horizontal_shift,
+                       b_axis_min=-settings.radius + settings.vertical_shift,
+                       b_axis_max=settings.radius + settings.vertical_shift)
+
+def set_mirror_parameters(settings, mirror, reflectivity_data=None):
+    '''
+    :param reflectivity_data: content of the reflectivity data file, used if has_reflectivity == 2
+    '''
+    _set_reflecting_element_parameters(settings, mirror)
+
+    if settings.has_reflectivity == 1:
+        mirror.set_reflectivity(reflectivity_data=settings.reflectivity_value)
+    elif settings.has_reflectivity == 2:
+        mirror.set_reflectivity(reflectivity_data=reflectivity_data,
+                                energies_number=settings.reflectivity_energies_number,
+                                angles_number=settings.reflectivity_angles_number,
+                                components_number=settings.reflectivity_components_number + 1,
+                                energy_start=settings.reflectivity_energy_start,
+                                energy_end=settings.reflectivity_energy_end,
+                                energy_scale_type=ScaleType.LINEAR if settings.reflectivity_energy_scale_type==0 else ScaleType.LOGARITHMIC,
+                                angle_start=settings.reflectivity_angle_start,
+                                angle_end=settings.reflectivity_angle_end,
+                                angle_scale_type=ScaleType.LINEAR if settings.reflectivity_angle_scale_type==0 else ScaleType.LOGARITHMIC)
+
+    return mirror
+
+def set_grating_parameters(settings, grating):
+    _set_reflecting_element_parameters(settings, grating)
+
+    grating.diffraction_order=settings.diffraction_order
+    grating.grooving_density_0=settings.grooving_density_0
+    grating.grooving_density_1=settings.grooving_density_1
+    grating.grooving_density_2=settings.grooving_density_2
+    grating.grooving_density_3=settings.grooving_density_3
+    grating.grooving_density_4=settings.grooving_density_4
+    grating.grooving_angle=numpy.radians(settings.grooving_angle)
+
+    return grating
+
+def set_grating_orientation_vectors(settings, grating, photon_energy):
+    orientation_parameters = get_grating_orientation_parameters(grating, photon_energy)
+
+    settings.oe_orientation_of_the_output_optical_axis_vector_x = orientation_parameters.orientation_of_the_output_optical_axis_vector_x
+    settings.oe_orientation_of_the_output_optical_axis_vector_y = orientation_parameters.orientation_of_the_output_optical_axis_vector_y
+    settings.oe_orientation_of_the_output_optical_axis_vector_z = orientation_parameters.orientation_of_the_output_optical_axis_vector_z
+    settings.oe_orientation_of_the_horizontal_base_vector_x     = orientation_parameters.orientation_of_the_horizontal_base_vector_x
+    settings.oe_orientation_of_the_horizontal_base_vector_y     = orientation_parameters.orientation_of_the_horizontal_base_vector_y
+
+def get_grating_orientation_parameters(grating, photon_energy):
+    orientation_of_the_output_optical_axis_vector_x, \
+    orientation_of_the_output_optical_axis_vector_y, \
+    orientation_of_the_output_optical_axis_vector_z, \
+    orientation_of_the_horizontal_base_vector_x    , \
+    orientation_of_the_horizontal_base_vector_y     = grating.get_output_orientation_vectors(photon_energy)
+
+    return WavefrontPropagationOptionalParameters(orientation_of_the_output_optical_axis_vector_x = round(orientation_of_the_output_optical_axis_vector_x, 8),
+                                                  orientation_of_the_output_optical_axis_vector_y = round(orientation_of_the_output_optical_axis_vector_y, 8),
+                                                  orientation_of_the_output_optical_axis_vector_z = round(orientation_of_the_output_optical_axis_vector_z, 8),
+                                                  orientation_of_the_horizontal_base_vector_x     = round(orientation_of_the_horizontal_base_vector_x, 8),
+                                                  orientation_of_the_horizontal_base_vector_y     = round(orientation_of_the_horizontal_base_vector_y, 8))
+
+def _set_reflecting_element_parameters(settings, optical_element):
+    optical_element.tangential_size=settings.tangential_size
+    optical_element.sagittal_size=settings.sagittal_size
+    optical_element.grazing_angle=numpy.radians(90-settings.angle_radial)
+    optical_element.orientation_of_reflection_plane=settings.orientation_azimuthal
+    optical_element.invert_tangent_component = settings.invert_tangent_component == 1
+    optical_element.add_acceptance_slit=settings.add_acceptance_slit == 1
+    optical_element.height_profile_data_file=settings.height_profile_data_file if settings.has_height_profile else None
+    optical_element.height_profile_data_file_dimension=settings.height_profile_data_file_dimension + 1
+    optical_element.height_amplification_coefficient=settings.height_amplification_coefficient
+
+def get_beamline_element(settings, optical_element):
+    if settings.has_displacement==1:
+        optical_element.displacement = SRWOpticalElementDisplacement(shift_x=settings.shift_x,
+                                                                     shift_y=settings.shift_y,
+                                                                     rotation_x=numpy.radians(-settings.rotation_x),
+                                                                     rotation_y=numpy.radians(-settings.rotation_y))
+
+    return BeamlineElement(optical_element=optical_element,
+                           coordinates=ElementCoordinates(p=settings.p,
+                                                          q=settings.q,
+                                                          angle_radial=numpy.radians(settings.angle_radial),
+                                                          angle_azimuthal=numpy.radians(settings.angle_azimuthal)))
+
+def set_additional_parameters(settings, beamline_element, propagation_parameters=None, beamline=None, has_oe_wavefront_propagation_parameters=True):
+    # DRIFT BEFORE
+    srw_drift_before_wavefront_propagation_parameters = None
+    srw_drift_before_wavefront_propagation_optional_parameters = None
+
+    if beamline_element.get_coordinates().p() != 0:
+        srw_drift_before_wavefront_propagation_parameters = _get_wavefront_propagation_parameters(settings, "drift_before_")
+
+        if not propagation_parameters is None: propagation_parameters.set_additional_parameters("srw_drift_before_wavefront_propagation_parameters", srw_drift_before_wavefront_propagation_parameters)
+
+        srw_drift_before_wavefront_propagation_optional_parameters = _get_wavefront_propagation_optional_parameters(settings, "drift_before_")
+
+        if not (propagation_parameters is None or srw_drift_before_wavefront_propagation_optional_parameters is None):
+            propagation_parameters.set_additional_parameters("srw_drift_before_wavefront_propagation_optional_parameters", srw_drift_before_wavefront_propagation_optional_parameters)
+
+    if not beamline is None: beamline.append_wavefront_propagation_parameters(srw_drift_before_wavefront_propagation_parameters, srw_drift_before_wavefront_propagation_optional_parameters, Where.DRIFT_BEFORE)
+
+    # OE
+    srw_oe_wavefront_propagation_parameters = None
+    srw_oe_wavefront_propagation_optional_parameters = None
+
+    if has_oe_wavefront_propagation_parameters:
+        srw_oe_wavefront_propagation_parameters = _get_wavefront_propagation_parameters(settings, "oe_")
+
+        if not propagation_parameters is None: propagation_parameters.set_additional_parameters("srw_oe_wavefront_propagation_parameters", srw_oe_wavefront_propagation_parameters)
+
+        srw_oe_wavefront_propagation_optional_parameters = _get_wavefront_propagation_optional_parameters(settings, "oe_")
+
+        if not (propagation_parameters is None or srw_oe_wavefront_propagation_optional_parameters is None):
+            propagation_parameters.set_additional_parameters("srw_oe_wavefront_propagation_optional_parameters", srw_oe_wavefront_propagation_optional_parameters)
+
+    if not beamline is None: beamline.append_wavefront_propagation_parameters(srw_oe_wavefront_propagation_parameters, srw_oe_wavefront_propagation_optional_parameters, Where.OE)
+
+    # DRIFT AFTER
+    srw_drift_after_wavefront_propagation_parameters = None
+    srw_drift_after_wavefront_propagation_optional_parameters = None
+
+    if beamline_element.get_coordinates().q():
+        srw_drift_after_wavefront_propagation_parameters = _get_wavefront_propagation_parameters(settings, "drift_")
+
+        if not propagation_parameters is None: propagation_parameters.set_additional_parameters("srw_drift_after_wavefront_propagation_parameters", srw_drift_after_wavefront_propagation_parameters)
+
+        srw_drift_after_wavefront_propagation_optional_parameters = _get_wavefront_propagation_optional_parameters(settings, "drift_after_")
+
+        if not (propagation_parameters is None or srw_drift_after_wavefront_propagation_optional_parameters is None):
+            propagation_parameters.set_additional_parameters("srw_drift_after_wavefront_propagation_optional_parameters", srw_drift_after_wavefront_propagation_optional_parameters)
+
+    if not beamline is None: beamline.append_wavefront_propagation_parameters(srw_drift_after_wavefront_propagation_parameters, srw_drift_after_wavefront_propagation_optional_parameters, Where.DRIFT_AFTER)
+
+def _get_wavefront_propagation_parameters(settings, prefix):
+    def setting(name): return getattr(settings, prefix + name)
+
+    return WavefrontPropagationParameters(auto_resize_before_propagation                         = setting("auto_resize_before_propagation"),
+                                          auto_resize_after_propagation                          = setting("auto_resize_after_propagation"),
+                                          relative_precision_for_propagation_with_autoresizing   = setting("relative_precision_for_propagation_with_autoresizing"),
+                                          allow_semianalytical_treatment_of_quadratic_phase_term = setting("allow_semianalytical_treatment_of_quadratic_phase_term"),
+                                          do_any_resizing_on_fourier_side_using_fft              = setting("do_any_resizing_on_fourier_side_using_fft"),
+                                          horizontal_range_modification_factor_at_resizing       = setting("horizontal_range_modification_factor_at_resizing"),
+                                          horizontal_resolution_modification_factor_at_resizing  = setting("horizontal_resolution_modification_factor_at_resizing"),
+                                          vertical_range_modification_factor_at_resizing         = setting("vertical_range_modification_factor_at_resizing"),
+                                          vertical_resolution_modification_factor_at_resizing    = setting("vertical_resolution_modification_factor_at_resizing"),
+                                          type_of_wavefront_shift_before_resizing                = setting("type_of_wavefront_shift_before_resizing"),
+                                          new_horizontal_wavefront_center_position_after_shift   = setting("new_horizontal_wavefront_center_position_after_shift"),
+                                          new_vertical_wavefront_center_position_after_shift     = setting("new_vertical_wavefront_center_position_after_shift"))
+
+def _get_wavefront_propagation_optional_parameters(settings, prefix):
+    values = [getattr(settings, prefix + name) for name in ["orientation_of_the_output_optical_axis_vector_x",
+                                                            "orientation_of_the_output_optical_axis_vector_y",
+                                                            "orientation_of_the_output_optical_axis_vector_z",
+                                                            "orientation_of_the_horizontal_base_vector_x",
+                                                            "orientation_of_the_horizontal_base_vector_y"]]
+
+    if all(value == 0.0 for value in values): return None
+
+    return WavefrontPropagationOptionalParameters(orientation_of_the_output_optical_axis_vector_x = values[0],
+                                                  orientation_of_the_output_optical_axis_vector_y = values[1],
+                                                  orientation_of_the_output_optical_axis_vector_z = values[2],
+                                                  orientation_of_the_horizontal_base_vector_x     = values[3],
+                                                  orientation_of_the_horizontal_base_vector_y     = values[4])
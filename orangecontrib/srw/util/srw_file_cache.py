@@ -0,0 +1,56 @@
+import os
+
+import numpy
+
+#
+# Binary cache of the data of a text file: a .npy file next to it, memory-mapped when the text file is read again.
+# The cache is valid while the size and the modification time (ns) of the text file are the ones recorded in
+# a stamp file when the cache was written.
+#
+
+def get_cache_file_name(file_name):
+    return file_name + ".npy"
+
+def get_file_stamp(file_name):
+    stat = os.stat(file_name)
+
+    return "%d %d" % (stat.st_size, stat.st_mtime_ns)
+
+def is_cache_valid(file_name):
+    cache_file = get_cache_file_name(file_name)
+
+    try:
+        with open(_get_stamp_file_name(cache_file), "r") as stamp_file:
+            return os.path.isfile(cache_file) and stamp_file.read() == get_file_stamp(file_name)
+    except OSError:
+        return False
+
+def load_cache(file_name, mmap_mode="r"):
+    '''
+    :return: the cached data, memory-mapped, or None if there is no valid cache
+    '''
+    return numpy.load(get_cache_file_name(file_name), mmap_mode=mmap_mode) if is_cache_valid(file_name) else None
+
+def write_cache(file_name, data, file_stamp=None):
+    '''
+    :param file_stamp: stamp of the text file when the data were read (default: now)
+    '''
+    cache_file = get_cache_file_name(file_name)
+    stamp_file = _get_stamp_file_name(cache_file)
+
+    try:
+        if file_stamp is None: file_stamp = get_file_stamp(file_name)
+
+        # the old stamp is removed first: a cache without stamp is invalid
+        if os.path.exists(stamp_file): os.remove(stamp_file)
+
+        numpy.save(cache_file + ".tmp.npy", data)
+        os.replace(cache_file + ".tmp.npy", cache_file)
+
+        with open(stamp_file + ".tmp", "w") as file: file.write(file_stamp)
+        os.replace(stamp_file + ".tmp", stamp_file)
+    except OSError: # e.g. read-only directory: the text file is parsed every time
+        pass
+
+def _get_stamp_file_name(cache_file):
+    return cache_file + ".stamp"
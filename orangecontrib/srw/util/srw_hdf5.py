@@ -41,7 +41,8 @@ import sys
 import os
 
 
-def save_wfr_2_hdf5(wfr,filename,subgroupname="wfr",intensity=False,phase=False,overwrite=True):
+def save_wfr_2_hdf5(wfr,filename,subgroupname="wfr",intensity=False,phase=False,overwrite=True,
+                    compression=None,compression_opts=None,shuffle=False,chunks=None):
     """
     Writes wavefront data into a hdf5 generic file.
     When using the append mode to write h5 files, overwriting forces to initializes a new file.
@@ -54,113 +55,102 @@ def save_wfr_2_hdf5(wfr,filename,subgroupname="wfr",intensity=False,phase=False,
             2: Writes total intensity (total polarisation) plus sigma polarization and pi polarization
     :param phase: "Single-Electron" Radiation Phase - total polarisation (instance of srwl.CalcIntFromElecField)
     :param overwrite: flag that should always be set to True to avoid infinity loop on the recursive part of the function.
+    :param compression: compression filter of the complex amplitude, intensity and phase datasets: None (Default), "gzip" or "lzf"
+    :param compression_opts: compression level (0-9) when using "gzip"
+    :param shuffle: applies the HDF5 shuffle filter before compression
+    :param chunks: chunk shape of the complex amplitude, intensity and phase datasets (None: HDF5 default, True: automatic)
     """
 
     _complex_amplitude=True
 
+    storage = _storage_options(compression, compression_opts, shuffle, chunks)
+
     if (os.path.isfile(filename)) and (overwrite==True):
         os.remove(filename)
         FileName = filename.split("/")
         print("save_wfr_2_hdf5: file deleted %s"%FileName[-1])
 
-    if not os.path.isfile(filename):  # if file doesn't exist, create it.
-        sys.stdout.flush()
-        f = h5py.File(filename, 'w')
-        # points to the default data to be plotted
-        f.attrs['default']          = 'entry'
-        # give the HDF5 root some more attributes
-        f.attrs['file_name']        = filename
-        f.attrs['file_time']        = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
-        f.attrs['creator']          = 'save_wfr_2_hdf5'
-        f.attrs['code']             = 'SRW'
-        f.attrs['HDF5_Version']     = h5py.version.hdf5_version
-        f.attrs['h5py_version']     = h5py.version.version
-        f.close()
-
-
-    if phase:
-        # s
-        ar1 = array('d', [0] * wfr.mesh.nx * wfr.mesh.ny)  # "flat" 2D array to take intensity data
-        srwl.CalcIntFromElecField(ar1, wfr, 0, 4, 3, wfr.mesh.eStart, 0, 0)
-        arxx = numpy.array(ar1)
-        arxx = arxx.reshape((wfr.mesh.ny, wfr.mesh.nx))#.T
-
-
-        # p
-        ar2 = array('d', [0] * wfr.mesh.nx * wfr.mesh.ny)  # "flat" 2D array to take intensity data
-        srwl.CalcIntFromElecField(ar2, wfr, 1, 4, 3, wfr.mesh.eStart, 0, 0)
-        aryy = numpy.array(ar2)
-        aryy = aryy.reshape((wfr.mesh.ny, wfr.mesh.nx))#.T
-
-        _dump_arr_2_hdf5(arxx-aryy, "phase/wfr_phase", filename, subgroupname) # difference
-        _dump_arr_2_hdf5(arxx, "phase/wfr_phase_s", filename, subgroupname)
-        _dump_arr_2_hdf5(aryy, "phase/wfr_phase_p", filename, subgroupname)
+    f = _open_hdf5_file(filename, creator='save_wfr_2_hdf5')
 
-    if (_complex_amplitude) or (intensity):
-        x_polarization = _SRWArrayToNumpy(wfr.arEx, wfr.mesh.nx, wfr.mesh.ny, wfr.mesh.ne)   # sigma
-        y_polarization = _SRWArrayToNumpy(wfr.arEy, wfr.mesh.nx, wfr.mesh.ny, wfr.mesh.ne)   # pi
-
-        e_field = numpy.concatenate((x_polarization, y_polarization), 3)
-
-        complex_amplitude_s = e_field[0,:,:,0]
-        complex_amplitude_p = e_field[0,:,:,1]
+    try:
+        f1 = f.require_group(subgroupname)
+
+        if phase:
+            arxx = _calc_phase(wfr, 0) # s
+            aryy = _calc_phase(wfr, 1) # p
+
+            _dump_arr_2_hdf5(arxx-aryy, "phase/wfr_phase", f1, storage) # difference
+            _dump_arr_2_hdf5(arxx, "phase/wfr_phase_s", f1, storage)
+            _dump_arr_2_hdf5(aryy, "phase/wfr_phase_p", f1, storage)
+
+        if (_complex_amplitude) or (intensity):
+            x_polarization = _SRWArrayToNumpy(wfr.arEx, wfr.mesh.nx, wfr.mesh.ny, wfr.mesh.ne)   # sigma
+            y_polarization = _SRWArrayToNumpy(wfr.arEy, wfr.mesh.nx, wfr.mesh.ny, wfr.mesh.ne)   # pi
+
+            # datasets are written as [vertical, horizontal] or, for multi-energy wavefronts, [energy, vertical, horizontal]
+            if wfr.mesh.ne == 1:
+                complex_amplitude_s = x_polarization[0,:,:,0].T
+                complex_amplitude_p = y_polarization[0,:,:,0].T
+            else:
+                complex_amplitude_s = x_polarization[:,:,:,0].swapaxes(1, 2)
+                complex_amplitude_p = y_polarization[:,:,:,0].swapaxes(1, 2)
+
+            if _complex_amplitude:
+                _dump_arr_2_hdf5(complex_amplitude_s, "wfr_complex_amplitude_s", f1, storage)
+                _dump_arr_2_hdf5(complex_amplitude_p, "wfr_complex_amplitude_p", f1, storage)
+
+            if intensity:
+                intens_p = numpy.abs(complex_amplitude_p) ** 2
+                intens_s = numpy.abs(complex_amplitude_s) ** 2
+                intens = intens_s + intens_p
+
+                _dump_arr_2_hdf5(intens,"intensity/wfr_intensity", f1, storage)
+                if intensity == 2:
+                    _dump_arr_2_hdf5(intens_s,"intensity/wfr_intensity_s", f1, storage)
+                    _dump_arr_2_hdf5(intens_p,"intensity/wfr_intensity_p", f1, storage)
 
-        if _complex_amplitude:
-            _dump_arr_2_hdf5(complex_amplitude_s.T, "wfr_complex_amplitude_s", filename, subgroupname)
-            _dump_arr_2_hdf5(complex_amplitude_p.T, "wfr_complex_amplitude_p", filename, subgroupname)
+        # points to the default data to be plotted
+        f1.attrs['NX_class'] = 'NXentry'
+        f1.attrs['default']  = 'intensity'
+
+        #f1["wfr_method"] = "SRW"
+        #f1["wfr_dimension"] = 2
+        f1["wfr_photon_energy"] = float(wfr.mesh.eStart)
+        f1["wfr_zStart"] = wfr.mesh.zStart
+        f1["wfr_Rx_dRx"] =  numpy.array([wfr.Rx,wfr.dRx])
+        f1["wfr_Ry_dRy"] =  numpy.array([wfr.Ry,wfr.dRy])
+        f1["wfr_mesh_X"] =  numpy.array([wfr.mesh.xStart,wfr.mesh.xFin,wfr.mesh.nx])
+        f1["wfr_mesh_Y"] =  numpy.array([wfr.mesh.yStart,wfr.mesh.yFin,wfr.mesh.ny])
+        f1["wfr_mesh_E"] =  numpy.array([wfr.mesh.eStart,wfr.mesh.eFin,wfr.mesh.ne])
 
-        if intensity:
-            intens_p = numpy.abs(complex_amplitude_p) ** 2
-            intens_s = numpy.abs(complex_amplitude_s) ** 2
-            intens = intens_s + intens_p
+        # Add NX plot attribites for automatic plot with silx view
+        myflags = [intensity,phase]
+        mylabels = ['intensity','phase']
+        for i,label in enumerate(mylabels):
+            if myflags[i]:
 
-            _dump_arr_2_hdf5(intens.T,"intensity/wfr_intensity",filename, subgroupname)
-            if intensity == 2:
-                _dump_arr_2_hdf5(intens_s.T,"intensity/wfr_intensity_s",filename, subgroupname)
-                _dump_arr_2_hdf5(intens_p.T,"intensity/wfr_intensity_p",filename, subgroupname)
+                f2 = f1[mylabels[i]]
+                f2.attrs['NX_class'] = 'NXdata'
+                f2.attrs['signal'] = 'wfr_%s'%(mylabels[i])
 
-    f = h5py.File(filename, 'a')
-    f1 = f[subgroupname]
+                # ds = nxdata.create_dataset('image_data', data=data)
+                f3 = f2["wfr_%s"%(mylabels[i])]
+                f3.attrs['interpretation'] = 'image'
 
-    # points to the default data to be plotted
-    f1.attrs['NX_class'] = 'NXentry'
-    f1.attrs['default']  = 'intensity'
+                _dump_energy_axis(f2, wfr.mesh)
 
-    #f1["wfr_method"] = "SRW"
-    #f1["wfr_dimension"] = 2
-    f1["wfr_photon_energy"] = float(wfr.mesh.eStart)
-    f1["wfr_zStart"] = wfr.mesh.zStart
-    f1["wfr_Rx_dRx"] =  numpy.array([wfr.Rx,wfr.dRx])
-    f1["wfr_Ry_dRy"] =  numpy.array([wfr.Ry,wfr.dRy])
-    f1["wfr_mesh_X"] =  numpy.array([wfr.mesh.xStart,wfr.mesh.xFin,wfr.mesh.nx])
-    f1["wfr_mesh_Y"] =  numpy.array([wfr.mesh.yStart,wfr.mesh.yFin,wfr.mesh.ny])
-
-    # Add NX plot attribites for automatic plot with silx view
-    myflags = [intensity,phase]
-    mylabels = ['intensity','phase']
-    for i,label in enumerate(mylabels):
-        if myflags[i]:
-
-            f2 = f1[mylabels[i]]
-            f2.attrs['NX_class'] = 'NXdata'
-            f2.attrs['signal'] = 'wfr_%s'%(mylabels[i])
-            f2.attrs['axes'] = [b'axis_y', b'axis_x']
-
-            # ds = nxdata.create_dataset('image_data', data=data)
-            f3 = f2["wfr_%s"%(mylabels[i])]
-            f3.attrs['interpretation'] = 'image'
-
-            # X axis data
-            ds = f2.create_dataset('axis_y', data=1e6*numpy.linspace(wfr.mesh.yStart,wfr.mesh.yFin,wfr.mesh.ny))
-            # f1['axis1_name'] = numpy.arange(_wfr.mesh.ny)
-            ds.attrs['units'] = 'microns'
-            ds.attrs['long_name'] = 'Y Pixel Size (microns)'    # suggested X axis plot label
-            #
-            # Y axis data
-            ds = f2.create_dataset('axis_x', data=1e6*numpy.linspace(wfr.mesh.xStart,wfr.mesh.xFin,wfr.mesh.nx))
-            ds.attrs['units'] = 'microns'
-            ds.attrs['long_name'] = 'X Pixel Size (microns)'    # suggested Y axis plot label
-    f.close()
+                # X axis data
+                ds = f2.create_dataset('axis_y', data=1e6*numpy.linspace(wfr.mesh.yStart,wfr.mesh.yFin,wfr.mesh.ny))
+                # f1['axis1_name'] = numpy.arange(_wfr.mesh.ny)
+                ds.attrs['units'] = 'microns'
+                ds.attrs['long_name'] = 'Y Pixel Size (microns)'    # suggested X axis plot label
+                #
+                # Y axis data
+                ds = f2.create_dataset('axis_x', data=1e6*numpy.linspace(wfr.mesh.xStart,wfr.mesh.xFin,wfr.mesh.nx))
+                ds.attrs['units'] = 'microns'
+                ds.attrs['long_name'] = 'X Pixel Size (microns)'    # suggested Y axis plot label
+    finally:
+        f.close()
 
     FileName = filename.split("/")
     print("save_wfr_2_hdf5: file written/updated %s" %FileName[-1])
@@ -177,7 +167,8 @@ def load_hdf5_2_wfr(filename,filepath):
     wfr = _dictionary_to_wfr(wdic)
     return wfr
 
-def save_stokes_2_hdf5(_Stokes,_filename,_subgroupname="wfr",_S0=True,_S1=False,_S2=False,_S3=False,_overwrite=True):
+def save_stokes_2_hdf5(_Stokes,_filename,_subgroupname="wfr",_S0=True,_S1=False,_S2=False,_S3=False,_overwrite=True,
+                       _compression=None,_compression_opts=None,_shuffle=False,_chunks=None):
     """
      Auxiliary function to write the Stokes parameters data into a hdf5 generic file. The Stokes parameters of a plane
      monochromatic wave are four quantities: S0, S1, S2 and S3. Only three of them are independent, since they are
@@ -190,73 +181,73 @@ def save_stokes_2_hdf5(_Stokes,_filename,_subgroupname="wfr",_S0=True,_S1=False,
     :param _S2: U = P_45 + P_135 = <2Ex*Ey*cos(delta)>
     :param _S3: V = P_r_circular + P_l_circular = <2Ex*Ey*sin(delta)>
     :param _overwrite: flag that should always be set to True to avoid infinity loop on the recursive part of the function.
+    :param _compression: compression filter of the Stokes datasets: None (Default), "gzip" or "lzf"
+    :param _compression_opts: compression level (0-9) when using "gzip"
+    :param _shuffle: applies the HDF5 shuffle filter before compression
+    :param _chunks: chunk shape of the Stokes datasets (None: HDF5 default, True: automatic)
     """
+    storage = _storage_options(_compression, _compression_opts, _shuffle, _chunks)
+
     try:
-        if not os.path.isfile(_filename):  # if file doesn't exist, create it.
-            sys.stdout.flush()
-            f = h5py.File(_filename, 'w')
+        f = _open_hdf5_file(_filename, creator='save_stokes_2_hdf5')
+
+        try:
+            # SRW order is [component, vertical, horizontal, energy]: datasets are written as [vertical, horizontal]
+            # or, for multi-energy Stokes, [energy, vertical, horizontal]
+            arxx = numpy.array(_Stokes.arS)
+            arxx = arxx.reshape((4, _Stokes.mesh.ny, _Stokes.mesh.nx, _Stokes.mesh.ne)).transpose(0, 3, 1, 2)
+            if _Stokes.mesh.ne == 1: arxx = arxx[:, 0, :, :]
+
+            f1 = f.require_group(_subgroupname)
+
+            if _S0:
+                _dump_arr_2_hdf5(arxx[0], "Stokes_S0/S0", f1, storage)
+            if _S1:
+                _dump_arr_2_hdf5(arxx[1], "Stokes_S1/S1", f1, storage)
+            if _S2:
+                _dump_arr_2_hdf5(arxx[2], "Stokes_S2/S2", f1, storage)
+            if _S3:
+                _dump_arr_2_hdf5(arxx[3], "Stokes_S3/S3", f1, storage)
+
             # points to the default data to be plotted
-            f.attrs['default']          = 'entry'
-            # give the HDF5 root some more attributes
-            f.attrs['file_name']        = _filename
-            f.attrs['file_time']        = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
-            f.attrs['creator']          = 'save_stokes_2_hdf5'
-            f.attrs['code']             = 'SRW'
-            f.attrs['HDF5_Version']     = h5py.version.hdf5_version
-            f.attrs['h5py_version']     = h5py.version.version
+            f1.attrs['NX_class'] = 'NXentry'
+            f1.attrs['default']  = 'S0'
+
+            #f1["Stokes_method"] = "SRW"
+            f1["Stokes_photon_energy"] = _Stokes.mesh.eStart
+            f1["Stokes_mesh_X"] = numpy.array([_Stokes.mesh.xStart, _Stokes.mesh.xFin, _Stokes.mesh.nx])
+            f1["Stokes_mesh_Y"] = numpy.array([_Stokes.mesh.yStart, _Stokes.mesh.yFin, _Stokes.mesh.ny])
+            f1["Stokes_mesh_E"] = numpy.array([_Stokes.mesh.eStart, _Stokes.mesh.eFin, _Stokes.mesh.ne])
+
+            # Add NX plot attribites for automatic plot with silx view
+            myflags = [_S0,_S1,_S2,_S3]
+            mylabels = ['S0','S1','S2','S3']
+            for i,label in enumerate(mylabels):
+                if myflags[i]:
+
+                    f2 = f1['Stokes_%s'%(mylabels[i])]
+                    f2.attrs['NX_class'] = 'NXdata'
+                    f2.attrs['signal'] = '%s'%(mylabels[i])
+
+                    # ds = nxdata.create_dataset('image_data', data=data)
+                    f3 = f2["%s"%(mylabels[i])]
+                    f3.attrs['interpretation'] = 'image'
+
+                    _dump_energy_axis(f2, _Stokes.mesh)
+
+                    # X axis data
+                    ds = f2.create_dataset('axis_y', data=1e6*numpy.linspace(_Stokes.mesh.yStart,_Stokes.mesh.yFin,_Stokes.mesh.ny))
+                    # f1['axis1_name'] = numpy.arange(_wfr.mesh.ny)
+                    ds.attrs['units'] = 'microns'
+                    ds.attrs['long_name'] = 'Y Pixel Size (microns)'    # suggested X axis plot label
+                    #
+                    # Y axis data
+                    ds = f2.create_dataset('axis_x', data=1e6*numpy.linspace(_Stokes.mesh.xStart,_Stokes.mesh.xFin,_Stokes.mesh.nx))
+                    ds.attrs['units'] = 'microns'
+                    ds.attrs['long_name'] = 'X Pixel Size (microns)'    # suggested Y axis plot label
+        finally:
             f.close()
 
-        arxx = numpy.array(_Stokes.arS)
-        arxx = arxx.reshape((4, _Stokes.mesh.ny, _Stokes.mesh.nx)).T
-
-        if _S0:
-            _dump_arr_2_hdf5(arxx[:, :, 0].T, "Stokes_S0/S0", _filename, _subgroupname)
-        if _S1:
-            _dump_arr_2_hdf5(arxx[:, :, 1].T, "Stokes_S1/S1", _filename, _subgroupname)
-        if _S2:
-            _dump_arr_2_hdf5(arxx[:, :, 2].T, "Stokes_S2/S2", _filename, _subgroupname)
-        if _S3:
-            _dump_arr_2_hdf5(arxx[:, :, 3].T, "Stokes_S3/S3", _filename, _subgroupname)
-
-        f = h5py.File(_filename, 'a')
-        f1 = f[_subgroupname]
-
-        # points to the default data to be plotted
-        f1.attrs['NX_class'] = 'NXentry'
-        f1.attrs['default']  = 'S0'
-
-        #f1["Stokes_method"] = "SRW"
-        f1["Stokes_photon_energy"] = _Stokes.mesh.eStart
-        f1["Stokes_mesh_X"] = numpy.array([_Stokes.mesh.xStart, _Stokes.mesh.xFin, _Stokes.mesh.nx])
-        f1["Stokes_mesh_Y"] = numpy.array([_Stokes.mesh.yStart, _Stokes.mesh.yFin, _Stokes.mesh.ny])
-
-        # Add NX plot attribites for automatic plot with silx view
-        myflags = [_S0,_S1,_S2,_S3]
-        mylabels = ['S0','S1','S2','S3']
-        for i,label in enumerate(mylabels):
-            if myflags[i]:
-
-                f2 = f1['Stokes_%s'%(mylabels[i])]
-                f2.attrs['NX_class'] = 'NXdata'
-                f2.attrs['signal'] = '%s'%(mylabels[i])
-                f2.attrs['axes'] = [b'axis_y', b'axis_x']
-
-                # ds = nxdata.create_dataset('image_data', data=data)
-                f3 = f2["%s"%(mylabels[i])]
-                f3.attrs['interpretation'] = 'image'
-
-                # X axis data
-                ds = f2.create_dataset('axis_y', data=1e6*numpy.linspace(_Stokes.mesh.yStart,_Stokes.mesh.yFin,_Stokes.mesh.ny))
-                # f1['axis1_name'] = numpy.arange(_wfr.mesh.ny)
-                ds.attrs['units'] = 'microns'
-                ds.attrs['long_name'] = 'Y Pixel Size (microns)'    # suggested X axis plot label
-                #
-                # Y axis data
-                ds = f2.create_dataset('axis_x', data=1e6*numpy.linspace(_Stokes.mesh.xStart,_Stokes.mesh.xFin,_Stokes.mesh.nx))
-                ds.attrs['units'] = 'microns'
-                ds.attrs['long_name'] = 'X Pixel Size (microns)'    # suggested Y axis plot label
-        f.close()
-
         FileName = _filename.split("/")
         print(">>>> save_stokes_2_hdf5: file witten/updated %s" %FileName[-1])
 
@@ -267,12 +258,14 @@ def save_stokes_2_hdf5(_Stokes,_filename,_subgroupname="wfr",_S0=True,_S1=False,
         os.remove(_filename)
         FileName = _filename.split("/")
         print(">>>> save_stokes_2_hdf5: file deleted %s"%FileName[-1])
-        save_stokes_2_hdf5(_Stokes,_filename,_subgroupname,_S0,_S1,_S2,_S3,_overwrite = False)
+        save_stokes_2_hdf5(_Stokes,_filename,_subgroupname,_S0,_S1,_S2,_S3,_overwrite = False,
+                           _compression=_compression,_compression_opts=_compression_opts,_shuffle=_shuffle,_chunks=_chunks)
 
 def SRWdat_2_h5(_file_path,_num_type='f'):
     """
     Auxiliary to be convert output files from SRW .dat format into a generic wavefront hdf5 generic file. Read-in tabulated
     Intensity data from an ASCII file (format is defined in srwl_uti_save_intens_ascii)
+    Multi-energy files are written as a single [energy, vertical, horizontal] dataset, chunked one energy per chunk.
     :param _file_path: path to file for saving the wavefront
     """
     file_h5 = _file_path.replace(".dat", ".h5")
@@ -282,29 +275,9 @@ def SRWdat_2_h5(_file_path,_num_type='f'):
 
     arxx = numpy.array(wfr.arEx)
 
-    if wfr.mesh.ne > 1:
-        print('>>>> No support for such .dat file')
-        return
-        # sys.stdout.flush()
-
-        # f = h5py.File(file_h5, 'w')
-        # Energy = numpy.linspace(wfr.mesh.eStart, wfr.mesh.eFin, num=wfr.mesh.ne)
-        # arxx = arxx.reshape((wfr.mesh.ny, wfr.mesh.nx, wfr.mesh.ne, 1))
-        # arxx = arxx.swapaxes(0, 2)
-
-        # for count in range(wfr.mesh.ne):
-
-        #     subgroupname = "wfr_%d"%count
-        #     f1 = f.create_group(subgroupname)
-        #     f1["converted_array"] = arxx
-        #     f1["wfr_method"] = "SRW"
-        #     f1["wfr_photon_energy"] = Energy[count]
-        #     f1["wfr_radii"] = numpy.array([wfr.Rx, wfr.dRx, wfr.Ry, wfr.dRy])
-        #     f1["wfr_mesh"] = numpy.array([wfr.mesh.xStart, wfr.mesh.xFin, wfr.mesh.nx, wfr.mesh.yStart, wfr.mesh.yFin, wfr.mesh.ny])
-        # f.close()
-        # return
-
-    arxx = arxx.reshape((wfr.mesh.ny, wfr.mesh.nx))#.T
+    # SRW order is [vertical, horizontal, energy]
+    arxx = arxx.reshape((wfr.mesh.ny, wfr.mesh.nx, wfr.mesh.ne)).transpose(2, 0, 1)
+    if wfr.mesh.ne == 1: arxx = arxx[0]
 
     sys.stdout.flush()
 
@@ -323,7 +296,7 @@ def SRWdat_2_h5(_file_path,_num_type='f'):
     # f1["converted_array"] = arxx
     # f1["wfr_method"] = "SRW"
 
-    fdata = f1.create_dataset("converted_array/array", data=arxx)
+    fdata = _dump_arr_2_hdf5(arxx, "converted_array/array", f1, {})
 
     f1["wfr_photon_energy"] = float(wfr.mesh.eStart)
     f1["wfr_zStart"] = wfr.mesh.zStart
@@ -331,18 +304,20 @@ def SRWdat_2_h5(_file_path,_num_type='f'):
     f1["wfr_Ry_dRy"] = numpy.array([wfr.Ry, wfr.dRy])
     f1["wfr_mesh_X"] = numpy.array([wfr.mesh.xStart, wfr.mesh.xFin, wfr.mesh.nx])
     f1["wfr_mesh_Y"] = numpy.array([wfr.mesh.yStart, wfr.mesh.yFin, wfr.mesh.ny])
+    f1["wfr_mesh_E"] = numpy.array([wfr.mesh.eStart, wfr.mesh.eFin, wfr.mesh.ne])
 
 
 
     f2 = f1["converted_array"]
     f2.attrs['NX_class'] = 'NXdata'
     f2.attrs['signal'] = 'array'
-    f2.attrs['axes'] = [b'axis_y', b'axis_x']
 
     # ds = nxdata.create_dataset('image_data', data=data)
     f3 = f2['array']
     f3.attrs['interpretation'] = 'image'
 
+    _dump_energy_axis(f2, wfr.mesh)
+
     # X axis data
     ds = f2.create_dataset('axis_y', data=1e6 * numpy.linspace(wfr.mesh.yStart, wfr.mesh.yFin, wfr.mesh.ny))
     # f1['axis1_name'] = numpy.arange(_wfr.mesh.ny)
@@ -360,49 +335,199 @@ def SRWdat_2_h5(_file_path,_num_type='f'):
 def load_hdf5_2_dictionary(filename,filepath):
 
     try:
-        f = h5py.File(filename, 'r')
-        # mesh_X = f[filepath+"/wfr_mesh_X"].value
-        # mesh_Y = f[filepath+"/wfr_mesh_Y"].value
-        # complex_amplitude_s = f[filepath+"/wfr_complex_amplitude_s"].value.T
-        # complex_amplitude_p = f[filepath+"/wfr_complex_amplitude_p"].value.T
-        # photon_energy = f[filepath+"/wfr_photon_energy"].value
-
-        out =  {
-            "wfr_complex_amplitude_s":f[filepath+"/wfr_complex_amplitude_s"].value.T,
-            "wfr_complex_amplitude_p":f[filepath+"/wfr_complex_amplitude_p"].value.T,
-            "wfr_photon_energy":f[filepath+"/wfr_photon_energy"].value,
-            "wfr_zStart":f[filepath+"/wfr_zStart"].value,
-            "wfr_mesh_X":f[filepath+"/wfr_mesh_X"].value,
-            "wfr_mesh_Y":f[filepath+"/wfr_mesh_Y"].value,
-            "wfr_Rx_dRx":f[filepath+"/wfr_Rx_dRx"].value,
-            "wfr_Ry_dRy":f[filepath+"/wfr_Ry_dRy"].value,
-        }
-
-        f.close()
-        return out
+        with LazyWavefront(filename, filepath) as lazy_wavefront:
+            return lazy_wavefront.get_dictionary()
     except:
         raise Exception("Failed to load SRW wavefront from h5 file: "+filename)
 
+class LazyWavefront(object):
+    """
+    Read-only access to a wavefront dumped with save_wfr_2_hdf5(), keeping the hdf5 datasets open: only the requested
+    hyperslabs (region of interest, decimated grid, single polarization, single energy) are read from disk, and a SRWLWfr
+    is built only when asked for.
+    Regions of interest are given as (x_min, x_max, y_min, y_max) in meters, decimation as the number of points to step.
+    Multi-energy wavefronts return [energy, horizontal, vertical] stacks, or a single [horizontal, vertical] slice when
+    an energy_index is given.
+    """
+
+    def __init__(self, filename, filepath="wfr"):
+        """
+        :param filename: the file name where a SRW wavefront has been dumped
+        :param filepath: wavefront entry name in the file, e.g., "wfr" or "wfr_end"
+        """
+        self._filename = filename
+        self._file = h5py.File(filename, 'r')
+
+        try:
+            self._group = self._file[filepath]
+
+            self._amplitude = {"s" : self._group["wfr_complex_amplitude_s"],
+                               "p" : self._group["wfr_complex_amplitude_p"]}
+
+            self.photon_energy = self._group["wfr_photon_energy"][()]
+            self.zStart        = self._group["wfr_zStart"][()]
+            self.mesh_X        = self._group["wfr_mesh_X"][()]
+            self.mesh_Y        = self._group["wfr_mesh_Y"][()]
+            self.Rx_dRx        = self._group["wfr_Rx_dRx"][()]
+            self.Ry_dRy        = self._group["wfr_Ry_dRy"][()]
+
+            if "wfr_mesh_E" in self._group:
+                self.mesh_E = self._group["wfr_mesh_E"][()]
+            else:
+                self.mesh_E = numpy.array([self.photon_energy, self.photon_energy, 1])
+        except:
+            self._file.close()
+            raise Exception("Failed to load SRW wavefront from h5 file: "+filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def nx(self):
+        return int(self.mesh_X[2])
+
+    def ny(self):
+        return int(self.mesh_Y[2])
+
+    def ne(self):
+        return int(self.mesh_E[2])
+
+    def get_energies(self):
+        return numpy.linspace(self.mesh_E[0], self.mesh_E[1], self.ne())
+
+    def get_x_coordinates(self, roi=None, decimation=1):
+        x_slice, _ = self._get_slices(roi, decimation)
+        return numpy.linspace(self.mesh_X[0], self.mesh_X[1], self.nx())[x_slice]
+
+    def get_y_coordinates(self, roi=None, decimation=1):
+        _, y_slice = self._get_slices(roi, decimation)
+        return numpy.linspace(self.mesh_Y[0], self.mesh_Y[1], self.ny())[y_slice]
+
+    def get_complex_amplitude(self, polarization="s", roi=None, decimation=1, energy_index=None):
+        """
+        :param polarization: "s" (sigma, horizontal) or "p" (pi, vertical)
+        :return: 2D complex array [horizontal, vertical] (3D [energy, horizontal, vertical] for multi-energy wavefronts)
+        """
+        if not polarization in self._amplitude:
+            raise ValueError("Polarization must be 's' or 'p'")
+
+        return self._read(self._amplitude[polarization], roi, decimation, energy_index)
+
+    def get_intensity(self, polarization="total", roi=None, decimation=1, energy_index=None):
+        """
+        :param polarization: "total", "s" (sigma, horizontal) or "p" (pi, vertical)
+        :return: 2D array [horizontal, vertical] (3D [energy, horizontal, vertical] for multi-energy wavefronts)
+        """
+        if polarization == "total":
+            if "intensity/wfr_intensity" in self._group:
+                return self._read(self._group["intensity/wfr_intensity"], roi, decimation, energy_index)
+            else:
+                return self.get_intensity("s", roi, decimation, energy_index) + \
+                       self.get_intensity("p", roi, decimation, energy_index)
+        else:
+            return numpy.abs(self.get_complex_amplitude(polarization, roi, decimation, energy_index)) ** 2
+
+    def get_intensity_dataset(self):
+        """
+        :return: the stored total intensity dataset [vertical, horizontal] or [energy, vertical, horizontal], still on
+                 disk (e.g. to be streamed one energy at a time by SRWWavefrontViewer.plot_3D), or None if not written
+        """
+        if "intensity/wfr_intensity" in self._group:
+            return self._group["intensity/wfr_intensity"]
+        else:
+            return None
+
+    def get_dictionary(self, roi=None, decimation=1, energy_index=None):
+        """
+        :return: the same dictionary of load_hdf5_2_dictionary(), restricted to the region of interest/decimated grid
+                 and, for multi-energy wavefronts, to the energy slice
+        """
+        x = self.get_x_coordinates(roi, decimation)
+        y = self.get_y_coordinates(roi, decimation)
+
+        if energy_index is None:
+            photon_energy = self.photon_energy
+            mesh_E = self.mesh_E
+        else:
+            photon_energy = self.get_energies()[energy_index]
+            mesh_E = numpy.array([photon_energy, photon_energy, 1])
+
+        return {
+            "wfr_complex_amplitude_s":self.get_complex_amplitude("s", roi, decimation, energy_index),
+            "wfr_complex_amplitude_p":self.get_complex_amplitude("p", roi, decimation, energy_index),
+            "wfr_photon_energy":photon_energy,
+            "wfr_zStart":self.zStart,
+            "wfr_mesh_X":self.mesh_X if roi is None and decimation == 1 else numpy.array([x[0], x[-1], x.size]),
+            "wfr_mesh_Y":self.mesh_Y if roi is None and decimation == 1 else numpy.array([y[0], y[-1], y.size]),
+            "wfr_mesh_E":mesh_E,
+            "wfr_Rx_dRx":self.Rx_dRx,
+            "wfr_Ry_dRy":self.Ry_dRy,
+        }
+
+    def get_srw_wfr(self, roi=None, decimation=1, energy_index=None):
+        """
+        :return: a SRW wavefront (instance of SRWLWfr) on the region of interest/decimated grid/energy slice
+        """
+        return _dictionary_to_wfr(self.get_dictionary(roi, decimation, energy_index))
+
+    def _read(self, dataset, roi, decimation, energy_index):
+        x_slice, y_slice = self._get_slices(roi, decimation)
+
+        if dataset.ndim == 2:
+            if not energy_index in (None, 0): raise IndexError("Energy index out of range")
+
+            return dataset[y_slice, x_slice].T
+        elif energy_index is None:
+            return dataset[:, y_slice, x_slice].swapaxes(1, 2)
+        else:
+            return dataset[energy_index, y_slice, x_slice].T
+
+    def _get_slices(self, roi, decimation):
+        decimation = int(decimation)
+        if decimation < 1: raise ValueError("Decimation must be a positive integer")
+
+        if roi is None:
+            return slice(None, None, decimation), slice(None, None, decimation)
+
+        x_min, x_max, y_min, y_max = roi
+
+        return self._get_slice(self.mesh_X, x_min, x_max, decimation), \
+               self._get_slice(self.mesh_Y, y_min, y_max, decimation)
+
+    @classmethod
+    def _get_slice(cls, mesh, coordinate_min, coordinate_max, decimation):
+        coordinates = numpy.linspace(mesh[0], mesh[1], int(mesh[2]))
+        indexes = numpy.where(numpy.logical_and(coordinates >= coordinate_min, coordinates <= coordinate_max))[0]
+
+        if indexes.size == 0: raise ValueError("Region of interest is outside the wavefront mesh")
+
+        return slice(int(indexes[0]), int(indexes[-1]) + 1, decimation)
+
 #
 # Auxiliar functions
 #
 def _numpyArrayToSRWArray(numpy_array):
     """
     Converts a numpy.array to an array usable by SRW.
-    :param numpy_array: a 2D numpy array
-    :return: a 2D complex SRW array
+    The real and imaginary parts are interleaved by writing the (transposed) complex field into a complex64 view of the
+    SRW buffer: the only copy made is the one into the returned array.
+    :param numpy_array: a 2D [horizontal, vertical] or 3D [energy, horizontal, vertical] complex numpy array
+    :return: a complex SRW array (interleaved real and imaginary parts, float32)
     """
-    elements_size = numpy_array.size
+    if not numpy_array.ndim in (2, 3):
+        raise ValueError("Only 2D [x, y] or 3D [energy, x, y] arrays can be converted to SRW arrays")
 
-    r_horizontal_field = numpy_array[:, :].real.transpose().flatten().astype(numpy.float)
-    i_horizontal_field = numpy_array[:, :].imag.transpose().flatten().astype(numpy.float)
+    srw_array = array('f', [0.0]) * (2 * numpy_array.size)
 
-    tmp = numpy.zeros(elements_size * 2, dtype=numpy.float32)
-    for i in range(elements_size):
-        tmp[2*i] = r_horizontal_field[i]
-        tmp[2*i+1] = i_horizontal_field[i]
+    # SRW stores the field in C-order as [vertical, horizontal, energy]
+    _SRWArrayView(srw_array, numpy_array.shape[::-1])[...] = numpy_array.transpose()
 
-    return array('f', tmp)
+    return srw_array
 
 def _SRWArrayToNumpy(srw_array, dim_x, dim_y, number_energies):
     """
@@ -413,37 +538,127 @@ def _SRWArrayToNumpy(srw_array, dim_x, dim_y, number_energies):
     :param number_energies: Size of energy dimension
     :return: 4D numpy array: [energy, horizontal, vertical, polarisation={0:horizontal, 1: vertical}]
     """
-    re = numpy.array(srw_array[::2],  dtype=numpy.float)
-    im = numpy.array(srw_array[1::2], dtype=numpy.float)
-
-    e = re + 1j * im
-    e = e.reshape((dim_y,
-                   dim_x,
-                   number_energies,
-                   1)
-                  )
+    e = _SRWArrayView(srw_array, (dim_y, dim_x, number_energies, 1))
 
     e = e.swapaxes(0, 2)
 
     return e.copy()
 
-def _dump_arr_2_hdf5(_arr,_calculation, _filename, _subgroupname):
+def _SRWArrayView(srw_array, shape):
     """
-    Auxiliary routine to save_wfr_2_hdf5() and save_stokes_2_hdf5()
-    :param _arr: (usually 2D) array to be saved on the hdf5 file inside the _subgroupname
-    :param _calculation
+    Returns a complex numpy view sharing memory with a SRW array (no copy is made).
+    :param srw_array: SRW array of interleaved real and imaginary parts (array('f') or array('d'))
+    :param shape: shape of the complex view, in SRW (C) order
+    :return: complex64 (or complex128 for double precision SRW arrays) numpy array
+    """
+    if isinstance(srw_array, array):
+        float_type = numpy.float64 if srw_array.typecode == 'd' else numpy.float32
+        buffer = numpy.frombuffer(srw_array, dtype=float_type)
+    else:
+        buffer = numpy.asarray(srw_array, dtype=numpy.float32)
+
+    complex_type = numpy.complex128 if buffer.dtype == numpy.float64 else numpy.complex64
+
+    return buffer.view(complex_type).reshape(shape)
+
+def _open_hdf5_file(_filename, creator):
+    """
+    Opens a hdf5 file in append mode, creating it (with the root attributes) if it doesn't exist.
     :param _filename: path to file for saving the wavefront
-    :param _subgroupname: container mechanism by which HDF5 files are organised
+    :param creator: name of the function writing the file
+    :return: the open file (instance of h5py.File), to be closed by the caller
     """
+    if os.path.isfile(_filename):
+        return h5py.File(_filename, 'a')
+
     sys.stdout.flush()
-    f = h5py.File(_filename, 'a')
-    try:
-        f1 = f.create_group(_subgroupname)
-    except:
-        f1 = f[_subgroupname]
-    #f1[_calculation] = _arr
-    fdata = f1.create_dataset(_calculation, data=_arr)
-    f.close()
+    f = h5py.File(_filename, 'w')
+    # points to the default data to be plotted
+    f.attrs['default']          = 'entry'
+    # give the HDF5 root some more attributes
+    f.attrs['file_name']        = _filename
+    f.attrs['file_time']        = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+    f.attrs['creator']          = creator
+    f.attrs['code']             = 'SRW'
+    f.attrs['HDF5_Version']     = h5py.version.hdf5_version
+    f.attrs['h5py_version']     = h5py.version.version
+
+    return f
+
+def _storage_options(compression=None, compression_opts=None, shuffle=False, chunks=None):
+    """
+    Builds the h5py dataset creation keywords for the (large) arrays.
+    :param compression: None, "gzip" or "lzf"
+    :param compression_opts: compression level (0-9) when using "gzip"
+    :param shuffle: applies the HDF5 shuffle filter
+    :param chunks: chunk shape, True for automatic chunking or None for the HDF5 default
+    :return: dictionary to be passed to h5py.Group.create_dataset
+    """
+    if not compression in (None, "gzip", "lzf"):
+        raise ValueError("Compression must be None, 'gzip' or 'lzf'")
+    if compression == "lzf" and not compression_opts is None:
+        raise ValueError("lzf compression does not accept options")
+
+    storage = {}
+    if not chunks is None:
+        storage["chunks"] = chunks
+    if not compression is None:
+        storage["compression"] = compression
+        if not compression_opts is None:
+            storage["compression_opts"] = compression_opts
+    if shuffle:
+        storage["shuffle"] = True
+
+    return storage
+
+def _dump_arr_2_hdf5(_arr,_calculation, _group, _storage=None):
+    """
+    Auxiliary routine to save_wfr_2_hdf5() and save_stokes_2_hdf5()
+    :param _arr: (usually 2D) array to be saved on the hdf5 file inside the _group
+    :param _calculation: dataset name, relative to _group
+    :param _group: open hdf5 group where the dataset is created (instance of h5py.Group)
+    :param _storage: dataset creation keywords (see _storage_options), applied to arrays of two or more dimensions.
+                     3D [energy, vertical, horizontal] arrays are chunked one energy per chunk, unless a chunk shape is given
+    """
+    if _storage is None or numpy.ndim(_arr) < 2:
+        _storage = {}
+    elif numpy.ndim(_arr) == 3 and _storage.get("chunks", True) is True:
+        _storage = dict(_storage, chunks=(1,) + numpy.shape(_arr)[1:])
+
+    return _group.create_dataset(_calculation, data=_arr, **_storage)
+
+def _dump_energy_axis(_group, _mesh):
+    """
+    Auxiliary routine to save_wfr_2_hdf5(), save_stokes_2_hdf5() and SRWdat_2_h5(): sets the NX axes of an image or,
+    for multi-energy meshes, of a stack of images
+    :param _group: NXdata group (instance of h5py.Group)
+    :param _mesh: SRW mesh (instance of SRWLRadMesh)
+    """
+    if _mesh.ne == 1:
+        _group.attrs['axes'] = [b'axis_y', b'axis_x']
+    else:
+        _group.attrs['axes'] = [b'axis_e', b'axis_y', b'axis_x']
+
+        ds = _group.create_dataset('axis_e', data=numpy.linspace(_mesh.eStart, _mesh.eFin, _mesh.ne))
+        ds.attrs['units'] = 'eV'
+        ds.attrs['long_name'] = 'Photon Energy (eV)'
+
+def _calc_phase(wfr, polarization):
+    """
+    Auxiliary routine to save_wfr_2_hdf5(): "Single-Electron" Radiation Phase of one polarization component
+    :param wfr: SRW wavefront (instance of SRWLWfr)
+    :param polarization: 0 (s) or 1 (p)
+    :return: [vertical, horizontal] or, for multi-energy wavefronts, [energy, vertical, horizontal] array
+    """
+    energies = numpy.linspace(wfr.mesh.eStart, wfr.mesh.eFin, wfr.mesh.ne)
+    phase = numpy.zeros((wfr.mesh.ne, wfr.mesh.ny, wfr.mesh.nx))
+
+    for ie, energy in enumerate(energies):
+        ar = array('d', [0]) * (wfr.mesh.nx * wfr.mesh.ny)  # "flat" 2D array to take phase data
+        srwl.CalcIntFromElecField(ar, wfr, polarization, 4, 3, energy, 0, 0)
+        phase[ie, :, :] = numpy.frombuffer(ar, dtype=numpy.float64).reshape((wfr.mesh.ny, wfr.mesh.nx))
+
+    return phase[0] if wfr.mesh.ne == 1 else phase
 
 
 def _dictionary_to_wfr(wdic):
@@ -460,6 +675,7 @@ def _dictionary_to_wfr(wdic):
     RX = wdic["wfr_Rx_dRx"]
     RY = wdic["wfr_Ry_dRy"]
     Z = wdic["wfr_zStart"]
+    E = wdic.get("wfr_mesh_E", [energy, energy, 1])
 
     # wshape = w_s.shape
     # print(">>>>>>>>>>>>>>>>wshape before: ",wshape,w_s.shape)
@@ -467,8 +683,8 @@ def _dictionary_to_wfr(wdic):
     # w_p.shape = [1,wshape[0],wshape[1],1]
     # print(">>>>>>>>>>>>>>>>wshape after: ",wshape,w_s.shape)
 
-    horizontal_size = w_s.shape[0]
-    vertical_size = w_s.shape[1]
+    horizontal_size = w_s.shape[-2]
+    vertical_size = w_s.shape[-1]
 
     if horizontal_size % 2 == 1 or \
        vertical_size % 2 == 1:
@@ -481,9 +697,9 @@ def _dictionary_to_wfr(wdic):
     srw_wavefront = SRWLWfr(_arEx=horizontal_field,
                             _arEy=vertical_field,
                             _typeE='f',
-                            _eStart=energy,
-                            _eFin=energy,
-                            _ne=1,
+                            _eStart=E[0],
+                            _eFin=E[1],
+                            _ne=int(E[2]),
                             _xStart=X[0],
                             _xFin=X[1],
                             _nx=int(X[2]),
@@ -0,0 +1,101 @@
+# coding: utf-8
+# /*##########################################################################
+#
+# Copyright (c) 2018 European Synchrotron Radiation Facility
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# ###########################################################################*/
+
+__authors__ = ["M Sanchez del Rio"]
+__license__ = "MIT"
+__date__ = "27/05/2018"
+
+"""
+
+benchmark of the numpy <-> SRW array converters used by srw_hdf5
+
+the loop-based converters are the ones used before the vectorization, kept here as a reference
+
+usage: python srw_hdf5_benchmark.py [number of points per side]
+
+"""
+
+import sys
+import time
+import numpy
+from array import array
+
+from srw_hdf5 import _numpyArrayToSRWArray, _SRWArrayToNumpy
+
+
+def numpyArrayToSRWArray_loop(numpy_array):
+    elements_size = numpy_array.size
+
+    r_horizontal_field = numpy_array[:, :].real.transpose().flatten().astype(numpy.float64)
+    i_horizontal_field = numpy_array[:, :].imag.transpose().flatten().astype(numpy.float64)
+
+    tmp = numpy.zeros(elements_size * 2, dtype=numpy.float32)
+    for i in range(elements_size):
+        tmp[2*i] = r_horizontal_field[i]
+        tmp[2*i+1] = i_horizontal_field[i]
+
+    return array('f', tmp)
+
+def SRWArrayToNumpy_loop(srw_array, dim_x, dim_y, number_energies):
+    re = numpy.array(srw_array[::2],  dtype=numpy.float64)
+    im = numpy.array(srw_array[1::2], dtype=numpy.float64)
+
+    e = re + 1j * im
+    e = e.reshape((dim_y, dim_x, number_energies, 1))
+    e = e.swapaxes(0, 2)
+
+    return e.copy()
+
+def timeit(function, *args):
+    t0 = time.time()
+    result = function(*args)
+    return result, time.time() - t0
+
+
+if __name__ == "__main__":
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+
+    field = (numpy.random.rand(n, n) + 1j*numpy.random.rand(n, n)).astype(numpy.complex64)
+
+    print("\n#\n# numpy -> SRW array (%d x %d)\n#\n" % (n, n))
+
+    srw_array_loop, t_loop = timeit(numpyArrayToSRWArray_loop, field)
+    srw_array,      t_new  = timeit(_numpyArrayToSRWArray, field)
+
+    assert srw_array == srw_array_loop
+
+    print("   loop:       %10.4f s" % t_loop)
+    print("   vectorized: %10.4f s  (x%.1f)" % (t_new, t_loop/max(t_new, 1e-9)))
+
+    print("\n#\n# SRW array -> numpy (%d x %d)\n#\n" % (n, n))
+
+    field_loop, t_loop = timeit(SRWArrayToNumpy_loop, srw_array, n, n, 1)
+    field_new,  t_new  = timeit(_SRWArrayToNumpy, srw_array, n, n, 1)
+
+    numpy.testing.assert_array_equal(field_new, field_loop)
+
+    print("   loop:       %10.4f s" % t_loop)
+    print("   vectorized: %10.4f s  (x%.1f)" % (t_new, t_loop/max(t_new, 1e-9)))
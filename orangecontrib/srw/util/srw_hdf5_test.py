@@ -39,7 +39,8 @@ import unittest
 import numpy
 from vinyl_srw.srwlib import *
 
-from srw_hdf5 import save_wfr_2_hdf5, load_hdf5_2_wfr, load_hdf5_2_dictionary
+from srw_hdf5 import save_wfr_2_hdf5, load_hdf5_2_wfr, load_hdf5_2_dictionary, LazyWavefront
+from srw_hdf5 import _numpyArrayToSRWArray, _SRWArrayToNumpy
 import os
 
 
@@ -211,4 +212,90 @@ class SRWhdf5Test(unittest.TestCase):
             numpy.testing.assert_almost_equal(1e-6*wf1_end[key],1e-6*wf2_end[key],1)
 
         os.remove("tmp3.h5")
-        os.remove("tmp3bis.h5")
\ No newline at end of file
+        os.remove("tmp3bis.h5")
+
+    def test_lazy_wavefront(self):
+
+        print("\n#\n# SRW hdf5 test lazy loading of region of interest\n#\n")
+
+        wfr = self.create_source()
+
+        save_wfr_2_hdf5(wfr,"tmp4.h5",intensity=True,phase=False,overwrite=True)
+
+        wf = load_hdf5_2_dictionary("tmp4.h5","wfr")
+
+        roi = (-0.0005, 0.0002, -0.0001, 0.0007)
+        x = numpy.linspace(wfr.mesh.xStart, wfr.mesh.xFin, wfr.mesh.nx)
+        y = numpy.linspace(wfr.mesh.yStart, wfr.mesh.yFin, wfr.mesh.ny)
+        x_mask = numpy.logical_and(x >= roi[0], x <= roi[1])
+        y_mask = numpy.logical_and(y >= roi[2], y <= roi[3])
+
+        with LazyWavefront("tmp4.h5","wfr") as lazy_wavefront:
+            complex_amplitude_s = lazy_wavefront.get_complex_amplitude("s", roi=roi, decimation=2)
+            numpy.testing.assert_array_equal(complex_amplitude_s, wf["wfr_complex_amplitude_s"][x_mask][:, y_mask][::2, ::2])
+
+            wfr_roi = lazy_wavefront.get_srw_wfr(roi=roi, decimation=2)
+            self.assertEqual(wfr_roi.mesh.nx, complex_amplitude_s.shape[0])
+            self.assertEqual(wfr_roi.mesh.ny, complex_amplitude_s.shape[1])
+            self.assertAlmostEqual(wfr_roi.mesh.xStart, x[x_mask][0])
+
+        os.remove("tmp4.h5")
+
+    def test_multi_energy(self):
+
+        print("\n#\n# SRW hdf5 test write/load multi-energy wavefront\n#\n")
+
+        ne, nx, ny = 3, 20, 10
+
+        wfr = SRWLWfr()
+        wfr.allocate(ne, nx, ny)
+        wfr.mesh.eStart = 1000.
+        wfr.mesh.eFin = 1100.
+        wfr.mesh.xStart = -0.001
+        wfr.mesh.xFin = 0.001
+        wfr.mesh.yStart = -0.001
+        wfr.mesh.yFin = 0.001
+        wfr.arEx = array('f', numpy.random.rand(2*ne*nx*ny).tolist())
+        wfr.arEy = array('f', numpy.random.rand(2*ne*nx*ny).tolist())
+
+        save_wfr_2_hdf5(wfr,"tmp5.h5",intensity=True,phase=False,overwrite=True)
+
+        wfr_loaded = load_hdf5_2_wfr("tmp5.h5","wfr")
+
+        self.assertEqual(wfr_loaded.mesh.ne, ne)
+        self.assertEqual(wfr_loaded.arEx, wfr.arEx)
+        self.assertEqual(wfr_loaded.arEy, wfr.arEy)
+
+        with LazyWavefront("tmp5.h5","wfr") as lazy_wavefront:
+            self.assertEqual(lazy_wavefront.get_intensity_dataset().chunks, (1, ny, nx))
+
+            intensity = lazy_wavefront.get_intensity()
+            self.assertEqual(intensity.shape, (ne, nx, ny))
+            numpy.testing.assert_array_equal(lazy_wavefront.get_intensity(energy_index=1), intensity[1])
+
+            wfr_slice = lazy_wavefront.get_srw_wfr(energy_index=1)
+            self.assertEqual(wfr_slice.mesh.ne, 1)
+            self.assertAlmostEqual(wfr_slice.mesh.eStart, 1050.)
+
+        os.remove("tmp5.h5")
+
+    def test_array_conversion(self):
+
+        print("\n#\n# SRW hdf5 test numpy <-> SRW array conversion\n#\n")
+
+        nx, ny, ne = 20, 30, 3
+
+        field = (numpy.random.rand(nx, ny) + 1j*numpy.random.rand(nx, ny)).astype(numpy.complex64)
+        srw_array = _numpyArrayToSRWArray(field)
+
+        self.assertEqual(len(srw_array), 2*nx*ny)
+        self.assertEqual(srw_array[0], field[0, 0].real)
+        self.assertEqual(srw_array[1], field[0, 0].imag)
+        self.assertEqual(srw_array[2], field[1, 0].real)
+        numpy.testing.assert_array_equal(_SRWArrayToNumpy(srw_array, nx, ny, 1)[0, :, :, 0], field)
+
+        field = (numpy.random.rand(ne, nx, ny) + 1j*numpy.random.rand(ne, nx, ny)).astype(numpy.complex64)
+        srw_array = _numpyArrayToSRWArray(field)
+
+        self.assertEqual(srw_array[2], field[1, 0, 0].real)
+        numpy.testing.assert_array_equal(_SRWArrayToNumpy(srw_array, nx, ny, ne)[:, :, :, 0], field)
@@ -0,0 +1,79 @@
+"""
+
+benchmark of the import time of the SRW add-on (python -X importtime, in a fresh interpreter for each module):
+ - total import time of each module
+ - slowest orangecontrib.srw modules (cumulative time)
+ - heavy dependencies loaded by the import (they should be loaded when the widgets are instantiated)
+
+usage: python srw_import_benchmark.py [max total import time in ms, e.g. 3000] [module, ...]
+
+with a maximum time, the exit code is 1 when a module takes longer to import (to be used in CI)
+
+"""
+
+import sys
+import subprocess
+
+MODULES = ["orangecontrib.srw.util.srw_propagation",
+           "orangecontrib.srw.util.srw_builders",
+           "orangecontrib.srw.util.srw_batch",
+           "orangecontrib.srw.widgets.gui.ow_srw_wavefront_viewer",
+           "orangecontrib.srw.widgets.light_sources.ow_srw_undulator",
+           "orangecontrib.srw.widgets.optical_elements.ow_srw_plane_mirror",
+           "orangecontrib.srw.menu.ow_srw_tools_menu"]
+
+HEAVY_DEPENDENCIES = ["PyQt5", "matplotlib", "silx", "h5py", "scipy", "srxraylib"]
+
+def get_import_times(module):
+    '''
+    :return: dictionary {imported module : (self time, cumulative time)} in ms, or None if the import fails
+    '''
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    if process.returncode != 0:
+        print("   import of " + module + " failed:\n" + process.stderr.strip().split("\n")[-1])
+        return None
+
+    import_times = {}
+
+    for line in process.stderr.split("\n"):
+        if not line.startswith("import time:") or "[us]" in line: continue
+
+        self_time, cumulative_time, imported_module = line[len("import time:"):].split("|")
+        import_times[imported_module.strip()] = (int(self_time)/1000, int(cumulative_time)/1000)
+
+    return import_times
+
+def benchmark_import(module, number_of_modules=10):
+    print("\n#\n# import " + module + "\n#\n")
+
+    import_times = get_import_times(module)
+
+    if import_times is None: return None
+
+    total_time = import_times[module][1]
+    srw_modules = sorted([name for name in import_times.keys() if name.startswith("orangecontrib.srw")], key=lambda name: -import_times[name][1])
+
+    print("   total:                        %10.1f ms" % total_time)
+
+    for name in srw_modules[:number_of_modules]:
+        print("   %-60s %10.1f ms" % (name, import_times[name][1]))
+
+    loaded_dependencies = [dependency for dependency in HEAVY_DEPENDENCIES if dependency in import_times]
+
+    print("   heavy dependencies loaded:    " + (", ".join(loaded_dependencies) if len(loaded_dependencies) > 0 else "none"))
+
+    return total_time
+
+if __name__ == "__main__":
+    max_time = float(sys.argv[1]) if len(sys.argv) > 1 else None
+    modules  = sys.argv[2:] if len(sys.argv) > 2 else MODULES
+
+    failed = False
+
+    for module in modules:
+        total_time = benchmark_import(module)
+
+        if total_time is None or (not max_time is None and total_time > max_time): failed = True
+
+    sys.exit(1 if failed else 0)
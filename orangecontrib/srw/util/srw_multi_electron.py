@@ -0,0 +1,472 @@
+import os, copy, pickle, hashlib, multiprocessing
+from array import array
+
+import numpy
+import h5py
+from scipy.interpolate import RegularGridInterpolator
+
+from wofrysrw.propagator.wavefront2D.srw_wavefront import SRWWavefront
+from wofrysrw.propagator.propagators2D.srw_fresnel_native import FresnelSRWNative
+from wofrysrw.util.srw import srwl, SRWLOptC, SRWLRadMesh, srwl_uti_save_intens_ascii
+
+from orangecontrib.srw.util.srw_accumulation import get_intensity
+
+class SRWMultiElectronRunner(object):
+    '''
+    Multi-electron propagation on a local pool of processes, as an alternative to the MPI script.
+
+    The macro-electrons are split in chunks of save_periodicity electrons: every chunk is calculated
+    by a worker (random electron coordinates from the 2nd order moments of the electron beam, SR
+    wavefront, propagation through the whole beamline) and its summed intensity is merged in the
+    accumulated one as soon as it is over, writing the average intensity to the output file, in the
+    SRW ascii format. The intensities are interpolated on the mesh of the propagated central electron.
+
+    The chunk of electrons [start, end) uses the random generator seeded by (seed, start), so that the
+    result does not depend on the number of processes or on the order of completion, and the seed with
+    the list of the completed chunks is the whole state of the calculation: it is saved in the HDF5
+    checkpoint file after every merge, together with the accumulated intensity. A runner loading the
+    checkpoint calculates only the missing electrons, or appends new ones if number_of_electrons is
+    larger than in the checkpointed calculation. The checkpoint is refused if it was written for a
+    different beamline, wavefront parameters or sampling (digest of the calculation, see
+    get_calculation_digest).
+
+    With mutual_intensity, the cuts of the mutual intensity vs X (at y=0) and vs Y (at x=0) are
+    accumulated and checkpointed as well, as in the MPI script with _char=4 (single photon energy).
+
+    With accumulation_file_name, the accumulated intensity is a memory-mapped .npy file instead of
+    an array in memory, and so are the sums of the chunks, written by the workers in temporary .npy
+    files next to it and merged one energy slice at a time: neither the workers nor the runner hold
+    a whole (energy, x, y) array. The output file is written one vertical position at a time.
+    '''
+
+    def __init__(self, srw_beamline, wavefront_parameters, number_of_electrons, save_periodicity=100, sampling_factor=0.0, output_file_name=None, checkpoint_file_name=None, accumulation_file_name=None, number_of_processes=None, seed=None, mutual_intensity=False):
+        if mutual_intensity and wavefront_parameters._photon_energy_points != 1: raise ValueError("Mutual Intensity is calculated at a single photon energy")
+
+        self.srw_beamline = srw_beamline
+        self.wavefront_parameters = wavefront_parameters
+        self.number_of_electrons = number_of_electrons
+        self.save_periodicity = max(1, save_periodicity)
+        self.sampling_factor = sampling_factor
+        self.output_file_name = output_file_name
+        self.checkpoint_file_name = checkpoint_file_name
+        self.accumulation_file_name = accumulation_file_name
+        self.number_of_processes = number_of_processes if not (number_of_processes is None or number_of_processes <= 0) else multiprocessing.cpu_count()
+        self.seed = seed if not seed is None else numpy.random.SeedSequence().entropy
+        self.mutual_intensity = mutual_intensity
+
+        self.energies = None
+        self.h_coordinates = None
+        self.v_coordinates = None
+        self.accumulated_intensity = None
+        self.accumulated_mutual_intensity_h = None
+        self.accumulated_mutual_intensity_v = None
+        self.number_of_electrons_done = 0
+        self.completed_ranges = []
+
+        self.__pool = None
+        self.__reference = None
+        self.__results = None
+
+    def is_running(self):
+        return not self.__pool is None
+
+    def start(self):
+        self.__pool = multiprocessing.Pool(processes=self.number_of_processes)
+        self.__reference = None
+        self.__results = None
+
+        if self.energies is None:
+            self.__reference = self.__pool.apply_async(_get_reference_mesh, (self.srw_beamline, self.wavefront_parameters, self.sampling_factor))
+        else: # resumed
+            self.__results = self.__pool.imap_unordered(_propagate_electrons, self.__get_tasks())
+
+    def poll(self, timeout=0):
+        '''
+        :param timeout: seconds to wait for a result, None to wait until it arrives
+        :return: True if new electrons have been added to the accumulated intensity
+        '''
+        if not self.is_running(): return False
+
+        try:
+            if self.__results is None:
+                self.__reference.wait(timeout)
+
+                if self.__reference.ready():
+                    self.energies, self.h_coordinates, self.v_coordinates = self.__reference.get()
+                    self.accumulated_intensity = self.__allocate((self.energies.size, self.h_coordinates.size, self.v_coordinates.size))
+                    if self.mutual_intensity:
+                        self.accumulated_mutual_intensity_h = numpy.zeros((self.h_coordinates.size, self.h_coordinates.size), dtype=numpy.complex128)
+                        self.accumulated_mutual_intensity_v = numpy.zeros((self.v_coordinates.size, self.v_coordinates.size), dtype=numpy.complex128)
+                    self.__results = self.__pool.imap_unordered(_propagate_electrons, self.__get_tasks())
+
+                return False
+            else:
+                start, end, intensity, mutual_intensity = self.__results.next(timeout)
+        except multiprocessing.TimeoutError:
+            return False
+        except StopIteration:
+            self.__close()
+            return False
+        except Exception as exception:
+            self.cancel()
+            raise exception
+
+        if self.accumulation_file_name is None:
+            self.accumulated_intensity += intensity
+        else:
+            chunk_intensity = numpy.load(intensity, mmap_mode="r")
+            for energy_index in range(self.energies.size): self.accumulated_intensity[energy_index] += chunk_intensity[energy_index]
+            self.accumulated_intensity.flush()
+
+            del chunk_intensity
+            os.remove(intensity)
+        if self.mutual_intensity:
+            self.accumulated_mutual_intensity_h += mutual_intensity[0]
+            self.accumulated_mutual_intensity_v += mutual_intensity[1]
+        self.number_of_electrons_done += end - start
+        self.completed_ranges.append((start, end))
+
+        if not self.output_file_name is None: self.save(self.output_file_name)
+        if not self.checkpoint_file_name is None: self.save_checkpoint(self.checkpoint_file_name)
+
+        if self.number_of_electrons_done >= self.number_of_electrons: self.__close()
+
+        return True
+
+    def run(self, progress_callback=None):
+        '''
+        Blocking execution
+
+        :param progress_callback: called with (number of electrons done, total number of electrons)
+        :return: energies, horizontal and vertical coordinates and average intensity
+        '''
+        self.start()
+
+        while self.is_running():
+            if self.poll(timeout=None) and not progress_callback is None:
+                progress_callback(self.number_of_electrons_done, self.number_of_electrons)
+
+        return self.get_intensity()
+
+    def cancel(self):
+        if self.is_running():
+            self.__pool.terminate()
+            self.__close()
+
+    def get_intensity(self, energy_index=Ellipsis):
+        '''
+        :param energy_index: to get only the average intensity at one energy
+        '''
+        if self.number_of_electrons_done == 0: return None
+
+        return self.energies, self.h_coordinates, self.v_coordinates, self.accumulated_intensity[energy_index]/self.number_of_electrons_done
+
+    def get_mutual_intensity(self):
+        '''
+        :return: horizontal and vertical coordinates and average mutual intensity cuts J(x1, x2) at y=0 and J(y1, y2) at x=0
+        '''
+        if self.number_of_electrons_done == 0 or not self.mutual_intensity: return None
+
+        return self.h_coordinates, self.v_coordinates, \
+               self.accumulated_mutual_intensity_h/self.number_of_electrons_done, \
+               self.accumulated_mutual_intensity_v/self.number_of_electrons_done
+
+    def get_calculation_digest(self):
+        '''
+        Digest of everything that determines the result, except the number of electrons
+        '''
+        return hashlib.sha256(pickle.dumps((self.srw_beamline,
+                                            self.wavefront_parameters,
+                                            self.sampling_factor,
+                                            self.save_periodicity, # the chunks define the random streams
+                                            self.mutual_intensity))).hexdigest()
+
+    def save(self, file_name):
+        if self.number_of_electrons_done == 0: return
+
+        mesh = SRWLRadMesh(_eStart=self.energies[0], _eFin=self.energies[-1], _ne=self.energies.size,
+                           _xStart=self.h_coordinates[0], _xFin=self.h_coordinates[-1], _nx=self.h_coordinates.size,
+                           _yStart=self.v_coordinates[0], _yFin=self.v_coordinates[-1], _ny=self.v_coordinates.size)
+
+        save_intensity_ascii(file_name, mesh, lambda v_index: self.accumulated_intensity[:, :, v_index]/self.number_of_electrons_done)
+
+        if self.mutual_intensity:
+            h_coordinates, v_coordinates, mutual_intensity_h, mutual_intensity_v = self.get_mutual_intensity()
+
+            # file names of srwl_wfr_fn(file_name, 31) and srwl_wfr_fn(file_name, 32)
+            file_name_core, extension = os.path.splitext(file_name)
+
+            for suffix, mutual_intensity, cut_mesh, labels in [("_mix", mutual_intensity_h,
+                                                                SRWLRadMesh(_eStart=self.energies[0], _eFin=self.energies[-1], _ne=1,
+                                                                            _xStart=h_coordinates[0], _xFin=h_coordinates[-1], _nx=h_coordinates.size,
+                                                                            _yStart=0.0, _yFin=0.0, _ny=1),
+                                                                ['Photon Energy', 'Horizontal Position', 'Conj. Horizontal Position', 'Mutual Intensity']),
+                                                               ("_miy", mutual_intensity_v,
+                                                                SRWLRadMesh(_eStart=self.energies[0], _eFin=self.energies[-1], _ne=1,
+                                                                            _xStart=0.0, _xFin=0.0, _nx=1,
+                                                                            _yStart=v_coordinates[0], _yFin=v_coordinates[-1], _ny=v_coordinates.size),
+                                                                ['Photon Energy', 'Vertical Position', 'Conj. Vertical Position', 'Mutual Intensity'])]:
+                # C-aligned, first coordinate changing fastest, real and imaginary parts interleaved
+                mutual_intensity = mutual_intensity.T
+                srwl_uti_save_intens_ascii(array('f', numpy.stack((mutual_intensity.real, mutual_intensity.imag), axis=-1).astype(numpy.float32).tobytes()),
+                                           cut_mesh, file_name_core + suffix + extension,
+                                           _arLabels=labels, _arUnits=['eV', 'm', 'm', 'ph/s/.1%bw/mm^2'], _mutual=1, _cmplx=1)
+
+    def save_checkpoint(self, file_name):
+        with h5py.File(file_name + ".tmp", "w") as f:
+            accumulated_intensity = f.create_dataset("accumulated_intensity", shape=self.accumulated_intensity.shape, dtype=numpy.float64)
+            for energy_index in range(self.energies.size): accumulated_intensity[energy_index] = self.accumulated_intensity[energy_index]
+            f.create_dataset("energies", data=self.energies)
+            f.create_dataset("h_coordinates", data=self.h_coordinates)
+            f.create_dataset("v_coordinates", data=self.v_coordinates)
+            f.create_dataset("completed_ranges", data=numpy.array(self.completed_ranges, dtype=numpy.int64).reshape(-1, 2))
+            if self.mutual_intensity:
+                f.create_dataset("accumulated_mutual_intensity_h", data=self.accumulated_mutual_intensity_h)
+                f.create_dataset("accumulated_mutual_intensity_v", data=self.accumulated_mutual_intensity_v)
+
+            f.attrs["digest"] = self.get_calculation_digest()
+            f.attrs["seed"] = str(self.seed) # 128 bits
+            f.attrs["number_of_electrons_done"] = self.number_of_electrons_done
+            f.attrs["number_of_electrons"] = self.number_of_electrons
+
+        os.replace(file_name + ".tmp", file_name)
+
+    def load_checkpoint(self, file_name):
+        if self.is_running(): raise RuntimeError("Calculation is running")
+
+        with h5py.File(file_name, "r") as f:
+            if f.attrs.get("digest") != self.get_calculation_digest():
+                raise ValueError("Checkpoint " + file_name + " was written by a different calculation (beamline, wavefront parameters, sampling, saving periodicity or mutual intensity)")
+
+            self.energies = f["energies"][()]
+            self.h_coordinates = f["h_coordinates"][()]
+            self.v_coordinates = f["v_coordinates"][()]
+
+            accumulated_intensity = f["accumulated_intensity"]
+            self.accumulated_intensity = self.__allocate(accumulated_intensity.shape)
+            for energy_index in range(self.energies.size): self.accumulated_intensity[energy_index] = accumulated_intensity[energy_index]
+            self.completed_ranges = [(int(start), int(end)) for start, end in f["completed_ranges"][()]]
+            if self.mutual_intensity:
+                self.accumulated_mutual_intensity_h = f["accumulated_mutual_intensity_h"][()]
+                self.accumulated_mutual_intensity_v = f["accumulated_mutual_intensity_v"][()]
+
+            self.seed = int(f.attrs["seed"])
+            self.number_of_electrons_done = int(f.attrs["number_of_electrons_done"])
+
+    def __allocate(self, shape):
+        if self.accumulation_file_name is None: return numpy.zeros(shape)
+        else: return numpy.lib.format.open_memmap(self.accumulation_file_name, mode="w+", dtype=numpy.float64, shape=shape)
+
+    def __get_tasks(self):
+        for start, end in get_missing_ranges(self.completed_ranges, self.number_of_electrons, self.save_periodicity):
+            yield (self.srw_beamline,
+                   self.wavefront_parameters,
+                   self.sampling_factor,
+                   (self.energies, self.h_coordinates, self.v_coordinates),
+                   start,
+                   end,
+                   numpy.random.SeedSequence(self.seed, spawn_key=(start,)),
+                   self.mutual_intensity,
+                   self.__get_chunk_file_name(start))
+
+    def __get_chunk_file_name(self, start):
+        if self.accumulation_file_name is None: return None
+        else: return os.path.splitext(self.accumulation_file_name)[0] + ".chunk_" + str(start) + ".npy"
+
+    def __close(self):
+        self.__pool.close() # after terminate() on cancel
+        self.__pool.join()
+        self.__pool = None
+        self.__reference = None
+        self.__results = None
+
+        # chunks of a cancelled calculation
+        if not (self.accumulation_file_name is None or self.energies is None):
+            for start, _ in get_missing_ranges(self.completed_ranges, self.number_of_electrons, self.save_periodicity):
+                if os.path.exists(self.__get_chunk_file_name(start)): os.remove(self.__get_chunk_file_name(start))
+
+def get_missing_ranges(completed_ranges, number_of_electrons, save_periodicity):
+    '''
+    Chunks [start, end) of at most save_periodicity electrons, aligned to multiples of save_periodicity,
+    covering the electrons up to number_of_electrons not in the completed ranges
+    '''
+    missing_ranges = []
+    position = 0
+
+    for start, end in sorted(completed_ranges) + [(number_of_electrons, number_of_electrons)]:
+        while position < min(start, number_of_electrons):
+            chunk_end = min(start, number_of_electrons, (position//save_periodicity + 1)*save_periodicity)
+            missing_ranges.append((position, chunk_end))
+            position = chunk_end
+
+        position = max(position, end)
+
+    return missing_ranges
+
+def save_intensity_ascii(file_name, mesh, get_intensity_slice):
+    '''
+    Same file of srwl_uti_save_intens_ascii (default labels and units), written one vertical position
+    at a time
+
+    :param get_intensity_slice: function of the vertical index returning the (energy, x) intensity
+    '''
+    labels = ['Photon Energy', 'Horizontal Position', 'Vertical Position', 'Intensity']
+    units = ['eV', 'm', 'm', 'ph/s/.1%bw/mm^2']
+    label_units = [labels[i] + ' [' + units[i] + ']' for i in range(4)]
+
+    with open(file_name, 'w') as f:
+        f.write('#' + label_units[3] + ' (C-aligned, inner loop is vs ' + labels[0] + ', outer loop vs ' + labels[2] + ')\n')
+        for start, end, points, index in [(mesh.eStart, mesh.eFin, mesh.ne, 0), (mesh.xStart, mesh.xFin, mesh.nx, 1), (mesh.yStart, mesh.yFin, mesh.ny, 2)]:
+            f.write('#' + str(start) + ' #Initial ' + label_units[index] + '\n')
+            f.write('#' + str(end) + ' #Final ' + label_units[index] + '\n')
+            f.write('#' + str(points) + ' #Number of points vs ' + labels[index] + '\n')
+        f.write('#1 #Number of components\n')
+
+        # SRW order: energy, x, y (energy changing fastest)
+        for v_index in range(mesh.ny):
+            f.write(''.join([' ' + str(value) + '\n' for value in numpy.asarray(get_intensity_slice(v_index)).T.astype(numpy.float32).flatten().tolist()]))
+
+def get_electron_beams(electron_beam, number_of_electrons, random_generator):
+    '''
+    Macro-electrons, as SRW particle beams with the first order moments randomized according to the
+    2nd order moments of the electron beam
+    '''
+    part_beam = electron_beam.to_SRWLPartBeam()
+    moments = part_beam.arStatMom2
+
+    x, xp = random_generator.multivariate_normal([0.0, 0.0], [[moments[0], moments[1]], [moments[1], moments[2]]], number_of_electrons).T
+    y, yp = random_generator.multivariate_normal([0.0, 0.0], [[moments[3], moments[4]], [moments[4], moments[5]]], number_of_electrons).T
+    energy_deviation = random_generator.normal(0.0, numpy.sqrt(moments[10]), number_of_electrons)
+
+    electron_beams = []
+
+    for i in range(number_of_electrons):
+        electron = copy.deepcopy(part_beam)
+        electron.partStatMom1.x += x[i]
+        electron.partStatMom1.xp += xp[i]
+        electron.partStatMom1.y += y[i]
+        electron.partStatMom1.yp += yp[i]
+        electron.partStatMom1.gamma *= (1 + energy_deviation[i])
+
+        electron_beams.append(electron)
+
+    return electron_beams
+
+def get_electric_field_cuts(wavefront, h_coordinates, v_coordinates):
+    '''
+    Electric field (single photon energy) of the horizontal and vertical polarizations on the cuts
+    vs X at y=0 and vs Y at x=0, linearly interpolated on the given coordinates
+
+    :return: (2, h_coordinates.size) and (2, v_coordinates.size) complex arrays
+    '''
+    mesh = wavefront.mesh
+    wavefront_h_coordinates = numpy.linspace(mesh.xStart, mesh.xFin, mesh.nx)
+    wavefront_v_coordinates = numpy.linspace(mesh.yStart, mesh.yFin, mesh.ny)
+
+    h_cut = []
+    v_cut = []
+
+    for field_array in [wavefront.arEx, wavefront.arEy]:
+        field = numpy.frombuffer(field_array, dtype=numpy.float32).reshape(mesh.ny, mesh.nx, mesh.ne, 2)[:, :, 0, :]
+        field = (field[:, :, 0] + 1j*field[:, :, 1]).T # (x, y)
+
+        h_cut.append(_interpolate(h_coordinates, wavefront_h_coordinates, [_interpolate(0.0, wavefront_v_coordinates, column) for column in field]))
+        v_cut.append(_interpolate(v_coordinates, wavefront_v_coordinates, [_interpolate(0.0, wavefront_h_coordinates, row) for row in field.T]))
+
+    return numpy.array(h_cut), numpy.array(v_cut)
+
+def _interpolate(coordinates, wavefront_coordinates, values):
+    values = numpy.asarray(values)
+
+    if wavefront_coordinates.size == 1: return numpy.full(numpy.shape(coordinates), values[0])
+
+    return numpy.interp(coordinates, wavefront_coordinates, values.real, left=0.0, right=0.0) + \
+           1j*numpy.interp(coordinates, wavefront_coordinates, values.imag, left=0.0, right=0.0)
+
+def _get_source_wavefront(srw_beamline, wavefront_parameters, part_beam, sampling_factor):
+    light_source = srw_beamline.get_light_source()
+
+    mesh = wavefront_parameters.to_SRWRadMesh()
+
+    wavefront = SRWWavefront()
+    wavefront.allocate(mesh.ne, mesh.nx, mesh.ny)
+    wavefront.mesh = mesh
+    wavefront.partBeam = part_beam
+    wavefront.unitElFld = wavefront_parameters._electric_field_units
+
+    precision_parameters = wavefront_parameters._wavefront_precision_parameters.to_SRW_array()
+    precision_parameters[6] = sampling_factor
+
+    srwl.CalcElecFieldSR(wavefront, 0, light_source.get_magnetic_structure().get_SRWLMagFldC(), precision_parameters)
+
+    return wavefront
+
+def _get_optical_beamline(srw_beamline, wavefront):
+    propagator = FresnelSRWNative()
+    srw_oe_array = []
+    srw_pp_array = []
+
+    for index in range(srw_beamline.get_beamline_elements_number()):
+        propagator.add_optical_element_from_beamline(srw_beamline, index, srw_oe_array, srw_pp_array, wavefront)
+
+    return SRWLOptC(srw_oe_array, srw_pp_array)
+
+def _propagate(wavefront, optical_beamline):
+    if len(optical_beamline.arOpt) > 0: srwl.PropagElecField(wavefront, optical_beamline)
+
+    return wavefront
+
+def _get_reference_mesh(srw_beamline, wavefront_parameters, sampling_factor):
+    wavefront = _get_source_wavefront(srw_beamline, wavefront_parameters, srw_beamline.get_light_source().get_electron_beam().to_SRWLPartBeam(), sampling_factor)
+    wavefront = _propagate(wavefront, _get_optical_beamline(srw_beamline, wavefront))
+
+    mesh = wavefront.mesh
+
+    return numpy.linspace(mesh.eStart, mesh.eFin, mesh.ne), numpy.linspace(mesh.xStart, mesh.xFin, mesh.nx), numpy.linspace(mesh.yStart, mesh.yFin, mesh.ny)
+
+def _propagate_electrons(task):
+    srw_beamline, wavefront_parameters, sampling_factor, reference_mesh, start, end, seed_sequence, mutual_intensity, chunk_file_name = task
+
+    energies, h_coordinates, v_coordinates = reference_mesh
+    shape = (energies.size, h_coordinates.size, v_coordinates.size)
+
+    if chunk_file_name is None: intensity_sum = numpy.zeros(shape)
+    else: intensity_sum = numpy.lib.format.open_memmap(chunk_file_name, mode="w+", dtype=numpy.float64, shape=shape)
+    mutual_intensity_sum = (numpy.zeros((h_coordinates.size, h_coordinates.size), dtype=numpy.complex128),
+                            numpy.zeros((v_coordinates.size, v_coordinates.size), dtype=numpy.complex128)) if mutual_intensity else None
+    optical_beamline = None
+
+    for part_beam in get_electron_beams(srw_beamline.get_light_source().get_electron_beam(), end - start, numpy.random.default_rng(seed_sequence)):
+        wavefront = _get_source_wavefront(srw_beamline, wavefront_parameters, part_beam, sampling_factor)
+
+        # the SRW optical elements are reused for all the electrons, as in srwl_wfr_emit_prop_multi_e
+        if optical_beamline is None: optical_beamline = _get_optical_beamline(srw_beamline, wavefront)
+
+        wavefront = _propagate(wavefront, optical_beamline)
+
+        mesh = wavefront.mesh
+        same_mesh = mesh.nx == h_coordinates.size and mesh.ny == v_coordinates.size and \
+                    numpy.allclose([mesh.xStart, mesh.xFin, mesh.yStart, mesh.yFin], [h_coordinates[0], h_coordinates[-1], v_coordinates[0], v_coordinates[-1]])
+
+        if not same_mesh: h_mesh, v_mesh = numpy.meshgrid(h_coordinates, v_coordinates, indexing="ij")
+
+        # one energy slice at a time
+        for ie in range(energies.size):
+            intensity = get_intensity(wavefront, energy_index=ie)
+
+            if same_mesh:
+                intensity_sum[ie] += intensity
+            else:
+                interpolator = RegularGridInterpolator((numpy.linspace(mesh.xStart, mesh.xFin, mesh.nx), numpy.linspace(mesh.yStart, mesh.yFin, mesh.ny)),
+                                                       intensity, bounds_error=False, fill_value=0.0)
+                intensity_sum[ie] += interpolator((h_mesh, v_mesh))
+
+        if mutual_intensity:
+            for cut_sum, cut_field in zip(mutual_intensity_sum, get_electric_field_cuts(wavefront, h_coordinates, v_coordinates)):
+                cut_sum += numpy.einsum("pi,pj->ij", cut_field, numpy.conj(cut_field))
+
+    if chunk_file_name is None: return start, end, intensity_sum, mutual_intensity_sum
+
+    intensity_sum.flush()
+
+    return start, end, chunk_file_name, mutual_intensity_sum
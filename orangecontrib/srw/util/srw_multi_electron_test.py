@@ -0,0 +1,163 @@
+"""
+
+test of the multi-electron runner: chunks, seeding, checkpoints (a resumed calculation must give the result of the
+uninterrupted one) and mutual intensity
+
+"""
+
+import os
+import glob
+import shutil
+import tempfile
+import unittest
+import numpy
+from array import array
+
+from wofrysrw.beamline.srw_beamline import SRWBeamline
+from wofrysrw.storage_ring.srw_light_source import WavefrontParameters
+from wofrysrw.storage_ring.srw_electron_beam import SRWElectronBeam
+from wofrysrw.storage_ring.magnetic_structures.srw_undulator import SRWUndulator
+from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUndulatorLightSource
+from wofrysrw.util.srw import SRWLRadMesh, srwl_uti_save_intens_ascii
+
+from srw_multi_electron import SRWMultiElectronRunner, get_missing_ranges, get_electron_beams, save_intensity_ascii
+
+def create_beamline(K_vertical=1.5):
+    electron_beam = SRWElectronBeam(energy_in_GeV=6.0, energy_spread=1e-3, current=0.2,
+                                    moment_xx=(30e-6)**2, moment_xpxp=(5e-6)**2, moment_yy=(5e-6)**2, moment_ypyp=(2e-6)**2)
+
+    return SRWBeamline(light_source=SRWUndulatorLightSource(electron_beam=electron_beam,
+                                                            undulator_magnetic_structure=SRWUndulator(K_vertical=K_vertical, period_length=0.02, number_of_periods=50)))
+
+def create_wavefront_parameters():
+    return WavefrontParameters(photon_energy_min=8000, photon_energy_max=8000, photon_energy_points=1,
+                               h_slit_gap=1e-3, h_slit_points=9, v_slit_gap=1e-3, v_slit_points=7, distance=20.0)
+
+class MissingRangesTest(unittest.TestCase):
+
+    def test_missing_ranges(self):
+        self.assertEqual(get_missing_ranges([], 10, 4), [(0, 4), (4, 8), (8, 10)])
+        self.assertEqual(get_missing_ranges([(0, 4), (8, 10)], 10, 4), [(4, 8)])
+        self.assertEqual(get_missing_ranges([(4, 8)], 10, 4), [(0, 4), (8, 10)])
+        self.assertEqual(get_missing_ranges([(0, 4), (4, 8), (8, 10)], 10, 4), [])
+
+        # more electrons than in the completed calculation: the last chunk is completed
+        self.assertEqual(get_missing_ranges([(0, 4), (4, 8), (8, 10)], 14, 4), [(10, 12), (12, 14)])
+
+        # fewer electrons
+        self.assertEqual(get_missing_ranges([(0, 4)], 2, 4), [])
+
+class SRWMultiElectronRunnerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_runner(self, number_of_electrons, srw_beamline=None, checkpoint=True, **kwargs):
+        return SRWMultiElectronRunner(create_beamline() if srw_beamline is None else srw_beamline,
+                                      create_wavefront_parameters(),
+                                      number_of_electrons,
+                                      save_periodicity=2,
+                                      checkpoint_file_name=os.path.join(self.directory, "checkpoint.h5") if checkpoint else None,
+                                      number_of_processes=2,
+                                      seed=12345,
+                                      **kwargs)
+
+    def test_save_intensity_ascii(self):
+        intensity = numpy.random.default_rng(0).random((3, 4, 5))*1e12 # energy, x, y
+        mesh = SRWLRadMesh(_eStart=1000.0, _eFin=1100.0, _ne=3, _xStart=-1e-3, _xFin=1e-3, _nx=4, _yStart=-2e-3, _yFin=2e-3, _ny=5)
+
+        srwl_uti_save_intens_ascii(array('f', numpy.transpose(intensity, (2, 1, 0)).astype(numpy.float32).tobytes()), mesh, os.path.join(self.directory, "srw.dat"))
+        save_intensity_ascii(os.path.join(self.directory, "slices.dat"), mesh, lambda v_index: intensity[:, :, v_index])
+
+        with open(os.path.join(self.directory, "srw.dat")) as srw_file, open(os.path.join(self.directory, "slices.dat")) as slices_file:
+            self.assertEqual(srw_file.read(), slices_file.read())
+
+    def test_accumulation_file(self):
+        _, _, _, intensity = self.create_runner(4, checkpoint=False).run()
+
+        accumulation_file_name = os.path.join(self.directory, "accumulation.npy")
+        runner = self.create_runner(4, checkpoint=False, accumulation_file_name=accumulation_file_name)
+        _, _, _, memory_mapped_intensity = runner.run()
+
+        self.assertIsInstance(runner.accumulated_intensity, numpy.memmap)
+        numpy.testing.assert_allclose(memory_mapped_intensity, intensity, rtol=1e-12)
+
+        # the chunks are removed after the merge
+        self.assertEqual(glob.glob(os.path.join(self.directory, "accumulation.chunk_*")), [])
+
+    def test_seeding(self):
+        electron_beam = create_beamline().get_light_source().get_electron_beam()
+
+        def get_x(seed_sequence):
+            return [part_beam.partStatMom1.x for part_beam in get_electron_beams(electron_beam, 2, numpy.random.default_rng(seed_sequence))]
+
+        self.assertEqual(get_x(numpy.random.SeedSequence(1, spawn_key=(0,))), get_x(numpy.random.SeedSequence(1, spawn_key=(0,))))
+        self.assertNotEqual(get_x(numpy.random.SeedSequence(1, spawn_key=(0,))), get_x(numpy.random.SeedSequence(1, spawn_key=(2,))))
+        self.assertNotEqual(get_x(numpy.random.SeedSequence(1, spawn_key=(0,))), get_x(numpy.random.SeedSequence(2, spawn_key=(0,))))
+
+    def test_resume(self):
+        _, _, _, uninterrupted_intensity = self.create_runner(6, checkpoint=False).run()
+
+        # interrupted after the first chunk
+        runner = self.create_runner(6)
+        runner.start()
+        while not runner.poll(timeout=None): pass
+        runner.cancel()
+
+        self.assertEqual(runner.number_of_electrons_done, 2)
+
+        runner = self.create_runner(6)
+        runner.load_checkpoint(runner.checkpoint_file_name)
+
+        self.assertEqual(runner.number_of_electrons_done, 2)
+
+        _, _, _, resumed_intensity = runner.run()
+
+        self.assertEqual(runner.number_of_electrons_done, 6)
+        numpy.testing.assert_allclose(resumed_intensity, uninterrupted_intensity, rtol=1e-12)
+
+    def test_append(self):
+        _, _, _, uninterrupted_intensity = self.create_runner(6, checkpoint=False).run()
+
+        self.create_runner(4).run()
+
+        runner = self.create_runner(6)
+        runner.load_checkpoint(runner.checkpoint_file_name)
+        _, _, _, appended_intensity = runner.run()
+
+        self.assertEqual(sorted(runner.completed_ranges), [(0, 2), (2, 4), (4, 6)])
+        numpy.testing.assert_allclose(appended_intensity, uninterrupted_intensity, rtol=1e-12)
+
+    def test_checkpoint_of_another_calculation(self):
+        runner = self.create_runner(2)
+        runner.run()
+
+        self.create_runner(4).load_checkpoint(runner.checkpoint_file_name)
+
+        with self.assertRaises(ValueError): self.create_runner(4, srw_beamline=create_beamline(K_vertical=1.6)).load_checkpoint(runner.checkpoint_file_name)
+        with self.assertRaises(ValueError): self.create_runner(4, sampling_factor=0.5).load_checkpoint(runner.checkpoint_file_name)
+        with self.assertRaises(ValueError): self.create_runner(4, mutual_intensity=True).load_checkpoint(runner.checkpoint_file_name)
+
+    def test_mutual_intensity(self):
+        runner = self.create_runner(4, mutual_intensity=True, output_file_name=os.path.join(self.directory, "intensity.dat"))
+        _, _, _, intensity = runner.run()
+
+        h_coordinates, v_coordinates, mutual_intensity_h, mutual_intensity_v = runner.get_mutual_intensity()
+
+        # the diagonal of the cuts is the intensity on the axes (the meshes contain x=0 and y=0)
+        numpy.testing.assert_allclose(numpy.diag(mutual_intensity_h).real, intensity[0, :, v_coordinates.size//2], rtol=1e-4)
+        numpy.testing.assert_allclose(numpy.diag(mutual_intensity_v).real, intensity[0, h_coordinates.size//2, :], rtol=1e-4)
+        numpy.testing.assert_allclose(mutual_intensity_h, numpy.conj(mutual_intensity_h.T))
+
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "intensity_mix.dat")))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "intensity_miy.dat")))
+
+        # checkpointed
+        resumed_runner = self.create_runner(4, mutual_intensity=True)
+        resumed_runner.load_checkpoint(runner.checkpoint_file_name)
+
+        numpy.testing.assert_array_equal(resumed_runner.get_mutual_intensity()[2], mutual_intensity_h)
+        numpy.testing.assert_array_equal(resumed_runner.get_mutual_intensity()[3], mutual_intensity_v)
@@ -57,7 +57,8 @@ class SRWReflectivityData:
                  energy_scale_type=ScaleType.LINEAR,
                  angle_start=0.0,
                  angle_end=0.0,
-                 angle_scale_type=ScaleType.LINEAR):
+                 angle_scale_type=ScaleType.LINEAR,
+                 reflectivity_data=None):
 
         self.reflectivity_data_file = reflectivity_data_file
         self.energies_number   = energies_number
@@ -69,6 +70,7 @@ class SRWReflectivityData:
         self.angle_start       = angle_start
         self.angle_end         = angle_end
         self.angle_scale_type  = angle_scale_type
+        self.reflectivity_data = reflectivity_data # content of the file, when available in memory
 
 class SRWPreProcessorData:
 
@@ -0,0 +1,122 @@
+import copy
+
+import numpy
+
+from orangecontrib.srw.util.srw_symmetry import get_symmetric_mesh
+
+def calculate_power_density(srw_source, wavefront_parameters, power_density_precision_parameters, symmetry_index=0):
+    '''
+    :param symmetry_index: index of Symmetry.tuple()
+    :return: h, v, power density
+    '''
+    symmetric_mesh = get_symmetric_mesh(symmetry_index, srw_source, wavefront_parameters)
+
+    h, v, p = srw_source.get_power_density(source_wavefront_parameters=wavefront_parameters if symmetric_mesh is None else symmetric_mesh.get_reduced_wavefront_parameters(),
+                                           power_density_precision_parameters=power_density_precision_parameters)
+
+    if not symmetric_mesh is None:
+        h, v = symmetric_mesh.get_coordinates()
+        p = symmetric_mesh.mirror(p)
+
+    return h, v, p
+
+class SRWMultiResolutionPowerDensity(object):
+    '''
+    Coarse to fine power density: a coarse map (coarse_factor times fewer points per direction) is calculated on
+    the whole aperture, then the mesh is calculated at full resolution only on the region where the coarse map
+    is above threshold times its peak (plus one coarse step around it).
+
+    The composite map is on the full resolution mesh: the refined region contains the fine values, the rest the
+    coarse map linearly interpolated. The symmetry, if any, is used for the coarse map only, since the refined
+    region is not centered in general.
+    '''
+
+    def __init__(self, srw_source, wavefront_parameters, power_density_precision_parameters, coarse_factor=4, threshold=0.1, symmetry_index=0):
+        self.srw_source = srw_source
+        self.wavefront_parameters = wavefront_parameters
+        self.power_density_precision_parameters = power_density_precision_parameters
+        self.coarse_factor = coarse_factor
+        self.threshold = threshold
+        self.symmetry_index = symmetry_index
+
+        self.coarse_power_density = None
+        self.refined_region = None
+        self.__coarse_calculated_points = 0
+
+    def run(self):
+        '''
+        :return: h, v, composite power density
+        '''
+        from scipy.interpolate import RegularGridInterpolator # imported only when the map is refined
+
+        h_points = int(self.wavefront_parameters._h_slit_points)
+        v_points = int(self.wavefront_parameters._v_slit_points)
+
+        h = numpy.linspace(self.wavefront_parameters._h_position - 0.5*self.wavefront_parameters._h_slit_gap,
+                           self.wavefront_parameters._h_position + 0.5*self.wavefront_parameters._h_slit_gap, h_points)
+        v = numpy.linspace(self.wavefront_parameters._v_position - 0.5*self.wavefront_parameters._v_slit_gap,
+                           self.wavefront_parameters._v_position + 0.5*self.wavefront_parameters._v_slit_gap, v_points)
+
+        coarse_wavefront_parameters = copy.deepcopy(self.wavefront_parameters)
+        coarse_wavefront_parameters._h_slit_points = _get_coarse_points(h_points, self.coarse_factor)
+        coarse_wavefront_parameters._v_slit_points = _get_coarse_points(v_points, self.coarse_factor)
+
+        h_coarse, v_coarse, p_coarse = calculate_power_density(self.srw_source, coarse_wavefront_parameters, self.power_density_precision_parameters, self.symmetry_index)
+
+        self.coarse_power_density = (h_coarse, v_coarse, p_coarse)
+
+        symmetric_mesh = get_symmetric_mesh(self.symmetry_index, self.srw_source, coarse_wavefront_parameters)
+        self.__coarse_calculated_points = p_coarse.size if symmetric_mesh is None else p_coarse.size/symmetric_mesh.get_reduction_factor()
+
+        h_indexes, v_indexes = numpy.where(p_coarse >= self.threshold*numpy.max(p_coarse))
+
+        h_first, h_last = _get_fine_indexes(h, h_coarse, h_indexes.min(), h_indexes.max())
+        v_first, v_last = _get_fine_indexes(v, v_coarse, v_indexes.min(), v_indexes.max())
+
+        self.refined_region = (h_first, h_last, v_first, v_last)
+
+        fine_wavefront_parameters = copy.deepcopy(self.wavefront_parameters)
+        fine_wavefront_parameters._h_position    = 0.5*(h[h_first] + h[h_last])
+        fine_wavefront_parameters._h_slit_gap    = h[h_last] - h[h_first]
+        fine_wavefront_parameters._h_slit_points = h_last - h_first + 1
+        fine_wavefront_parameters._v_position    = 0.5*(v[v_first] + v[v_last])
+        fine_wavefront_parameters._v_slit_gap    = v[v_last] - v[v_first]
+        fine_wavefront_parameters._v_slit_points = v_last - v_first + 1
+
+        _, _, p_fine = calculate_power_density(self.srw_source, fine_wavefront_parameters, self.power_density_precision_parameters)
+
+        hh, vv = numpy.meshgrid(h, v, indexing="ij")
+
+        p = RegularGridInterpolator((h_coarse, v_coarse), p_coarse, bounds_error=False, fill_value=None)((hh, vv))
+        p[h_first:h_last + 1, v_first:v_last + 1] = p_fine
+
+        return h, v, p
+
+    def get_calculated_points_fraction(self):
+        '''
+        :return: calculated points (coarse + fine) over the points of the full resolution mesh
+        '''
+        h_first, h_last, v_first, v_last = self.refined_region
+
+        return (self.__coarse_calculated_points + (h_last - h_first + 1)*(v_last - v_first + 1)) / \
+               (int(self.wavefront_parameters._h_slit_points)*int(self.wavefront_parameters._v_slit_points))
+
+def _get_coarse_points(points, coarse_factor):
+    return max(3, int(numpy.ceil((points - 1)/coarse_factor)) + 1)
+
+def _get_fine_indexes(coordinates, coarse_coordinates, first_coarse_index, last_coarse_index):
+    # one coarse step around the region above the threshold
+    first_coarse_index = max(0, first_coarse_index - 1)
+    last_coarse_index  = min(coarse_coordinates.size - 1, last_coarse_index + 1)
+
+    step = coordinates[1] - coordinates[0] if coordinates.size > 1 else 1.0
+
+    first = max(0, int(numpy.floor((coarse_coordinates[first_coarse_index] - coordinates[0])/step + 1e-9)))
+    last  = min(coordinates.size - 1, int(numpy.ceil((coarse_coordinates[last_coarse_index] - coordinates[0])/step - 1e-9)))
+
+    # at least 2 points: SRW divides by (points - 1)
+    if last == first:
+        if last < coordinates.size - 1: last += 1
+        else: first = max(0, first - 1)
+
+    return first, last
@@ -0,0 +1,119 @@
+"""
+
+test of the multi-resolution power density: coarse and refined meshes, and the composite map, with a light source
+returning an analytical power density instead of the SRW one
+
+"""
+
+import unittest
+import numpy
+
+from wofrysrw.storage_ring.srw_light_source import WavefrontParameters
+from wofrysrw.storage_ring.srw_electron_beam import SRWElectronBeam
+from wofrysrw.storage_ring.magnetic_structures.srw_undulator import SRWUndulator
+from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUndulatorLightSource
+
+from srw_power_density import SRWMultiResolutionPowerDensity, calculate_power_density, _get_coarse_points, _get_fine_indexes
+
+def get_analytical_power_density(h, v):
+    return numpy.exp(-(h[:, numpy.newaxis]/1e-4)**2 - (v[numpy.newaxis, :]/0.5e-4)**2)
+
+class AnalyticalLightSource(SRWUndulatorLightSource):
+    def __init__(self):
+        electron_beam = SRWElectronBeam(energy_in_GeV=6.0, current=0.2, moment_xx=(10e-6)**2, moment_xpxp=(1e-6)**2, moment_yy=(2e-6)**2, moment_ypyp=(0.5e-6)**2)
+
+        super().__init__(electron_beam=electron_beam, undulator_magnetic_structure=SRWUndulator(K_vertical=1.5, period_length=0.02, number_of_periods=50))
+
+        self.calculated_meshes = []
+
+    def get_power_density(self, source_wavefront_parameters, power_density_precision_parameters):
+        h = numpy.linspace(source_wavefront_parameters._h_position - 0.5*source_wavefront_parameters._h_slit_gap,
+                           source_wavefront_parameters._h_position + 0.5*source_wavefront_parameters._h_slit_gap, int(source_wavefront_parameters._h_slit_points))
+        v = numpy.linspace(source_wavefront_parameters._v_position - 0.5*source_wavefront_parameters._v_slit_gap,
+                           source_wavefront_parameters._v_position + 0.5*source_wavefront_parameters._v_slit_gap, int(source_wavefront_parameters._v_slit_points))
+
+        self.calculated_meshes.append((h.size, v.size))
+
+        return h, v, get_analytical_power_density(h, v)
+
+def create_wavefront_parameters(h_slit_points=201, v_slit_points=101):
+    return WavefrontParameters(photon_energy_min=0.0, photon_energy_max=0.0, photon_energy_points=1,
+                               h_slit_gap=2e-3, h_slit_points=h_slit_points, v_slit_gap=1e-3, v_slit_points=v_slit_points, distance=20.0)
+
+class SRWPowerDensityTest(unittest.TestCase):
+
+    def test_coarse_points(self):
+        self.assertEqual(_get_coarse_points(101, 4), 26)
+        self.assertEqual(_get_coarse_points(100, 4), 26)
+        # at least 3 points
+        self.assertEqual(_get_coarse_points(5, 4), 3)
+        self.assertEqual(_get_coarse_points(2, 4), 3)
+
+    def test_fine_indexes(self):
+        coordinates = numpy.linspace(-1.0, 1.0, 101)
+        coarse_coordinates = numpy.linspace(-1.0, 1.0, 26)
+
+        # one coarse step around the region above the threshold
+        first, last = _get_fine_indexes(coordinates, coarse_coordinates, 10, 12)
+
+        self.assertAlmostEqual(coordinates[first], coarse_coordinates[9])
+        self.assertAlmostEqual(coordinates[last], coarse_coordinates[13])
+
+        # at the edges of the mesh
+        self.assertEqual(_get_fine_indexes(coordinates, coarse_coordinates, 0, 0), (0, 4))
+        self.assertEqual(_get_fine_indexes(coordinates, coarse_coordinates, 25, 25), (96, 100))
+
+        # at least 2 points, for a single point at the end of the mesh too
+        self.assertEqual(_get_fine_indexes(numpy.linspace(-1.0, 1.0, 3), numpy.linspace(-1.0, 1.0, 3), 2, 2), (1, 2))
+
+    def test_multi_resolution(self):
+        light_source = AnalyticalLightSource()
+        wavefront_parameters = create_wavefront_parameters()
+
+        multi_resolution_power_density = SRWMultiResolutionPowerDensity(light_source, wavefront_parameters, None, coarse_factor=4, threshold=0.1)
+
+        h, v, p = multi_resolution_power_density.run()
+
+        self.assertEqual(light_source.calculated_meshes[0], (51, 26))
+        self.assertEqual(p.shape, (201, 101))
+
+        h_first, h_last, v_first, v_last = multi_resolution_power_density.refined_region
+
+        # the refined region is calculated at full resolution and contains all the points above the threshold
+        self.assertEqual(light_source.calculated_meshes[1], (h_last - h_first + 1, v_last - v_first + 1))
+
+        expected = get_analytical_power_density(h, v)
+
+        numpy.testing.assert_allclose(p[h_first:h_last + 1, v_first:v_last + 1], expected[h_first:h_last + 1, v_first:v_last + 1], rtol=1e-12)
+
+        h_indexes, v_indexes = numpy.where(expected >= 0.1*expected.max())
+
+        self.assertTrue(h_first <= h_indexes.min() and h_indexes.max() <= h_last)
+        self.assertTrue(v_first <= v_indexes.min() and v_indexes.max() <= v_last)
+
+        # outside, the interpolated coarse map
+        outside = numpy.ones(p.shape, dtype=bool)
+        outside[h_first:h_last + 1, v_first:v_last + 1] = False
+
+        numpy.testing.assert_allclose(p[outside], expected[outside], atol=0.1*expected.max())
+
+        self.assertAlmostEqual(multi_resolution_power_density.get_calculated_points_fraction(),
+                               (51*26 + (h_last - h_first + 1)*(v_last - v_first + 1))/(201*101))
+        self.assertLess(multi_resolution_power_density.get_calculated_points_fraction(), 0.5)
+
+    def test_symmetric_coarse_map(self):
+        light_source = AnalyticalLightSource()
+        wavefront_parameters = create_wavefront_parameters()
+
+        h, v, p = calculate_power_density(light_source, wavefront_parameters, None, symmetry_index=2)
+
+        # the reduced mesh is calculated and mirrored
+        self.assertLess(light_source.calculated_meshes[0][0]*light_source.calculated_meshes[0][1], 201*101)
+        numpy.testing.assert_allclose(p, get_analytical_power_density(h, v), rtol=1e-10)
+
+        multi_resolution_power_density = SRWMultiResolutionPowerDensity(AnalyticalLightSource(), wavefront_parameters, None, symmetry_index=2)
+        _, _, p_multi_resolution = multi_resolution_power_density.run()
+
+        numpy.testing.assert_allclose(multi_resolution_power_density.coarse_power_density[2],
+                                      get_analytical_power_density(*multi_resolution_power_density.coarse_power_density[:2]), rtol=1e-10)
+        self.assertEqual(p_multi_resolution.shape, (201, 101))
@@ -0,0 +1,46 @@
+from wofry.propagator.propagator import PropagationManager, WavefrontDimension
+from wofrysrw.propagator.propagators2D.srw_fresnel_native import FresnelSRWNative, SRW_APPLICATION
+from wofrysrw.propagator.propagators2D.srw_fresnel_wofry import FresnelSRWWofry
+from wofrysrw.propagator.propagators2D.srw_propagation_mode import SRWPropagationMode
+
+def initialize_propagator_2D():
+    '''
+    Registers the SRW propagators and sets the default propagation mode: it is called when the widgets
+    are instantiated (not when their modules are imported) and it does nothing after the first call,
+    so that it does not reset a propagation mode chosen in the meantime.
+    '''
+    propagation_manager = PropagationManager.Instance()
+
+    if not propagation_manager.is_initialized(SRW_APPLICATION):
+        if not propagation_manager.has_propagator(FresnelSRWNative.HANDLER_NAME, WavefrontDimension.TWO): propagation_manager.add_propagator(FresnelSRWNative())
+        if not propagation_manager.has_propagator(FresnelSRWWofry.HANDLER_NAME, WavefrontDimension.TWO): propagation_manager.add_propagator(FresnelSRWWofry())
+
+        propagation_manager.set_propagation_mode(SRW_APPLICATION, SRWPropagationMode.STEP_BY_STEP)
+
+        propagation_manager.set_initialized(SRW_APPLICATION, True)
+
+def calculate_source_wavefront(srw_source, wavefront_parameters, progress_callback=None):
+    if not progress_callback is None: progress_callback(0.0)
+
+    output_wavefront = srw_source.get_SRW_Wavefront(source_wavefront_parameters=wavefront_parameters)
+
+    # what is left is sending the wavefront back to the widget
+    if not progress_callback is None: progress_callback(1.0)
+
+    # the source is returned too: it keeps the wavefront parameters, needed by the scripts and the ME propagation
+    return srw_source, output_wavefront
+
+def do_propagation(propagation_parameters, handler_name, propagation_mode, progress_callback=None):
+    # the child process could have been spawned instead of forked
+    initialize_propagator_2D()
+
+    if not progress_callback is None: progress_callback(0.0)
+
+    propagator = PropagationManager.Instance()
+    propagator.set_propagation_mode(SRW_APPLICATION, propagation_mode)
+
+    output_wavefront = propagator.do_propagation(propagation_parameters=propagation_parameters, handler_name=handler_name)
+
+    if not progress_callback is None: progress_callback(1.0)
+
+    return output_wavefront
@@ -0,0 +1,228 @@
+import os, hashlib, pickle
+from array import array
+from collections import OrderedDict
+
+import numpy
+import h5py
+
+from wofrysrw.propagator.wavefront2D.srw_wavefront import SRWWavefront
+
+class SRWPropagationCache(object):
+    '''
+    Content-addressed cache of propagated wavefronts.
+
+    The key is a digest of the input electric field buffers and mesh, plus the pickled propagation
+    elements, additional parameters, handler and propagation mode. The optical elements read some of
+    their data from files when they propagate (e.g. the height profiles): path, size and modification
+    time of every file they reference are part of the key too, so that a file regenerated with the same
+    name makes a new entry. Entries are kept in memory in LRU order up to max_memory bytes and, when a
+    directory is given, are also written to disk as HDF5 files named after the key.
+    '''
+    WAVEFRONT_ATTRIBUTES = ["Rx", "Ry", "dRx", "dRy", "xc", "yc", "avgPhotEn", "presCA", "presFT", "numTypeElFld", "unitElFld"]
+    MESH_ATTRIBUTES = ["eStart", "eFin", "ne", "xStart", "xFin", "nx", "yStart", "yFin", "ny", "zStart"]
+
+    def __init__(self, max_memory=0, disk_cache_directory=None):
+        self.__max_memory = max_memory
+        self.__disk_cache_directory = disk_cache_directory
+        self.__entries = OrderedDict()
+        self.__memory = 0
+
+        if not disk_cache_directory is None: os.makedirs(disk_cache_directory, exist_ok=True)
+
+    def get_max_memory(self):
+        return self.__max_memory
+
+    def get_disk_cache_directory(self):
+        return self.__disk_cache_directory
+
+    def is_enabled(self):
+        return self.__max_memory > 0 or not self.__disk_cache_directory is None
+
+    def get_propagation_key(self, propagation_parameters, handler_name, propagation_mode):
+        hasher = hashlib.sha1()
+
+        self.__update_with_wavefront(hasher, propagation_parameters.get_wavefront())
+
+        propagation_elements = propagation_parameters.get_PropagationElements()
+        additional_parameters = sorted(propagation_parameters._additional_parameters.items())
+
+        hasher.update(pickle.dumps((propagation_elements, additional_parameters, handler_name, propagation_mode)))
+
+        # the working beamline of the WHOLE_BEAMLINE mode is one of the additional parameters
+        for file_name in sorted(_get_referenced_files((propagation_elements, additional_parameters))):
+            stat = os.stat(file_name)
+            hasher.update(repr((file_name, stat.st_size, stat.st_mtime_ns)).encode())
+
+        return hasher.hexdigest()
+
+    def get(self, key):
+        if key in self.__entries:
+            self.__entries.move_to_end(key)
+
+            return self.__entries[key].duplicate()
+
+        if not self.__disk_cache_directory is None:
+            file_name = self.__get_file_name(key)
+
+            if os.path.exists(file_name):
+                try:
+                    wavefront = self.__read_wavefront(file_name)
+                except Exception:
+                    return None
+
+                self.__store(key, wavefront)
+
+                return wavefront.duplicate()
+
+        return None
+
+    def put(self, key, wavefront):
+        wavefront = wavefront.duplicate()
+
+        self.__store(key, wavefront)
+
+        if not self.__disk_cache_directory is None:
+            file_name = self.__get_file_name(key)
+
+            try:
+                self.__write_wavefront(file_name + ".tmp", wavefront)
+                os.replace(file_name + ".tmp", file_name)
+            except OSError:
+                pass
+
+    def clear(self):
+        self.__entries.clear()
+        self.__memory = 0
+
+    def __store(self, key, wavefront):
+        size = self.__get_size(wavefront)
+
+        if size > self.__max_memory: return
+
+        if key in self.__entries: self.__memory -= self.__get_size(self.__entries.pop(key))
+
+        self.__entries[key] = wavefront
+        self.__memory += size
+
+        while self.__memory > self.__max_memory:
+            _, removed = self.__entries.popitem(last=False)
+            self.__memory -= self.__get_size(removed)
+
+    def __get_file_name(self, key):
+        return os.path.join(self.__disk_cache_directory, key + ".h5")
+
+    @classmethod
+    def __get_size(cls, wavefront):
+        return (len(wavefront.arEx) + len(wavefront.arEy))*wavefront.arEx.itemsize
+
+    @classmethod
+    def __update_with_wavefront(cls, hasher, wavefront):
+        hasher.update(memoryview(wavefront.arEx).cast("B"))
+        hasher.update(memoryview(wavefront.arEy).cast("B"))
+        hasher.update(repr([getattr(wavefront.mesh, name) for name in cls.MESH_ATTRIBUTES]).encode())
+        hasher.update(repr([getattr(wavefront, name) for name in cls.WAVEFRONT_ATTRIBUTES]).encode())
+        hasher.update(pickle.dumps(wavefront.partBeam))
+
+    @classmethod
+    def __write_wavefront(cls, file_name, wavefront):
+        with h5py.File(file_name, "w") as f:
+            f.create_dataset("arEx", data=numpy.frombuffer(wavefront.arEx, dtype=wavefront.arEx.typecode))
+            f.create_dataset("arEy", data=numpy.frombuffer(wavefront.arEy, dtype=wavefront.arEy.typecode))
+            f.create_dataset("partBeam", data=numpy.void(pickle.dumps(wavefront.partBeam)))
+
+            for name in cls.MESH_ATTRIBUTES: f.attrs["mesh_" + name] = getattr(wavefront.mesh, name)
+            for name in cls.WAVEFRONT_ATTRIBUTES: f.attrs[name] = getattr(wavefront, name)
+
+    @classmethod
+    def __read_wavefront(cls, file_name):
+        with h5py.File(file_name, "r") as f:
+            type_code = f.attrs["numTypeElFld"]
+            if isinstance(type_code, bytes): type_code = type_code.decode()
+
+            mesh = {name: f.attrs["mesh_" + name].item() for name in cls.MESH_ATTRIBUTES}
+
+            wavefront = SRWWavefront(_arEx=_to_srw_array(f["arEx"][()], type_code),
+                                     _arEy=_to_srw_array(f["arEy"][()], type_code),
+                                     _typeE=type_code,
+                                     _eStart=mesh["eStart"],
+                                     _eFin=mesh["eFin"],
+                                     _ne=mesh["ne"],
+                                     _xStart=mesh["xStart"],
+                                     _xFin=mesh["xFin"],
+                                     _nx=mesh["nx"],
+                                     _yStart=mesh["yStart"],
+                                     _yFin=mesh["yFin"],
+                                     _ny=mesh["ny"],
+                                     _zStart=mesh["zStart"],
+                                     _partBeam=pickle.loads(f["partBeam"][()].tobytes()))
+
+            for name in cls.WAVEFRONT_ATTRIBUTES:
+                value = f.attrs[name]
+                if isinstance(value, bytes): value = value.decode()
+                elif isinstance(value, numpy.generic): value = value.item()
+                setattr(wavefront, name, value)
+
+        return wavefront
+
+def _get_referenced_files(data, files=None, visited=None):
+    '''
+    :return: set of the absolute paths of the existing files named by the strings in data (recursively, in
+             lists, tuples, dictionaries and object attributes)
+    '''
+    if files is None: files = set()
+    if visited is None: visited = set()
+
+    if isinstance(data, str):
+        if data.strip() != "" and os.path.isfile(data): files.add(os.path.abspath(data))
+    elif isinstance(data, (int, float, bytes, array, numpy.ndarray)) or data is None or id(data) in visited:
+        pass
+    else:
+        visited.add(id(data))
+
+        if isinstance(data, dict): values = list(data.keys()) + list(data.values())
+        elif isinstance(data, (list, tuple, set)): values = data
+        elif hasattr(data, "__dict__"): values = vars(data).values()
+        else: values = []
+
+        for value in values: _get_referenced_files(value, files, visited)
+
+    return files
+
+def _to_srw_array(numpy_array, type_code):
+    srw_array = array(type_code)
+    srw_array.frombytes(numpy_array.astype(type_code).tobytes())
+
+    return srw_array
+
+DEFAULT_MAX_MEMORY = 256 # MB
+
+_propagation_cache = None
+
+def get_propagation_cache():
+    '''
+    Cache shared by all the optical elements of the workflow: the memory tier is on by default (DEFAULT_MAX_MEMORY MB),
+    the disk tier is off. Both are set from the SRW Tools menu (see set_propagation_cache), the initial values can be
+    given by the environment variables SRW_PROPAGATION_CACHE_SIZE (MB, 0 disables the memory tier) and
+    SRW_PROPAGATION_CACHE_DIR (enables the disk tier)
+    '''
+    global _propagation_cache
+
+    if _propagation_cache is None:
+        set_propagation_cache(float(os.environ.get("SRW_PROPAGATION_CACHE_SIZE", DEFAULT_MAX_MEMORY)),
+                              os.environ.get("SRW_PROPAGATION_CACHE_DIR", None))
+
+    return _propagation_cache
+
+def set_propagation_cache(max_memory, disk_cache_directory=None):
+    '''
+    Replaces the shared cache: the entries in memory are discarded, the ones on disk are kept
+
+    :param max_memory: MB
+    :param disk_cache_directory: None or "" to disable the disk tier
+    '''
+    global _propagation_cache
+
+    _propagation_cache = SRWPropagationCache(max_memory=int(max_memory*1024**2),
+                                             disk_cache_directory=None if disk_cache_directory is None or disk_cache_directory.strip() == "" else disk_cache_directory)
+
+    return _propagation_cache
@@ -0,0 +1,165 @@
+"""
+
+test of the propagation cache: keys, LRU eviction, invalidation by the files referenced by the optical elements
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from array import array
+
+from wofry.propagator.propagator import PropagationParameters, PropagationElements
+from syned.beamline.beamline_element import BeamlineElement
+from syned.beamline.element_coordinates import ElementCoordinates
+from wofrysrw.propagator.wavefront2D.srw_wavefront import SRWWavefront
+
+from srw_propagation_cache import SRWPropagationCache, get_propagation_cache, set_propagation_cache
+
+class FileBackedElement(object):
+    def __init__(self, height_profile_data_file=None, distance=1.0):
+        self.height_profile_data_file = height_profile_data_file
+        self.distance = distance
+
+def create_wavefront(nx=4, ny=3, value=1.0):
+    return SRWWavefront(_arEx=array('f', [value]*(2*nx*ny)),
+                        _arEy=array('f', [0.0]*(2*nx*ny)),
+                        _typeE='f',
+                        _eStart=1000.0, _eFin=1000.0, _ne=1,
+                        _xStart=-1e-3, _xFin=1e-3, _nx=nx,
+                        _yStart=-1e-3, _yFin=1e-3, _ny=ny,
+                        _zStart=10.0)
+
+def create_propagation_parameters(wavefront, optical_element, working_beamline=None):
+    propagation_elements = PropagationElements()
+    propagation_elements.add_beamline_element(BeamlineElement(optical_element, ElementCoordinates(p=optical_element.distance)))
+
+    propagation_parameters = PropagationParameters(wavefront=wavefront, propagation_elements=propagation_elements)
+
+    if not working_beamline is None: propagation_parameters.set_additional_parameters("working_beamline", working_beamline)
+
+    return propagation_parameters
+
+class SRWPropagationCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_file(self, file_name, text):
+        with open(file_name, "w") as file: file.write(text)
+
+    def get_key(self, cache, wavefront, optical_element, working_beamline=None, propagation_mode=0):
+        return cache.get_propagation_key(create_propagation_parameters(wavefront, optical_element, working_beamline), "HANDLER", propagation_mode)
+
+    def test_disabled_by_default(self):
+        self.assertFalse(SRWPropagationCache().is_enabled())
+        self.assertTrue(SRWPropagationCache(max_memory=1024).is_enabled())
+        self.assertTrue(SRWPropagationCache(disk_cache_directory=self.directory).is_enabled())
+
+    def test_shared_cache(self):
+        # the memory tier of the workflow cache is on without any configuration
+        if not "SRW_PROPAGATION_CACHE_SIZE" in os.environ: self.assertTrue(get_propagation_cache().is_enabled())
+
+        cache = set_propagation_cache(64, self.directory)
+
+        self.assertIs(get_propagation_cache(), cache)
+        self.assertEqual((cache.get_max_memory(), cache.get_disk_cache_directory()), (64*1024**2, self.directory))
+
+        self.assertFalse(set_propagation_cache(0, "").is_enabled())
+
+    def test_key(self):
+        cache = SRWPropagationCache(max_memory=1024**2)
+
+        key = self.get_key(cache, create_wavefront(), FileBackedElement())
+
+        self.assertEqual(key, self.get_key(cache, create_wavefront(), FileBackedElement()))
+        self.assertNotEqual(key, self.get_key(cache, create_wavefront(value=2.0), FileBackedElement()))
+        self.assertNotEqual(key, self.get_key(cache, create_wavefront(nx=3, ny=4), FileBackedElement()))
+        self.assertNotEqual(key, self.get_key(cache, create_wavefront(), FileBackedElement(distance=2.0)))
+        self.assertNotEqual(key, self.get_key(cache, create_wavefront(), FileBackedElement(), propagation_mode=1))
+
+    def test_get_put(self):
+        cache = SRWPropagationCache(max_memory=1024**2)
+
+        key = self.get_key(cache, create_wavefront(), FileBackedElement())
+
+        self.assertIsNone(cache.get(key))
+
+        cache.put(key, create_wavefront(value=3.0))
+        cached_wavefront = cache.get(key)
+
+        self.assertEqual(list(cached_wavefront.arEx), [3.0]*24)
+
+        # a copy: changes of the returned wavefront do not affect the cache
+        cached_wavefront.arEx[0] = 0.0
+        self.assertEqual(cache.get(key).arEx[0], 3.0)
+
+    def test_eviction(self):
+        wavefront_size = 2*24*4 # arEx + arEy, float32
+
+        cache = SRWPropagationCache(max_memory=2*wavefront_size)
+
+        cache.put("a", create_wavefront())
+        cache.put("b", create_wavefront())
+        cache.get("a") # "b" is now the least recently used
+        cache.put("c", create_wavefront())
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+
+        # larger than the memory tier: not stored
+        cache.put("d", create_wavefront(nx=40, ny=30))
+        self.assertIsNone(cache.get("d"))
+        self.assertIsNotNone(cache.get("a"))
+
+    def test_disk_tier(self):
+        cache = SRWPropagationCache(disk_cache_directory=self.directory)
+
+        cache.put("a", create_wavefront(value=5.0))
+
+        # a new session
+        cache = SRWPropagationCache(disk_cache_directory=self.directory)
+        wavefront = cache.get("a")
+
+        self.assertEqual(list(wavefront.arEx), [5.0]*24)
+        self.assertEqual((wavefront.mesh.nx, wavefront.mesh.ny, wavefront.mesh.zStart), (4, 3, 10.0))
+
+    def test_invalidation_by_referenced_file(self):
+        cache = SRWPropagationCache(max_memory=1024**2)
+
+        file_name = os.path.join(self.directory, "height_profile.dat")
+        self.write_file(file_name, "0\t1\n1\t0.0\n")
+
+        key = self.get_key(cache, create_wavefront(), FileBackedElement(file_name))
+        cache.put(key, create_wavefront())
+
+        self.assertEqual(key, self.get_key(cache, create_wavefront(), FileBackedElement(file_name)))
+
+        # regenerated with the same name
+        self.write_file(file_name, "0\t1\n1\t1e-9\n")
+        stat = os.stat(file_name)
+        os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        new_key = self.get_key(cache, create_wavefront(), FileBackedElement(file_name))
+
+        self.assertNotEqual(key, new_key)
+        self.assertIsNone(cache.get(new_key))
+
+    def test_invalidation_by_working_beamline_file(self):
+        cache = SRWPropagationCache(max_memory=1024**2)
+
+        file_name = os.path.join(self.directory, "height_profile.dat")
+        self.write_file(file_name, "0\t1\n1\t0.0\n")
+
+        working_beamline = [FileBackedElement(), FileBackedElement(file_name)]
+
+        key = self.get_key(cache, create_wavefront(), FileBackedElement(), working_beamline)
+
+        self.write_file(file_name, "0\t1\n1\t1e-9\n1\t2e-9\n")
+
+        self.assertNotEqual(key, self.get_key(cache, create_wavefront(), FileBackedElement(), working_beamline))
@@ -0,0 +1,218 @@
+import copy, multiprocessing
+
+import numpy
+
+class SRWSpectrumCalculator(object):
+    '''
+    Spectra of a light source calculated in a pool of processes: the energy range of every spectrum is
+    split in chunks of consecutive energies of the same grid, each chunk is a separate SRW calculation
+    and the results are stitched back together. The chunks of all the spectra share the same pool, so
+    the spectra are calculated concurrently.
+
+    A spectrum is a tuple (wavefront parameters, flux precision parameters, multi electron): with flux
+    precision parameters the flux is calculated by the undulator (get_undulator_flux), otherwise it is
+    extracted from the SR wavefront.
+
+    With the adaptive sampling (run_adaptive) the number of energy points of the wavefront parameters is a
+    budget of SRW evaluations instead of the size of a uniform grid: a coarse uniform grid, plus dense
+    windows around the given harmonic energies (narrow peaks that the coarse grid could miss), is refined
+    in a few passes by inserting points in the intervals where the spectra change the most.
+    '''
+    CHUNKS_PER_PROCESS = 4 # more chunks than processes, for load balancing
+    MINIMUM_CHUNK_POINTS = 10
+
+    COARSE_GRID_FRACTION = 0.25  # of the points budget
+    HARMONIC_WINDOW_POINTS = 11
+    REFINEMENT_PASSES = 4
+    POINTS_PER_INTERVAL = 3      # inserted in every refined interval
+    MINIMUM_INTERVAL_FACTOR = 0.01 # of the step of the uniform grid with the same budget
+
+    def __init__(self, srw_source, spectra, polarization_component_to_be_extracted=6, number_of_processes=None):
+        self.srw_source = srw_source
+        self.spectra = spectra
+        self.polarization_component_to_be_extracted = polarization_component_to_be_extracted
+        self.number_of_processes = number_of_processes if not (number_of_processes is None or number_of_processes <= 0) else multiprocessing.cpu_count()
+
+    def run(self, progress_callback=None):
+        '''
+        :param progress_callback: called with (number of completed chunks, number of chunks)
+        :return: list of (energies, flux), one per spectrum
+        '''
+        segments = []
+        for wavefront_parameters, _, _ in self.spectra:
+            segments.append(get_energy_chunks(wavefront_parameters._photon_energy_min,
+                                              wavefront_parameters._photon_energy_max,
+                                              int(wavefront_parameters._photon_energy_points),
+                                              self.number_of_processes*self.CHUNKS_PER_PROCESS,
+                                              self.MINIMUM_CHUNK_POINTS))
+
+        with self.__get_pool() as pool:
+            results = self.calculate_segments(pool, segments, progress_callback)
+
+        return [(numpy.concatenate([e for e, _ in spectrum_results]), numpy.concatenate([i for _, i in spectrum_results])) for spectrum_results in results]
+
+    def run_adaptive(self, harmonic_energies=[], harmonic_window=(0.0, 0.0), progress_callback=None):
+        '''
+        All the spectra are calculated on the same energies, with the range and the budget of the first one
+
+        :param harmonic_energies: energies of the peaks to be resolved from the beginning
+        :param harmonic_window: (below, above) the harmonic energy, in eV
+        :param progress_callback: called with (number of calculated energies, budget)
+        :return: list of (energies, flux), one per spectrum
+        '''
+        wavefront_parameters = self.spectra[0][0]
+
+        photon_energy_min = wavefront_parameters._photon_energy_min
+        photon_energy_max = wavefront_parameters._photon_energy_max
+        budget = int(wavefront_parameters._photon_energy_points)
+
+        coarse_points = max(2, min(budget, int(budget*self.COARSE_GRID_FRACTION)))
+
+        segments = get_energy_chunks(photon_energy_min, photon_energy_max, coarse_points, self.number_of_processes*self.CHUNKS_PER_PROCESS, self.MINIMUM_CHUNK_POINTS)
+
+        # windows around the harmonics: half of the remaining points at most
+        harmonic_points = 0
+        for harmonic_energy in harmonic_energies:
+            if harmonic_points + self.HARMONIC_WINDOW_POINTS > (budget - coarse_points)//2: break
+
+            window_min = max(photon_energy_min, harmonic_energy - harmonic_window[0])
+            window_max = min(photon_energy_max, harmonic_energy + harmonic_window[1])
+
+            if window_max > window_min:
+                segments.append((window_min, window_max, self.HARMONIC_WINDOW_POINTS))
+                harmonic_points += self.HARMONIC_WINDOW_POINTS
+
+        minimum_interval = self.MINIMUM_INTERVAL_FACTOR*(photon_energy_max - photon_energy_min)/max(1, budget - 1)
+
+        energies = numpy.zeros(0)
+        fluxes = [numpy.zeros(0) for _ in self.spectra]
+
+        with self.__get_pool() as pool:
+            for refinement_pass in range(self.REFINEMENT_PASSES + 1):
+                results = self.calculate_segments(pool, [segments]*len(self.spectra))
+
+                energies = numpy.concatenate([energies] + [e for e, _ in results[0]])
+                fluxes = [numpy.concatenate([flux] + [i for _, i in spectrum_results]) for flux, spectrum_results in zip(fluxes, results)]
+
+                energies, indexes = numpy.unique(energies, return_index=True)
+                fluxes = [flux[indexes] for flux in fluxes]
+
+                if not progress_callback is None: progress_callback(min(energies.size, budget), budget)
+
+                remaining_points = budget - energies.size
+                remaining_passes = self.REFINEMENT_PASSES - refinement_pass
+
+                if remaining_points <= 0 or remaining_passes == 0: break
+
+                segments = get_refinement_segments(energies, fluxes,
+                                                   number_of_points=max(1, remaining_points//remaining_passes),
+                                                   points_per_interval=self.POINTS_PER_INTERVAL,
+                                                   minimum_interval=minimum_interval)
+
+                if len(segments) == 0: break
+
+        return [(energies, flux) for flux in fluxes]
+
+    def calculate_segments(self, pool, segments, progress_callback=None):
+        '''
+        :param segments: for every spectrum, list of energy grids (photon energy min, photon energy max, photon energy points)
+        :return: for every spectrum, list of (energies, flux), one per energy grid
+        '''
+        tasks = []
+        for spectrum_index, ((wavefront_parameters, flux_precision_parameters, multi_electron), spectrum_segments) in enumerate(zip(self.spectra, segments)):
+            for segment_index, segment in enumerate(spectrum_segments):
+                tasks.append((self.srw_source, get_segment_wavefront_parameters(wavefront_parameters, *segment), flux_precision_parameters, multi_electron,
+                              self.polarization_component_to_be_extracted, spectrum_index, segment_index))
+
+        results = [[None]*len(spectrum_segments) for spectrum_segments in segments]
+
+        for completed, (spectrum_index, segment_index, e, i) in enumerate(pool.imap_unordered(_calculate_flux, tasks)):
+            results[spectrum_index][segment_index] = (e, i)
+
+            if not progress_callback is None: progress_callback(completed + 1, len(tasks))
+
+        return results
+
+    def __get_pool(self):
+        return multiprocessing.Pool(processes=self.number_of_processes)
+
+def get_energy_chunks(photon_energy_min, photon_energy_max, photon_energy_points, number_of_chunks, minimum_chunk_points=1):
+    '''
+    Splits the energy grid in contiguous sub-grids: the stitched sub-grids are the original grid
+
+    :return: list of (photon energy min, photon energy max, photon energy points)
+    '''
+    energies = numpy.linspace(photon_energy_min, photon_energy_max, photon_energy_points)
+
+    number_of_chunks = max(1, min(number_of_chunks, photon_energy_points // max(1, minimum_chunk_points)))
+
+    return [(chunk[0], chunk[-1], chunk.size) for chunk in numpy.array_split(energies, number_of_chunks) if chunk.size > 0]
+
+def get_refinement_segments(energies, fluxes, number_of_points, points_per_interval=3, minimum_interval=0.0):
+    '''
+    Selects the intervals between consecutive energies where any of the spectra changes the most (relatively
+    to its maximum) and fills them with uniformly spaced points
+
+    :return: list of (photon energy min, photon energy max, photon energy points), one per interval
+    '''
+    intervals = numpy.diff(energies)
+    variation = numpy.zeros(intervals.size)
+
+    weights = (energies[2:] - energies[1:-1])/(energies[2:] - energies[:-2])
+
+    for flux in fluxes:
+        flux_max = numpy.max(numpy.abs(flux))
+
+        if flux_max > 0:
+            variation = numpy.maximum(variation, numpy.abs(numpy.diff(flux))/flux_max)
+
+            # distance of every point from the chord of its neighbours: large on the peaks, where the variation is small
+            deviation = numpy.abs(flux[1:-1] - (weights*flux[:-2] + (1 - weights)*flux[2:]))/flux_max
+
+            variation[:-1] = numpy.maximum(variation[:-1], deviation)
+            variation[1:]  = numpy.maximum(variation[1:], deviation)
+
+    points_per_interval = max(1, min(points_per_interval, number_of_points))
+
+    # the inserted points must not be closer than the minimum interval
+    variation[intervals < (points_per_interval + 1)*minimum_interval] = 0.0
+
+    candidates = numpy.argsort(variation)[::-1][:max(1, number_of_points//points_per_interval)]
+    candidates = candidates[variation[candidates] > 0]
+
+    segments = []
+    for index in numpy.sort(candidates):
+        step = intervals[index]/(points_per_interval + 1)
+        segments.append((energies[index] + step, energies[index + 1] - step, points_per_interval))
+
+    return segments
+
+def is_uniform_grid(energies, relative_tolerance=1e-6):
+    '''
+    :return: False for the energies of the adaptive sampling (a few points can be uniform by chance)
+    '''
+    if energies.size < 3: return True
+
+    steps = numpy.diff(energies)
+
+    return bool(numpy.all(numpy.abs(steps - steps[0]) <= relative_tolerance*numpy.abs(steps[0])))
+
+def get_segment_wavefront_parameters(wavefront_parameters, photon_energy_min, photon_energy_max, photon_energy_points):
+    segment_wavefront_parameters = copy.deepcopy(wavefront_parameters)
+    segment_wavefront_parameters._photon_energy_min = photon_energy_min
+    segment_wavefront_parameters._photon_energy_max = photon_energy_max
+    segment_wavefront_parameters._photon_energy_points = photon_energy_points
+
+    return segment_wavefront_parameters
+
+def _calculate_flux(task):
+    srw_source, wavefront_parameters, flux_precision_parameters, multi_electron, polarization_component_to_be_extracted, spectrum_index, segment_index = task
+
+    if flux_precision_parameters is None:
+        srw_wavefront = srw_source.get_SRW_Wavefront(source_wavefront_parameters=wavefront_parameters)
+
+        e, i = srw_wavefront.get_flux(multi_electron=multi_electron, polarization_component_to_be_extracted=polarization_component_to_be_extracted)
+    else:
+        e, i = srw_source.get_undulator_flux(source_wavefront_parameters=wavefront_parameters, flux_precision_parameters=flux_precision_parameters)
+
+    return spectrum_index, segment_index, numpy.array(e), numpy.array(i)
@@ -0,0 +1,105 @@
+"""
+
+test of the spectrum calculator: energy chunks, refinement segments and the budget of the adaptive sampling, on a
+synthetic spectrum with sinc^2 harmonics instead of SRW
+
+"""
+
+import unittest
+import numpy
+
+from wofrysrw.storage_ring.srw_light_source import WavefrontParameters
+
+from srw_spectrum import SRWSpectrumCalculator, get_energy_chunks, get_refinement_segments, is_uniform_grid
+
+NUMBER_OF_PERIODS = 100
+RESONANCE_ENERGY = 1000.0
+HARMONICS = [1, 3, 5]
+PEAK_SHIFT = 3.3 # eV per harmonic number, the peaks are not on the nominal harmonic energies
+
+def get_synthetic_flux(energies):
+    flux = numpy.zeros_like(energies)
+
+    for harmonic in HARMONICS:
+        flux += numpy.sinc(NUMBER_OF_PERIODS*(energies - harmonic*(RESONANCE_ENERGY - PEAK_SHIFT))/(harmonic*RESONANCE_ENERGY))**2/harmonic
+
+    return flux
+
+def get_integral(energies, flux):
+    return numpy.sum(0.5*(flux[1:] + flux[:-1])*numpy.diff(energies))
+
+class SyntheticSpectrumCalculator(SRWSpectrumCalculator):
+    def calculate_segments(self, pool, segments, progress_callback=None):
+        return [[(energies, get_synthetic_flux(energies)) for energies in [numpy.linspace(*segment) for segment in spectrum_segments]] for spectrum_segments in segments]
+
+class SRWSpectrumTest(unittest.TestCase):
+
+    def test_energy_chunks(self):
+        for photon_energy_points, number_of_chunks in [(100, 8), (101, 8), (7, 8), (1, 4)]:
+            chunks = get_energy_chunks(1000.0, 2000.0, photon_energy_points, number_of_chunks)
+
+            # the stitched chunks are the original grid
+            numpy.testing.assert_allclose(numpy.concatenate([numpy.linspace(*chunk) for chunk in chunks]), numpy.linspace(1000.0, 2000.0, photon_energy_points))
+            self.assertLessEqual(len(chunks), number_of_chunks)
+
+        self.assertEqual(len(get_energy_chunks(1000.0, 2000.0, 100, 32, minimum_chunk_points=10)), 10)
+
+    def test_refinement_segments(self):
+        energies = numpy.linspace(0.0, 10.0, 11)
+        flux = numpy.exp(-(energies - 5.0)**2)
+
+        segments = get_refinement_segments(energies, [flux], number_of_points=6, points_per_interval=3)
+
+        self.assertEqual(len(segments), 2)
+
+        for photon_energy_min, photon_energy_max, photon_energy_points in segments:
+            self.assertEqual(photon_energy_points, 3)
+
+            # inside the intervals around the peak, without the existing energies
+            self.assertTrue(3.0 < photon_energy_min < photon_energy_max < 7.0)
+            self.assertFalse(numpy.any(numpy.isclose(numpy.linspace(photon_energy_min, photon_energy_max, 3)[:, numpy.newaxis], energies)))
+
+        # intervals too small to be refined
+        self.assertEqual(get_refinement_segments(energies, [flux], number_of_points=6, points_per_interval=3, minimum_interval=1.0), [])
+
+        # constant spectrum
+        self.assertEqual(get_refinement_segments(energies, [numpy.ones(11)], number_of_points=6), [])
+
+    def test_uniform_grid(self):
+        self.assertTrue(is_uniform_grid(numpy.linspace(1000.0, 2000.0, 1001)))
+        self.assertTrue(is_uniform_grid(numpy.array([1000.0, 1500.0])))
+        self.assertFalse(is_uniform_grid(numpy.array([1000.0, 1001.0, 1500.0, 2000.0])))
+
+    def test_adaptive_sampling(self):
+        budget = 1000
+
+        wavefront_parameters = WavefrontParameters(photon_energy_min=500.0, photon_energy_max=5500.0, photon_energy_points=budget)
+        calculator = SyntheticSpectrumCalculator(None, [(wavefront_parameters, None, False)], number_of_processes=1)
+
+        progress = []
+        harmonic_width = RESONANCE_ENERGY/NUMBER_OF_PERIODS
+
+        (energies, flux), = calculator.run_adaptive(harmonic_energies=[harmonic*RESONANCE_ENERGY for harmonic in HARMONICS],
+                                                    harmonic_window=(2*harmonic_width, harmonic_width),
+                                                    progress_callback=lambda calculated, total: progress.append((calculated, total)))
+
+        self.assertLessEqual(energies.size, budget)
+        self.assertTrue(numpy.all(numpy.diff(energies) > 0))
+        self.assertTrue(all(calculated <= total == budget for calculated, total in progress))
+
+        uniform_energies = numpy.linspace(500.0, 5500.0, budget)
+        uniform_flux = get_synthetic_flux(uniform_energies)
+
+        def get_peak_error(energies, flux, harmonic):
+            window = numpy.abs(energies - harmonic*(RESONANCE_ENERGY - PEAK_SHIFT)) < harmonic*harmonic_width
+
+            return numpy.abs(numpy.max(flux[window])*harmonic - 1)
+
+        for harmonic in HARMONICS: self.assertLess(get_peak_error(energies, flux, harmonic), 2e-3)
+
+        # the uniform grid with the same budget misses the top of the first harmonic
+        self.assertGreater(get_peak_error(uniform_energies, uniform_flux, 1), 1e-2)
+
+        reference_energies = numpy.linspace(500.0, 5500.0, 2000001)
+
+        self.assertLess(numpy.abs(get_integral(energies, flux)/get_integral(reference_energies, get_synthetic_flux(reference_energies)) - 1), 1e-2)
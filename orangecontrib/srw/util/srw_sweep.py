@@ -0,0 +1,156 @@
+import copy, multiprocessing
+
+import numpy
+
+from wofry.propagator.propagator import PropagationParameters
+from wofrysrw.beamline.srw_beamline import SRWBeamline, Where
+from wofrysrw.beamline.optical_elements.mirrors.srw_mirror import SRWMirror
+from wofrysrw.beamline.optical_elements.gratings.srw_grating import SRWGrating
+from wofrysrw.beamline.optical_elements.crystals.srw_crystal import SRWCrystal
+from wofrysrw.propagator.propagators2D.srw_fresnel_native import FresnelSRWNative
+from wofrysrw.propagator.propagators2D.srw_propagation_mode import SRWPropagationMode
+
+from orangecontrib.srw.util.srw_propagation import do_propagation
+from orangecontrib.srw.util.srw_builders import get_grating_orientation_parameters
+
+COORDINATES_VARIABLES = ["p", "q", "angle_radial", "angle_azimuthal"]
+
+class SRWSweepResult(object):
+    COLUMNS = ["total", "fwhm_h", "fwhm_v", "peak"]
+
+    def __init__(self, variable_name, values):
+        self.variable_name = variable_name
+        self.values = numpy.array(values)
+        self.__rows = [None]*len(values)
+
+    def set_row(self, index, summary):
+        self.__rows[index] = summary
+
+    def get_column(self, name):
+        return numpy.array([numpy.nan if row is None else row[name] for row in self.__rows])
+
+    def is_complete(self):
+        return not None in self.__rows
+
+    def save(self, file_name):
+        numpy.savetxt(file_name,
+                      numpy.column_stack([self.values] + [self.get_column(name) for name in self.COLUMNS]),
+                      header="\t".join([self.variable_name] + self.COLUMNS),
+                      delimiter="\t")
+
+class SRWParameterSweep(object):
+    '''
+    Headless scan of one variable of a beamline element: every value is a whole-beamline propagation of
+    the input wavefront through a copy of the beamline, run in a pool of processes.
+
+    variable_name is an attribute of the optical element (e.g. "grazing_angle") or one of the element
+    coordinates (p, q, angle_radial, angle_azimuthal, angles in rad); a comma separated list of names
+    sets all of them to the same value, as with the scanning loop triggers.
+
+    The state derived from the variable is kept consistent as in the widgets: the grazing angle of mirrors
+    and gratings is pi/2 - angle_radial, and the output orientation vectors of the gratings (o.e. wavefront
+    propagation optional parameters) are recalculated at the photon energy of the input wavefront. Variables
+    whose derived state cannot be recalculated are rejected.
+
+    The result table has one row per value: integrated intensity, peak and FWHM (mm) of the intensity
+    at the central photon energy.
+    '''
+
+    def __init__(self, srw_beamline, input_wavefront, variable_name, values, element_index=-1, multi_electron=False, number_of_processes=None):
+        if srw_beamline.get_beamline_elements_number() == 0: raise ValueError("Beamline has no elements")
+
+        self.srw_beamline = srw_beamline
+        self.input_wavefront = input_wavefront
+        self.variable_name = variable_name
+        self.values = values
+        self.element_index = element_index % srw_beamline.get_beamline_elements_number()
+        self.multi_electron = multi_electron
+        self.number_of_processes = number_of_processes if not number_of_processes is None else multiprocessing.cpu_count()
+
+    def run(self, progress_callback=None):
+        '''
+        :param progress_callback: called with (number of completed points, number of points)
+        '''
+        result = SRWSweepResult(self.variable_name, self.values)
+        variable_names = [name.strip() for name in self.variable_name.split(",")]
+
+        # invalid variables are reported before starting the pool
+        if len(self.values) > 0: get_modified_beamline(self.srw_beamline, self.element_index, variable_names, self.values[0], self.input_wavefront.get_photon_energy())
+
+        tasks = [(self.srw_beamline, self.input_wavefront, self.element_index, variable_names, value, self.multi_electron, index) for index, value in enumerate(self.values)]
+
+        with multiprocessing.Pool(processes=min(self.number_of_processes, max(len(tasks), 1))) as pool:
+            for completed, (index, summary) in enumerate(pool.imap_unordered(_run_sweep_point, tasks)):
+                result.set_row(index, summary)
+
+                if not progress_callback is None: progress_callback(completed + 1, len(tasks))
+
+        return result
+
+def get_modified_beamline(srw_beamline, element_index, variable_names, value, photon_energy=None):
+    '''
+    :param photon_energy: to recalculate the output orientation vectors of a grating
+    '''
+    beamline_elements = [srw_beamline.get_beamline_element_at(index) for index in range(srw_beamline.get_beamline_elements_number())]
+
+    beamline_element = copy.deepcopy(beamline_elements[element_index])
+    optical_element = beamline_element.get_optical_element()
+    coordinates = beamline_element.get_coordinates()
+
+    if isinstance(optical_element, SRWCrystal):
+        raise ValueError("Crystals cannot be scanned: their orientation is derived from the Bragg angle")
+
+    is_reflecting_element = isinstance(optical_element, (SRWMirror, SRWGrating))
+
+    for variable_name in variable_names:
+        if variable_name in COORDINATES_VARIABLES:
+            setattr(coordinates, "_" + variable_name, value)
+
+            if variable_name == "angle_radial" and is_reflecting_element: optical_element.grazing_angle = numpy.pi/2 - value
+        elif hasattr(optical_element, variable_name):
+            setattr(optical_element, variable_name, value)
+
+            if variable_name == "grazing_angle" and is_reflecting_element: coordinates._angle_radial = numpy.pi/2 - value
+        else:
+            raise ValueError("Variable " + variable_name + " not found in the optical element or in its coordinates")
+
+    beamline_elements[element_index] = beamline_element
+
+    modified_beamline = SRWBeamline(light_source=srw_beamline.get_light_source(), beamline_elements_list=beamline_elements)
+
+    for where in Where.tuple():
+        for index, (wavefront_propagation_parameters, wavefront_propagation_optional_parameters) in enumerate(srw_beamline.get_wavefront_propagation_parameters(where)):
+            if index == element_index and where == Where.OE:
+                if isinstance(optical_element, SRWGrating):
+                    if photon_energy is None: raise ValueError("The photon energy is needed to recalculate the orientation of the grating")
+
+                    wavefront_propagation_optional_parameters = get_grating_orientation_parameters(optical_element, photon_energy)
+                elif isinstance(optical_element, SRWMirror) and not wavefront_propagation_optional_parameters is None and \
+                        any(variable_name in ["grazing_angle", "angle_radial"] for variable_name in variable_names):
+                    raise ValueError("The output orientation vectors of the mirror are set by hand: they cannot follow the scanned angle")
+
+            modified_beamline.append_wavefront_propagation_parameters(wavefront_propagation_parameters, wavefront_propagation_optional_parameters, where)
+
+    return modified_beamline
+
+def get_intensity_summary(wavefront, multi_electron=False):
+    from orangecontrib.srw.util.srw_util import SRWPlot
+
+    e, h, v, i = wavefront.get_intensity(multi_electron=multi_electron)
+
+    ticket = SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)])
+
+    return {"total"  : ticket["total"],
+            "fwhm_h" : numpy.nan if ticket["fwhm_h"] is None else ticket["fwhm_h"],
+            "fwhm_v" : numpy.nan if ticket["fwhm_v"] is None else ticket["fwhm_v"],
+            "peak"   : numpy.max(ticket["histogram"])}
+
+def _run_sweep_point(task):
+    srw_beamline, input_wavefront, element_index, variable_names, value, multi_electron, index = task
+
+    propagation_parameters = PropagationParameters(wavefront=input_wavefront.duplicate(), propagation_elements=None)
+    propagation_parameters.set_additional_parameters("working_beamline", get_modified_beamline(srw_beamline, element_index, variable_names, value, input_wavefront.get_photon_energy()))
+
+    output_wavefront = do_propagation(propagation_parameters, FresnelSRWNative.HANDLER_NAME, SRWPropagationMode.WHOLE_BEAMLINE)
+
+    return index, get_intensity_summary(output_wavefront, multi_electron)
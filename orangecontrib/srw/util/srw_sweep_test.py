@@ -0,0 +1,120 @@
+"""
+
+test of the beamlines of the parameter sweep: the state derived from the scanned variable must be the one the
+widgets would calculate
+
+"""
+
+import os
+import tempfile
+import unittest
+import numpy
+
+from syned.beamline.beamline_element import BeamlineElement
+from syned.beamline.element_coordinates import ElementCoordinates
+from wofrysrw.beamline.srw_beamline import SRWBeamline, Where
+from wofrysrw.beamline.optical_elements.gratings.srw_plain_grating import SRWPlaneGrating
+from wofrysrw.beamline.optical_elements.ideal_elements.srw_ideal_lens import SRWIdealLens
+from wofrysrw.beamline.optical_elements.mirrors.srw_plane_mirror import SRWPlaneMirror
+from wofrysrw.propagator.wavefront2D.srw_wavefront import WavefrontPropagationParameters, WavefrontPropagationOptionalParameters
+from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUndulatorLightSource
+
+from srw_builders import get_grating_orientation_parameters
+from srw_sweep import get_modified_beamline, SRWSweepResult
+
+PHOTON_ENERGY = 500.0
+
+def create_beamline(mirror_orientation_parameters=None):
+    srw_beamline = SRWBeamline(light_source=SRWUndulatorLightSource(), beamline_elements_list=[])
+
+    grating = SRWPlaneGrating(grazing_angle=numpy.radians(1.0), grooving_density_0=800.0)
+
+    elements = [(SRWPlaneMirror(grazing_angle=numpy.radians(0.5)), numpy.radians(89.5), mirror_orientation_parameters),
+                (grating, numpy.radians(89.0), get_grating_orientation_parameters(grating, PHOTON_ENERGY)),
+                (SRWIdealLens(focal_x=10.0, focal_y=10.0), 0.0, None)]
+
+    for optical_element, angle_radial, orientation_parameters in elements:
+        srw_beamline.append_beamline_element(BeamlineElement(optical_element, ElementCoordinates(p=10.0, q=0.0, angle_radial=angle_radial)))
+
+        srw_beamline.append_wavefront_propagation_parameters(WavefrontPropagationParameters(), None, Where.DRIFT_BEFORE)
+        srw_beamline.append_wavefront_propagation_parameters(WavefrontPropagationParameters(), orientation_parameters, Where.OE)
+        srw_beamline.append_wavefront_propagation_parameters(None, None, Where.DRIFT_AFTER)
+
+    return srw_beamline
+
+def get_orientation_vectors(orientation_parameters):
+    return [orientation_parameters.orientation_of_the_output_optical_axis_vector_x,
+            orientation_parameters.orientation_of_the_output_optical_axis_vector_y,
+            orientation_parameters.orientation_of_the_output_optical_axis_vector_z,
+            orientation_parameters.orientation_of_the_horizontal_base_vector_x,
+            orientation_parameters.orientation_of_the_horizontal_base_vector_y]
+
+class SRWSweepTest(unittest.TestCase):
+
+    def test_coordinates(self):
+        srw_beamline = create_beamline()
+
+        modified_beamline = get_modified_beamline(srw_beamline, 2, ["p", "q"], 3.0)
+
+        self.assertEqual(modified_beamline.get_beamline_element_at(2).get_coordinates().p(), 3.0)
+        self.assertEqual(modified_beamline.get_beamline_element_at(2).get_coordinates().q(), 3.0)
+
+        # the original beamline is unchanged
+        self.assertEqual(srw_beamline.get_beamline_element_at(2).get_coordinates().p(), 10.0)
+
+    def test_optical_element_attribute(self):
+        modified_beamline = get_modified_beamline(create_beamline(), 2, ["focal_x"], 5.0)
+
+        self.assertEqual(modified_beamline.get_beamline_element_at(2).get_optical_element().focal_x, 5.0)
+
+    def test_mirror_pitch(self):
+        srw_beamline = create_beamline()
+
+        for variable_name, value, grazing_angle in [("grazing_angle", numpy.radians(0.6), numpy.radians(0.6)),
+                                                    ("angle_radial", numpy.radians(89.3), numpy.radians(0.7))]:
+            beamline_element = get_modified_beamline(srw_beamline, 0, [variable_name], value).get_beamline_element_at(0)
+
+            self.assertAlmostEqual(beamline_element.get_optical_element().grazing_angle, grazing_angle, places=12)
+            self.assertAlmostEqual(beamline_element.get_coordinates().angle_radial(), numpy.pi/2 - grazing_angle, places=12)
+
+    def test_grating_pitch(self):
+        srw_beamline = create_beamline()
+
+        modified_beamline = get_modified_beamline(srw_beamline, 1, ["grazing_angle"], numpy.radians(1.5), PHOTON_ENERGY)
+
+        grating = modified_beamline.get_beamline_element_at(1).get_optical_element()
+        orientation_parameters = modified_beamline.get_wavefront_propagation_parameters_at(1, Where.OE)[1]
+
+        self.assertAlmostEqual(modified_beamline.get_beamline_element_at(1).get_coordinates().angle_radial(), numpy.radians(88.5), places=12)
+        self.assertEqual(get_orientation_vectors(orientation_parameters), get_orientation_vectors(get_grating_orientation_parameters(grating, PHOTON_ENERGY)))
+        self.assertNotEqual(get_orientation_vectors(orientation_parameters), get_orientation_vectors(srw_beamline.get_wavefront_propagation_parameters_at(1, Where.OE)[1]))
+
+        # the other elements keep their parameters
+        self.assertIs(modified_beamline.get_wavefront_propagation_parameters_at(0, Where.OE)[0], srw_beamline.get_wavefront_propagation_parameters_at(0, Where.OE)[0])
+
+        with self.assertRaises(ValueError): get_modified_beamline(srw_beamline, 1, ["grazing_angle"], numpy.radians(1.5))
+
+    def test_rejected_variables(self):
+        with self.assertRaises(ValueError): get_modified_beamline(create_beamline(), 0, ["not_an_attribute"], 1.0)
+
+        # orientation vectors of the mirror set by hand
+        srw_beamline = create_beamline(mirror_orientation_parameters=WavefrontPropagationOptionalParameters(0.0, 0.0174, 0.9998, 1.0, 0.0))
+
+        with self.assertRaises(ValueError): get_modified_beamline(srw_beamline, 0, ["grazing_angle"], numpy.radians(0.6))
+
+        get_modified_beamline(srw_beamline, 0, ["p"], 12.0)
+
+    def test_result(self):
+        result = SRWSweepResult("p", [1.0, 2.0])
+        result.set_row(1, {"total": 1.0, "fwhm_h": 0.1, "fwhm_v": 0.2, "peak": 3.0})
+
+        self.assertFalse(result.is_complete())
+        numpy.testing.assert_array_equal(result.get_column("peak"), [numpy.nan, 3.0])
+
+        file_name = os.path.join(tempfile.mkdtemp(), "sweep.dat")
+        result.save(file_name)
+
+        numpy.testing.assert_array_equal(numpy.loadtxt(file_name)[1], [2.0, 1.0, 0.1, 0.2, 3.0])
+
+        os.remove(file_name)
+        os.rmdir(os.path.dirname(file_name))
@@ -0,0 +1,140 @@
+import copy
+
+import numpy
+
+from wofrysrw.storage_ring.light_sources.srw_bending_magnet_light_source import SRWBendingMagnetLightSource
+from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUndulatorLightSource
+
+class Symmetry:
+    NONE = 0
+    X = 1  # x -> -x
+    Y = 2  # y -> -y
+    XY = 3 # quadrant
+
+    @classmethod
+    def tuple(cls):
+        return ["No", "Automatic", "X and Y (Quadrant)", "Y only (Half)", "X only (Half)"]
+
+def get_source_symmetry(srw_source, wavefront_parameters):
+    '''
+    Mirror symmetries of the radiation on the observation mesh: the beam and the magnetic structure have to
+    be on axis, and the mesh centered on it. Planar undulators (vertical field) are symmetric in x and y,
+    bending magnets only in y.
+    '''
+    electron_beam = srw_source.get_electron_beam()
+    magnetic_structure = srw_source.get_magnetic_structure()
+
+    if not (electron_beam._moment_x == 0.0 and electron_beam._moment_xp == 0.0 and \
+            electron_beam._moment_y == 0.0 and electron_beam._moment_yp == 0.0 and \
+            magnetic_structure.horizontal_central_position == 0.0 and magnetic_structure.vertical_central_position == 0.0 and \
+            wavefront_parameters._h_position == 0.0 and wavefront_parameters._v_position == 0.0):
+        return Symmetry.NONE
+
+    if isinstance(srw_source, SRWUndulatorLightSource):
+        return Symmetry.XY if magnetic_structure._K_horizontal == 0.0 else Symmetry.NONE
+    elif isinstance(srw_source, SRWBendingMagnetLightSource):
+        return Symmetry.Y
+    else:
+        return Symmetry.NONE
+
+def get_symmetric_mesh(symmetry_index, srw_source, wavefront_parameters):
+    '''
+    :param symmetry_index: index of Symmetry.tuple(), as in the widget combo boxes
+    :return: None if there is no symmetry to exploit: also a declared symmetry is ignored if the mesh is not
+             centered on its axes (the mirror images are taken about the center of the mesh)
+    '''
+    # with a sampling factor SRW chooses the mesh itself: the reduced mesh would not be a part of the full one
+    precision_parameters = wavefront_parameters._wavefront_precision_parameters
+    if not precision_parameters is None and precision_parameters._sampling_factor_for_adjusting_nx_ny > 0: return None
+
+    if symmetry_index == 1: symmetry = get_source_symmetry(srw_source, wavefront_parameters)
+    else: symmetry = [Symmetry.NONE, None, Symmetry.XY, Symmetry.Y, Symmetry.X][symmetry_index]
+
+    if symmetry & Symmetry.X and wavefront_parameters._h_position != 0.0: return None
+    if symmetry & Symmetry.Y and wavefront_parameters._v_position != 0.0: return None
+
+    return None if symmetry == Symmetry.NONE else SRWSymmetricMesh(srw_source, wavefront_parameters, symmetry)
+
+class SRWSymmetricMesh(object):
+    '''
+    Calculation of symmetric intensities and power densities on a part of the observation mesh: along every
+    symmetry axis only the points with coordinate >= 0 are needed, the others are their mirror images.
+
+    SRW convolves the single-electron results with the electron beam distribution on the mesh, so the reduced
+    mesh extends across the symmetry axis by a margin of margin_sigmas times the electron beam size at the
+    observation distance: the values in the margin are discarded. The points of the reduced mesh are points
+    of the full mesh.
+    '''
+    MARGIN_SIGMAS = 4
+
+    def __init__(self, srw_source, wavefront_parameters, symmetry, margin_sigmas=MARGIN_SIGMAS):
+        self.wavefront_parameters = wavefront_parameters
+        self.symmetry = symmetry
+
+        electron_beam = srw_source.get_electron_beam()
+        distance = wavefront_parameters._distance
+
+        sigma_h = numpy.sqrt(electron_beam._moment_xx + (distance**2)*electron_beam._moment_xpxp)
+        sigma_v = numpy.sqrt(electron_beam._moment_yy + (distance**2)*electron_beam._moment_ypyp)
+
+        self.__h_start = _get_start_index(wavefront_parameters._h_slit_gap, int(wavefront_parameters._h_slit_points), margin_sigmas*sigma_h) if symmetry & Symmetry.X else 0
+        self.__v_start = _get_start_index(wavefront_parameters._v_slit_gap, int(wavefront_parameters._v_slit_points), margin_sigmas*sigma_v) if symmetry & Symmetry.Y else 0
+
+    def get_reduction_factor(self):
+        return (int(self.wavefront_parameters._h_slit_points)*int(self.wavefront_parameters._v_slit_points)) / \
+               ((int(self.wavefront_parameters._h_slit_points) - self.__h_start)*(int(self.wavefront_parameters._v_slit_points) - self.__v_start))
+
+    def get_reduced_wavefront_parameters(self):
+        reduced_wavefront_parameters = copy.deepcopy(self.wavefront_parameters)
+
+        if self.__h_start > 0:
+            reduced_wavefront_parameters._h_position, reduced_wavefront_parameters._h_slit_gap, reduced_wavefront_parameters._h_slit_points = \
+                _get_reduced_axis(self.wavefront_parameters._h_position, self.wavefront_parameters._h_slit_gap, int(self.wavefront_parameters._h_slit_points), self.__h_start)
+        if self.__v_start > 0:
+            reduced_wavefront_parameters._v_position, reduced_wavefront_parameters._v_slit_gap, reduced_wavefront_parameters._v_slit_points = \
+                _get_reduced_axis(self.wavefront_parameters._v_position, self.wavefront_parameters._v_slit_gap, int(self.wavefront_parameters._v_slit_points), self.__v_start)
+
+        return reduced_wavefront_parameters
+
+    def get_coordinates(self):
+        '''
+        :return: h and v coordinates of the full mesh
+        '''
+        return numpy.linspace(self.wavefront_parameters._h_position - 0.5*self.wavefront_parameters._h_slit_gap,
+                              self.wavefront_parameters._h_position + 0.5*self.wavefront_parameters._h_slit_gap,
+                              int(self.wavefront_parameters._h_slit_points)), \
+               numpy.linspace(self.wavefront_parameters._v_position - 0.5*self.wavefront_parameters._v_slit_gap,
+                              self.wavefront_parameters._v_position + 0.5*self.wavefront_parameters._v_slit_gap,
+                              int(self.wavefront_parameters._v_slit_points))
+
+    def mirror(self, data):
+        '''
+        :param data: array calculated on the reduced mesh, with (h, v) as last axes
+        :return: the array on the full mesh
+        '''
+        if data.shape[-2:] != (int(self.wavefront_parameters._h_slit_points) - self.__h_start, int(self.wavefront_parameters._v_slit_points) - self.__v_start):
+            raise ValueError("The calculated mesh is not the reduced mesh")
+
+        if self.symmetry & Symmetry.X: data = numpy.take(data, _get_mirror_indexes(int(self.wavefront_parameters._h_slit_points), self.__h_start), axis=data.ndim - 2)
+        if self.symmetry & Symmetry.Y: data = numpy.take(data, _get_mirror_indexes(int(self.wavefront_parameters._v_slit_points), self.__v_start), axis=data.ndim - 1)
+
+        return data
+
+def _get_start_index(gap, points, margin):
+    if points < 3: return 0
+
+    step = gap/(points - 1)
+
+    return max(0, points//2 - int(numpy.ceil(margin/step)))
+
+def _get_reduced_axis(position, gap, points, start_index):
+    start = position - 0.5*gap + start_index*gap/(points - 1)
+    end   = position + 0.5*gap
+
+    return 0.5*(start + end), end - start, points - start_index
+
+def _get_mirror_indexes(points, start_index):
+    indexes = numpy.arange(points)
+
+    # the coordinate of the point i < points//2 is the opposite of the one of points-1-i
+    return numpy.where(indexes >= points//2, indexes, points - 1 - indexes) - start_index
@@ -0,0 +1,100 @@
+"""
+
+test of the symmetric calculations: the mirrored reduced mesh must be the full mesh, for odd and even numbers of points
+
+"""
+
+import unittest
+import numpy
+
+from wofrysrw.propagator.wavefront2D.srw_wavefront import WavefrontPrecisionParameters
+from wofrysrw.storage_ring.srw_light_source import WavefrontParameters
+from wofrysrw.storage_ring.srw_electron_beam import SRWElectronBeam
+from wofrysrw.storage_ring.magnetic_structures.srw_undulator import SRWUndulator
+from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUndulatorLightSource
+
+from srw_symmetry import Symmetry, SRWSymmetricMesh, get_symmetric_mesh, _get_mirror_indexes
+
+def create_source():
+    electron_beam = SRWElectronBeam(energy_in_GeV=6.0, current=0.2, moment_xx=(10e-6)**2, moment_xpxp=(1e-6)**2, moment_yy=(2e-6)**2, moment_ypyp=(0.5e-6)**2)
+
+    return SRWUndulatorLightSource(electron_beam=electron_beam, undulator_magnetic_structure=SRWUndulator(K_vertical=1.5, period_length=0.02, number_of_periods=50))
+
+def create_wavefront_parameters(h_slit_points, v_slit_points, sampling_factor=0.0):
+    return WavefrontParameters(photon_energy_min=8000, photon_energy_max=8000, photon_energy_points=1,
+                               h_slit_gap=1e-3, h_slit_points=h_slit_points, v_slit_gap=0.5e-3, v_slit_points=v_slit_points, distance=20.0,
+                               wavefront_precision_parameters=WavefrontPrecisionParameters(sampling_factor_for_adjusting_nx_ny=sampling_factor))
+
+def get_axis(position, gap, points):
+    return numpy.linspace(position - 0.5*gap, position + 0.5*gap, int(points))
+
+def get_data(wavefront_parameters):
+    h = get_axis(wavefront_parameters._h_position, wavefront_parameters._h_slit_gap, wavefront_parameters._h_slit_points)
+    v = get_axis(wavefront_parameters._v_position, wavefront_parameters._v_slit_gap, wavefront_parameters._v_slit_points)
+
+    # even in x and y
+    return numpy.exp(-(h[:, numpy.newaxis]/3e-4)**2 - (v[numpy.newaxis, :]/1e-4)**2)*(1 + (h[:, numpy.newaxis]*v[numpy.newaxis, :]*1e7)**2)
+
+class SRWSymmetryTest(unittest.TestCase):
+
+    def test_mirror_indexes(self):
+        # odd: the central point is on the axis
+        numpy.testing.assert_array_equal(_get_mirror_indexes(5, 0), [4, 3, 2, 3, 4])
+        numpy.testing.assert_array_equal(_get_mirror_indexes(5, 1), [3, 2, 1, 2, 3])
+        # even: no point on the axis
+        numpy.testing.assert_array_equal(_get_mirror_indexes(6, 0), [5, 4, 3, 3, 4, 5])
+        numpy.testing.assert_array_equal(_get_mirror_indexes(6, 2), [3, 2, 1, 1, 2, 3])
+
+    def test_mirror(self):
+        for h_slit_points, v_slit_points in [(101, 51), (100, 50), (101, 50), (100, 51)]:
+            wavefront_parameters = create_wavefront_parameters(h_slit_points, v_slit_points)
+
+            for symmetry in [Symmetry.X, Symmetry.Y, Symmetry.XY]:
+                symmetric_mesh = SRWSymmetricMesh(create_source(), wavefront_parameters, symmetry)
+                reduced_wavefront_parameters = symmetric_mesh.get_reduced_wavefront_parameters()
+
+                self.assertLess(reduced_wavefront_parameters._h_slit_points*reduced_wavefront_parameters._v_slit_points, h_slit_points*v_slit_points)
+
+                # the reduced mesh is a part of the full one
+                h, v = symmetric_mesh.get_coordinates()
+                reduced_h = get_axis(reduced_wavefront_parameters._h_position, reduced_wavefront_parameters._h_slit_gap, reduced_wavefront_parameters._h_slit_points)
+                reduced_v = get_axis(reduced_wavefront_parameters._v_position, reduced_wavefront_parameters._v_slit_gap, reduced_wavefront_parameters._v_slit_points)
+
+                numpy.testing.assert_allclose(reduced_h, h[h.size - reduced_h.size:], atol=1e-15)
+                numpy.testing.assert_allclose(reduced_v, v[v.size - reduced_v.size:], atol=1e-15)
+
+                numpy.testing.assert_allclose(symmetric_mesh.mirror(get_data(reduced_wavefront_parameters)), get_data(wavefront_parameters), rtol=1e-10)
+
+                # energy as first axis
+                mirrored = symmetric_mesh.mirror(numpy.array([get_data(reduced_wavefront_parameters)]*2))
+                numpy.testing.assert_allclose(mirrored[1], get_data(wavefront_parameters), rtol=1e-10)
+
+                with self.assertRaises(ValueError): symmetric_mesh.mirror(get_data(wavefront_parameters))
+
+    def test_symmetric_mesh(self):
+        self.assertIsInstance(get_symmetric_mesh(1, create_source(), create_wavefront_parameters(101, 51)), SRWSymmetricMesh)
+        self.assertIsNone(get_symmetric_mesh(0, create_source(), create_wavefront_parameters(101, 51)))
+
+        # SRW resamples the mesh
+        self.assertIsNone(get_symmetric_mesh(1, create_source(), create_wavefront_parameters(101, 51, sampling_factor=1.0)))
+        self.assertIsNone(get_symmetric_mesh(2, create_source(), create_wavefront_parameters(101, 51, sampling_factor=1.0)))
+
+        # off axis
+        wavefront_parameters = create_wavefront_parameters(101, 51)
+        wavefront_parameters._h_position = 1e-4
+
+        self.assertIsNone(get_symmetric_mesh(1, create_source(), wavefront_parameters))
+
+        # a declared symmetry is ignored off axis, except along the axis that is not mirrored
+        for symmetry_index in [2, 3, 4]:
+            wavefront_parameters = create_wavefront_parameters(101, 51)
+            wavefront_parameters._h_position = 2e-4
+
+            if symmetry_index == 3: self.assertIsInstance(get_symmetric_mesh(symmetry_index, create_source(), wavefront_parameters), SRWSymmetricMesh)
+            else: self.assertIsNone(get_symmetric_mesh(symmetry_index, create_source(), wavefront_parameters))
+
+            wavefront_parameters = create_wavefront_parameters(101, 51)
+            wavefront_parameters._v_position = 1e-4
+
+            if symmetry_index == 4: self.assertIsInstance(get_symmetric_mesh(symmetry_index, create_source(), wavefront_parameters), SRWSymmetricMesh)
+            else: self.assertIsNone(get_symmetric_mesh(symmetry_index, create_source(), wavefront_parameters))
@@ -0,0 +1,157 @@
+import copy, multiprocessing
+
+import numpy
+
+from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import FluxPrecisionParameters
+
+import scipy.constants as codata
+
+m2ev = codata.c * codata.h / codata.e
+
+def get_gamma(electron_energy_in_GeV):
+    return 1e9*electron_energy_in_GeV / (codata.m_e *  codata.c**2 / codata.e)
+
+def get_K_from_magnetic_field(B, period_length):
+    return B /(2 * numpy.pi * codata.m_e * codata.c / (codata.e * period_length))
+
+def get_magnetic_field_from_gap(gap, period_length, a=3.694, b=-5.068, c=1.520):
+    '''
+    Peak field of a permanent magnet undulator: B = a exp(b (gap/period) + c (gap/period)^2)
+    (defaults: hybrid NdFeB, valid for 0.1 < gap/period < 1)
+    '''
+    gap_over_period = numpy.asarray(gap)/period_length
+
+    return a*numpy.exp(b*gap_over_period + c*gap_over_period**2)
+
+def get_resonance_energy(electron_energy_in_GeV, period_length, K_vertical, K_horizontal=0.0, harmonic=1, theta_x=0.0, theta_z=0.0):
+    '''
+    All the arguments can be arrays (broadcast by numpy)
+    '''
+    gamma = get_gamma(electron_energy_in_GeV)
+
+    wavelength = (period_length / (2.0*gamma **2)) * \
+                 (1 + numpy.asarray(K_vertical)**2 / 2.0 + numpy.asarray(K_horizontal)**2 / 2.0 + \
+                  gamma**2 * (theta_x**2 + theta_z ** 2))
+
+    wavelength = wavelength / harmonic
+
+    return m2ev/wavelength
+
+def get_K_vertical_from_resonance_energy(electron_energy_in_GeV, period_length, photon_energy, harmonic=1):
+    '''
+    K of a planar undulator with the given harmonic at the photon energy (nan if out of reach)
+    '''
+    wavelength = harmonic*m2ev/numpy.asarray(photon_energy)
+
+    with numpy.errstate(invalid="ignore"):
+        return numpy.sqrt(2 * (((wavelength * 2 * get_gamma(electron_energy_in_GeV) ** 2) / period_length) - 1))
+
+class SRWTuningCurveCalculator(object):
+    '''
+    Tuning curves of an undulator: for every harmonic and every K (vertical, the horizontal one is the one of the
+    source) the table contains the resonance energy, the peak flux through the aperture of the wavefront
+    parameters and the corresponding brilliance, with the photon source sizes and divergences of
+    get_photon_source_properties.
+
+    The resonance energies are calculated on the whole K x harmonics grid at once; the flux of every point is a
+    separate SRW calculation (get_undulator_flux on a narrow energy window below the harmonic energy, where the
+    peak is shifted by emittance and aperture), distributed on a pool of processes.
+
+    Without wavefront parameters the flux is not calculated, and flux and brilliance are nan.
+    '''
+    COLUMNS = ["Gap [m]", "K", "Harmonic", "Energy [eV]", "Flux [ph/s/0.1%bw]", "Brilliance [ph/s/0.1%bw/mm²/mrad²]"]
+
+    FLUX_WINDOW_POINTS = 41
+    FLUX_WINDOW = (2.0, 1.0) # (below, above) the harmonic energy, in units of the natural harmonic width E1/N
+
+    def __init__(self, srw_source, K_values, harmonics, wavefront_parameters=None, flux_precision_parameters=FluxPrecisionParameters(), gap_values=None, number_of_processes=None):
+        '''
+        :param K_values: array of vertical K
+        :param harmonics: array of harmonic numbers
+        :param wavefront_parameters: aperture (slit gaps, position, distance) for the flux
+        :param gap_values: array of the gaps corresponding to the K values, for the table only
+        :param number_of_processes: 1 = no pool, None or 0 = all the CPUs
+        '''
+        self.srw_source = srw_source
+        self.K_values = numpy.atleast_1d(numpy.asarray(K_values, dtype=float))
+        self.harmonics = numpy.atleast_1d(numpy.asarray(harmonics, dtype=int))
+        self.wavefront_parameters = wavefront_parameters
+        self.flux_precision_parameters = flux_precision_parameters
+        self.gap_values = numpy.full(self.K_values.size, numpy.nan) if gap_values is None else numpy.atleast_1d(numpy.asarray(gap_values, dtype=float))
+        self.number_of_processes = number_of_processes if not (number_of_processes is None or number_of_processes <= 0) else multiprocessing.cpu_count()
+
+        if self.gap_values.size != self.K_values.size: raise ValueError("Gap and K values have different sizes")
+
+    def run(self, progress_callback=None):
+        '''
+        :param progress_callback: called with (number of calculated points, number of points)
+        :return: table (points x COLUMNS), ordered by harmonic and K
+        '''
+        magnetic_structure = self.srw_source.get_magnetic_structure()
+
+        harmonics, K_values = numpy.meshgrid(self.harmonics, self.K_values, indexing="ij")
+        _, gap_values = numpy.meshgrid(self.harmonics, self.gap_values, indexing="ij")
+
+        table = numpy.full((K_values.size, len(self.COLUMNS)), numpy.nan)
+        table[:, 0] = gap_values.flatten()
+        table[:, 1] = K_values.flatten()
+        table[:, 2] = harmonics.flatten()
+        table[:, 3] = get_resonance_energy(self.srw_source.get_electron_beam()._energy_in_GeV,
+                                           magnetic_structure._period_length,
+                                           K_values,
+                                           magnetic_structure._K_horizontal,
+                                           harmonics).flatten()
+
+        if not self.wavefront_parameters is None:
+            tasks = [(self.__get_source(K), self.wavefront_parameters, self.flux_precision_parameters, int(harmonic), index)
+                     for index, (K, harmonic) in enumerate(zip(table[:, 1], table[:, 2]))]
+
+            if self.number_of_processes == 1:
+                self.__collect_flux(table, map(_calculate_peak_flux, tasks), progress_callback)
+            else:
+                with multiprocessing.Pool(processes=self.number_of_processes) as pool:
+                    self.__collect_flux(table, pool.imap_unordered(_calculate_peak_flux, tasks), progress_callback)
+
+        return table
+
+    def __collect_flux(self, table, results, progress_callback):
+        for completed, (index, flux, photon_source_properties) in enumerate(results):
+            table[index, 4] = flux
+            table[index, 5] = get_brilliance(flux, photon_source_properties)
+
+            if not progress_callback is None: progress_callback(completed + 1, table.shape[0])
+
+    def __get_source(self, K):
+        srw_source = copy.deepcopy(self.srw_source)
+        srw_source.get_magnetic_structure()._K_vertical = K
+
+        return srw_source
+
+def get_brilliance(flux, photon_source_properties):
+    '''
+    :param flux: ph/s/0.1%bw
+    :return: ph/s/0.1%bw/mm^2/mrad^2
+    '''
+    return flux / ((2*numpy.pi)**2 * 1e12 * photon_source_properties._rms_h * photon_source_properties._rms_v * \
+                                             photon_source_properties._rms_hp * photon_source_properties._rms_vp)
+
+def _calculate_peak_flux(task):
+    srw_source, wavefront_parameters, flux_precision_parameters, harmonic, index = task
+
+    resonance_energy = srw_source.get_resonance_energy()
+    harmonic_width   = resonance_energy/srw_source.get_magnetic_structure()._number_of_periods
+
+    flux_wavefront_parameters = copy.deepcopy(wavefront_parameters)
+    flux_wavefront_parameters._photon_energy_min = harmonic*resonance_energy - SRWTuningCurveCalculator.FLUX_WINDOW[0]*harmonic_width
+    flux_wavefront_parameters._photon_energy_max = harmonic*resonance_energy + SRWTuningCurveCalculator.FLUX_WINDOW[1]*harmonic_width
+    flux_wavefront_parameters._photon_energy_points = SRWTuningCurveCalculator.FLUX_WINDOW_POINTS
+
+    # the neighbouring harmonics are negligible in the window
+    harmonic_flux_precision_parameters = copy.deepcopy(flux_precision_parameters)
+    harmonic_flux_precision_parameters._initial_UR_harmonic = max(1, harmonic - 1)
+    harmonic_flux_precision_parameters._final_UR_harmonic = harmonic + 1
+    harmonic_flux_precision_parameters._calculation_type = 1
+
+    _, flux = srw_source.get_undulator_flux(source_wavefront_parameters=flux_wavefront_parameters, flux_precision_parameters=harmonic_flux_precision_parameters)
+
+    return index, numpy.max(flux), srw_source.get_photon_source_properties(harmonic=harmonic)
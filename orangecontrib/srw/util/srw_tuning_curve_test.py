@@ -0,0 +1,89 @@
+"""
+
+test of the tuning curves: the vectorized resonance energies and K must be the ones of the light source, and the
+table without wavefront parameters (no flux calculation) must be ordered by harmonic and K
+
+"""
+
+import unittest
+import numpy
+
+from wofrysrw.storage_ring.srw_electron_beam import SRWElectronBeam
+from wofrysrw.storage_ring.magnetic_structures.srw_undulator import SRWUndulator
+from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUndulatorLightSource
+
+from srw_tuning_curve import SRWTuningCurveCalculator, get_resonance_energy, get_K_vertical_from_resonance_energy, get_K_from_magnetic_field
+
+ELECTRON_ENERGY = 6.0
+PERIOD_LENGTH = 0.02
+
+def create_light_source(K_vertical=1.5, K_horizontal=0.0):
+    electron_beam = SRWElectronBeam(energy_in_GeV=ELECTRON_ENERGY, current=0.2, moment_xx=(10e-6)**2, moment_xpxp=(1e-6)**2, moment_yy=(2e-6)**2, moment_ypyp=(0.5e-6)**2)
+
+    return SRWUndulatorLightSource(electron_beam=electron_beam,
+                                   undulator_magnetic_structure=SRWUndulator(K_vertical=K_vertical, K_horizontal=K_horizontal, period_length=PERIOD_LENGTH, number_of_periods=100))
+
+class SRWTuningCurveTest(unittest.TestCase):
+
+    def test_resonance_energy(self):
+        K_values = numpy.array([0.5, 1.0, 1.5, 2.0])
+
+        for K_horizontal in [0.0, 0.7]:
+            expected = [create_light_source(K, K_horizontal).get_resonance_energy() for K in K_values]
+
+            numpy.testing.assert_allclose(get_resonance_energy(ELECTRON_ENERGY, PERIOD_LENGTH, K_values, K_horizontal), expected, rtol=1e-10)
+
+        # harmonics, broadcast
+        numpy.testing.assert_allclose(get_resonance_energy(ELECTRON_ENERGY, PERIOD_LENGTH, 1.5, harmonic=numpy.array([1, 3, 5])),
+                                      numpy.array([1, 3, 5])*create_light_source(1.5).get_resonance_energy(), rtol=1e-10)
+
+    def test_K_from_resonance_energy(self):
+        for K in [0.5, 1.0, 1.5, 2.0]:
+            resonance_energy = create_light_source(K).get_resonance_energy()
+
+            self.assertAlmostEqual(float(get_K_vertical_from_resonance_energy(ELECTRON_ENERGY, PERIOD_LENGTH, resonance_energy)), K, places=10)
+            self.assertAlmostEqual(float(get_K_vertical_from_resonance_energy(ELECTRON_ENERGY, PERIOD_LENGTH, 3*resonance_energy, harmonic=3)), K, places=10)
+
+        # above the energy with K=0
+        self.assertTrue(numpy.isnan(get_K_vertical_from_resonance_energy(ELECTRON_ENERGY, PERIOD_LENGTH, 2*create_light_source(0.0).get_resonance_energy())))
+
+    def test_K_from_magnetic_field(self):
+        undulator = create_light_source().get_magnetic_structure()
+
+        for B in [0.2, 0.8, 1.1]:
+            undulator.set_K_vertical_from_magnetic_field(B)
+
+            self.assertAlmostEqual(get_K_from_magnetic_field(B, PERIOD_LENGTH), undulator.K_vertical(), places=12)
+
+        K_values = get_K_from_magnetic_field(numpy.array([0.2, 0.8, 1.1]), PERIOD_LENGTH)
+
+        numpy.testing.assert_allclose(get_resonance_energy(ELECTRON_ENERGY, PERIOD_LENGTH, K_values),
+                                      [create_light_source(K).get_resonance_energy() for K in K_values], rtol=1e-10)
+
+    def test_table(self):
+        K_values = [0.5, 1.0, 1.5]
+        gap_values = [0.015, 0.010, 0.007]
+        harmonics = [1, 3]
+
+        light_source = create_light_source(K_horizontal=0.3)
+        table = SRWTuningCurveCalculator(light_source, K_values, harmonics, gap_values=gap_values, number_of_processes=1).run()
+
+        self.assertEqual(table.shape, (6, len(SRWTuningCurveCalculator.COLUMNS)))
+
+        # ordered by harmonic, then K
+        numpy.testing.assert_array_equal(table[:, 2], [1, 1, 1, 3, 3, 3])
+        numpy.testing.assert_array_equal(table[:, 1], K_values*2)
+        numpy.testing.assert_array_equal(table[:, 0], gap_values*2)
+
+        numpy.testing.assert_allclose(table[:, 3], [harmonic*create_light_source(K, 0.3).get_resonance_energy() for harmonic in harmonics for K in K_values], rtol=1e-10)
+
+        # no flux without wavefront parameters
+        self.assertTrue(numpy.all(numpy.isnan(table[:, 4:])))
+
+        # the source is unchanged
+        self.assertEqual(light_source.get_magnetic_structure().K_vertical(), 1.5)
+
+        # without gaps
+        numpy.testing.assert_array_equal(SRWTuningCurveCalculator(light_source, K_values, harmonics, number_of_processes=1).run()[:, 0], numpy.full(6, numpy.nan))
+
+        with self.assertRaises(ValueError): SRWTuningCurveCalculator(light_source, K_values, harmonics, gap_values=[0.01])
@@ -2,20 +2,12 @@ import numpy, decimal
 from PyQt5.QtGui import QFont, QPalette, QColor
 from PyQt5.QtWidgets import QWidget, QGridLayout, QLabel, QDialog, QVBoxLayout, QDialogButtonBox
 
-from matplotlib import cm
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-from matplotlib.figure import Figure
-from matplotlib.patches import FancyArrowPatch, ArrowStyle
-try:
-    from mpl_toolkits.mplot3d import Axes3D  # necessario per caricare i plot 3D
-except:
-    pass
+# matplotlib, silx and srxraylib are imported where they are used: importing this module at the OASYS startup does not load them
 
 from oasys.widgets import gui
-from srxraylib.metrology import profiles_simulation
-from silx.gui.plot.ImageView import ImageView, PlotWindow
 
-import matplotlib
+from orangecontrib.srw.util import srw_file_cache
+from orangecontrib.srw.util.srw_spectrum import is_uniform_grid
 
 class SRWStatisticData:
     def __init__(self, total = 0.0):
@@ -45,6 +37,8 @@ class SRWPlot:
 
     _is_conversione_active = True
 
+    MINIMUM_CANVAS_SIZE = 600 # pixels: images are not downsampled below it, the canvas can be still hidden
+
     #########################################################################################
     #
     # FOR TEMPORARY USE: FIX AN ERROR IN PYMCA.PLOT.IMAGEWIEW
@@ -155,6 +149,7 @@ class SRWPlot:
             self.setLayout(layout)
 
         def plot_1D(self, ticket, col, title, xtitle, ytitle, xum="", xrange=None, use_default_factor=True):
+            from matplotlib.patches import FancyArrowPatch, ArrowStyle
 
             if use_default_factor:
                 factor = SRWPlot.get_factor(col)
@@ -205,7 +200,7 @@ class SRWPlot:
 
             self.plot_canvas.replot()
 
-            self.info_box.total.setText("{:.2e}".format(decimal.Decimal(ticket['total'])))
+            self.info_box.total.setText("" if ticket['total'] is None else "{:.2e}".format(decimal.Decimal(ticket['total'])))
             self.info_box.fwhm_h.setText("{:5.4f}".format(ticket['fwhm']*factor))
             self.info_box.label_h.setText("FWHM " + xum)
 
@@ -217,6 +212,8 @@ class SRWPlot:
         def __init__(self, x_scale_factor = 1.0, y_scale_factor = 1.0):
             super(SRWPlot.Detailed2DWidget, self).__init__()
 
+            from silx.gui.plot.ImageView import ImageView
+
             self.x_scale_factor = x_scale_factor
             self.y_scale_factor = y_scale_factor
 
@@ -239,6 +236,8 @@ class SRWPlot:
             self.setLayout(layout)
 
         def plot_2D(self, ticket, var_x, var_y, title, xtitle, ytitle, xum="", yum="", plotting_range=None, use_default_factor=True):
+            import matplotlib
+            from matplotlib.patches import FancyArrowPatch, ArrowStyle
 
             matplotlib.rcParams['axes.formatter.useoffset']='False'
 
@@ -249,47 +248,17 @@ class SRWPlot:
                 factor1 = 1.0
                 factor2 = 1.0
 
-            if plotting_range == None:
-                xx = ticket['bin_h']
-                yy = ticket['bin_v']
-
-                nbins_h = ticket['nbins_h']
-                nbins_v = ticket['nbins_v']
-
-                histogram = ticket['histogram']
-            else:
-                range_x  = numpy.where(numpy.logical_and(ticket['bin_h']>=plotting_range[0], ticket['bin_h']<=plotting_range[1]))
-                range_y  = numpy.where(numpy.logical_and(ticket['bin_v']>=plotting_range[2], ticket['bin_v']<=plotting_range[3]))
-
-                xx = ticket['bin_h'][range_x]
-                yy = ticket['bin_v'][range_y]
-
-                histogram = []
-                for row in ticket['histogram'][range_x]:
-                    histogram.append(row[range_y])
-
-                nbins_h = len(xx)
-                nbins_v = len(yy)
-
-            if len(xx) == 0 or len(yy) == 0:
-                raise Exception("Nothing to plot in the given range")
+            xx, yy, data_to_plot, steps = SRWPlot.get_image_to_plot(ticket,
+                                                                    plotting_range=plotting_range,
+                                                                    canvas_size=(self.plot_canvas.width(), self.plot_canvas.height()))
 
             xmin, xmax = xx.min(), xx.max()
             ymin, ymax = yy.min(), yy.max()
 
             origin = (xmin*factor1, ymin*factor2)
-            scale = (abs((xmax-xmin)/nbins_h)*factor1, abs((ymax-ymin)/nbins_v)*factor2)
-
-            # PyMCA inverts axis!!!! histogram must be calculated reversed
-            data_to_plot = []
-            for y_index in range(0, nbins_v):
-                x_values = []
-                for x_index in range(0, nbins_h):
-                    x_values.append(histogram[x_index][y_index])
-
-                data_to_plot.append(x_values)
+            scale = (abs((xmax-xmin)/len(xx))*factor1*steps[0], abs((ymax-ymin)/len(yy))*factor2*steps[1])
 
-            self.plot_canvas.setImage(numpy.array(data_to_plot), origin=origin, scale=scale)
+            self.plot_canvas.setImage(data_to_plot, origin=origin, scale=scale)
 
             if xtitle is None: xtitle=SRWPlot.get_SRW_label(var_x)
             if ytitle is None: ytitle=SRWPlot.get_SRW_label(var_y)
@@ -409,17 +378,61 @@ class SRWPlot:
         ticket['histogram'] = h
         ticket['bins'] = bins
         ticket['xrange'] = xrange
-        ticket['total'] = numpy.sum(h)
+        ticket['total'] = numpy.sum(h) if is_uniform_grid(bins) else None # the sum of a non uniform sampling is meaningless
         ticket['fwhm'] = None
 
         tt = numpy.where(h>=max(h)*0.5)
         if h[tt].size > 1:
-            binSize = bins[1]-bins[0]
-            ticket['fwhm'] = binSize*(tt[0][-1]-tt[0][0])
+            ticket['fwhm'] = bins[tt[0][-1]]-bins[tt[0][0]] # also for non uniform bins
             ticket['fwhm_coordinates'] = (bins[tt[0][0]], bins[tt[0][-1]])
 
         return ticket
 
+    @classmethod
+    def get_image_to_plot(cls, ticket, plotting_range=None, canvas_size=None):
+        """
+        :return: bins h and v in the plotting range, the histogram transposed to [v, h] (PyMCA inverts axis),
+                 downsampled for display by powers of 2 when larger than the canvas, and the downsampling steps (h, v)
+        """
+        xx = ticket['bin_h']
+        yy = ticket['bin_v']
+        histogram = numpy.asarray(ticket['histogram'])
+
+        if not plotting_range is None:
+            range_x = cls.get_range_slice(xx, plotting_range[0], plotting_range[1])
+            range_y = cls.get_range_slice(yy, plotting_range[2], plotting_range[3])
+
+            xx = xx[range_x]
+            yy = yy[range_y]
+            histogram = histogram[range_x, range_y]
+
+        if len(xx) == 0 or len(yy) == 0:
+            raise Exception("Nothing to plot in the given range")
+
+        data_to_plot = histogram.T
+
+        step_x = step_y = 1
+
+        if not canvas_size is None:
+            canvas_width, canvas_height = max(canvas_size[0], cls.MINIMUM_CANVAS_SIZE), max(canvas_size[1], cls.MINIMUM_CANVAS_SIZE)
+
+            while len(xx)//(2*step_x) >= canvas_width: step_x *= 2
+            while len(yy)//(2*step_y) >= canvas_height: step_y *= 2
+
+            if step_x > 1 or step_y > 1:
+                n_v, n_h = data_to_plot.shape[0]//step_y, data_to_plot.shape[1]//step_x
+
+                data_to_plot = data_to_plot[:n_v*step_y, :n_h*step_x].reshape(n_v, step_y, n_h, step_x).mean(axis=(1, 3))
+
+        return xx, yy, numpy.ascontiguousarray(data_to_plot), (step_x, step_y)
+
+    @classmethod
+    def get_range_slice(cls, bins, min_value, max_value):
+        indexes = numpy.where(numpy.logical_and(bins >= min_value, bins <= max_value))[0]
+
+        if len(indexes) == 0: return slice(0, 0)
+        else: return slice(indexes[0], indexes[-1] + 1) # bins are monotonic
+
     @classmethod
     def get_ticket_2D(cls, x_array, y_array, z_array):
         ticket = {'error':0}
@@ -475,6 +488,15 @@ class ShowErrorProfileDialog(QDialog):
         layout = QVBoxLayout(self)
 
         if dimension == 2:
+            from matplotlib import cm
+            from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+            from matplotlib.figure import Figure
+            from srxraylib.metrology import profiles_simulation
+            try:
+                from mpl_toolkits.mplot3d import Axes3D  # necessario per caricare i plot 3D
+            except:
+                pass
+
             figure = Figure(figsize=(100, 100))
             figure.patch.set_facecolor('white')
 
@@ -547,57 +569,52 @@ class ShowErrorProfileDialog(QDialog):
 # and first row the "transverse" position [m], and _height_prof_data[0][0] is not used;
 # otherwise the "longitudinal" and "transverse" positions on the surface are assumed to be given by _ar_height_prof_x, _ar_height_prof_y
 
-def write_error_profile_file(zz, xx, yy, output_file, separator = '\t'):
-    buffer = open(output_file, 'w')
-
-    # first row: x positions
-
-    first_row = "0"
-    for x_pos in xx:
-        first_row += separator + str(x_pos)
-
-    first_row += "\n"
+def write_error_profile_file(zz, xx, yy, output_file, separator = '\t', write_sidecar=False):
+    with open(output_file, 'w') as buffer:
+        # first row: x positions
+        buffer.write(separator.join(["0"] + _to_strings(xx)) + "\n")
 
-    buffer.write(first_row)
+        # next rows: y pos + z
+        zz = numpy.asarray(zz)
 
-    # next rows: y pos + z
-    for y_index in range(len(yy)):
-        row =  str(yy[y_index])
+        for y_pos, z_row in zip(_to_strings(yy), zz):
+            buffer.write(separator.join([y_pos] + _to_strings(z_row)) + "\n")
 
-        for x_index in range(len(xx)):
-            row += separator + str(zz[y_index, x_index])
+    if write_sidecar:
+        data = numpy.zeros((len(yy) + 1, len(xx) + 1))
+        data[0, 1:] = xx
+        data[1:, 0] = yy
+        data[1:, 1:] = zz
 
-        row += "\n"
+        srw_file_cache.write_cache(output_file, data)
 
-        buffer.write(row)
+def _to_strings(values):
+    values = numpy.asarray(values)
 
-    buffer.close()
+    # str() of numpy float64 and python float are the same, not for other types
+    return list(map(str, values.tolist() if values.dtype == numpy.float64 else values))
 
 from oasys.widgets import congruence
 
-def read_error_profile_file(file_name, separator = '\t', dimension=2):
+def read_error_profile_file(file_name, separator = '\t', dimension=2, use_sidecar=False):
     if dimension == 2:
-        rows = open(congruence.checkFile(file_name), "r").readlines()
+        congruence.checkFile(file_name)
 
-        # first row: x positions
+        # a memory mapped binary copy of the file (see srw_file_cache)
+        data = srw_file_cache.load_cache(file_name) if use_sidecar else None
 
-        x_pos = rows[0].split(separator)
-        n_x = len(x_pos)-1
-        n_y = len(rows)-1
+        if data is None:
+            file_stamp = srw_file_cache.get_file_stamp(file_name)
 
-        x_coords = numpy.zeros(n_x)
-        y_coords = numpy.zeros(n_y)
-        z_values = numpy.zeros((n_x, n_y))
+            data = numpy.loadtxt(file_name, delimiter=separator, ndmin=2)
 
-        for i_x in range(n_x):
-            x_coords[i_x] = float(x_pos[i_x+1])
+            if use_sidecar: srw_file_cache.write_cache(file_name, data, file_stamp)
 
-        for i_y in range(n_y):
-            data = rows[i_y+1].split(separator)
-            y_coords[i_y] = float(data[0])
+        # first row: x positions, first column: y positions
 
-            for i_x in range(n_x):
-                z_values[i_x, i_y] = float(data[i_x+1])
+        x_coords = numpy.array(data[0, 1:])
+        y_coords = numpy.array(data[1:, 0])
+        z_values = data[1:, 1:].T
 
         return x_coords, y_coords, z_values
     else:
@@ -608,6 +625,40 @@ def read_error_profile_file(file_name, separator = '\t', dimension=2):
 
         return x_coords, z_values
 
+#
+# Reflectivity data file: one value per row, real and imaginary (0.0) parts of the reflectivity interleaved,
+# the photon energy running faster than the grazing angle, and the components (sigma, pi) one after the other
+#
+
+def get_reflectivity_data(components):
+    return _to_reflectivity_array(numpy.concatenate([_interleave_reflectivity_component(component) for component in components]))
+
+def write_reflectivity_data_file(file_name, components, chunk_size=100000):
+    with open(file_name, "w") as file:
+        for index, component in enumerate(components):
+            values = numpy.asarray(component, dtype=float).ravel()
+
+            for start in range(0, len(values), chunk_size):
+                if index > 0 or start > 0: file.write("\n")
+
+                file.write("\n0.0\n".join(map(str, values[start:start + chunk_size].tolist())) + "\n0.0")
+
+def read_reflectivity_data_file(file_name):
+    return _to_reflectivity_array(numpy.loadtxt(congruence.checkFile(file_name), ndmin=1))
+
+def _interleave_reflectivity_component(component):
+    values = numpy.asarray(component, dtype=float).ravel()
+
+    return numpy.stack((values, numpy.zeros_like(values)), axis=1).ravel()
+
+def _to_reflectivity_array(values):
+    from array import array
+
+    reflectivity_data = array('d')
+    reflectivity_data.frombytes(numpy.ascontiguousarray(values, dtype=numpy.float64).tobytes())
+
+    return reflectivity_data
+
 ###############################################################
 #
 # MESSAGING
@@ -646,6 +697,8 @@ def showCriticalMessage(message, parent=None):
 from PyQt5.QtWidgets import QApplication
 
 if __name__=="__main__":
+    from silx.gui.plot.ImageView import ImageView
+
     print(SRWPlot.get_SRW_label(1))
     print(SRWPlot.get_SRW_label(2))
     print(SRWPlot.get_SRW_label(3))
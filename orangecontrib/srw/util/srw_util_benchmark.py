@@ -0,0 +1,108 @@
+"""
+
+benchmark of the error profile I/O of srw_util on a synthetic surface:
+ - loop-based writer/reader (as before the vectorization, kept here as a reference)
+ - vectorized text writer/reader
+ - memory-mapped .npy sidecar
+
+usage: python srw_util_benchmark.py [points along x, e.g. 500] [points along y, e.g. 5000]
+
+"""
+
+import os
+import sys
+import time
+import tempfile
+import numpy
+
+from orangecontrib.srw.util import srw_util
+
+def write_error_profile_file_loop(zz, xx, yy, output_file, separator = '\t'):
+    buffer = open(output_file, 'w')
+
+    first_row = "0"
+    for x_pos in xx:
+        first_row += separator + str(x_pos)
+
+    first_row += "\n"
+
+    buffer.write(first_row)
+
+    for y_index in range(len(yy)):
+        row =  str(yy[y_index])
+
+        for x_index in range(len(xx)):
+            row += separator + str(zz[y_index, x_index])
+
+        row += "\n"
+
+        buffer.write(row)
+
+    buffer.close()
+
+def read_error_profile_file_loop(file_name, separator = '\t'):
+    rows = open(file_name, "r").readlines()
+
+    x_pos = rows[0].split(separator)
+    n_x = len(x_pos)-1
+    n_y = len(rows)-1
+
+    x_coords = numpy.zeros(n_x)
+    y_coords = numpy.zeros(n_y)
+    z_values = numpy.zeros((n_x, n_y))
+
+    for i_x in range(n_x):
+        x_coords[i_x] = float(x_pos[i_x+1])
+
+    for i_y in range(n_y):
+        data = rows[i_y+1].split(separator)
+        y_coords[i_y] = float(data[0])
+
+        for i_x in range(n_x):
+            z_values[i_x, i_y] = float(data[i_x+1])
+
+    return x_coords, y_coords, z_values
+
+def timeit(function, *args, **kwargs):
+    t0 = time.time()
+    result = function(*args, **kwargs)
+    return result, time.time() - t0
+
+def benchmark_error_profile(n_x, n_y):
+    print("\n#\n# error profile: %d x %d synthetic surface\n#\n" % (n_x, n_y))
+
+    directory = tempfile.mkdtemp()
+    file_loop = os.path.join(directory, "loop.dat")
+    file_new  = os.path.join(directory, "vectorized.dat")
+
+    xx = numpy.linspace(-0.01, 0.01, n_x)
+    yy = numpy.linspace(-0.5, 0.5, n_y)
+    zz = numpy.random.normal(0.0, 1e-9, (n_y, n_x))
+
+    _, t_write_loop = timeit(write_error_profile_file_loop, zz, xx, yy, file_loop)
+    _, t_write_new  = timeit(srw_util.write_error_profile_file, zz, xx, yy, file_new)
+
+    assert open(file_loop).read() == open(file_new).read()
+
+    data_loop,    t_read_loop    = timeit(read_error_profile_file_loop, file_loop)
+    data_new,     t_read_new     = timeit(srw_util.read_error_profile_file, file_new, use_sidecar=False)
+    _,            t_read_first   = timeit(srw_util.read_error_profile_file, file_new, use_sidecar=True)
+    data_sidecar, t_read_sidecar = timeit(srw_util.read_error_profile_file, file_new, use_sidecar=True)
+
+    for loop, new, sidecar in zip(data_loop, data_new, data_sidecar):
+        numpy.testing.assert_array_equal(new, loop)
+        numpy.testing.assert_array_equal(sidecar, loop)
+
+    print("   write, loop:                  %10.4f s" % t_write_loop)
+    print("   write, vectorized:            %10.4f s" % t_write_new)
+    print("   read, loop:                   %10.4f s" % t_read_loop)
+    print("   read, vectorized:             %10.4f s" % t_read_new)
+    print("   read, parse + sidecar:        %10.4f s" % t_read_first)
+    print("   read, memory-mapped sidecar:  %10.4f s" % t_read_sidecar)
+
+    for file_name in os.listdir(directory): os.remove(os.path.join(directory, file_name))
+    os.rmdir(directory)
+
+if __name__ == "__main__":
+    benchmark_error_profile(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+                            int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
@@ -0,0 +1,136 @@
+import multiprocessing, traceback
+
+from PyQt5.QtCore import QObject, QTimer
+
+def _run_task(connection, function, args, report_progress):
+    try:
+        if report_progress:
+            result = ("result", function(*args, progress_callback=lambda progress: connection.send(("progress", progress))))
+        else:
+            result = ("result", function(*args))
+    except Exception as exception:
+        traceback.print_exc()
+        result = ("error", exception)
+
+    try:
+        connection.send(result)
+    except Exception:
+        # result or exception not picklable
+        connection.send(("error", Exception(str(result[1]))))
+    finally:
+        connection.close()
+
+class SRWCalculationWorker(QObject):
+    '''
+    Runs SRW calculations out of the GUI thread.
+
+    SRW holds the GIL for the whole duration of its C calls, so a thread would still freeze the
+    event loop: each calculation runs in a separate process, whose progress and result are collected
+    by polling a pipe from a QTimer. Submitting while a calculation is running replaces the pending
+    request, so that only the most recent one is executed when the running one is over.
+    '''
+    POLLING_INTERVAL = 100 # ms
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self.__process = None
+        self.__connection = None
+        self.__callbacks = None
+        self.__pending = None
+
+        self.__timer = QTimer(self)
+        self.__timer.setInterval(self.POLLING_INTERVAL)
+        self.__timer.timeout.connect(self.__poll)
+
+    def is_running(self):
+        return not self.__process is None
+
+    def submit(self, function, args, on_result, on_error, on_progress=None, synchronous=False):
+        '''
+        :param function: module level function, to be pickled and executed in the child process
+        :param args: tuple of picklable arguments
+        :param on_result: called in the GUI thread with the returned value
+        :param on_error: called in the GUI thread with the raised exception
+        :param on_progress: called in the GUI thread with the progress (0 to 1) reported by the function,
+                            that receives a progress_callback keyword argument
+        :param synchronous: run in the calling thread (for debugging)
+        '''
+        if synchronous:
+            try:
+                if on_progress is None: result = function(*args)
+                else: result = function(*args, progress_callback=on_progress)
+            except Exception as exception:
+                on_error(exception)
+            else:
+                on_result(result)
+        elif self.is_running():
+            self.__pending = (function, args, on_result, on_error, on_progress)
+        else:
+            self.__start(function, args, on_result, on_error, on_progress)
+
+    def cancel(self):
+        self.__pending = None
+
+        if self.is_running():
+            self.__process.terminate()
+            self.__process.join()
+            self.__cleanup()
+
+            return True
+
+        return False
+
+    def __start(self, function, args, on_result, on_error, on_progress):
+        parent_connection, child_connection = multiprocessing.Pipe(duplex=False)
+
+        self.__process = multiprocessing.Process(target=_run_task, args=(child_connection, function, args, not on_progress is None), daemon=True)
+        self.__connection = parent_connection
+        self.__callbacks = (on_result, on_error, on_progress)
+
+        self.__process.start()
+        child_connection.close()
+
+        self.__timer.start()
+
+    def __cleanup(self):
+        self.__timer.stop()
+        self.__connection.close()
+
+        self.__process = None
+        self.__connection = None
+        self.__callbacks = None
+
+    def __poll(self):
+        message = None
+
+        while message is None and self.__connection.poll():
+            try:
+                message = self.__connection.recv()
+            except EOFError:
+                message = ("error", Exception("Calculation process terminated unexpectedly"))
+
+            if message[0] == "progress":
+                on_progress = self.__callbacks[2]
+                if not (on_progress is None or not self.__pending is None): on_progress(message[1])
+
+                message = None
+
+        if message is None:
+            if self.__process.is_alive() or self.__connection.poll(): return # still running, or result arrived in the meantime
+
+            message = ("error", Exception("Calculation process terminated unexpectedly (exit code " + str(self.__process.exitcode) + ")"))
+
+        self.__process.join()
+        on_result, on_error, _ = self.__callbacks
+        self.__cleanup()
+
+        if not self.__pending is None:
+            # the result is already obsolete
+            function, args, on_result, on_error, on_progress = self.__pending
+            self.__pending = None
+            self.__start(function, args, on_result, on_error, on_progress)
+        elif message[0] == "result":
+            on_result(message[1])
+        else:
+            on_error(message[1])
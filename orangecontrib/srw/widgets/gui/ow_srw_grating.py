@@ -1,5 +1,3 @@
-import numpy
-
 from PyQt5.QtWidgets import QMessageBox
 
 from orangewidget import gui
@@ -11,6 +9,7 @@ from oasys.util.oasys_util import TriggerOut
 from syned.beamline.optical_elements.gratings.grating import Grating
 from syned.widget.widget_decorator import WidgetDecorator
 
+from orangecontrib.srw.util import srw_builders
 from orangecontrib.srw.widgets.gui.ow_srw_optical_element import OWSRWOpticalElement
 from orangecontrib.srw.util.srw_util import ShowErrorProfileDialog
 from orangecontrib.srw.util.srw_objects import SRWData, SRWPreProcessorData, SRWErrorProfileData
@@ -115,41 +114,12 @@ class OWSRWGrating(OWSRWOpticalElement):
         self.height_profile_box_2.setVisible(self.has_height_profile==1)
 
     def get_optical_element(self):
-        grating = self.get_grating_instance()
-
-        grating.tangential_size=self.tangential_size
-        grating.sagittal_size=self.sagittal_size
-        grating.grazing_angle=numpy.radians(90-self.angle_radial)
-        grating.orientation_of_reflection_plane=self.orientation_azimuthal
-        grating.invert_tangent_component = self.invert_tangent_component == 1
-        grating.add_acceptance_slit=self.add_acceptance_slit == 1
-        grating.height_profile_data_file=self.height_profile_data_file if self.has_height_profile else None
-        grating.height_profile_data_file_dimension=self.height_profile_data_file_dimension + 1
-        grating.height_amplification_coefficient=self.height_amplification_coefficient
-        grating.diffraction_order=self.diffraction_order
-        grating.grooving_density_0=self.grooving_density_0
-        grating.grooving_density_1=self.grooving_density_1
-        grating.grooving_density_2=self.grooving_density_2
-        grating.grooving_density_3=self.grooving_density_3
-        grating.grooving_density_4=self.grooving_density_4
-        grating.grooving_angle=numpy.radians(self.grooving_angle)
-
-        return grating
+        return srw_builders.set_grating_parameters(self, self.get_grating_instance())
 
     def set_additional_parameters(self, beamline_element, propagation_parameters, beamline):
         grating = beamline.get_beamline_element_at(-1).get_optical_element()
 
-        orientation_of_the_output_optical_axis_vector_x, \
-        orientation_of_the_output_optical_axis_vector_y, \
-        orientation_of_the_output_optical_axis_vector_z, \
-        orientation_of_the_horizontal_base_vector_x    , \
-        orientation_of_the_horizontal_base_vector_y     = grating.get_output_orientation_vectors(self.input_srw_data.get_srw_wavefront().get_photon_energy())
-
-        self.oe_orientation_of_the_output_optical_axis_vector_x = round(orientation_of_the_output_optical_axis_vector_x, 8)
-        self.oe_orientation_of_the_output_optical_axis_vector_y = round(orientation_of_the_output_optical_axis_vector_y, 8)
-        self.oe_orientation_of_the_output_optical_axis_vector_z = round(orientation_of_the_output_optical_axis_vector_z, 8)
-        self.oe_orientation_of_the_horizontal_base_vector_x     = round(orientation_of_the_horizontal_base_vector_x, 8)
-        self.oe_orientation_of_the_horizontal_base_vector_y     = round(orientation_of_the_horizontal_base_vector_y, 8)
+        srw_builders.set_grating_orientation_vectors(self, grating, self.input_srw_data.get_srw_wavefront().get_photon_energy())
 
         super(OWSRWGrating, self).set_additional_parameters(beamline_element, propagation_parameters, beamline)
 
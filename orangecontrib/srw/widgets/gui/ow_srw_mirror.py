@@ -1,5 +1,3 @@
-import numpy
-
 from PyQt5.QtWidgets import QMessageBox
 
 from orangewidget import gui
@@ -12,9 +10,10 @@ from syned.beamline.optical_elements.mirrors.mirror import Mirror
 from syned.widget.widget_decorator import WidgetDecorator
 from wofrysrw.beamline.optical_elements.mirrors.srw_mirror import ScaleType
 
+from orangecontrib.srw.util import srw_builders
 from orangecontrib.srw.util.srw_objects import SRWData, SRWPreProcessorData, SRWErrorProfileData, SRWReflectivityData
 from orangecontrib.srw.widgets.gui.ow_srw_optical_element import OWSRWOpticalElement
-from orangecontrib.srw.util.srw_util import ShowErrorProfileDialog
+from orangecontrib.srw.util.srw_util import ShowErrorProfileDialog, read_reflectivity_data_file
 
 class OWSRWMirror(OWSRWOpticalElement):
 
@@ -47,6 +46,8 @@ class OWSRWMirror(OWSRWOpticalElement):
     reflectivity_angle_end = Setting(0.005)
     reflectivity_angle_scale_type = Setting(0)
 
+    in_memory_reflectivity = None # (reflectivity data file, reflectivity data) received with the preprocessor data
+
     inputs = [("SRWData", SRWData, "set_input"),
               ("Trigger", TriggerOut, "propagate_new_wavefront"),
               ("PreProcessor Data #1", SRWPreProcessorData, "setPreProcessorData"),
@@ -177,39 +178,15 @@ class OWSRWMirror(OWSRWOpticalElement):
         self.reflectivity_box_3.setVisible(self.has_reflectivity==2)
 
     def get_optical_element(self):
-        
-        mirror = self.get_mirror_instance()
-
-        mirror.tangential_size=self.tangential_size
-        mirror.sagittal_size=self.sagittal_size
-        mirror.grazing_angle=numpy.radians(90-self.angle_radial)
-        mirror.orientation_of_reflection_plane=self.orientation_azimuthal
-        mirror.invert_tangent_component = self.invert_tangent_component == 1
-        mirror.add_acceptance_slit=self.add_acceptance_slit == 1
-        mirror.height_profile_data_file=self.height_profile_data_file if self.has_height_profile else None
-        mirror.height_profile_data_file_dimension=self.height_profile_data_file_dimension + 1
-        mirror.height_amplification_coefficient=self.height_amplification_coefficient
-
-        if self.has_reflectivity == 1:
-            mirror.set_reflectivity(reflectivity_data=self.reflectivity_value)
-        elif self.has_reflectivity == 2:
-            mirror.set_reflectivity(reflectivity_data=self.read_reflectivity_data_file(),
-                                    energies_number=self.reflectivity_energies_number,
-                                    angles_number=self.reflectivity_angles_number,
-                                    components_number=self.reflectivity_components_number + 1,
-                                    energy_start=self.reflectivity_energy_start,
-                                    energy_end=self.reflectivity_energy_end,
-                                    energy_scale_type=ScaleType.LINEAR if self.reflectivity_energy_scale_type==0 else ScaleType.LOGARITHMIC,
-                                    angle_start=self.reflectivity_angle_start,
-                                    angle_end=self.reflectivity_angle_end,
-                                    angle_scale_type=ScaleType.LINEAR if self.reflectivity_angle_scale_type==0 else ScaleType.LOGARITHMIC)
-
-        return mirror
-
-
+        return srw_builders.set_mirror_parameters(self, self.get_mirror_instance(),
+                                                  reflectivity_data=self.read_reflectivity_data_file() if self.has_reflectivity == 2 else None)
 
     def read_reflectivity_data_file(self):
-        return numpy.loadtxt(self.reflectivity_data_file).tolist()
+        # data received in memory with the preprocessor data are used while the file is not changed
+        if not self.in_memory_reflectivity is None and self.in_memory_reflectivity[0] == self.reflectivity_data_file:
+            return self.in_memory_reflectivity[1]
+        else:
+            return read_reflectivity_data_file(self.reflectivity_data_file)
 
     def get_mirror_instance(self):
         raise NotImplementedError()
@@ -292,6 +269,8 @@ class OWSRWMirror(OWSRWOpticalElement):
                     if data.reflectivity_data.reflectivity_data_file != SRWReflectivityData.NONE:
                         self.has_reflectivity=2
                         self.reflectivity_data_file=data.reflectivity_data.reflectivity_data_file
+                        self.in_memory_reflectivity = None if data.reflectivity_data.reflectivity_data is None else \
+                                                      (data.reflectivity_data.reflectivity_data_file, data.reflectivity_data.reflectivity_data)
                         self.reflectivity_energies_number=data.reflectivity_data.energies_number
                         self.reflectivity_angles_number=data.reflectivity_data.angles_number
                         self.reflectivity_components_number=data.reflectivity_data.components_number-1
@@ -15,17 +15,18 @@ from oasys.widgets.gui import ConfirmDialog
 from oasys.util.oasys_util import TriggerIn, TriggerOut
 
 from syned.widget.widget_decorator import WidgetDecorator
-from syned.beamline.element_coordinates import ElementCoordinates
-from syned.beamline.beamline_element import BeamlineElement
 
 from wofry.propagator.propagator import PropagationManager, PropagationElements, PropagationParameters
-from wofrysrw.propagator.wavefront2D.srw_wavefront import SRWWavefront, PolarizationComponent, WavefrontPropagationParameters, WavefrontPropagationOptionalParameters
+from wofrysrw.propagator.wavefront2D.srw_wavefront import SRWWavefront, PolarizationComponent
 from wofrysrw.propagator.propagators2D.srw_propagation_mode import SRWPropagationMode
 from wofrysrw.propagator.propagators2D.srw_fresnel_native import FresnelSRWNative, SRW_APPLICATION
 from wofrysrw.propagator.propagators2D.srw_fresnel_wofry import FresnelSRWWofry
-from wofrysrw.beamline.optical_elements.srw_optical_element import SRWOpticalElementDisplacement
 
+from orangecontrib.srw.util import srw_builders
 from orangecontrib.srw.util.srw_objects import SRWData
+from orangecontrib.srw.util.srw_worker import SRWCalculationWorker
+from orangecontrib.srw.util.srw_propagation import do_propagation
+from orangecontrib.srw.util.srw_propagation_cache import get_propagation_cache
 from orangecontrib.srw.widgets.gui.ow_srw_wavefront_viewer import SRWWavefrontViewer
 from wofrysrw.beamline.optical_elements.srw_optical_element import Orientation
 
@@ -151,6 +152,8 @@ class OWSRWOpticalElement(SRWWavefrontViewer, WidgetDecorator):
         self.has_displacement_tab=has_displacement_tab
 
 
+        self.calculation_worker = SRWCalculationWorker(self)
+
         self.runaction = widget.OWAction("Propagate Wavefront", self)
         self.runaction.triggered.connect(self.propagate_wavefront)
         self.addAction(self.runaction)
@@ -166,6 +169,10 @@ class OWSRWOpticalElement(SRWWavefrontViewer, WidgetDecorator):
         button.setPalette(palette) # assign new palette
         button.setFixedHeight(45)
 
+        button = gui.button(button_box, self, "Cancel", callback=self.cancel_propagation)
+        button.setFixedHeight(45)
+        button.setFixedWidth(70)
+
         button = gui.button(button_box, self, "Reset Fields", callback=self.callResetSettings)
         font = QFont(button.font())
         font.setItalic(True)
@@ -493,17 +500,7 @@ class OWSRWOpticalElement(SRWWavefrontViewer, WidgetDecorator):
             optical_element = self.get_optical_element()
             optical_element.name = self.oe_name if not self.oe_name is None else self.windowTitle()
 
-            if self.has_displacement==1:
-                optical_element.displacement = SRWOpticalElementDisplacement(shift_x=self.shift_x,
-                                                                             shift_y=self.shift_y,
-                                                                             rotation_x=numpy.radians(-self.rotation_x),
-                                                                             rotation_y=numpy.radians(-self.rotation_y))
-
-            beamline_element = BeamlineElement(optical_element=optical_element,
-                                               coordinates=ElementCoordinates(p=self.p,
-                                                                              q=self.q,
-                                                                              angle_radial=numpy.radians(self.angle_radial),
-                                                                              angle_azimuthal=numpy.radians(self.angle_azimuthal)))
+            beamline_element = srw_builders.get_beamline_element(self, optical_element)
 
             srw_beamline.append_beamline_element(beamline_element)
             working_srw_beamline.append_beamline_element(beamline_element)
@@ -520,20 +517,10 @@ class OWSRWOpticalElement(SRWWavefrontViewer, WidgetDecorator):
 
                     propagation_parameters.set_additional_parameters("working_beamline", working_srw_beamline)
 
-                    self.setStatusMessage("Begin Propagation")
-
-                    output_wavefront = propagator.do_propagation(propagation_parameters=propagation_parameters,
-                                                                 handler_name=handler_name)
-                    self.setStatusMessage("Propagation Completed")
-
-                    output_srw_data = SRWData(srw_beamline=srw_beamline,
-                                              srw_wavefront=output_wavefront)
-                    output_srw_data.reset_working_srw_beamline()
+                    self.run_propagation(propagation_parameters, handler_name, propagation_mode, input_wavefront, srw_beamline, reset_working_srw_beamline=True)
                 else:
-                    output_wavefront = None
-
-                    output_srw_data = SRWData(srw_beamline=srw_beamline,
-                                              srw_wavefront=input_wavefront)
+                    self.propagation_completed(None, SRWData(srw_beamline=srw_beamline,
+                                                             srw_wavefront=input_wavefront))
             else:
                 propagation_elements = PropagationElements()
                 propagation_elements.add_beamline_element(beamline_element)
@@ -543,21 +530,58 @@ class OWSRWOpticalElement(SRWWavefrontViewer, WidgetDecorator):
 
                 self.set_additional_parameters(beamline_element, propagation_parameters, srw_beamline)
 
-                self.setStatusMessage("Begin Propagation")
+                self.run_propagation(propagation_parameters, handler_name, propagation_mode, input_wavefront, srw_beamline)
+        except Exception as e:
+            self.propagation_failed(e)
+
+    def run_propagation(self, propagation_parameters, handler_name, propagation_mode, input_wavefront, srw_beamline, reset_working_srw_beamline=False):
+        scanned_variable_data = input_wavefront.scanned_variable_data
+
+        def on_result(output_wavefront):
+            output_wavefront.setScanningData(scanned_variable_data)
 
-                output_wavefront = propagator.do_propagation(propagation_parameters=propagation_parameters,
-                                                             handler_name=handler_name)
+            output_srw_data = SRWData(srw_beamline=srw_beamline,
+                                      srw_wavefront=output_wavefront)
+            if reset_working_srw_beamline: output_srw_data.reset_working_srw_beamline()
 
-                self.setStatusMessage("Propagation Completed")
+            self.setStatusMessage("Propagation Completed")
 
-                output_srw_data = SRWData(srw_beamline=srw_beamline,
-                                          srw_wavefront=output_wavefront)
+            self.propagation_completed(output_wavefront, output_srw_data)
 
+        propagation_cache = get_propagation_cache()
+
+        if propagation_cache.is_enabled():
+            cache_key = propagation_cache.get_propagation_key(propagation_parameters, handler_name, propagation_mode)
+            cached_wavefront = propagation_cache.get(cache_key)
+
+            if not cached_wavefront is None:
+                # a propagation still running (or pending) for older parameters would overwrite this result
+                self.calculation_worker.cancel()
+
+                on_result(cached_wavefront)
+                return
+
+            on_propagation_result = on_result
+
+            def on_result(output_wavefront):
+                propagation_cache.put(cache_key, output_wavefront)
+                on_propagation_result(output_wavefront)
+
+        self.setStatusMessage("Begin Propagation")
+
+        # the debug mode runs in the GUI thread, to have the exceptions raised
+        self.calculation_worker.submit(do_propagation,
+                                       (propagation_parameters, handler_name, propagation_mode),
+                                       on_result=on_result,
+                                       on_error=self.propagation_failed,
+                                       on_progress=lambda progress: self.progressBarSet(20 + 30*progress),
+                                       synchronous=self.IS_DEVELOP)
+
+    def propagation_completed(self, output_wavefront, output_srw_data):
+        try:
             self.progressBarSet(50)
 
             if not output_wavefront is None:
-                output_wavefront.setScanningData(self.input_srw_data.get_srw_wavefront().scanned_variable_data)
-
                 self.output_wavefront = output_wavefront
                 self.initializeTabs()
 
@@ -573,145 +597,30 @@ class OWSRWOpticalElement(SRWWavefrontViewer, WidgetDecorator):
             self.send("SRWData", output_srw_data)
 
             self.send("Trigger", TriggerIn(new_object=True))
-
         except Exception as e:
-            QMessageBox.critical(self, "Error", str(e.args[0]), QMessageBox.Ok)
+            self.propagation_failed(e)
 
-            self.setStatusMessage("")
-            self.progressBarFinished()
+    def propagation_failed(self, exception):
+        QMessageBox.critical(self, "Error", str(exception.args[0]) if len(exception.args) > 0 else str(exception), QMessageBox.Ok)
 
-            if self.IS_DEVELOP: raise e
+        self.setStatusMessage("")
+        self.progressBarFinished()
 
-    def set_additional_parameters(self, beamline_element, propagation_parameters=None, beamline=None):
-        from wofrysrw.beamline.srw_beamline import Where
-
-        srw_drift_before_wavefront_propagation_parameters = None
-        srw_drift_before_wavefront_propagation_optional_parameters = None
-
-        # DRIFT BEFORE
-        if beamline_element.get_coordinates().p() != 0:
-            srw_drift_before_wavefront_propagation_parameters = WavefrontPropagationParameters(
-                                                                 auto_resize_before_propagation                         = self.drift_before_auto_resize_before_propagation,
-                                                                 auto_resize_after_propagation                          = self.drift_before_auto_resize_after_propagation,
-                                                                 relative_precision_for_propagation_with_autoresizing   = self.drift_before_relative_precision_for_propagation_with_autoresizing,
-                                                                 allow_semianalytical_treatment_of_quadratic_phase_term = self.drift_before_allow_semianalytical_treatment_of_quadratic_phase_term,
-                                                                 do_any_resizing_on_fourier_side_using_fft              = self.drift_before_do_any_resizing_on_fourier_side_using_fft,
-                                                                 horizontal_range_modification_factor_at_resizing       = self.drift_before_horizontal_range_modification_factor_at_resizing,
-                                                                 horizontal_resolution_modification_factor_at_resizing  = self.drift_before_horizontal_resolution_modification_factor_at_resizing ,
-                                                                 vertical_range_modification_factor_at_resizing         = self.drift_before_vertical_range_modification_factor_at_resizing,
-                                                                 vertical_resolution_modification_factor_at_resizing    = self.drift_before_vertical_resolution_modification_factor_at_resizing ,
-                                                                 type_of_wavefront_shift_before_resizing                = self.drift_before_type_of_wavefront_shift_before_resizing,
-                                                                 new_horizontal_wavefront_center_position_after_shift   = self.drift_before_new_horizontal_wavefront_center_position_after_shift,
-                                                                 new_vertical_wavefront_center_position_after_shift     = self.drift_before_new_vertical_wavefront_center_position_after_shift
-                                                             )
-
-            if not propagation_parameters is None: propagation_parameters.set_additional_parameters("srw_drift_before_wavefront_propagation_parameters", srw_drift_before_wavefront_propagation_parameters)
-
-            if self.has_drift_before_wavefront_propagation_optional_parameters():
-                srw_drift_before_wavefront_propagation_optional_parameters = WavefrontPropagationOptionalParameters(
-                                                                     orientation_of_the_output_optical_axis_vector_x = self.drift_before_orientation_of_the_output_optical_axis_vector_x,
-                                                                     orientation_of_the_output_optical_axis_vector_y = self.drift_before_orientation_of_the_output_optical_axis_vector_y,
-                                                                     orientation_of_the_output_optical_axis_vector_z = self.drift_before_orientation_of_the_output_optical_axis_vector_z,
-                                                                     orientation_of_the_horizontal_base_vector_x     = self.drift_before_orientation_of_the_horizontal_base_vector_x,
-                                                                     orientation_of_the_horizontal_base_vector_y     = self.drift_before_orientation_of_the_horizontal_base_vector_y
-                                                                 )
-
-                if not propagation_parameters is None: propagation_parameters.set_additional_parameters("srw_drift_before_wavefront_propagation_optional_parameters", srw_drift_before_wavefront_propagation_optional_parameters)
-
-        if not beamline is None: beamline.append_wavefront_propagation_parameters(srw_drift_before_wavefront_propagation_parameters, srw_drift_before_wavefront_propagation_optional_parameters, Where.DRIFT_BEFORE)
+        if self.IS_DEVELOP: raise exception
 
-        # OE
-        srw_oe_wavefront_propagation_parameters = None
-        srw_oe_wavefront_propagation_optional_parameters = None
+    def cancel_propagation(self):
+        if self.calculation_worker.cancel():
+            self.setStatusMessage("Propagation Cancelled")
+            self.progressBarFinished()
 
-        if self.has_oe_wavefront_propagation_parameters_tab:
-            srw_oe_wavefront_propagation_parameters = WavefrontPropagationParameters(
-                                                                 auto_resize_before_propagation                         = self.oe_auto_resize_before_propagation,
-                                                                 auto_resize_after_propagation                          = self.oe_auto_resize_after_propagation,
-                                                                 relative_precision_for_propagation_with_autoresizing   = self.oe_relative_precision_for_propagation_with_autoresizing,
-                                                                 allow_semianalytical_treatment_of_quadratic_phase_term = self.oe_allow_semianalytical_treatment_of_quadratic_phase_term,
-                                                                 do_any_resizing_on_fourier_side_using_fft              = self.oe_do_any_resizing_on_fourier_side_using_fft,
-                                                                 horizontal_range_modification_factor_at_resizing       = self.oe_horizontal_range_modification_factor_at_resizing,
-                                                                 horizontal_resolution_modification_factor_at_resizing  = self.oe_horizontal_resolution_modification_factor_at_resizing ,
-                                                                 vertical_range_modification_factor_at_resizing         = self.oe_vertical_range_modification_factor_at_resizing,
-                                                                 vertical_resolution_modification_factor_at_resizing    = self.oe_vertical_resolution_modification_factor_at_resizing ,
-                                                                 type_of_wavefront_shift_before_resizing                = self.oe_type_of_wavefront_shift_before_resizing,
-                                                                 new_horizontal_wavefront_center_position_after_shift   = self.oe_new_horizontal_wavefront_center_position_after_shift,
-                                                                 new_vertical_wavefront_center_position_after_shift     = self.oe_new_vertical_wavefront_center_position_after_shift
-                                                             )
-
-
-            if not propagation_parameters is None: propagation_parameters.set_additional_parameters("srw_oe_wavefront_propagation_parameters", srw_oe_wavefront_propagation_parameters)
-
-            if self.has_oe_wavefront_propagation_optional_parameters():
-                srw_oe_wavefront_propagation_optional_parameters = WavefrontPropagationOptionalParameters(
-                                                                     orientation_of_the_output_optical_axis_vector_x = self.oe_orientation_of_the_output_optical_axis_vector_x,
-                                                                     orientation_of_the_output_optical_axis_vector_y = self.oe_orientation_of_the_output_optical_axis_vector_y,
-                                                                     orientation_of_the_output_optical_axis_vector_z = self.oe_orientation_of_the_output_optical_axis_vector_z,
-                                                                     orientation_of_the_horizontal_base_vector_x     = self.oe_orientation_of_the_horizontal_base_vector_x,
-                                                                     orientation_of_the_horizontal_base_vector_y     = self.oe_orientation_of_the_horizontal_base_vector_y
-                                                                 )
-
-                if not propagation_parameters is None: propagation_parameters.set_additional_parameters("srw_oe_wavefront_propagation_optional_parameters", srw_oe_wavefront_propagation_optional_parameters)
-
-        if not beamline is None: beamline.append_wavefront_propagation_parameters(srw_oe_wavefront_propagation_parameters, srw_oe_wavefront_propagation_optional_parameters, Where.OE)
-
-        # DRIFT AFTER
-        srw_drift_after_wavefront_propagation_parameters = None
-        srw_drift_after_wavefront_propagation_optional_parameters = None
-
-        if beamline_element.get_coordinates().q():
-            srw_drift_after_wavefront_propagation_parameters = WavefrontPropagationParameters(
-                                                                 auto_resize_before_propagation                         = self.drift_auto_resize_before_propagation,
-                                                                 auto_resize_after_propagation                          = self.drift_auto_resize_after_propagation,
-                                                                 relative_precision_for_propagation_with_autoresizing   = self.drift_relative_precision_for_propagation_with_autoresizing,
-                                                                 allow_semianalytical_treatment_of_quadratic_phase_term = self.drift_allow_semianalytical_treatment_of_quadratic_phase_term,
-                                                                 do_any_resizing_on_fourier_side_using_fft              = self.drift_do_any_resizing_on_fourier_side_using_fft,
-                                                                 horizontal_range_modification_factor_at_resizing       = self.drift_horizontal_range_modification_factor_at_resizing,
-                                                                 horizontal_resolution_modification_factor_at_resizing  = self.drift_horizontal_resolution_modification_factor_at_resizing ,
-                                                                 vertical_range_modification_factor_at_resizing         = self.drift_vertical_range_modification_factor_at_resizing,
-                                                                 vertical_resolution_modification_factor_at_resizing    = self.drift_vertical_resolution_modification_factor_at_resizing ,
-                                                                 type_of_wavefront_shift_before_resizing                = self.drift_type_of_wavefront_shift_before_resizing,
-                                                                 new_horizontal_wavefront_center_position_after_shift   = self.drift_new_horizontal_wavefront_center_position_after_shift,
-                                                                 new_vertical_wavefront_center_position_after_shift     = self.drift_new_vertical_wavefront_center_position_after_shift
-                                                             )
-
-
-            if not propagation_parameters is None: propagation_parameters.set_additional_parameters("srw_drift_after_wavefront_propagation_parameters", srw_drift_after_wavefront_propagation_parameters)
-
-            if self.has_drift_after_wavefront_propagation_optional_parameters():
-                srw_drift_after_wavefront_propagation_optional_parameters = WavefrontPropagationOptionalParameters(
-                                                                     orientation_of_the_output_optical_axis_vector_x = self.drift_after_orientation_of_the_output_optical_axis_vector_x,
-                                                                     orientation_of_the_output_optical_axis_vector_y = self.drift_after_orientation_of_the_output_optical_axis_vector_y,
-                                                                     orientation_of_the_output_optical_axis_vector_z = self.drift_after_orientation_of_the_output_optical_axis_vector_z,
-                                                                     orientation_of_the_horizontal_base_vector_x     = self.drift_after_orientation_of_the_horizontal_base_vector_x,
-                                                                     orientation_of_the_horizontal_base_vector_y     = self.drift_after_orientation_of_the_horizontal_base_vector_y
-                                                                 )
-
-                if not propagation_parameters is None: propagation_parameters.set_additional_parameters("srw_drift_after_wavefront_propagation_optional_parameters", srw_drift_after_wavefront_propagation_optional_parameters)
-
-        if not beamline is None: beamline.append_wavefront_propagation_parameters(srw_drift_after_wavefront_propagation_parameters, srw_drift_after_wavefront_propagation_optional_parameters, Where.DRIFT_AFTER)
-
-    def has_drift_before_wavefront_propagation_optional_parameters(self):
-        return self.drift_before_orientation_of_the_output_optical_axis_vector_x != 0.0 or \
-               self.drift_before_orientation_of_the_output_optical_axis_vector_y != 0.0 or \
-               self.drift_before_orientation_of_the_output_optical_axis_vector_z != 0.0 or \
-               self.drift_before_orientation_of_the_horizontal_base_vector_x     != 0.0 or \
-               self.drift_before_orientation_of_the_horizontal_base_vector_y     != 0.0
-
-    def has_oe_wavefront_propagation_optional_parameters(self):
-        return self.oe_orientation_of_the_output_optical_axis_vector_x != 0.0 or \
-               self.oe_orientation_of_the_output_optical_axis_vector_y != 0.0 or \
-               self.oe_orientation_of_the_output_optical_axis_vector_z != 0.0 or \
-               self.oe_orientation_of_the_horizontal_base_vector_x     != 0.0 or \
-               self.oe_orientation_of_the_horizontal_base_vector_y     != 0.0
-
-    def has_drift_after_wavefront_propagation_optional_parameters(self):
-        return self.drift_after_orientation_of_the_output_optical_axis_vector_x != 0.0 or \
-               self.drift_after_orientation_of_the_output_optical_axis_vector_y != 0.0 or \
-               self.drift_after_orientation_of_the_output_optical_axis_vector_z != 0.0 or \
-               self.drift_after_orientation_of_the_horizontal_base_vector_x     != 0.0 or \
-               self.drift_after_orientation_of_the_horizontal_base_vector_y     != 0.0
+    def onDeleteWidget(self):
+        self.calculation_worker.cancel()
+
+        super().onDeleteWidget()
+
+    def set_additional_parameters(self, beamline_element, propagation_parameters=None, beamline=None):
+        srw_builders.set_additional_parameters(self, beamline_element, propagation_parameters, beamline,
+                                               has_oe_wavefront_propagation_parameters=self.has_oe_wavefront_propagation_parameters_tab)
 
     def get_optical_element(self):
         raise NotImplementedError()
@@ -725,37 +634,17 @@ class OWSRWOpticalElement(SRWWavefrontViewer, WidgetDecorator):
 
     def run_calculation_for_plots(self, tickets, progress_bar_value):
         if self.view_type==2:
-            e, h, v, i = self.output_wavefront.get_intensity(multi_electron=False, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL)
+            tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=False, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL))
 
-            tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
+            tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=False, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL))
 
-            self.progressBarSet(progress_bar_value)
+            tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_phase, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL))
 
-            e, h, v, i = self.output_wavefront.get_intensity(multi_electron=False, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL)
-
-            tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
-
-            e, h, v, i = self.output_wavefront.get_phase(polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL)
-
-            tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
-
-            self.progressBarSet(progress_bar_value + 10)
-
-            e, h, v, i = self.output_wavefront.get_phase(polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL)
-
-            tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
+            tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_phase, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL))
         elif self.view_type==1:
-            e, h, v, i = self.output_wavefront.get_intensity(multi_electron=False)
-
-            tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
-
-            self.progressBarSet(progress_bar_value)
-
-            e, h, v, i = self.output_wavefront.get_phase()
-
-            tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
+            tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=False))
 
-            self.progressBarSet(progress_bar_value + 10)
+            tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_phase))
 
     def receive_syned_data(self, data):
         if not data is None:
@@ -3,14 +3,14 @@ import numpy
 from orangecontrib.srw.util.srw_util import SRWPlot
 from orangecontrib.srw.widgets.gui.ow_srw_wavefront_viewer import SRWWavefrontViewer
 
-from silx.gui.plot import Plot2D
-
 class SRWPowerDensityViewer(SRWWavefrontViewer):
 
     def __init__(self, show_general_option_box=True, show_automatic_box=True, show_view_box=True):
         super().__init__(show_general_option_box=show_general_option_box, show_automatic_box=show_automatic_box, show_view_box=show_view_box)
 
     def plot_2D(self, ticket, progressBarValue, var_x, var_y, plot_canvas_index, title, xtitle, ytitle, xum="", yum="", ignore_range=False):
+        from silx.gui.plot import Plot2D
+
         if self.plot_canvas[plot_canvas_index] is None:
             self.plot_canvas[plot_canvas_index] = Plot2D()
             self.tab[plot_canvas_index].layout().addWidget(self.plot_canvas[plot_canvas_index])
@@ -36,49 +36,19 @@ class SRWPowerDensityViewer(SRWWavefrontViewer):
         factor1=SRWPlot.get_factor(var_x)
         factor2=SRWPlot.get_factor(var_y)
 
-        if plotting_range == None:
-            xx = ticket['bin_h']
-            yy = ticket['bin_v']
-
-            nbins_h = ticket['nbins_h']
-            nbins_v = ticket['nbins_v']
-
-            histogram = ticket['histogram']
-        else:
-            range_x  = numpy.where(numpy.logical_and(ticket['bin_h']>=plotting_range[0], ticket['bin_h']<=plotting_range[1]))
-            range_y  = numpy.where(numpy.logical_and(ticket['bin_v']>=plotting_range[2], ticket['bin_v']<=plotting_range[3]))
-
-            xx = ticket['bin_h'][range_x]
-            yy = ticket['bin_v'][range_y]
-
-            histogram = []
-            for row in ticket['histogram'][range_x]:
-                histogram.append(row[range_y])
-
-            nbins_h = len(xx)
-            nbins_v = len(yy)
-
-        if len(xx) == 0 or len(yy) == 0:
-            raise Exception("Nothing to plot in the given range")
+        xx, yy, data_to_plot, steps = SRWPlot.get_image_to_plot(ticket,
+                                                                plotting_range=plotting_range,
+                                                                canvas_size=(self.plot_canvas[plot_canvas_index].width(), self.plot_canvas[plot_canvas_index].height()))
 
         xmin, xmax = xx.min(), xx.max()
         ymin, ymax = yy.min(), yy.max()
 
         origin = (xmin*factor1, ymin*factor2)
-        scale = (abs((xmax-xmin)/nbins_h)*factor1, abs((ymax-ymin)/nbins_v)*factor2)
-
-        # PyMCA inverts axis!!!! histogram must be calculated reversed
-        data_to_plot = []
-        for y_index in range(0, nbins_v):
-            x_values = []
-            for x_index in range(0, nbins_h):
-                x_values.append(histogram[x_index][y_index])
-
-            data_to_plot.append(x_values)
+        scale = (abs((xmax-xmin)/len(xx))*factor1*steps[0], abs((ymax-ymin)/len(yy))*factor2*steps[1])
 
         colormap = {"name":"temperature", "normalization":"linear", "autoscale":True, "vmin":0, "vmax":0, "colors":256}
 
-        self.plot_canvas[plot_canvas_index].addImage(numpy.array(data_to_plot),
+        self.plot_canvas[plot_canvas_index].addImage(data_to_plot,
                                   legend="Power Density",
                                   scale=scale,
                                   origin=origin,
@@ -8,6 +8,7 @@ from oasys.widgets import congruence
 from syned.beamline.optical_elements.absorbers.slit import Slit
 from syned.beamline.shape import Rectangle, Ellipse
 
+from orangecontrib.srw.util import srw_builders
 from orangecontrib.srw.widgets.gui.ow_srw_optical_element import OWSRWOpticalElement
 
 class OWSRWSlits(OWSRWOpticalElement):
@@ -50,19 +51,7 @@ class OWSRWSlits(OWSRWOpticalElement):
         self.circle_box.setVisible(self.shape == 1)
 
     def get_optical_element(self):
-        if self.shape == 0:
-            boundary_shape = Rectangle(x_left=-0.5*self.width + self.horizontal_shift,
-                                       x_right=0.5*self.width + self.horizontal_shift,
-                                       y_bottom=-0.5*self.height + self.vertical_shift,
-                                       y_top=0.5*self.height + self.vertical_shift)
-
-        elif self.shape == 1:
-            boundary_shape = Ellipse(a_axis_min=-self.radius + self.horizontal_shift,
-                                     a_axis_max=self.radius + self.horizontal_shift,
-                                     b_axis_min=-self.radius + self.vertical_shift,
-                                     b_axis_max=self.radius + self.vertical_shift)
-
-        return self.get_srw_object(boundary_shape=boundary_shape)
+        return self.get_srw_object(boundary_shape=srw_builders.get_boundary_shape(self))
 
     def get_srw_object(self, boundary_shape):
         raise NotImplementedError
@@ -18,12 +18,14 @@ from syned.storage_ring.light_source import ElectronBeam, LightSource
 from syned.widget.widget_decorator import WidgetDecorator
 from syned.beamline.shape import Rectangle
 
-from wofrysrw.propagator.wavefront2D.srw_wavefront import WavefrontParameters, WavefrontPrecisionParameters, PolarizationComponent
-from wofrysrw.storage_ring.srw_electron_beam import SRWElectronBeam
+from wofrysrw.propagator.wavefront2D.srw_wavefront import PolarizationComponent
 from wofrysrw.beamline.srw_beamline import SRWBeamline
 
+from orangecontrib.srw.util import srw_builders
 from orangecontrib.srw.util.srw_util import SRWPlot
 from orangecontrib.srw.util.srw_objects import SRWData
+from orangecontrib.srw.util.srw_worker import SRWCalculationWorker
+from orangecontrib.srw.util.srw_propagation import calculate_source_wavefront
 from orangecontrib.srw.widgets.gui.ow_srw_wavefront_viewer import SRWWavefrontViewer
 
 class OWSRWSource(SRWWavefrontViewer, WidgetDecorator):
@@ -102,6 +104,8 @@ class OWSRWSource(SRWWavefrontViewer, WidgetDecorator):
     def __init__(self):
         super().__init__(show_general_option_box=False, show_automatic_box=False)
 
+        self.calculation_worker = SRWCalculationWorker(self)
+
         self.runaction = widget.OWAction("Run SRW", self)
         self.runaction.triggered.connect(self.runSRWSource)
         self.addAction(self.runaction)
@@ -117,6 +121,10 @@ class OWSRWSource(SRWWavefrontViewer, WidgetDecorator):
         button.setPalette(palette) # assign new palette
         button.setFixedHeight(45)
 
+        button = gui.button(button_box, self, "Cancel", callback=self.cancel_source_calculation)
+        button.setFixedHeight(45)
+        button.setFixedWidth(70)
+
         button = gui.button(button_box, self, "Reset Fields", callback=self.callResetSettings)
         font = QFont(button.font())
         font.setItalic(True)
@@ -286,11 +294,21 @@ class OWSRWSource(SRWWavefrontViewer, WidgetDecorator):
 
             self.progressBarSet(20)
 
-            self.setStatusMessage("")
+            # the debug mode runs in the GUI thread, to have the exceptions raised
+            self.calculation_worker.submit(calculate_source_wavefront,
+                                           (srw_source, self.get_wavefront_parameters(srw_source)),
+                                           on_result=lambda result: self.source_calculation_completed(SRWBeamline(light_source=result[0]), result[1]),
+                                           on_error=self.source_calculation_failed,
+                                           on_progress=lambda progress: self.progressBarSet(20 + 30*progress),
+                                           synchronous=self.IS_DEVELOP)
+        except Exception as exception:
+            self.source_calculation_failed(exception)
 
-            beamline = SRWBeamline(light_source=srw_source)
-            self.output_wavefront = self.calculate_wavefront_propagation(srw_source)
+    def source_calculation_completed(self, beamline, output_wavefront):
+        try:
+            self.setStatusMessage("")
 
+            self.output_wavefront = output_wavefront
 
             if self.is_do_plots():
                 self.setStatusMessage("Plotting Results")
@@ -304,106 +322,35 @@ class OWSRWSource(SRWWavefrontViewer, WidgetDecorator):
             self.setStatusMessage("")
 
             self.send("SRWData", SRWData(srw_beamline=beamline, srw_wavefront=self.output_wavefront))
-
         except Exception as exception:
-            QMessageBox.critical(self, "Error", str(exception), QMessageBox.Ok)
-
-            if self.IS_DEVELOP: raise exception
+            self.source_calculation_failed(exception)
+        else:
+            self.progressBarFinished()
 
+    def source_calculation_failed(self, exception):
+        self.setStatusMessage("")
         self.progressBarFinished()
 
+        QMessageBox.critical(self, "Error", str(exception), QMessageBox.Ok)
+
+        if self.IS_DEVELOP: raise exception
+
+    def cancel_source_calculation(self):
+        if self.calculation_worker.cancel():
+            self.setStatusMessage("Calculation Cancelled")
+            self.progressBarFinished()
+
+    def onDeleteWidget(self):
+        self.calculation_worker.cancel()
+
+        super().onDeleteWidget()
+
     def sendNewWavefront(self, trigger):
         if trigger and trigger.new_object == True:
             self.runSRWSource()
 
     def get_electron_beam(self):
-        if self.type_of_initialization == 2:
-            electron_beam = SRWElectronBeam(energy_in_GeV=numpy.random.normal(self.electron_energy_in_GeV,
-                                                                              self.electron_energy_spread*self.electron_energy_in_GeV),
-                                            energy_spread=self.electron_energy_spread,
-                                            current=self.ring_current)
-        else:
-            electron_beam = SRWElectronBeam(energy_in_GeV=self.electron_energy_in_GeV,
-                                            energy_spread=self.electron_energy_spread,
-                                            current=self.ring_current)
-
-        if self.type_of_properties == 0:
-            electron_beam._moment_xx = self.moment_xx
-            electron_beam._moment_xxp = self.moment_xxp
-            electron_beam._moment_xpxp = self.moment_xpxp
-            electron_beam._moment_yy = self.moment_yy
-            electron_beam._moment_yyp = self.moment_yyp
-            electron_beam._moment_ypyp = self.moment_ypyp
-
-            x, xp, y, yp = electron_beam.get_sigmas_all()
-
-            self.electron_beam_size_h = x
-            self.electron_beam_size_v = y
-            self.electron_beam_divergence_h = xp
-            self.electron_beam_divergence_v = yp
-        elif self.type_of_properties == 1:
-            electron_beam.set_sigmas_all(sigma_x=self.electron_beam_size_h,
-                                         sigma_y=self.electron_beam_size_v,
-                                         sigma_xp=self.electron_beam_divergence_h,
-                                         sigma_yp=self.electron_beam_divergence_v)
-
-            self.moment_xx = electron_beam._moment_xx
-            self.moment_xpxp = electron_beam._moment_xpxp
-            self.moment_yy = electron_beam._moment_yy
-            self.moment_ypyp = electron_beam._moment_ypyp
-
-        elif self.type_of_properties == 2:
-            electron_beam.set_moments_from_twiss(horizontal_emittance = self.horizontal_emittance,
-                                                 horizontal_beta      = self.horizontal_beta,
-                                                 horizontal_alpha     = self.horizontal_alpha,
-                                                 horizontal_eta       = self.horizontal_eta,
-                                                 horizontal_etap      = self.horizontal_etap,
-                                                 vertical_emittance   = self.vertical_emittance,
-                                                 vertical_beta        = self.vertical_beta,
-                                                 vertical_alpha       = self.vertical_alpha,
-                                                 vertical_eta         = self.vertical_eta,
-                                                 vertical_etap        = self.vertical_etap)
-
-            self.moment_xx = electron_beam._moment_xx
-            self.moment_xpxp = electron_beam._moment_xpxp
-            self.moment_yy = electron_beam._moment_yy
-            self.moment_ypyp = electron_beam._moment_ypyp
-
-            x, xp, y, yp = electron_beam.get_sigmas_all()
-
-            self.electron_beam_size_h = round(x, 9)
-            self.electron_beam_size_v = round(y, 9)
-            self.electron_beam_divergence_h = round(xp, 10)
-            self.electron_beam_divergence_v = round(yp, 10)
-
-        if self.type_of_initialization == 0: # zero
-            self.moment_x = 0.0
-            self.moment_y = 0.0
-            self.moment_z = self.get_default_initial_z()
-            self.moment_xp = 0.0
-            self.moment_yp = 0.0
-        elif self.type_of_initialization == 2: # sampled
-            self.moment_x = numpy.random.normal(0.0, self.electron_beam_size_h)
-            self.moment_y = numpy.random.normal(0.0, self.electron_beam_size_v)
-            self.moment_z = self.get_default_initial_z()
-            self.moment_xp = numpy.random.normal(0.0, self.electron_beam_divergence_h)
-            self.moment_yp = numpy.random.normal(0.0, self.electron_beam_divergence_v)
-
-        electron_beam._moment_x = self.moment_x
-        electron_beam._moment_y = self.moment_y
-        electron_beam._moment_z = self.moment_z
-        electron_beam._moment_xp = self.moment_xp
-        electron_beam._moment_yp = self.moment_yp
-
-        print("\n", "Electron Trajectory Initialization:")
-        print("X0: ", electron_beam._moment_x)
-        print("Y0: ", electron_beam._moment_y)
-        print("Z0: ", electron_beam._moment_z)
-        print("XP0: ", electron_beam._moment_xp)
-        print("YP0: ", electron_beam._moment_yp)
-        print("E0: ", electron_beam._energy_in_GeV, "\n")
-
-        return electron_beam
+        return srw_builders.get_electron_beam(self, self.get_default_initial_z())
 
     def set_z0Default(self):
         self.moment_z = self.get_default_initial_z()
@@ -468,83 +415,39 @@ class OWSRWSource(SRWWavefrontViewer, WidgetDecorator):
     def run_calculation_for_plots(self, tickets, progress_bar_value):
         if not self.output_wavefront is None:
             if self.view_type == 1:
-                e, h, v, i = self.output_wavefront.get_intensity(multi_electron=False)
-
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
-
-                self.progressBarSet(progress_bar_value)
-
-                e, h, v, i = self.output_wavefront.get_phase()
-
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
-
-                self.progressBarSet(progress_bar_value + 10)
-
-                e, h, v, i = self.output_wavefront.get_intensity(multi_electron=True)
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=False))
 
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_phase))
 
-                self.progressBarSet(progress_bar_value + 20)
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=True))
             elif self.view_type == 2:
-                e, h, v, i = self.output_wavefront.get_intensity(multi_electron=False, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL)
-
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
-
-                self.progressBarSet(progress_bar_value)
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=False, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL))
 
                 #--
 
-                e, h, v, i = self.output_wavefront.get_intensity(multi_electron=False, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL)
-
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=False, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL))
 
                 #--
 
-                e, h, v, i = self.output_wavefront.get_phase(polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL)
-
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
-
-                self.progressBarSet(progress_bar_value + 10)
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_phase, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL))
 
-                e, h, v, i = self.output_wavefront.get_phase(polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL)
-
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_phase, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL))
 
                 #--
 
-                e, h, v, i = self.output_wavefront.get_intensity(multi_electron=True, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL)
-
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
-
-                self.progressBarSet(progress_bar_value + 20)
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=True, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL))
 
-                e, h, v, i = self.output_wavefront.get_intensity(multi_electron=True, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL)
-
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=True, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL))
 
 
     def get_automatic_sr_method(self):
         raise NotImplementedError()
 
     def calculate_wavefront_propagation(self, srw_source):
-        photon_energy = self.get_photon_energy_for_wavefront_propagation(srw_source)
-
-        wf_parameters = WavefrontParameters(photon_energy_min = photon_energy,
-                                            photon_energy_max = photon_energy,
-                                            photon_energy_points=1,
-                                            h_slit_gap = self.wf_h_slit_gap,
-                                            v_slit_gap = self.wf_v_slit_gap,
-                                            h_slit_points=self.wf_h_slit_points,
-                                            v_slit_points=self.wf_v_slit_points,
-                                            distance = self.wf_distance,
-                                            wavefront_precision_parameters=WavefrontPrecisionParameters(sr_method=0 if self.wf_sr_method == 0 else self.get_automatic_sr_method(),
-                                                                                                        relative_precision=self.wf_relative_precision,
-                                                                                                        start_integration_longitudinal_position=self.wf_start_integration_longitudinal_position,
-                                                                                                        end_integration_longitudinal_position=self.wf_end_integration_longitudinal_position,
-                                                                                                        number_of_points_for_trajectory_calculation=self.wf_number_of_points_for_trajectory_calculation,
-                                                                                                        use_terminating_terms=self.wf_use_terminating_terms,
-                                                                                                        sampling_factor_for_adjusting_nx_ny=self.wf_sampling_factor_for_adjusting_nx_ny))
-        return srw_source.get_SRW_Wavefront(source_wavefront_parameters=wf_parameters)
+        return calculate_source_wavefront(srw_source, self.get_wavefront_parameters(srw_source))[1]
+
+    def get_wavefront_parameters(self, srw_source):
+        return srw_builders.get_wavefront_parameters(self, self.get_photon_energy_for_wavefront_propagation(srw_source), self.get_automatic_sr_method())
 
     def get_photon_energy_for_wavefront_propagation(self, srw_source):
         return self.wf_photon_energy
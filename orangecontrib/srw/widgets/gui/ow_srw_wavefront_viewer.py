@@ -10,34 +10,16 @@ from orangewidget import gui
 from orangewidget.settings import Setting
 from oasys.widgets import gui as oasysgui
 from oasys.widgets import congruence
-from silx.gui.plot.StackView import StackViewMainWindow
 
-from wofry.propagator.propagator import PropagationManager, WavefrontDimension
-from wofrysrw.propagator.propagators2D.srw_fresnel_native import FresnelSRWNative, SRW_APPLICATION
-from wofrysrw.propagator.propagators2D.srw_fresnel_wofry import FresnelSRWWofry
+from wofry.propagator.propagator import PropagationManager
+from wofrysrw.propagator.propagators2D.srw_fresnel_native import SRW_APPLICATION
 from wofrysrw.propagator.propagators2D.srw_propagation_mode import SRWPropagationMode
+from wofrysrw.propagator.wavefront2D.srw_wavefront import PolarizationComponent
 
 from orangecontrib.srw.util.srw_util import SRWPlot
+from orangecontrib.srw.util.srw_propagation import initialize_propagator_2D
 from orangecontrib.srw.widgets.gui.ow_srw_widget import SRWWidget
 
-def initialize_propagator_2D():
-    propagation_manager = PropagationManager.Instance()
-
-    if not propagation_manager.is_initialized(SRW_APPLICATION):
-        if not propagation_manager.has_propagator(FresnelSRWNative.HANDLER_NAME, WavefrontDimension.TWO): propagation_manager.add_propagator(FresnelSRWNative())
-        if not propagation_manager.has_propagator(FresnelSRWWofry.HANDLER_NAME, WavefrontDimension.TWO): propagation_manager.add_propagator(FresnelSRWWofry())
-
-        propagation_manager.set_propagation_mode(SRW_APPLICATION, SRWPropagationMode.STEP_BY_STEP)
-
-        propagation_manager.set_initialized(True)
-try:
-    initialize_propagator_2D()
-except Exception as e:
-    print("Error while initializing propagators", str(e))
-
-    raise e
-
-
 class SRWWavefrontViewer(SRWWidget):
 
     IMAGE_WIDTH = 860
@@ -56,6 +38,8 @@ class SRWWavefrontViewer(SRWWidget):
     range_y_max = Setting(50)
 
     def __init__(self, show_general_option_box=True, show_automatic_box=True, show_view_box=True):
+        initialize_propagator_2D()
+
         super().__init__(show_general_option_box=show_general_option_box, show_automatic_box=show_automatic_box)
 
         self.main_tabs = oasysgui.tabWidget(self.mainArea)
@@ -125,7 +109,9 @@ class SRWWavefrontViewer(SRWWidget):
         #* -------------------------------------------------------------------------------------------------------------
 
         self.tab = []
+        self.lazy_tickets = {}
         self.tabs = oasysgui.tabWidget(plot_tab)
+        self.tabs.currentChanged.connect(self.plot_lazy_ticket)
 
         self.initializeTabs()
 
@@ -158,6 +144,8 @@ class SRWWavefrontViewer(SRWWidget):
         if self.show_view_box and propagation_mode==SRWPropagationMode.WHOLE_BEAMLINE: self.view_type = 0
 
     def initializeTabs(self):
+        self.lazy_tickets = {}
+
         current_tab = self.tabs.currentIndex()
 
         size = len(self.tab)
@@ -233,6 +221,25 @@ class SRWWavefrontViewer(SRWWidget):
     def run_calculation_for_plots(self, tickets, progress_bar_value):
         raise NotImplementedError("to be implemented")
 
+    def get_wavefront_intensity(self, multi_electron=True, polarization_component_to_be_extracted=PolarizationComponent.TOTAL):
+        return self.__get_wavefront_calculation(("intensity", multi_electron, polarization_component_to_be_extracted),
+                                                lambda: self.output_wavefront.get_intensity(multi_electron=multi_electron,
+                                                                                            polarization_component_to_be_extracted=polarization_component_to_be_extracted))
+
+    def get_wavefront_phase(self, polarization_component_to_be_extracted=PolarizationComponent.TOTAL):
+        return self.__get_wavefront_calculation(("phase", polarization_component_to_be_extracted),
+                                                lambda: self.output_wavefront.get_phase(polarization_component_to_be_extracted=polarization_component_to_be_extracted))
+
+    def __get_wavefront_calculation(self, key, calculation):
+        # memoized per wavefront instance: replots do not repeat the (multi-electron) calculations
+        if not getattr(self, "_calculations_wavefront", None) is self.output_wavefront:
+            self._calculations_wavefront = self.output_wavefront
+            self._calculations = {}
+
+        if not key in self._calculations: self._calculations[key] = calculation()
+
+        return self._calculations[key]
+
     def plot_1D(self, ticket, progressBarValue, var, plot_canvas_index, title, xtitle, ytitle, xum=""):
         if self.plot_canvas[plot_canvas_index] is None:
             self.plot_canvas[plot_canvas_index] = SRWPlot.Detailed1DWidget()
@@ -259,6 +266,9 @@ class SRWWavefrontViewer(SRWWidget):
         self.progressBarSet(progressBarValue)
 
     def plot_3D(self, data3D, dataE, dataX, dataY, progressBarValue, plot_canvas_index,  title, xtitle, ytitle, xum="", yum=""):
+        from silx.gui.plot.StackView import StackViewMainWindow
+        import h5py
+
         if self.plot_canvas[plot_canvas_index] is None:
             self.plot_canvas[plot_canvas_index] = StackViewMainWindow()
             self.tab[plot_canvas_index].layout().addWidget(self.plot_canvas[plot_canvas_index])
@@ -281,14 +291,17 @@ class SRWWavefrontViewer(SRWWidget):
         dim1_calib = (ymin, stepY)
         dim2_calib = (xmin, stepX)
 
-        data_to_plot = numpy.swapaxes(data3D, 1, 2)
+        if isinstance(data3D, h5py.Dataset):
+            data_to_plot = data3D # written by srw_hdf5 as [energy, vertical, horizontal]: the stack is read one energy at a time
+        else:
+            data_to_plot = numpy.array(numpy.swapaxes(data3D, 1, 2))
 
         colormap = {"name":"temperature", "normalization":"linear", "autoscale":True, "vmin":0, "vmax":0, "colors":256}
 
         self.plot_canvas[plot_canvas_index].setGraphTitle(title)
         self.plot_canvas[plot_canvas_index].setLabels(["Photon Energy [eV]",ytitle,xtitle])
         self.plot_canvas[plot_canvas_index].setColormap(colormap=colormap)
-        self.plot_canvas[plot_canvas_index].setStack(numpy.array(data_to_plot),
+        self.plot_canvas[plot_canvas_index].setStack(data_to_plot,
                                                      calibrations=[dim0_calib, dim1_calib, dim2_calib] )
 
 
@@ -311,25 +324,20 @@ class SRWWavefrontViewer(SRWWidget):
 
                     SRWPlot.set_conversion_active(self.getConversionActive())
 
-                    variables = self.getVariablesToPlot()
-                    titles = self.getTitles(with_um=True)
-                    xtitles = self.getXTitles()
-                    ytitles = self.getYTitles()
-                    xums = self.getXUM()
-                    yums = self.getYUM()
-
                     progress = (100 - progressBarValue) / len(tickets)
 
+                    # lazy tickets are calculated and plotted only when their tab is shown
+                    self.lazy_tickets = {i : (tickets[i], ignore_range) for i in range(0, len(tickets)) if callable(tickets[i])}
+
                     try:
                         for i in range(0, len(tickets)):
-                            if type(tickets[i]) is tuple:
-                                if len(tickets[i]) == 4:
-                                    self.plot_3D(tickets[i][0], tickets[i][1], tickets[i][2], tickets[i][3], progressBarValue + (i+1)*progress, plot_canvas_index=i, title=titles[i], xtitle=xtitles[i], ytitle=ytitles[i], xum=xums[i], yum=yums[i])
-                            else:
-                                if len(variables[i]) == 1:
-                                    self.plot_1D(tickets[i], progressBarValue + (i+1)*progress, variables[i],                     plot_canvas_index=i, title=titles[i], xtitle=xtitles[i], ytitle=ytitles[i], xum=xums[i])
-                                else:
-                                    self.plot_2D(tickets[i], progressBarValue + (i+1)*progress, variables[i][0], variables[i][1], plot_canvas_index=i, title=titles[i], xtitle=xtitles[i], ytitle=ytitles[i], xum=xums[i], yum=yums[i], ignore_range=ignore_range)
+                            if not i in self.lazy_tickets:
+                                self.plot_ticket(tickets[i], progressBarValue + (i+1)*progress, i, ignore_range)
+
+                        current_tab = self.tabs.currentIndex()
+
+                        if current_tab in self.lazy_tickets:
+                            self.plot_ticket(self.lazy_tickets.pop(current_tab)[0](), 100, current_tab, ignore_range)
                     except Exception as e:
                         self.view_type_combo.setEnabled(True)
 
@@ -339,6 +347,49 @@ class SRWWavefrontViewer(SRWWidget):
             else:
                 raise Exception("Nothing to Plot")
 
+    def plot_ticket(self, ticket, progressBarValue, plot_canvas_index, ignore_range=False):
+        variables = self.getVariablesToPlot()
+        titles = self.getTitles(with_um=True)
+        xtitles = self.getXTitles()
+        ytitles = self.getYTitles()
+        xums = self.getXUM()
+        yums = self.getYUM()
+
+        i = plot_canvas_index
+
+        if type(ticket) is tuple:
+            if len(ticket) == 4:
+                self.plot_3D(ticket[0], ticket[1], ticket[2], ticket[3], progressBarValue, plot_canvas_index=i, title=titles[i], xtitle=xtitles[i], ytitle=ytitles[i], xum=xums[i], yum=yums[i])
+        else:
+            if len(variables[i]) == 1:
+                self.plot_1D(ticket, progressBarValue, variables[i],                     plot_canvas_index=i, title=titles[i], xtitle=xtitles[i], ytitle=ytitles[i], xum=xums[i])
+            else:
+                self.plot_2D(ticket, progressBarValue, variables[i][0], variables[i][1], plot_canvas_index=i, title=titles[i], xtitle=xtitles[i], ytitle=ytitles[i], xum=xums[i], yum=yums[i], ignore_range=ignore_range)
+
+    def plot_lazy_ticket(self, index):
+        if not index in self.lazy_tickets: return
+
+        lazy_ticket, ignore_range = self.lazy_tickets.pop(index)
+
+        self.progressBarInit()
+
+        try:
+            self.plot_ticket(lazy_ticket(), 100, index, ignore_range)
+        except Exception as exception:
+            QtWidgets.QMessageBox.critical(self, "Error", str(exception), QtWidgets.QMessageBox.Ok)
+
+            if self.IS_DEVELOP: raise exception
+
+        self.progressBarFinished()
+
+    def get_lazy_ticket_2D(self, calculation, **parameters):
+        def ticket():
+            e, h, v, i = calculation(**parameters)
+
+            return SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)])
+
+        return ticket
+
     def writeStdOut(self, text):
         cursor = self.srw_output.textCursor()
         cursor.movePosition(QtGui.QTextCursor.End)
@@ -8,10 +8,10 @@ from oasys.widgets import congruence
 from oasys.util.oasys_util import EmittingStream
 
 from wofrysrw.propagator.wavefront2D.srw_wavefront import WavefrontParameters, WavefrontPrecisionParameters
-from wofrysrw.storage_ring.light_sources.srw_bending_magnet_light_source import SRWBendingMagnetLightSource
 from wofrysrw.storage_ring.magnetic_structures.srw_bending_magnet import SRWBendingMagnet
 
 from orangecontrib.srw.util.srw_util import SRWPlot
+from orangecontrib.srw.util import srw_builders
 from orangecontrib.srw.widgets.gui.ow_srw_source import OWSRWSource
 
 from syned.storage_ring.magnetic_structures.bending_magnet import BendingMagnet
@@ -45,14 +45,7 @@ class OWSRWBendingMagnet(OWSRWSource):
         return -0.5*self.length # initial Longitudinal Coordinate
 
     def get_srw_source(self, electron_beam):
-
-        self.magnetic_radius = BendingMagnet.calculate_magnetic_radius(self.magnetic_field, electron_beam.electron_energy_in_GeV) if self.magnetic_radius == 0.0 else self.magnetic_radius
-        self.magnetic_field = BendingMagnet.calculate_magnetic_field(self.magnetic_radius, electron_beam.electron_energy_in_GeV) if self.magnetic_field == 0.0 else self.magnetic_field
-
-        return SRWBendingMagnetLightSource(electron_beam=electron_beam,
-                                           bending_magnet_magnetic_structure=SRWBendingMagnet(self.magnetic_radius,
-                                                                                              self.magnetic_field,
-                                                                                              self.length))
+        return srw_builders.get_bending_magnet_light_source(self, electron_beam)
 
     def print_specific_infos(self, srw_source):
         pass
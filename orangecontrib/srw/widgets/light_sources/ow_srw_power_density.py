@@ -20,6 +20,8 @@ from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUn
 
 from orangecontrib.srw.util.srw_util import SRWPlot
 from orangecontrib.srw.util.srw_objects import SRWData
+from orangecontrib.srw.util.srw_symmetry import Symmetry
+from orangecontrib.srw.util.srw_power_density import SRWMultiResolutionPowerDensity, calculate_power_density
 from orangecontrib.srw.widgets.gui.ow_srw_power_density_viewer import SRWPowerDensityViewer
 
 
@@ -63,6 +65,7 @@ class OWSRWPowerDensity(SRWPowerDensityViewer):
     int_h_slit_points=Setting(100)
     int_v_slit_points=Setting(100)
     int_distance = Setting(1.0)
+    int_symmetry = Setting(0)
 
     pow_precision_factor = Setting(1.5)
     pow_computation_method = Setting(1) 
@@ -70,6 +73,10 @@ class OWSRWPowerDensity(SRWPowerDensityViewer):
     pow_final_longitudinal_position = Setting(0.0) 
     pow_number_of_points_for_trajectory_calculation = Setting(20000)
 
+    pow_multi_resolution = Setting(0)
+    pow_coarse_factor = Setting(4)
+    pow_refinement_threshold = Setting(0.1)
+
     calculated_total_power = 0.0
 
     received_light_source = None
@@ -123,6 +130,21 @@ class OWSRWPowerDensity(SRWPowerDensityViewer):
         oasysgui.lineEdit(int_box, self, "int_v_slit_points", "V Slit Points", labelWidth=260, valueType=int, orientation="horizontal")
         oasysgui.lineEdit(int_box, self, "int_distance", "Propagation Distance [m]", labelWidth=260, valueType=float, orientation="horizontal")
 
+        gui.comboBox(int_box, self, "int_symmetry", label="Symmetry",
+                     items=Symmetry.tuple(), labelWidth=150,
+                     sendSelectedValue=False, orientation="horizontal")
+
+        gui.comboBox(int_box, self, "pow_multi_resolution", label="Multi-Resolution (Coarse to Fine)",
+                     items=["No", "Yes"], labelWidth=260, callback=self.set_multi_resolution,
+                     sendSelectedValue=False, orientation="horizontal")
+
+        self.box_multi_resolution = oasysgui.widgetBox(int_box, "", addSpace=False, orientation="vertical")
+
+        oasysgui.lineEdit(self.box_multi_resolution, self, "pow_coarse_factor", "Coarse Map Reduction Factor (per direction)", labelWidth=260, valueType=int, orientation="horizontal")
+        oasysgui.lineEdit(self.box_multi_resolution, self, "pow_refinement_threshold", "Refinement Threshold (fraction of peak)", labelWidth=260, valueType=float, orientation="horizontal")
+
+        self.set_multi_resolution()
+
         pre_box = oasysgui.widgetBox(tab_convolution, "Precision Parameters", addSpace=False, orientation="vertical")
 
         tabs_precision = oasysgui.tabWidget(pre_box)
@@ -141,6 +163,9 @@ class OWSRWPowerDensity(SRWPowerDensityViewer):
 
         gui.rubber(self.controlArea)
 
+    def set_multi_resolution(self):
+        self.box_multi_resolution.setVisible(self.pow_multi_resolution == 1)
+
     def calculateRadiation(self):
         if not self.received_light_source is None:
 
@@ -166,13 +191,13 @@ class OWSRWPowerDensity(SRWPowerDensityViewer):
 
                 tickets = []
 
-                self.run_calculation_intensity_power(srw_source, tickets)
+                status_message = self.run_calculation_intensity_power(srw_source, tickets)
 
                 self.setStatusMessage("Plotting Results")
 
                 self.plot_results(tickets)
 
-                self.setStatusMessage("")
+                self.setStatusMessage(status_message)
 
             except Exception as exception:
                 QMessageBox.critical(self, "Error", str(exception), QMessageBox.Ok)
@@ -254,6 +279,11 @@ class OWSRWPowerDensity(SRWPowerDensityViewer):
         congruence.checkStrictlyPositiveNumber(self.pow_precision_factor, "Intensity/Power Density Power - Precision Factor")
         congruence.checkStrictlyPositiveNumber(self.pow_number_of_points_for_trajectory_calculation, "Intensity/Power Density Power - Number of points for trajectory calculation")
 
+        if self.pow_multi_resolution == 1:
+            congruence.checkGreaterThan(self.pow_coarse_factor, 1, "Coarse Map Reduction Factor", "1")
+            congruence.checkPositiveNumber(self.pow_refinement_threshold, "Refinement Threshold")
+            congruence.checkLessOrEqualThan(self.pow_refinement_threshold, 1.0, "Refinement Threshold", "1")
+
 
     def run_calculation_intensity_power(self, srw_source, tickets, progress_bar_value=30):
         wf_parameters = WavefrontParameters(photon_energy_min = 0.0,
@@ -265,12 +295,25 @@ class OWSRWPowerDensity(SRWPowerDensityViewer):
                                             v_slit_points=self.int_v_slit_points,
                                             distance = self.int_distance)
 
-        h, v, p = srw_source.get_power_density(source_wavefront_parameters=wf_parameters,
-                                               power_density_precision_parameters=PowerDensityPrecisionParameters(precision_factor=self.pow_precision_factor,
-                                                                                                                  computation_method=self.pow_computation_method,
-                                                                                                                  initial_longitudinal_position=self.pow_initial_longitudinal_position,
-                                                                                                                  final_longitudinal_position=self.pow_final_longitudinal_position,
-                                                                                                                  number_of_points_for_trajectory_calculation=self.pow_number_of_points_for_trajectory_calculation))
+        power_density_precision_parameters = PowerDensityPrecisionParameters(precision_factor=self.pow_precision_factor,
+                                                                             computation_method=self.pow_computation_method,
+                                                                             initial_longitudinal_position=self.pow_initial_longitudinal_position,
+                                                                             final_longitudinal_position=self.pow_final_longitudinal_position,
+                                                                             number_of_points_for_trajectory_calculation=self.pow_number_of_points_for_trajectory_calculation)
+
+        if self.pow_multi_resolution == 0:
+            h, v, p = calculate_power_density(srw_source, wf_parameters, power_density_precision_parameters, self.int_symmetry)
+
+            status_message = ""
+        else:
+            multi_resolution_power_density = SRWMultiResolutionPowerDensity(srw_source, wf_parameters, power_density_precision_parameters,
+                                                                            coarse_factor=self.pow_coarse_factor,
+                                                                            threshold=self.pow_refinement_threshold,
+                                                                            symmetry_index=self.int_symmetry)
+
+            h, v, p = multi_resolution_power_density.run()
+
+            status_message = "Multi-Resolution: " + str(round(100*multi_resolution_power_density.get_calculated_points_fraction(), 1)) + "% of the points calculated"
 
         self.calculated_total_power = SRWLightSource.get_total_power_from_power_density(h, v, p)
 
@@ -280,6 +323,8 @@ class OWSRWPowerDensity(SRWPowerDensityViewer):
 
         self.progressBarSet(progress_bar_value + 10)
 
+        return status_message
+
     def getVariablesToPlot(self):
         return [[1, 2]]
 
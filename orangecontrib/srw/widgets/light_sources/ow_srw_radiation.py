@@ -21,6 +21,7 @@ from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUn
 
 from orangecontrib.srw.util.srw_util import SRWPlot
 from orangecontrib.srw.util.srw_objects import SRWData
+from orangecontrib.srw.util.srw_symmetry import Symmetry, get_symmetric_mesh
 from orangecontrib.srw.widgets.gui.ow_srw_power_density_viewer import SRWPowerDensityViewer
 
 class OWSRWRadiation(SRWPowerDensityViewer):
@@ -66,6 +67,7 @@ class OWSRWRadiation(SRWPowerDensityViewer):
     int_h_slit_points=Setting(100)
     int_v_slit_points=Setting(100)
     int_distance = Setting(1.0)
+    int_symmetry = Setting(0)
 
     int_sr_method = Setting(1)  
     int_relative_precision = Setting(0.01) 
@@ -131,6 +133,10 @@ class OWSRWRadiation(SRWPowerDensityViewer):
         oasysgui.lineEdit(int_box, self, "int_v_slit_points", "V Slit Points", labelWidth=260, valueType=int, orientation="horizontal")
         oasysgui.lineEdit(int_box, self, "int_distance", "Propagation Distance [m]", labelWidth=260, valueType=float, orientation="horizontal")
 
+        gui.comboBox(int_box, self, "int_symmetry", label="Symmetry",
+                     items=Symmetry.tuple(), labelWidth=150,
+                     sendSelectedValue=False, orientation="horizontal")
+
         pre_box = oasysgui.widgetBox(tab_convolution, "Precision Parameters", addSpace=False, orientation="vertical")
 
         tabs_precision = oasysgui.tabWidget(pre_box)
@@ -179,13 +185,13 @@ class OWSRWRadiation(SRWPowerDensityViewer):
 
                 tickets = []
 
-                self.run_calculation_intensity_power(srw_source, tickets)
+                status_message = self.run_calculation_intensity_power(srw_source, tickets)
 
                 self.setStatusMessage("Plotting Results")
 
                 self.plot_results(tickets)
 
-                self.setStatusMessage("")
+                self.setStatusMessage(status_message)
 
             except Exception as exception:
                 QMessageBox.critical(self, "Error", str(exception), QMessageBox.Ok)
@@ -296,14 +302,26 @@ class OWSRWRadiation(SRWPowerDensityViewer):
                                                                                                         use_terminating_terms=self.int_use_terminating_terms,
                                                                                                         sampling_factor_for_adjusting_nx_ny=self.int_sampling_factor_for_adjusting_nx_ny))
 
-        srw_wavefront = srw_source.get_SRW_Wavefront(source_wavefront_parameters=wf_parameters)
+        symmetric_mesh = get_symmetric_mesh(self.int_symmetry, srw_source, wf_parameters)
 
-        e, h, v, i_se = srw_wavefront.get_intensity(multi_electron=False)
+        if not symmetric_mesh is None:
+            status_message = "Symmetric Calculation: " + str(round(symmetric_mesh.get_reduction_factor(), 2)) + " times fewer points"
+        elif self.int_symmetry != 0 and self.int_sampling_factor_for_adjusting_nx_ny > 0:
+            status_message = "Symmetric Calculation not available with Sampling Factor for adjusting nx/ny > 0"
+        else:
+            status_message = ""
 
-        tickets.append((i_se, e, h*1e3, v*1e3))
+        srw_wavefront = srw_source.get_SRW_Wavefront(source_wavefront_parameters=wf_parameters if symmetric_mesh is None else symmetric_mesh.get_reduced_wavefront_parameters())
 
+        e, h, v, i_se = srw_wavefront.get_intensity(multi_electron=False)
         e, h, v, i_me = srw_wavefront.get_intensity(multi_electron=True)
 
+        if not symmetric_mesh is None:
+            h, v = symmetric_mesh.get_coordinates()
+            i_se = symmetric_mesh.mirror(i_se)
+            i_me = symmetric_mesh.mirror(i_me)
+
+        tickets.append((i_se, e, h*1e3, v*1e3))
         tickets.append((i_me, e, h*1e3, v*1e3))
 
         if len(e) > 1: energy_step = e[1]-e[0]
@@ -320,6 +338,8 @@ class OWSRWRadiation(SRWPowerDensityViewer):
 
         self.progressBarSet(progress_bar_value + 10)
 
+        return status_message
+
     def getVariablesToPlot(self):
         return [[1, 2], [1, 2], [1, 2]]
 
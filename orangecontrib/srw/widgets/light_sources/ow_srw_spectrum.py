@@ -22,6 +22,7 @@ from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import FluxP
 
 from orangecontrib.srw.util.srw_util import SRWPlot
 from orangecontrib.srw.util.srw_objects import SRWData
+from orangecontrib.srw.util.srw_spectrum import SRWSpectrumCalculator
 from orangecontrib.srw.widgets.gui.ow_srw_wavefront_viewer import SRWWavefrontViewer
 
 class OWSRWSpectrum(SRWWavefrontViewer):
@@ -66,6 +67,7 @@ class OWSRWSpectrum(SRWWavefrontViewer):
     spe_photon_energy_min = Setting(100.0)
     spe_photon_energy_max = Setting(100100.0)
     spe_photon_energy_points=Setting(10000)
+    spe_energy_sampling = Setting(0)
     spe_h_slit_gap = Setting(0.0001)
     spe_v_slit_gap =Setting( 0.0001)
     spe_h_slit_points=Setting(1)
@@ -88,6 +90,8 @@ class OWSRWSpectrum(SRWWavefrontViewer):
     spe_longitudinal_integration_precision_parameter = Setting(1.5)
     spe_azimuthal_integration_precision_parameter = Setting(1.5)
 
+    spe_number_of_processes = Setting(0)
+
     calculated_total_power = 0.0
 
     received_light_source = None
@@ -132,6 +136,11 @@ class OWSRWSpectrum(SRWWavefrontViewer):
         oasysgui.lineEdit(spe_box, self, "spe_photon_energy_min", "Photon Energy Min [eV]", labelWidth=260, valueType=float, orientation="horizontal")
         oasysgui.lineEdit(spe_box, self, "spe_photon_energy_max", "Photon Energy Max [eV]", labelWidth=260, valueType=float, orientation="horizontal")
         oasysgui.lineEdit(spe_box, self, "spe_photon_energy_points", "Photon Energy Points", labelWidth=260, valueType=int, orientation="horizontal")
+
+        gui.comboBox(spe_box, self, "spe_energy_sampling", label="Energy Sampling",
+                     items=["Uniform", "Adaptive (Points = Budget)"], labelWidth=200,
+                     sendSelectedValue=False, orientation="horizontal")
+
         oasysgui.lineEdit(spe_box, self, "spe_h_slit_gap", "H Slit Gap [m]", labelWidth=260, valueType=float, orientation="horizontal")
         oasysgui.lineEdit(spe_box, self, "spe_v_slit_gap", "V Slit Gap [m]", labelWidth=260, valueType=float, orientation="horizontal")
 
@@ -170,6 +179,8 @@ class OWSRWSpectrum(SRWWavefrontViewer):
 
         oasysgui.lineEdit(tab_prop, self, "spe_sampling_factor_for_adjusting_nx_ny", "Sampling factor for adjusting nx/ny", labelWidth=260, valueType=int, orientation="horizontal")
 
+        oasysgui.lineEdit(tab_prop, self, "spe_number_of_processes", "Nr. of Local Processes (0 = all CPUs)", labelWidth=260, valueType=int, orientation="horizontal")
+
         # FLUX  -------------------------------------------
 
         gui.rubber(self.controlArea)
@@ -199,13 +210,13 @@ class OWSRWSpectrum(SRWWavefrontViewer):
 
                 tickets = []
 
-                self.run_calculation_flux(srw_source, tickets)
+                status_message = self.run_calculation_flux(srw_source, tickets)
 
                 self.setStatusMessage("Plotting Results")
 
                 self.plot_results(tickets)
 
-                self.setStatusMessage("")
+                self.setStatusMessage(status_message)
 
                 self.send("srw_data", self.create_exchange_data(tickets))
 
@@ -297,6 +308,7 @@ class OWSRWSpectrum(SRWWavefrontViewer):
         congruence.checkStrictlyPositiveNumber(self.spe_relative_precision, "Relative Precision")
         congruence.checkStrictlyPositiveNumber(self.spe_number_of_points_for_trajectory_calculation, "Number of points for trajectory calculation")
         congruence.checkPositiveNumber(self.spe_sampling_factor_for_adjusting_nx_ny, "Sampling Factor for adjusting nx/ny")
+        congruence.checkPositiveNumber(self.spe_number_of_processes, "Nr. of Local Processes")
 
         self.checkFluxSpecificFields()
 
@@ -327,46 +339,69 @@ class OWSRWSpectrum(SRWWavefrontViewer):
                                                                                                         sampling_factor_for_adjusting_nx_ny=self.spe_sampling_factor_for_adjusting_nx_ny))
 
 
-        srw_wavefront = srw_source.get_SRW_Wavefront(source_wavefront_parameters=wf_parameters)
-
-        if isinstance(self.received_light_source, SRWBendingMagnetLightSource):
-            e, i = srw_wavefront.get_flux(multi_electron=True, polarization_component_to_be_extracted=self.spe_polarization_component_to_be_extracted)
-        elif isinstance(self.received_light_source, SRWUndulatorLightSource):
-            e, i = srw_source.get_undulator_flux(source_wavefront_parameters=wf_parameters,
-                                                 flux_precision_parameters=FluxPrecisionParameters(initial_UR_harmonic=self.spe_initial_UR_harmonic,
-                                                                                                   final_UR_harmonic=self.spe_final_UR_harmonic,
-                                                                                                   longitudinal_integration_precision_parameter=self.spe_longitudinal_integration_precision_parameter,
-                                                                                                   azimuthal_integration_precision_parameter=self.spe_azimuthal_integration_precision_parameter,
-                                                                                                   calculation_type=1))
-
-        tickets.append(SRWPlot.get_ticket_1D(e, i))
+        if isinstance(self.received_light_source, SRWUndulatorLightSource):
+            flux_precision_parameters = FluxPrecisionParameters(initial_UR_harmonic=self.spe_initial_UR_harmonic,
+                                                                final_UR_harmonic=self.spe_final_UR_harmonic,
+                                                                longitudinal_integration_precision_parameter=self.spe_longitudinal_integration_precision_parameter,
+                                                                azimuthal_integration_precision_parameter=self.spe_azimuthal_integration_precision_parameter,
+                                                                calculation_type=1)
+        else:
+            flux_precision_parameters = None
+
+        on_axis_wf_parameters = WavefrontParameters(photon_energy_min = self.spe_photon_energy_min,
+                                                    photon_energy_max = self.spe_photon_energy_max,
+                                                    photon_energy_points=self.spe_photon_energy_points,
+                                                    h_slit_gap = 0.0,
+                                                    v_slit_gap = 0.0,
+                                                    h_slit_points = 1,
+                                                    v_slit_points = 1,
+                                                    h_position=self.spe_on_axis_x,
+                                                    v_position=self.spe_on_axis_y,
+                                                    distance = self.spe_distance,
+                                                    wavefront_precision_parameters=WavefrontPrecisionParameters(sr_method=0 if self.spe_sr_method == 0 else self.get_automatic_sr_method(),
+                                                                                                                relative_precision=self.spe_relative_precision,
+                                                                                                                start_integration_longitudinal_position=self.spe_start_integration_longitudinal_position,
+                                                                                                                end_integration_longitudinal_position=self.spe_end_integration_longitudinal_position,
+                                                                                                                number_of_points_for_trajectory_calculation=self.spe_number_of_points_for_trajectory_calculation,
+                                                                                                                use_terminating_terms=self.spe_use_terminating_terms,
+                                                                                                                sampling_factor_for_adjusting_nx_ny=self.spe_sampling_factor_for_adjusting_nx_ny))
+
+        # the flux through the finite aperture and the on-axis spectrum are calculated concurrently, in energy chunks
+        spectrum_calculator = SRWSpectrumCalculator(srw_source,
+                                                    spectra=[(wf_parameters, flux_precision_parameters, True),
+                                                             (on_axis_wf_parameters, None, False)],
+                                                    polarization_component_to_be_extracted=self.spe_polarization_component_to_be_extracted,
+                                                    number_of_processes=self.spe_number_of_processes)
+
+        progress_callback = lambda completed, total: self.progressBarSet(20 + (progress_bar_value - 20)*completed/total)
+
+        if self.spe_energy_sampling == 0:
+            spectra = spectrum_calculator.run(progress_callback=progress_callback)
+
+            status_message = ""
+        else:
+            # the harmonic peaks are narrow (natural width E1/N) and shifted to lower energies by emittance and aperture
+            if isinstance(self.received_light_source, SRWUndulatorLightSource):
+                resonance_energy = srw_source.get_resonance_energy()
+                harmonic_width = resonance_energy/srw_source._magnetic_structure._number_of_periods
 
-        wf_parameters = WavefrontParameters(photon_energy_min = self.spe_photon_energy_min,
-                                            photon_energy_max = self.spe_photon_energy_max,
-                                            photon_energy_points=self.spe_photon_energy_points,
-                                            h_slit_gap = 0.0,
-                                            v_slit_gap = 0.0,
-                                            h_slit_points = 1,
-                                            v_slit_points = 1,
-                                            h_position=self.spe_on_axis_x,
-                                            v_position=self.spe_on_axis_y,
-                                            distance = self.spe_distance,
-                                            wavefront_precision_parameters=WavefrontPrecisionParameters(sr_method=0 if self.spe_sr_method == 0 else self.get_automatic_sr_method(),
-                                                                                                        relative_precision=self.spe_relative_precision,
-                                                                                                        start_integration_longitudinal_position=self.spe_start_integration_longitudinal_position,
-                                                                                                        end_integration_longitudinal_position=self.spe_end_integration_longitudinal_position,
-                                                                                                        number_of_points_for_trajectory_calculation=self.spe_number_of_points_for_trajectory_calculation,
-                                                                                                        use_terminating_terms=self.spe_use_terminating_terms,
-                                                                                                        sampling_factor_for_adjusting_nx_ny=self.spe_sampling_factor_for_adjusting_nx_ny))
+                harmonic_energies = [harmonic*resonance_energy for harmonic in range(self.spe_initial_UR_harmonic, self.spe_final_UR_harmonic + 1)]
+                harmonic_window = (2*harmonic_width, harmonic_width)
+            else:
+                harmonic_energies = []
+                harmonic_window = (0.0, 0.0)
 
-        srw_wavefront = srw_source.get_SRW_Wavefront(source_wavefront_parameters=wf_parameters)
+            spectra = spectrum_calculator.run_adaptive(harmonic_energies=harmonic_energies, harmonic_window=harmonic_window, progress_callback=progress_callback)
 
-        e, i = srw_wavefront.get_flux(multi_electron=False, polarization_component_to_be_extracted=self.spe_polarization_component_to_be_extracted)
+            status_message = "Adaptive Energy Sampling: " + str(spectra[0][0].size) + " SRW evaluations per spectrum"
 
-        tickets.append(SRWPlot.get_ticket_1D(e, i))
+        for e, i in spectra:
+            tickets.append(SRWPlot.get_ticket_1D(e, i))
 
         self.progressBarSet(progress_bar_value)
 
+        return status_message
+
     def create_exchange_data(self, tickets):
         ticket = tickets[0]
 
@@ -382,7 +417,18 @@ class OWSRWSpectrum(SRWWavefrontViewer):
         data[:, 1] = numpy.array(f)
 
         calculated_data = DataExchangeObject(program_name="SRW", widget_name="UNDULATOR_SPECTRUM")
-        calculated_data.add_content("srw_data", data)
+
+        if self.spe_energy_sampling == 0:
+            calculated_data.add_content("srw_data", data)
+        else:
+            # the receiving widgets expect a uniform energy grid: the adaptive spectrum is interpolated on the
+            # uniform grid of the same number of points, and sent as calculated as well
+            uniform_data = numpy.zeros((self.spe_photon_energy_points, 2))
+            uniform_data[:, 0] = numpy.linspace(data[0, 0], data[-1, 0], self.spe_photon_energy_points)
+            uniform_data[:, 1] = numpy.interp(uniform_data[:, 0], data[:, 0], data[:, 1])
+
+            calculated_data.add_content("srw_data", uniform_data)
+            calculated_data.add_content("srw_data_adaptive", data)
 
         return calculated_data
 
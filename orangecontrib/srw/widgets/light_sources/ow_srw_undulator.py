@@ -1,24 +1,24 @@
 import sys, os, numpy
 
-from PyQt5.QtWidgets import QApplication, QDialog, QVBoxLayout, QLabel, QDialogButtonBox
+from PyQt5.QtWidgets import QApplication, QDialog, QVBoxLayout, QLabel, QDialogButtonBox, QMessageBox
 from PyQt5.QtGui import QPixmap, QPalette, QColor, QFont
 import orangecanvas.resources as resources
 from orangewidget import gui
 from orangewidget.settings import Setting
 from oasys.widgets import gui as oasysgui
 from oasys.widgets import congruence
+from oasys.widgets.exchange import DataExchangeObject
+from oasys.util.oasys_util import EmittingStream
 
 from syned.storage_ring.magnetic_structures.undulator import Undulator
 
-from wofrysrw.storage_ring.light_sources.srw_undulator_light_source import SRWUndulatorLightSource
-from wofrysrw.storage_ring.magnetic_structures.srw_undulator import SRWUndulator
+from wofrysrw.propagator.wavefront2D.srw_wavefront import WavefrontParameters
 
+from orangecontrib.srw.util import srw_builders
+from orangecontrib.srw.util.srw_tuning_curve import SRWTuningCurveCalculator, get_K_from_magnetic_field, get_magnetic_field_from_gap, \
+    get_resonance_energy, get_K_vertical_from_resonance_energy
 from orangecontrib.srw.widgets.gui.ow_srw_source import OWSRWSource
 
-import scipy.constants as codata
-
-m2ev = codata.c * codata.h / codata.e
-
 class OWSRWUndulator(OWSRWSource):
 
     name = "Undulator"
@@ -26,6 +26,10 @@ class OWSRWUndulator(OWSRWSource):
     icon = "icons/undulator.png"
     priority = 2
 
+    outputs = OWSRWSource.outputs + [{"name": "srw_data",
+                                      "type": DataExchangeObject,
+                                      "doc": "Tuning Curve"}]
+
     magnetic_field_from = Setting(0)
 
     B_horizontal = Setting(0.0)
@@ -55,6 +59,22 @@ class OWSRWUndulator(OWSRWSource):
     auto_energy = Setting(0.0)
     auto_harmonic_number = Setting(1)
 
+    tc_scan_variable = Setting(0)
+    tc_K_min = Setting(0.1)
+    tc_K_max = Setting(2.5)
+    tc_gap_min = Setting(0.005)
+    tc_gap_max = Setting(0.02)
+    tc_gap_a = Setting(3.694)
+    tc_gap_b = Setting(-5.068)
+    tc_gap_c = Setting(1.520)
+    tc_points = Setting(100)
+    tc_harmonics = Setting("1, 3, 5")
+    tc_calculate_flux = Setting(1)
+    tc_h_slit_gap = Setting(0.001)
+    tc_v_slit_gap = Setting(0.001)
+    tc_distance = Setting(30.0)
+    tc_number_of_processes = Setting(0)
+
     def __init__(self):
         super().__init__()
 
@@ -120,6 +140,45 @@ class OWSRWUndulator(OWSRWSource):
 
         gui.button(left_box_1, self, "Set Kv value", callback=self.auto_set_undulator)
 
+        left_box_2 = oasysgui.widgetBox(tab_util, "Tuning Curve", addSpace=False, orientation="vertical")
+
+        gui.comboBox(left_box_2, self, "tc_scan_variable", label="Scan", labelWidth=250,
+                     items=["K", "Gap"], callback=self.set_TCScanVariable,
+                     sendSelectedValue=False, orientation="horizontal")
+
+        self.tc_scan_box_1 = oasysgui.widgetBox(left_box_2, "", addSpace=False, orientation="vertical")
+
+        oasysgui.lineEdit(self.tc_scan_box_1, self, "tc_K_min", "K Min", labelWidth=250, valueType=float, orientation="horizontal")
+        oasysgui.lineEdit(self.tc_scan_box_1, self, "tc_K_max", "K Max", labelWidth=250, valueType=float, orientation="horizontal")
+
+        self.tc_scan_box_2 = oasysgui.widgetBox(left_box_2, "", addSpace=False, orientation="vertical")
+
+        oasysgui.lineEdit(self.tc_scan_box_2, self, "tc_gap_min", "Gap Min [m]", labelWidth=250, valueType=float, orientation="horizontal")
+        oasysgui.lineEdit(self.tc_scan_box_2, self, "tc_gap_max", "Gap Max [m]", labelWidth=250, valueType=float, orientation="horizontal")
+        oasysgui.lineEdit(self.tc_scan_box_2, self, "tc_gap_a", "B = a exp(b g/λ + c (g/λ)²) [T]: a", labelWidth=250, valueType=float, orientation="horizontal")
+        oasysgui.lineEdit(self.tc_scan_box_2, self, "tc_gap_b", "b", labelWidth=250, valueType=float, orientation="horizontal")
+        oasysgui.lineEdit(self.tc_scan_box_2, self, "tc_gap_c", "c", labelWidth=250, valueType=float, orientation="horizontal")
+
+        self.set_TCScanVariable()
+
+        oasysgui.lineEdit(left_box_2, self, "tc_points", "Points", labelWidth=250, valueType=int, orientation="horizontal")
+        oasysgui.lineEdit(left_box_2, self, "tc_harmonics", "Harmonics (e.g. 1, 3, 5)", labelWidth=200, valueType=str, orientation="horizontal")
+
+        gui.comboBox(left_box_2, self, "tc_calculate_flux", label="Calculate Flux and Brilliance", labelWidth=250,
+                     items=["No", "Yes"], callback=self.set_TCCalculateFlux,
+                     sendSelectedValue=False, orientation="horizontal")
+
+        self.tc_flux_box = oasysgui.widgetBox(left_box_2, "", addSpace=False, orientation="vertical")
+
+        oasysgui.lineEdit(self.tc_flux_box, self, "tc_h_slit_gap", "H Slit Gap [m]", labelWidth=250, valueType=float, orientation="horizontal")
+        oasysgui.lineEdit(self.tc_flux_box, self, "tc_v_slit_gap", "V Slit Gap [m]", labelWidth=250, valueType=float, orientation="horizontal")
+        oasysgui.lineEdit(self.tc_flux_box, self, "tc_distance", "Distance [m]", labelWidth=250, valueType=float, orientation="horizontal")
+        oasysgui.lineEdit(self.tc_flux_box, self, "tc_number_of_processes", "Nr. of Local Processes (0 = all CPUs)", labelWidth=250, valueType=int, orientation="horizontal")
+
+        self.set_TCCalculateFlux()
+
+        gui.button(left_box_2, self, "Calculate Tuning Curve", callback=self.calculate_tuning_curve)
+
 
         gui.rubber(self.controlArea)
         gui.rubber(self.mainArea)
@@ -184,20 +243,116 @@ class OWSRWUndulator(OWSRWSource):
 
         self.set_harmonic_energy()
 
+    def set_TCScanVariable(self):
+        self.tc_scan_box_1.setVisible(self.tc_scan_variable==0)
+        self.tc_scan_box_2.setVisible(self.tc_scan_variable==1)
+
+    def set_TCCalculateFlux(self):
+        self.tc_flux_box.setVisible(self.tc_calculate_flux==1)
+
     def auto_set_undulator(self):
         congruence.checkStrictlyPositiveNumber(self.auto_energy, "Set Undulator at Energy")
         congruence.checkStrictlyPositiveNumber(self.auto_harmonic_number, "As Harmonic #")
         congruence.checkStrictlyPositiveNumber(self.electron_energy_in_GeV, "Energy")
         congruence.checkStrictlyPositiveNumber(self.period_length, "Period Length")
 
-        wavelength = self.auto_harmonic_number*m2ev/self.auto_energy
-
         self.magnetic_field_from = 0
-        self.K_vertical = round(numpy.sqrt(2 * (((wavelength * 2 * self.__gamma() ** 2) / self.period_length) - 1)), 6)
+        self.K_vertical = round(float(get_K_vertical_from_resonance_energy(self.electron_energy_in_GeV, self.period_length, self.auto_energy, self.auto_harmonic_number)), 6)
         self.K_horizontal = 0
 
         self.set_MagneticField()
 
+    def calculate_tuning_curve(self):
+        self.setStatusMessage("")
+        self.progressBarInit()
+
+        try:
+            self.checkFields()
+            self.checkTuningCurveFields()
+
+            harmonics = self.get_tuning_curve_harmonics()
+
+            if self.tc_scan_variable == 0:
+                gap_values = None
+                K_values = numpy.linspace(self.tc_K_min, self.tc_K_max, self.tc_points)
+            else:
+                gap_values = numpy.linspace(self.tc_gap_min, self.tc_gap_max, self.tc_points)
+                K_values = get_K_from_magnetic_field(get_magnetic_field_from_gap(gap_values, self.period_length, self.tc_gap_a, self.tc_gap_b, self.tc_gap_c), self.period_length)
+
+            if self.tc_calculate_flux == 1:
+                wavefront_parameters = WavefrontParameters(h_slit_gap=self.tc_h_slit_gap,
+                                                           v_slit_gap=self.tc_v_slit_gap,
+                                                           h_slit_points=1,
+                                                           v_slit_points=1,
+                                                           distance=self.tc_distance)
+            else:
+                wavefront_parameters = None
+
+            srw_source = self.get_srw_source(self.get_electron_beam())
+
+            self.setStatusMessage("Running SRW")
+
+            sys.stdout = EmittingStream(textWritten=self.writeStdOut)
+
+            self.progressBarSet(10)
+
+            tuning_curve_calculator = SRWTuningCurveCalculator(srw_source,
+                                                               K_values=K_values,
+                                                               harmonics=harmonics,
+                                                               wavefront_parameters=wavefront_parameters,
+                                                               gap_values=gap_values,
+                                                               number_of_processes=self.tc_number_of_processes)
+
+            table = tuning_curve_calculator.run(progress_callback=lambda completed, total: self.progressBarSet(10 + 80*completed/total))
+
+            print("\n" + "  ".join(SRWTuningCurveCalculator.COLUMNS))
+            for row in table: print("  ".join("%.6g" % value for value in row))
+
+            self.setStatusMessage("")
+
+            self.send("srw_data", self.create_exchange_data(table))
+        except Exception as exception:
+            QMessageBox.critical(self, "Error", str(exception), QMessageBox.Ok)
+
+            if self.IS_DEVELOP: raise exception
+
+        self.progressBarFinished()
+
+    def checkTuningCurveFields(self):
+        if self.tc_scan_variable == 0:
+            congruence.checkPositiveNumber(self.tc_K_min, "Tuning Curve K Min")
+            congruence.checkGreaterOrEqualThan(self.tc_K_max, self.tc_K_min, "Tuning Curve K Max", "Tuning Curve K Min")
+        else:
+            congruence.checkStrictlyPositiveNumber(self.tc_gap_min, "Tuning Curve Gap Min")
+            congruence.checkGreaterOrEqualThan(self.tc_gap_max, self.tc_gap_min, "Tuning Curve Gap Max", "Tuning Curve Gap Min")
+            congruence.checkStrictlyPositiveNumber(self.tc_gap_a, "Tuning Curve Gap Coefficient a")
+
+        congruence.checkStrictlyPositiveNumber(self.tc_points, "Tuning Curve Points")
+
+        if self.tc_calculate_flux == 1:
+            congruence.checkStrictlyPositiveNumber(self.tc_h_slit_gap, "Tuning Curve H Slit Gap")
+            congruence.checkStrictlyPositiveNumber(self.tc_v_slit_gap, "Tuning Curve V Slit Gap")
+            congruence.checkGreaterOrEqualThan(self.tc_distance, self.get_minimum_propagation_distance(),
+                                               "Tuning Curve Distance", "Minimum Distance out of the Source: " + str(self.get_minimum_propagation_distance()))
+            congruence.checkPositiveNumber(self.tc_number_of_processes, "Tuning Curve Nr. of Local Processes")
+
+    def get_tuning_curve_harmonics(self):
+        try:
+            harmonics = [int(harmonic) for harmonic in str(self.tc_harmonics).replace(",", " ").split()]
+        except ValueError:
+            harmonics = []
+
+        if len(harmonics) == 0 or min(harmonics) <= 0: raise ValueError("Tuning Curve Harmonics should be a list of positive integers")
+
+        return harmonics
+
+    def create_exchange_data(self, table):
+        calculated_data = DataExchangeObject(program_name="SRW", widget_name="UNDULATOR_TUNING_CURVE")
+        calculated_data.add_content("srw_data", table)
+        calculated_data.add_content("labels", SRWTuningCurveCalculator.COLUMNS)
+
+        return calculated_data
+
     def set_harmonic_energy(self):
         if self.wf_use_harmonic==0:
             self.wf_harmonic_energy = round(self.__resonance_energy(harmonic=self.wf_harmonic_number), 2)
@@ -211,36 +366,7 @@ class OWSRWUndulator(OWSRWSource):
         return -0.5*self.period_length*(self.number_of_periods + 4) # initial Longitudinal Coordinate (set before the ID)
 
     def get_srw_source(self, electron_beam):
-        symmetry_vs_longitudinal_position_horizontal = 1 if self.symmetry_vs_longitudinal_position_horizontal == 0 else -1
-        symmetry_vs_longitudinal_position_vertical = 1 if self.symmetry_vs_longitudinal_position_vertical == 0 else -1
-
-        if self.magnetic_field_from == 0:
-            undulator_magnetic_structure=SRWUndulator(horizontal_central_position = self.horizontal_central_position,
-                                                      vertical_central_position = self.vertical_central_position,
-                                                      longitudinal_central_position=self.longitudinal_central_position,
-                                                      K_vertical=self.K_vertical,
-                                                      K_horizontal=self.K_horizontal,
-                                                      period_length=self.period_length,
-                                                      number_of_periods=self.number_of_periods,
-                                                      initial_phase_horizontal=self.initial_phase_horizontal,
-                                                      initial_phase_vertical=self.initial_phase_vertical,
-                                                      symmetry_vs_longitudinal_position_horizontal=symmetry_vs_longitudinal_position_horizontal,
-                                                      symmetry_vs_longitudinal_position_vertical=symmetry_vs_longitudinal_position_vertical)
-        else:
-            undulator_magnetic_structure=SRWUndulator(horizontal_central_position = self.horizontal_central_position,
-                                                      vertical_central_position = self.vertical_central_position,
-                                                      longitudinal_central_position=self.longitudinal_central_position,
-                                                      period_length=self.period_length,
-                                                      number_of_periods=self.number_of_periods,
-                                                      initial_phase_horizontal=self.initial_phase_horizontal,
-                                                      initial_phase_vertical=self.initial_phase_vertical,
-                                                      symmetry_vs_longitudinal_position_horizontal=symmetry_vs_longitudinal_position_horizontal,
-                                                      symmetry_vs_longitudinal_position_vertical=symmetry_vs_longitudinal_position_vertical)
-            undulator_magnetic_structure.set_K_vertical_from_magnetic_field(self.B_vertical)
-            undulator_magnetic_structure.set_K_horizontal_from_magnetic_field(self.B_horizontal)
-
-        return SRWUndulatorLightSource(electron_beam=electron_beam,
-                                       undulator_magnetic_structure=undulator_magnetic_structure)
+        return srw_builders.get_undulator_light_source(self, electron_beam)
 
     def print_specific_infos(self, srw_source):
         print("1st Harmonic Energy", srw_source.get_resonance_energy(), "\n")
@@ -249,7 +375,7 @@ class OWSRWUndulator(OWSRWSource):
         return 1
 
     def get_photon_energy_for_wavefront_propagation(self, srw_source):
-        return self.wf_photon_energy if self.wf_use_harmonic == 1 else srw_source.get_resonance_energy()*self.wf_harmonic_number
+        return srw_builders.get_undulator_photon_energy(self, srw_source)
 
     def get_source_length(self):
         return self.period_length*self.number_of_periods
@@ -285,26 +411,12 @@ class OWSRWUndulator(OWSRWSource):
         else:
             raise ValueError("Syned data not correct")
 
-    def __gamma(self):
-        return 1e9*self.electron_energy_in_GeV / (codata.m_e *  codata.c**2 / codata.e)
-
-    def __K_from_magnetic_field(self, B):
-        return B /(2 * numpy.pi * codata.m_e * codata.c / (codata.e * self.period_length))
-
     def __resonance_energy(self, theta_x=0.0, theta_z=0.0, harmonic=1):
         if self.magnetic_field_from == 1:
-            self.K_vertical   = self.__K_from_magnetic_field(self.B_vertical)
-            self.K_horizontal = self.__K_from_magnetic_field(self.B_horizontal)
-
-        gamma = self.__gamma()
-
-        wavelength = (self.period_length / (2.0*gamma **2)) * \
-                     (1 + self.K_vertical**2 / 2.0 + self.K_horizontal**2 / 2.0 + \
-                      gamma**2 * (theta_x**2 + theta_z ** 2))
-
-        wavelength /= harmonic
+            self.K_vertical   = get_K_from_magnetic_field(self.B_vertical, self.period_length)
+            self.K_horizontal = get_K_from_magnetic_field(self.B_horizontal, self.period_length)
 
-        return m2ev/wavelength
+        return float(get_resonance_energy(self.electron_energy_in_GeV, self.period_length, self.K_vertical, self.K_horizontal, harmonic, theta_x, theta_z))
 
 
 if __name__ == "__main__":
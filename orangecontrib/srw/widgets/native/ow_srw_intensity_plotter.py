@@ -29,6 +29,7 @@ class OWSRWIntensityPlotter(SRWWavefrontViewer):
     TABS_AREA_HEIGHT = 618
 
     intensity_file_name = Setting("<file_intensity>.dat")
+    keep_binary_cache = Setting(0)
 
     is_final_screen = True
     view_type = 1
@@ -67,6 +68,8 @@ class OWSRWIntensityPlotter(SRWWavefrontViewer):
         self.le_intensity_file_name = oasysgui.lineEdit(file_box, self, "intensity_file_name", "Intensity File", labelWidth=105, valueType=str, orientation="horizontal")
         gui.button(file_box, self, "...", callback=self.selectIntensityFile)
 
+        gui.comboBox(self.tab_bas, self, "keep_binary_cache", label="Keep binary cache (.npy next to the file)", items=["No", "Yes"], labelWidth=260, orientation="horizontal")
+
         gui.separator(self.tab_bas)
 
         view_box_1 = oasysgui.widgetBox(self.tab_bas, "Plot Setting", addSpace=False, orientation="vertical")
@@ -116,7 +119,7 @@ class OWSRWIntensityPlotter(SRWWavefrontViewer):
 
             tickets = []
 
-            x, y, intensity = native_util.load_intensity_file(self.intensity_file_name)
+            x, y, intensity = native_util.load_intensity_file(self.intensity_file_name, use_cache=self.keep_binary_cache == 1)
 
             tickets.append(SRWPlot.get_ticket_2D(x*1000, y*1000, intensity))
 
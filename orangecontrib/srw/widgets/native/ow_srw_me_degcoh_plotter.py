@@ -31,6 +31,7 @@ class OWSRWDegCohPlotter(SRWWavefrontViewer):
     horizontal_cut_file_name = Setting("<file_me_degcoh>.dat.1")
     vertical_cut_file_name = Setting("<file_me_degcoh>.dat.2")
     mode = Setting(0)
+    keep_binary_cache = Setting(0)
 
     is_final_screen = True
     view_type = 1
@@ -77,6 +78,8 @@ class OWSRWDegCohPlotter(SRWWavefrontViewer):
 
         gui.comboBox(self.tab_bas, self, "mode", label="Calculation type:", items=["by using Numpy/Scipy (Faster)", "As Original Igor Macro (Slower)"], orientation="horizontal")
 
+        gui.comboBox(self.tab_bas, self, "keep_binary_cache", label="Keep binary cache (.npy next to the files)", items=["No", "Yes"], labelWidth=260, orientation="horizontal")
+
     def selectHorizontalCutFile(self):
         self.le_horizontal_cut_file_name.setText(oasysgui.selectFileFromDialog(self, self.horizontal_cut_file_name, "Mutual Intensity Horizontal Cut File", file_extension_filter="*.1"))
 
@@ -91,13 +94,13 @@ class OWSRWDegCohPlotter(SRWWavefrontViewer):
 
             mode = "Igor" if self.mode == 1 else "Scipy"
 
-            sum_x, difference_x, degree_of_coherence_x = native_util.calculate_degree_of_coherence_vs_sum_and_difference_from_file(self.horizontal_cut_file_name, mode=mode)
+            sum_x, difference_x, degree_of_coherence_x = native_util.calculate_degree_of_coherence_vs_sum_and_difference_from_file(self.horizontal_cut_file_name, mode=mode, use_cache=self.keep_binary_cache == 1)
 
             tickets.append(SRWPlot.get_ticket_2D(sum_x, difference_x, degree_of_coherence_x))
 
             self.progressBarSet(40)
 
-            sum_y, difference_y, degree_of_coherence_y = native_util.calculate_degree_of_coherence_vs_sum_and_difference_from_file(self.vertical_cut_file_name, mode=mode)
+            sum_y, difference_y, degree_of_coherence_y = native_util.calculate_degree_of_coherence_vs_sum_and_difference_from_file(self.vertical_cut_file_name, mode=mode, use_cache=self.keep_binary_cache == 1)
 
             tickets.append(SRWPlot.get_ticket_2D(sum_y, difference_y, degree_of_coherence_y))
 
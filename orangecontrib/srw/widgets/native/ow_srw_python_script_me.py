@@ -3,6 +3,7 @@ import os, sys
 from PyQt5 import QtGui, QtWidgets
 from PyQt5.QtGui import QPalette, QColor, QFont
 from PyQt5.QtWidgets import QApplication, QFileDialog
+from PyQt5.QtCore import QTimer
 
 from orangewidget import gui
 from orangewidget.settings import Setting
@@ -11,7 +12,8 @@ from oasys.widgets import congruence
 
 from orangecontrib.srw.util.python_script import PythonConsole
 from orangecontrib.srw.util.srw_objects import SRWData
-from orangecontrib.srw.util.srw_util import showConfirmMessage
+from orangecontrib.srw.util.srw_util import showConfirmMessage, SRWPlot
+from orangecontrib.srw.util.srw_multi_electron import SRWMultiElectronRunner
 from orangecontrib.srw.widgets.gui.ow_srw_widget import SRWWidget
 
 from wofrysrw.storage_ring.light_sources.srw_bending_magnet_light_source import SRWBendingMagnetLightSource
@@ -40,6 +42,10 @@ class SRWPythonScriptME(SRWWidget):
     srCalcPrec = Setting(0.01) # SR calculation rel. accuracy
     strIntPropME_OutFileName = Setting("output_srw_script_me.dat")
     _char = Setting(0)
+    number_of_processes = Setting(0)
+    checkpoint_file_name = Setting("output_srw_script_me.h5")
+    resume_from_checkpoint = Setting(0)
+    accumulation_file_name = Setting("")
 
     IMAGE_WIDTH = 890
     IMAGE_HEIGHT = 680
@@ -84,11 +90,21 @@ class SRWPythonScriptME(SRWWidget):
                      items=["Total Intensity", "Mutual Intensity"], labelWidth=300,
                      sendSelectedValue=False, orientation="horizontal")
 
+        oasysgui.lineEdit(gen_box, self, "number_of_processes", "Nr. of Local Processes (0 = all CPUs)", labelWidth=260, valueType=int, orientation="horizontal")
+        oasysgui.lineEdit(gen_box, self, "checkpoint_file_name", "Checkpoint File Name", labelWidth=150, valueType=str, orientation="horizontal")
+
+        oasysgui.lineEdit(gen_box, self, "accumulation_file_name", "Accumulation File (.npy, empty = memory)", labelWidth=260, valueType=str, orientation="horizontal")
+
+        gui.comboBox(gen_box, self, "resume_from_checkpoint", label="Resume from Checkpoint",
+                     items=["No", "Yes"], labelWidth=300,
+                     sendSelectedValue=False, orientation="horizontal")
+
         tabs_setting = oasysgui.tabWidget(self.mainArea)
         tabs_setting.setFixedHeight(self.IMAGE_HEIGHT)
         tabs_setting.setFixedWidth(self.IMAGE_WIDTH)
 
         tab_scr = oasysgui.createTabPage(tabs_setting, "Python Script")
+        tab_me  = oasysgui.createTabPage(tabs_setting, "ME Intensity")
         tab_out = oasysgui.createTabPage(tabs_setting, "System Output")
 
         self.pythonScript = oasysgui.textArea(readOnly=False)
@@ -116,6 +132,20 @@ class SRWPythonScriptME(SRWWidget):
         gui.button(button_box, self, "Run Script", callback=self.execute_script, height=40)
         gui.button(button_box, self, "Save Script to File", callback=self.save_script, height=40)
 
+        button_box = oasysgui.widgetBox(tab_me, "", addSpace=False, orientation="horizontal")
+
+        gui.button(button_box, self, "Run on Local Processes", callback=self.run_multi_electron, height=40)
+        gui.button(button_box, self, "Cancel", callback=self.cancel_multi_electron, height=40)
+
+        self.plot_canvas = SRWPlot.Detailed2DWidget()
+        tab_me.layout().addWidget(self.plot_canvas)
+
+        self.multi_electron_runner = None
+
+        self.multi_electron_timer = QTimer(self)
+        self.multi_electron_timer.setInterval(100)
+        self.multi_electron_timer.timeout.connect(self.poll_multi_electron)
+
     def execute_script(self):
         if showConfirmMessage(message = "Do you confirm launching a ME propagation?",
                               informative_text="This is a very long and resource-consuming process: launching it within the OASYS environment is highly discouraged." + \
@@ -125,6 +155,88 @@ class SRWPythonScriptME(SRWWidget):
             self.console.push("exec(_script)")
             self.console.new_prompt(sys.ps1)
 
+    def run_multi_electron(self):
+        if not self.input_srw_data is None:
+            try:
+                self.cancel_multi_electron()
+
+                srw_beamline = self.input_srw_data.get_srw_beamline()
+                light_source = srw_beamline.get_light_source()
+
+                if not (isinstance(light_source, SRWBendingMagnetLightSource) or isinstance(light_source, SRWUndulatorLightSource)):
+                    raise ValueError("ME Propagation is not available with this source")
+                if light_source.get_source_wavefront_parameters() is None:
+                    raise ValueError("Source wavefront parameters not available: recalculate the source")
+
+                congruence.checkStrictlyPositiveNumber(self.nMacroElec, "Total Nr. of Electrons")
+                congruence.checkStrictlyPositiveNumber(self.nMacroElecSavePer, "Saving periodicity")
+                congruence.checkPositiveNumber(self.number_of_processes, "Nr. of Local Processes")
+                congruence.checkDir(self.strIntPropME_OutFileName)
+                congruence.checkDir(self.checkpoint_file_name)
+
+                self.multi_electron_runner = SRWMultiElectronRunner(srw_beamline=srw_beamline,
+                                                                    wavefront_parameters=light_source.get_source_wavefront_parameters(),
+                                                                    number_of_electrons=self.nMacroElec,
+                                                                    save_periodicity=self.nMacroElecSavePer,
+                                                                    sampling_factor=self.sampFactNxNyForProp,
+                                                                    output_file_name=self.strIntPropME_OutFileName,
+                                                                    checkpoint_file_name=self.checkpoint_file_name,
+                                                                    accumulation_file_name=None if self.accumulation_file_name.strip() == "" else self.accumulation_file_name.strip(),
+                                                                    number_of_processes=self.number_of_processes,
+                                                                    mutual_intensity=self._char == 1)
+
+                if self.resume_from_checkpoint == 1 and os.path.exists(self.checkpoint_file_name):
+                    self.multi_electron_runner.load_checkpoint(self.checkpoint_file_name)
+
+                self.progressBarInit()
+                self.setStatusMessage("Running ME Propagation")
+
+                self.multi_electron_runner.start()
+                self.multi_electron_timer.start()
+            except Exception as e:
+                self.multi_electron_failed(e)
+
+    def poll_multi_electron(self):
+        try:
+            runner = self.multi_electron_runner
+
+            if runner.poll():
+                energies, h_coordinates, v_coordinates, intensity = runner.get_intensity(energy_index=int(runner.energies.size/2))
+
+                self.plot_canvas.plot_2D(SRWPlot.get_ticket_2D(h_coordinates*1000, v_coordinates*1000, intensity),
+                                         1, 2, "Intensity (" + str(runner.number_of_electrons_done) + " electrons)",
+                                         "X [\u03bcm]", "Y [\u03bcm]", xum="X [\u03bcm]", yum="Y [\u03bcm]")
+
+                self.progressBarSet(100*runner.number_of_electrons_done/runner.number_of_electrons)
+
+            if not runner.is_running():
+                self.multi_electron_timer.stop()
+                self.setStatusMessage("")
+                self.progressBarFinished()
+        except Exception as e:
+            self.multi_electron_failed(e)
+
+    def multi_electron_failed(self, exception):
+        self.multi_electron_timer.stop()
+        self.setStatusMessage("")
+        self.progressBarFinished()
+
+        QtWidgets.QMessageBox.critical(self, "Error", str(exception), QtWidgets.QMessageBox.Ok)
+
+        if self.IS_DEVELOP: raise exception
+
+    def cancel_multi_electron(self):
+        if not self.multi_electron_runner is None and self.multi_electron_runner.is_running():
+            self.multi_electron_timer.stop()
+            self.multi_electron_runner.cancel()
+            self.setStatusMessage("Calculation Cancelled")
+            self.progressBarFinished()
+
+    def onDeleteWidget(self):
+        self.cancel_multi_electron()
+
+        super().onDeleteWidget()
+
     def save_script(self):
         file_name = QFileDialog.getSaveFileName(self, "Save File to Disk", os.getcwd(), filter='*.py')[0]
 
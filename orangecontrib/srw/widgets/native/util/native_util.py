@@ -3,10 +3,12 @@ from scipy.interpolate import RectBivariateSpline
 
 from srxraylib.util.data_structures import ScaledMatrix, ScaledArray
 
+from orangecontrib.srw.util import srw_file_cache
 
-def calculate_degree_of_coherence_vs_sum_and_difference_from_file(filename_in, mode="Igor"):
 
-    coor, coor_conj, mutual_intensity  = load_mutual_intensity_file(filename_in)
+def calculate_degree_of_coherence_vs_sum_and_difference_from_file(filename_in, mode="Igor", use_cache=False):
+
+    coor, coor_conj, mutual_intensity  = load_mutual_intensity_file(filename_in, use_cache=use_cache)
 
     if mode == "Igor":
         sum, difference, degree_of_coherence = calculate_degree_of_coherence_vs_sum_and_difference_igor_macro(coor, coor_conj, mutual_intensity)
@@ -20,6 +22,116 @@ def calculate_degree_of_coherence_vs_sum_and_difference_from_file(filename_in, m
 #FROM OLEG'S IGOR MACRO ------------------------------------
 #-----------------------------------------------------------
 def calculate_degree_of_coherence_vs_sum_and_difference_igor_macro(coor, coor_conj, mutual_intensity, rel_thresh=1e-4):
+    """
+    Vectorized version of the Igor macro: same steps and same interpolators as
+    calculate_degree_of_coherence_vs_sum_and_difference_igor_macro_scalar, evaluated on whole grids
+
+    :param coor: the x1 or y1 coordinate
+    :param coor_conj: the x2 or y2 coordinate
+    :param mutual_intensity: the mutual intensity vs (x1,x2) [or y2,y3]
+    :param rel_thresh: relative threshold added to the normalization, w.r.t. the mutual intensity at (0, 0)
+    :return: x1+x2, x1-x2, DOC
+    """
+    # same rounding of the ScaledMatrix objects of the scalar version
+    coor = numpy.round(coor, 12)
+    coor_conj = numpy.round(coor_conj, 12)
+    mutual_intensity = numpy.round(mutual_intensity, 12)
+
+    nmInMutInt = _Spline(coor, coor_conj, mutual_intensity)
+
+    xStart = coor[0]
+    xNp = len(coor)
+    xStep = abs(coor[1] - coor[0])
+    xEnd = xStart + (xNp - 1)*xStep
+
+    yStart = coor_conj[0]
+    yNp = len(coor_conj)
+    yStep = abs(coor_conj[1] - coor_conj[0])
+    yEnd = yStart + (yNp - 1)*yStep
+
+    # mutual intensity on a grid twice as large, zero outside the original range
+
+    xHalfNp = round(xNp*0.5)
+    yHalfNp = round(yNp*0.5)
+
+    # same rounding of ScaledMatrix.set_scale_from_steps
+    x_res = numpy.round(xStart - xHalfNp*xStep, 12) + numpy.arange(2*xNp - 1)*numpy.round(xStep, 12)
+    y_res = numpy.round(yStart - yHalfNp*yStep, 12) + numpy.arange(2*yNp - 1)*numpy.round(yStep, 12)
+
+    x_inside = numpy.logical_and(x_res >= xStart, x_res <= xEnd)
+    y_inside = numpy.logical_and(y_res >= yStart, y_res <= yEnd)
+
+    wInMutCohRes = nmInMutInt.grid(x_res, y_res)*numpy.outer(x_inside, y_inside)
+
+    wInMutCohRes = _Spline(x_res, y_res, wInMutCohRes)
+
+    # degree of coherence vs (x1, x2)
+
+    abs_thresh = rel_thresh*abs(nmInMutInt.ev(0.0, 0.0))
+
+    wMutCohNonRot = numpy.abs(wInMutCohRes.grid(coor, coor_conj))/ \
+                    (numpy.sqrt(numpy.abs(numpy.outer(wInMutCohRes.ev(coor, coor), wInMutCohRes.ev(coor_conj, coor_conj)))) + abs_thresh)
+
+    wMutCohNonRot = _Spline(coor, coor_conj, wMutCohNonRot)
+
+    # degree of coherence vs (x1+x2, x1-x2): bilinear interpolation between the nodes, zero outside the range
+
+    X = numpy.outer(coor, numpy.ones_like(coor_conj))
+    Y = numpy.outer(numpy.ones_like(coor), coor_conj)
+
+    nmResDegCoh = numpy.zeros(X.shape)
+
+    inside = numpy.logical_and(numpy.logical_and(X + Y >= xStart, X + Y <= xEnd),
+                               numpy.logical_and(X - Y >= yStart, X - Y <= yEnd))
+
+    nmResDegCoh[inside] = _interpolate_2D_bilinear((X + Y)[inside], (X - Y)[inside], wMutCohNonRot, xStart, xEnd, xStep, yStart, yEnd, yStep)
+
+    return coor, coor_conj, nmResDegCoh
+
+class _Spline(object):
+    """
+    The interpolator of srxraylib's ScaledMatrix (cubic RectBivariateSpline, also for complex values), on arrays
+    """
+    def __init__(self, x_coord, y_coord, z_values):
+        if numpy.iscomplexobj(z_values):
+            self._splines = (RectBivariateSpline(x_coord, y_coord, numpy.real(z_values)),
+                             RectBivariateSpline(x_coord, y_coord, numpy.imag(z_values)))
+        else:
+            self._splines = (RectBivariateSpline(x_coord, y_coord, z_values), )
+
+    def ev(self, x, y):
+        if len(self._splines) == 2:
+            return self._splines[0].ev(x, y) + 1j*self._splines[1].ev(x, y)
+        else:
+            return self._splines[0].ev(x, y)
+
+    def grid(self, x, y):
+        X = numpy.outer(x, numpy.ones_like(y))
+        Y = numpy.outer(numpy.ones_like(x), y)
+
+        return self.ev(X, Y)
+
+def _interpolate_2D_bilinear(x, y, spline, xmin, xmax, xstep, ymin, ymax, ystep):
+    # srwUtiInterp2DBilin on arrays of points inside [xmin, xmax] x [ymin, ymax]
+    x0 = xmin + numpy.trunc((x - xmin)/xstep)*xstep
+    x0[x0 >= xmax] = xmax - xstep
+
+    x1 = x0 + xstep
+
+    y0 = ymin + numpy.trunc((y - ymin)/ystep)*ystep
+    y0[y0 >= ymax] = ymax - ystep
+
+    y1 = y0 + ystep
+
+    t = (x - x0)/xstep
+    u = (y - y0)/ystep
+
+    return (1 - t)*(1 - u)*(spline.ev(x0, y0)) + \
+           t*(1 - u)*(spline.ev(x1, y0)) + \
+           t*u*(spline.ev(x1, y1)) + \
+           (1 - t)*u*(spline.ev(x0, y1))
+
+def calculate_degree_of_coherence_vs_sum_and_difference_igor_macro_scalar(coor, coor_conj, mutual_intensity, rel_thresh=1e-4):
 
     nmInMutInt = ScaledMatrix(x_coord=coor, y_coord=coor_conj, z_values=mutual_intensity, interpolator=True)
 
@@ -181,8 +293,8 @@ def calculate_degree_of_coherence_vs_sum_and_difference(coor, coor_conj, mutual_
 
     return coor, coor_conj, nmResDegCoh_z
 
-def load_intensity_file(filename):
-    data, dump, allrange, arLabels, arUnits = file_load(filename)
+def load_intensity_file(filename, use_cache=False):
+    data, dump, allrange, arLabels, arUnits = file_load(filename, _use_cache=use_cache)
 
     dim_x = allrange[5]
     dim_y = allrange[8]
@@ -194,8 +306,8 @@ def load_intensity_file(filename):
     return x_coordinates, y_coordinates, np_array
 
 
-def load_mutual_intensity_file(filename):
-    data, dump, allrange, arLabels, arUnits = file_load(filename)
+def load_mutual_intensity_file(filename, use_cache=False):
+    data, dump, allrange, arLabels, arUnits = file_load(filename, _use_cache=use_cache)
 
     dim_x = allrange[5]
     dim_y = allrange[8]
@@ -221,15 +333,30 @@ def load_mutual_intensity_file(filename):
 
     return coordinates, conj_coordinates, np_array
 
-# copied from SRW's uti_plot_com and slightly  modified (no _enum)
-def file_load(_fname, _read_labels=1):
-    import numpy as np
+# copied from SRW's uti_plot_com and slightly  modified (no _enum, C parser for the data, optional binary cache)
+def file_load(_fname, _read_labels=1, _use_cache=False):
+    '''
+    :param _use_cache: the data are cached in a .npy file next to _fname (see srw_file_cache), memory-mapped when the file is read again
+    '''
     nLinesHead = 11
     hlp = []
 
-    with open(_fname,'r') as f:
+    with open(_fname,'rb') as f:
+        file_stamp = srw_file_cache.get_file_stamp(_fname)
+
+        data_position = 0
         for i in range(nLinesHead):
-            hlp.append(f.readline())
+            line = f.readline()
+            if line.startswith(b'#'): data_position = f.tell()
+            hlp.append(line.decode())
+
+        data = srw_file_cache.load_cache(_fname, mmap_mode='c') if _use_cache else None
+
+        if data is None:
+            f.seek(data_position)
+            data = numpy.fromfile(f, dtype=numpy.float64, sep=' ') #get data from file (C-aligned flat)
+
+            if _use_cache: srw_file_cache.write_cache(_fname, data, file_stamp)
 
     ne, nx, ny = [int(hlp[i].replace('#','').split()[0]) for i in [3,6,9]]
     ns = 1
@@ -239,7 +366,7 @@ def file_load(_fname, _read_labels=1):
 
     e0,e1,x0,x1,y0,y1 = [float(hlp[i].replace('#','').split()[0]) for i in [1,2,4,5,7,8]]
 
-    data = numpy.squeeze(numpy.loadtxt(_fname, dtype=numpy.float64)) #get data from file (C-aligned flat)
+    if data.size == 1: data = data.reshape(())
 
     allrange = e0, e1, ne, x0, x1, nx, y0, y1, ny
 
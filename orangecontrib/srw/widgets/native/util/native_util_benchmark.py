@@ -0,0 +1,88 @@
+"""
+
+benchmark of native_util on synthetic data:
+ - file_load on a SRW ascii intensity file
+ - degree of coherence (Igor macro), scalar vs vectorized, on a gaussian Schell-model mutual intensity
+
+usage: python native_util_benchmark.py [file points per side, e.g. 4096] [mutual intensity points per side, e.g. 200]
+
+"""
+
+import os
+import sys
+import time
+import tempfile
+import numpy
+
+from orangecontrib.srw.util import srw_file_cache
+from orangecontrib.srw.widgets.native.util import native_util
+
+def write_intensity_file(file_name, n):
+    with open(file_name, "w") as f:
+        f.write("#Intensity [ph/s/.1%bw/mm^2] (C-aligned, inner loop is vs photon energy, outer loop vs vertical position)\n")
+        f.write("#1000.0 #Initial Photon Energy [eV]\n")
+        f.write("#1000.0 #Final Photon Energy [eV]\n")
+        f.write("#1 #Number of points vs Photon Energy\n")
+        f.write("#-0.001 #Initial Horizontal Position [m]\n")
+        f.write("#0.001 #Final Horizontal Position [m]\n")
+        f.write("#%d #Number of points vs Horizontal Position\n" % n)
+        f.write("#-0.001 #Initial Vertical Position [m]\n")
+        f.write("#0.001 #Final Vertical Position [m]\n")
+        f.write("#%d #Number of points vs Vertical Position\n" % n)
+
+        numpy.savetxt(f, numpy.random.rand(n*n), fmt="%.6e")
+
+def gaussian_schell_mutual_intensity(n, sigma=50e-6, coherence_length=20e-6):
+    coor = numpy.linspace(-5*sigma, 5*sigma, n)
+    x1 = numpy.outer(coor, numpy.ones(n))
+    x2 = numpy.outer(numpy.ones(n), coor)
+
+    mutual_intensity = numpy.exp(-(x1**2 + x2**2)/(4*sigma**2))*numpy.exp(-(x1 - x2)**2/(2*coherence_length**2))
+
+    return coor, coor.copy(), mutual_intensity
+
+def timeit(function, *args, **kwargs):
+    t0 = time.time()
+    result = function(*args, **kwargs)
+    return result, time.time() - t0
+
+def benchmark_file_load(n):
+    file_name = os.path.join(tempfile.mkdtemp(), "intensity.dat")
+
+    print("\n#\n# file_load: %d x %d synthetic intensity file\n#\n" % (n, n))
+    write_intensity_file(file_name, n)
+
+    data_loadtxt, t_loadtxt = timeit(numpy.loadtxt, file_name, dtype=numpy.float64)
+    data_parse,   t_parse   = timeit(native_util.file_load, file_name, _use_cache=False)
+    data_first,   t_first   = timeit(native_util.file_load, file_name, _use_cache=True)
+    data_cache,   t_cache   = timeit(native_util.file_load, file_name, _use_cache=True)
+
+    numpy.testing.assert_array_equal(data_parse[0], data_loadtxt)
+    numpy.testing.assert_array_equal(data_cache[0], data_loadtxt)
+
+    print("   numpy.loadtxt:                %10.4f s" % t_loadtxt)
+    print("   file_load (C parser):         %10.4f s" % t_parse)
+    print("   file_load (parse + cache):    %10.4f s" % t_first)
+    print("   file_load (memory-map cache): %10.4f s" % t_cache)
+
+    os.remove(file_name)
+    os.remove(srw_file_cache.get_cache_file_name(file_name))
+    os.remove(srw_file_cache.get_cache_file_name(file_name) + ".stamp")
+    os.rmdir(os.path.dirname(file_name))
+
+def benchmark_degree_of_coherence(n):
+    print("\n#\n# degree of coherence (Igor macro): %d x %d mutual intensity\n#\n" % (n, n))
+
+    coor, coor_conj, mutual_intensity = gaussian_schell_mutual_intensity(n)
+
+    result_scalar, t_scalar = timeit(native_util.calculate_degree_of_coherence_vs_sum_and_difference_igor_macro_scalar, coor, coor_conj, mutual_intensity)
+    result,        t_new    = timeit(native_util.calculate_degree_of_coherence_vs_sum_and_difference_igor_macro, coor, coor_conj, mutual_intensity)
+
+    numpy.testing.assert_allclose(result[2], result_scalar[2], rtol=1e-10, atol=1e-12)
+
+    print("   scalar:     %10.4f s" % t_scalar)
+    print("   vectorized: %10.4f s  (x%.1f)" % (t_new, t_scalar/max(t_new, 1e-9)))
+
+if __name__ == "__main__":
+    benchmark_file_load(int(sys.argv[1]) if len(sys.argv) > 1 else 4096)
+    benchmark_degree_of_coherence(int(sys.argv[2]) if len(sys.argv) > 2 else 100)
@@ -0,0 +1,126 @@
+"""
+
+test of the vectorized degree of coherence (Igor macro) against the scalar version, and of the
+file_load fast path and binary cache
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+
+from native_util import calculate_degree_of_coherence_vs_sum_and_difference_igor_macro, \
+    calculate_degree_of_coherence_vs_sum_and_difference_igor_macro_scalar, file_load, load_intensity_file
+
+class NativeUtilTest(unittest.TestCase):
+
+    def check_degree_of_coherence(self, coor, coor_conj, mutual_intensity):
+        sum_scalar, difference_scalar, doc_scalar = calculate_degree_of_coherence_vs_sum_and_difference_igor_macro_scalar(coor, coor_conj, mutual_intensity)
+        sum, difference, doc = calculate_degree_of_coherence_vs_sum_and_difference_igor_macro(coor, coor_conj, mutual_intensity)
+
+        numpy.testing.assert_array_equal(sum, sum_scalar)
+        numpy.testing.assert_array_equal(difference, difference_scalar)
+        numpy.testing.assert_allclose(doc, doc_scalar, rtol=1e-10, atol=1e-12)
+
+    def test_gaussian_schell_model(self):
+        for n in [11, 20, 25]:
+            coor = numpy.linspace(-2.5e-4, 2.5e-4, n)
+            x1 = numpy.outer(coor, numpy.ones(n))
+            x2 = numpy.outer(numpy.ones(n), coor)
+
+            mutual_intensity = 1e12*numpy.exp(-(x1**2 + x2**2)/(4*(5e-5)**2))*numpy.exp(-(x1 - x2)**2/(2*(2e-5)**2))
+
+            self.check_degree_of_coherence(coor, coor.copy(), mutual_intensity)
+
+    def test_rectangular_grid(self):
+        coor = numpy.linspace(-1e-4, 1e-4, 15)
+        coor_conj = numpy.linspace(-1.2e-4, 1.2e-4, 18)
+
+        mutual_intensity = numpy.random.rand(15, 18)
+
+        self.check_degree_of_coherence(coor, coor_conj, mutual_intensity)
+
+class FileLoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.file_name = os.path.join(self.directory, "intensity.dat")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_intensity_file(self, intensity):
+        nx, ny = intensity.shape
+
+        with open(self.file_name, "w") as f:
+            f.write("#Intensity [ph/s/.1%bw/mm^2] (C-aligned, inner loop is vs photon energy, outer loop vs vertical position)\n")
+            f.write("#1000.0 #Initial Photon Energy [eV]\n")
+            f.write("#1000.0 #Final Photon Energy [eV]\n")
+            f.write("#1 #Number of points vs Photon Energy\n")
+            f.write("#-0.001 #Initial Horizontal Position [m]\n")
+            f.write("#0.001 #Final Horizontal Position [m]\n")
+            f.write("#%d #Number of points vs Horizontal Position\n" % nx)
+            f.write("#-0.002 #Initial Vertical Position [m]\n")
+            f.write("#0.002 #Final Vertical Position [m]\n")
+            f.write("#%d #Number of points vs Vertical Position\n" % ny)
+            f.write("#1 #Number of components\n")
+            f.write("\n".join(map(repr, intensity.T.ravel().tolist())) + "\n")
+
+    def cache_files(self):
+        return [file_name for file_name in os.listdir(self.directory) if file_name.startswith("intensity.dat.npy")]
+
+    def test_fast_path(self):
+        intensity = numpy.random.rand(7, 5)
+        self.write_intensity_file(intensity)
+
+        data, _, allrange, labels, units = file_load(self.file_name)
+
+        numpy.testing.assert_array_equal(data, numpy.loadtxt(self.file_name))
+        self.assertEqual(allrange, (1000.0, 1000.0, 1, -0.001, 0.001, 7, -0.002, 0.002, 5))
+        self.assertEqual(labels[3], "Intensity")
+        self.assertEqual(units[3], "ph/s/.1%bw/mm^2")
+
+        x, y, loaded_intensity = load_intensity_file(self.file_name)
+
+        numpy.testing.assert_array_equal(loaded_intensity, intensity)
+        numpy.testing.assert_array_equal(x, numpy.linspace(-0.001, 0.001, 7))
+
+        # the cache is opt-in
+        self.assertEqual(self.cache_files(), [])
+
+    def test_cache(self):
+        intensity = numpy.random.rand(7, 5)
+        self.write_intensity_file(intensity)
+
+        data_parsed = file_load(self.file_name, _use_cache=True)[0]
+        data_cached = file_load(self.file_name, _use_cache=True)[0]
+
+        self.assertNotIsInstance(data_parsed, numpy.memmap)
+        self.assertIsInstance(data_cached, numpy.memmap)
+        numpy.testing.assert_array_equal(data_cached, data_parsed)
+
+        # as the plotters load the files with "Keep binary cache"
+        numpy.testing.assert_array_equal(load_intensity_file(self.file_name, use_cache=True)[2], intensity)
+
+    def test_cache_invalidation(self):
+        self.write_intensity_file(numpy.random.rand(7, 5))
+        file_load(self.file_name, _use_cache=True)
+
+        # rewritten with a different size
+        intensity = numpy.random.rand(9, 5)
+        self.write_intensity_file(intensity)
+
+        numpy.testing.assert_array_equal(load_intensity_file(self.file_name)[2], intensity)
+        numpy.testing.assert_array_equal(file_load(self.file_name, _use_cache=True)[0], intensity.T.ravel())
+
+        # rewritten with the same size in the same second
+        stat = os.stat(self.file_name)
+
+        intensity = numpy.flip(intensity)
+        self.write_intensity_file(intensity)
+        os.utime(self.file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        self.assertEqual(os.stat(self.file_name).st_size, stat.st_size)
+        numpy.testing.assert_array_equal(file_load(self.file_name, _use_cache=True)[0], intensity.T.ravel())
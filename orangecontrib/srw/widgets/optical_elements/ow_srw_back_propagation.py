@@ -34,18 +34,12 @@ class OWSRWBackPropagation(OWSRWOpticalElement):
             super().run_calculation_for_plots(tickets, progress_bar_value)
 
             if self.view_type == 1:
-                e, h, v, i = self.output_wavefront.get_intensity(multi_electron=True)
-
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=True))
 
             elif self.view_type == 2:
-                e, h, v, i = self.output_wavefront.get_intensity(multi_electron=True, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL)
-
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
-
-                e, h, v, i = self.output_wavefront.get_intensity(multi_electron=True, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL)
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=True, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_HORIZONTAL))
 
-                tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, i[int(e.size/2)]))
+                tickets.append(self.get_lazy_ticket_2D(self.get_wavefront_intensity, multi_electron=True, polarization_component_to_be_extracted=PolarizationComponent.LINEAR_VERTICAL))
 
     def receive_specific_syned_data(self, optical_element):
         if not optical_element is None:
@@ -34,7 +34,7 @@ class OWdabam_height_profile(OWAbstractDabamHeightProfile):
         return self.usage_path
 
     def write_error_profile_file(self):
-        SU.write_error_profile_file(self.zz, self.xx, self.yy, self.heigth_profile_file_name)
+        SU.write_error_profile_file(self.zz, self.xx, self.yy, self.heigth_profile_file_name, write_sidecar=True)
 
     def send_data(self, dimension_x, dimension_y):
         self.send("PreProcessor_Data", SRWPreProcessorData(error_profile_data=SRWErrorProfileData(error_profile_data_file=self.heigth_profile_file_name,
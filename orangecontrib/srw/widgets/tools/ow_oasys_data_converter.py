@@ -88,7 +88,7 @@ class OWOasysDataConverter(widget.OWWidget):
                     if (file_extension==".hd5" or file_extension==".hdf5" or file_extension==".hdf"):
                         error_profile_data_file = filename + "_srw.dat"
 
-                    SU.write_error_profile_file(surface_data.zz, surface_data.xx, surface_data.yy, error_profile_data_file)
+                    SU.write_error_profile_file(surface_data.zz, surface_data.xx, surface_data.yy, error_profile_data_file, write_sidecar=True)
 
                     self.send("PreProcessor_Data", SRWPreProcessorData(error_profile_data=SRWErrorProfileData(error_profile_data_file=error_profile_data_file,
                                                                                                               error_profile_x_dim=error_profile_data.error_profile_x_dim,
@@ -101,7 +101,7 @@ class OWOasysDataConverter(widget.OWWidget):
                     if (file_extension==".hd5" or file_extension==".hdf5" or file_extension==".hdf"):
                         surface_data_file = filename + "_srw.dat"
 
-                    SU.write_error_profile_file(self.oasys_data.zz, self.oasys_data.xx, self.oasys_data.yy, surface_data_file)
+                    SU.write_error_profile_file(self.oasys_data.zz, self.oasys_data.xx, self.oasys_data.yy, surface_data_file, write_sidecar=True)
 
                     error_profile_x_dim = abs(self.oasys_data.xx[-1] - self.oasys_data.xx[0])
                     error_profile_y_dim = abs(self.oasys_data.yy[-1] - self.oasys_data.yy[0])
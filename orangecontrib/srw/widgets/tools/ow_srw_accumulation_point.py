@@ -1,14 +1,18 @@
 __author__ = 'labx'
 
-import os, sys, numpy
+import os, sys, numpy, time
 
 from PyQt5.QtGui import QPalette, QColor, QFont
 from PyQt5.QtWidgets import QMessageBox
+from PyQt5.QtCore import QTimer
 from orangewidget import gui
+from orangewidget.settings import Setting
 from oasys.widgets import gui as oasysgui
+from oasys.widgets import congruence
 
 from orangecontrib.srw.util.srw_util import SRWPlot
 from orangecontrib.srw.util.srw_objects import SRWData
+from orangecontrib.srw.util.srw_accumulation import SRWIntensityAccumulator, AccumulationBackend, get_intensity
 from orangecontrib.srw.widgets.gui.ow_srw_wavefront_viewer import SRWWavefrontViewer
 
 class OWSRWAccumulationPoint(SRWWavefrontViewer):
@@ -29,12 +33,30 @@ class OWSRWAccumulationPoint(SRWWavefrontViewer):
     TABS_AREA_HEIGHT = 618
     is_final_screen = True
 
-    accumulated_intensity = None
+    plotted_quantity = Setting(0)
+    replot_interval = Setting(1.0)
+    save_snapshots = Setting(0)
+    snapshot_file_name = Setting("accumulated_intensity.h5")
+    snapshot_interval = Setting(100)
+    accumulate_all_energies = Setting(0)
+    accumulation_backend = Setting(AccumulationBackend.MEMORY)
+    accumulation_file_name = Setting("accumulated_intensity")
+
     last_tickets = None
 
     def __init__(self, show_automatic_box=False):
         super().__init__(show_automatic_box=show_automatic_box, show_view_box=False)
 
+        self.accumulator = self.create_accumulator()
+        self.energy_index = Ellipsis
+        self.h_coordinates = None
+        self.v_coordinates = None
+        self.last_plot_time = 0.0
+
+        self.replot_timer = QTimer(self)
+        self.replot_timer.setSingleShot(True)
+        self.replot_timer.timeout.connect(self.plot_accumulation)
+
         self.general_options_box.setVisible(False)
 
         button_box = oasysgui.widgetBox(self.controlArea, "", addSpace=False, orientation="horizontal")
@@ -86,52 +108,123 @@ class OWSRWAccumulationPoint(SRWWavefrontViewer):
 
         self.set_PlottingRange()
 
+        accumulation_box = oasysgui.widgetBox(self.tab_bas, "Accumulation Setting", addSpace=False, orientation="vertical")
 
-    def replot(self):
-        if not self.last_tickets is None:
-            self.progressBarInit()
+        gui.comboBox(accumulation_box, self, "plotted_quantity", label="Plot",
+                     items=["Accumulated Intensity", "Mean Intensity", "Standard Error of the Mean"], labelWidth=120,
+                     callback=self.set_PlottedQuantity, sendSelectedValue=False, orientation="horizontal")
 
-            self.progressBarSet(50)
+        gui.comboBox(accumulation_box, self, "accumulate_all_energies", label="Accumulated Energies",
+                     items=["Plotted Energy Only", "All Energies"], labelWidth=200,
+                     callback=self.reset_accumulation, sendSelectedValue=False, orientation="horizontal")
 
-            self.plot_results(self.last_tickets, progressBarValue=50)
+        gui.comboBox(accumulation_box, self, "accumulation_backend", label="Accumulate in",
+                     items=["Memory", "Memory-Mapped Files (.npy)", "HDF5 File"], labelWidth=150,
+                     callback=self.set_AccumulationBackend, sendSelectedValue=False, orientation="horizontal")
 
-            self.progressBarFinished()
+        self.accumulation_file_box = oasysgui.widgetBox(accumulation_box, "", addSpace=False, orientation="vertical", height=25)
+
+        oasysgui.lineEdit(self.accumulation_file_box, self, "accumulation_file_name", "Accumulation File", labelWidth=105, valueType=str, orientation="horizontal")
+
+        oasysgui.lineEdit(accumulation_box, self, "replot_interval", "Minimum Interval between Plots [s]", labelWidth=260, valueType=float, orientation="horizontal")
+
+        gui.comboBox(accumulation_box, self, "save_snapshots", label="Save Snapshots (HDF5)",
+                     items=["No", "Yes"], labelWidth=260,
+                     callback=self.set_SaveSnapshots, sendSelectedValue=False, orientation="horizontal")
+
+        self.snapshot_box = oasysgui.widgetBox(accumulation_box, "", addSpace=False, orientation="vertical", height=50)
+
+        oasysgui.lineEdit(self.snapshot_box, self, "snapshot_file_name", "Snapshot File", labelWidth=105, valueType=str, orientation="horizontal")
+        oasysgui.lineEdit(self.snapshot_box, self, "snapshot_interval", "Save every [wavefronts]", labelWidth=260, valueType=int, orientation="horizontal")
+
+        self.set_SaveSnapshots()
+        self.set_AccumulationBackend(reset=False)
+
+    def set_AccumulationBackend(self, reset=True):
+        self.accumulation_file_box.setVisible(self.accumulation_backend != AccumulationBackend.MEMORY)
+
+        if reset: self.reset_accumulation()
+
+    def create_accumulator(self):
+        return SRWIntensityAccumulator(backend=self.accumulation_backend,
+                                       file_name=None if self.accumulation_backend == AccumulationBackend.MEMORY else self.accumulation_file_name)
+
+    def set_PlottedQuantity(self):
+        self.initializeTabs()
+        self.replot()
+
+    def set_SaveSnapshots(self):
+        self.snapshot_box.setVisible(self.save_snapshots == 1)
+
+    def replot(self):
+        self.plot_accumulation()
 
     def receive_srw_data(self, data):
         if not data is None:
             if isinstance(data, SRWData):
                 if not data.get_srw_wavefront() is None:
-                    self.progressBarInit()
+                    try:
+                        wavefront = data.get_srw_wavefront()
+                        mesh = wavefront.mesh
+
+                        if self.accumulate_all_energies == 1:
+                            # one energy slice at a time: the (energy, x, y) intensity is never in memory
+                            self.accumulator.add_slices((mesh.ne, mesh.nx, mesh.ny), lambda energy_index: get_intensity(wavefront, energy_index=energy_index))
+                            self.energy_index = int(mesh.ne/2)
+                        else:
+                            self.accumulator.add(get_intensity(wavefront, energy_index=int(mesh.ne/2)))
+                            self.energy_index = Ellipsis
 
-                    self.progressBarSet(30)
+                        self.h_coordinates = numpy.linspace(mesh.xStart, mesh.xFin, mesh.nx)
+                        self.v_coordinates = numpy.linspace(mesh.yStart, mesh.yFin, mesh.ny)
 
-                    e, h, v, i = data.get_srw_wavefront().get_intensity(multi_electron=False)
+                        self.setStatusMessage("Accumulated Wavefronts: " + str(self.accumulator.count))
 
-                    tickets = []
+                        if self.save_snapshots == 1 and self.accumulator.count % max(1, self.snapshot_interval) == 0:
+                            congruence.checkDir(self.snapshot_file_name)
 
-                    if self.accumulated_intensity is None:
-                        self.accumulated_intensity = i
-                    else:
-                        if i.shape != self.accumulated_intensity.shape:
-                            raise ValueError("Accumulated Intensity Shape is different from received one")
+                            self.accumulator.save(self.snapshot_file_name, self.h_coordinates, self.v_coordinates)
 
-                        self.accumulated_intensity += i
+                        elapsed_time = time.time() - self.last_plot_time
 
-                    self.progressBarSet(60)
+                        if elapsed_time >= self.replot_interval:
+                            self.plot_accumulation()
+                        elif not self.replot_timer.isActive(): # the last wavefront of a burst is plotted as well
+                            self.replot_timer.start(int(1000*(self.replot_interval - elapsed_time)))
+                    except Exception as e:
+                        QMessageBox.critical(self, "Error", str(e), QMessageBox.Ok)
 
-                    tickets.append(SRWPlot.get_ticket_2D(h*1000, v*1000, self.accumulated_intensity[int(e.size/2)]))
+                        if self.IS_DEVELOP: raise e
 
-                    self.plot_results(tickets, progressBarValue=90)
+    def plot_accumulation(self):
+        if self.accumulator.count == 0: return
 
-                    self.last_tickets = tickets
+        self.progressBarInit()
 
-                    self.progressBarFinished()
+        self.progressBarSet(50)
+
+        # only the plotted energy slice is read from the accumulated arrays
+        if self.plotted_quantity == 0:   intensity = self.accumulator.get_sum(self.energy_index)
+        elif self.plotted_quantity == 1: intensity = self.accumulator.get_mean(self.energy_index)
+        else:                            intensity = self.accumulator.get_standard_error(self.energy_index)
+
+        tickets = [SRWPlot.get_ticket_2D(self.h_coordinates*1000, self.v_coordinates*1000, intensity)]
+
+        self.plot_results(tickets, progressBarValue=90)
+
+        self.last_tickets = tickets
+        self.last_plot_time = time.time()
+
+        self.progressBarFinished()
 
     def reset_accumulation(self):
         try:
             self.progressBarInit()
 
-            self.accumulated_intensity = None
+            self.replot_timer.stop()
+            self.accumulator.reset()
+            self.accumulator = self.create_accumulator()
+            self.setStatusMessage("")
 
             self.plot_results([SRWPlot.get_ticket_2D(numpy.array([0, 0.001]),
                                                      numpy.array([0, 0.001]),
@@ -144,8 +237,10 @@ class OWSRWAccumulationPoint(SRWWavefrontViewer):
         return [[1, 2]]
 
     def getTitles(self, with_um=False):
-        if with_um: return ["Accumulated Intensity [ph/s/.1%bw/mm\u00b2]"]
-        else: return ["Accumulated Intensity"]
+        title = ["Accumulated Intensity", "Mean Intensity", "Standard Error of the Mean Intensity"][self.plotted_quantity]
+
+        if with_um: return [title + " [ph/s/.1%bw/mm\u00b2]"]
+        else: return [title]
 
     def getXTitles(self):
         return ["X [\u03bcm]"]
@@ -1,7 +1,5 @@
 import os, numpy
 
-from silx.gui.plot import Plot2D
-
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QMessageBox, QLabel, QSizePolicy
 from PyQt5.QtGui import QFont, QPalette, QColor, QPixmap
@@ -16,6 +14,7 @@ from oasys.widgets.exchange import DataExchangeObject
 
 from orangecontrib.srw.widgets.gui.ow_srw_widget import SRWWidget
 from orangecontrib.srw.util.srw_objects import SRWPreProcessorData, SRWReflectivityData
+from orangecontrib.srw.util.srw_util import write_reflectivity_data_file, get_reflectivity_data
 
 from wofrysrw.beamline.optical_elements.mirrors.srw_mirror import ScaleType
 
@@ -130,7 +129,7 @@ class OWReflectivityGenerator(SRWWidget):
 
         output_data = SRWPreProcessorData(reflectivity_data=SRWReflectivityData(reflectivity_data_file=self.data_file_name))
 
-        data_txt = ""
+        components = []
 
         if not self.reflectivity_unpol_data is None:
             try:
@@ -148,13 +147,7 @@ class OWReflectivityGenerator(SRWWidget):
                 output_data.reflectivity_data.angle_end = angle[-1]
                 output_data.reflectivity_data.angle_scale_type = ScaleType.LINEAR
 
-                data_txt = ""
-
-                for i in range(0, len(angle)):
-                    for j in range (0, len(energy)):
-                        if not (i==0 and j==0): data_txt += "\n"
-
-                        data_txt += str(reflectivity_data[j, i]) + "\n0.0"
+                components = [reflectivity_data.T] # energy runs faster than angle
 
             except:
                 try:
@@ -187,10 +180,7 @@ class OWReflectivityGenerator(SRWWidget):
                     output_data.reflectivity_data.energy_scale_type = ScaleType.LINEAR
                     output_data.reflectivity_data.angle_scale_type = ScaleType.LINEAR
 
-                    for i in range(0, len(reflectivity_data)):
-                        if i!=0: data_txt += "\n"
-
-                        data_txt += str(reflectivity_data[i, y_col]) + "\n0.0"
+                    components = [reflectivity_data[:, y_col]]
 
                 except Exception as exception:
                     QMessageBox.critical(self, "Error", str(exception), QMessageBox.Ok)
@@ -199,12 +189,10 @@ class OWReflectivityGenerator(SRWWidget):
 
                     return
 
-            if not data_txt == "":
-                file = open(file_name, "w")
+            if len(components) > 0:
+                write_reflectivity_data_file(file_name, components)
 
-                file.write(data_txt)
-                file.flush()
-                file.close()
+                output_data.reflectivity_data.reflectivity_data = get_reflectivity_data(components)
 
             self.send("Reflectivity Data", output_data)
 
@@ -239,17 +227,7 @@ class OWReflectivityGenerator(SRWWidget):
                     output_data.reflectivity_data.angle_end = angle_s[-1]
                     output_data.reflectivity_data.angle_scale_type = ScaleType.LINEAR
 
-                    data_txt = ""
-
-                    for i in range(0, len(angle_s)):
-                        for j in range (0, len(energy_s)):
-                            if not (i==0 and j==0): data_txt += "\n"
-
-                            data_txt += str(reflectivity_s[j, i]) + "\n0.0"
-
-                    for i in range(0, len(angle_p)):
-                        for j in range (0, len(energy_p)):
-                            data_txt += "\n" + str(reflectivity_p[j, i]) + "\n0.0"
+                    components = [reflectivity_s.T, reflectivity_p.T] # energy runs faster than angle
 
                 except:
                     QMessageBox.critical(self, "Error", "Reflectivity data have different dimension", QMessageBox.Ok)
@@ -305,13 +283,7 @@ class OWReflectivityGenerator(SRWWidget):
                         output_data.reflectivity_data.energy_scale_type = ScaleType.LINEAR
                         output_data.reflectivity_data.angle_scale_type = ScaleType.LINEAR
 
-                        for i in range(0, len(reflectivity_s)):
-                            if i!=0: data_txt += "\n"
-
-                            data_txt += str(reflectivity_s[i, y_col]) + "\n0.0"
-
-                        for i in range(0, len(reflectivity_p)):
-                            data_txt += "\n" + str(reflectivity_p[i, y_col]) + "\n0.0"
+                        components = [reflectivity_s[:, y_col], reflectivity_p[:, y_col]]
                     except:
                         QMessageBox.critical(self, "Error", "Reflectivity data have different dimension", QMessageBox.Ok)
 
@@ -324,12 +296,10 @@ class OWReflectivityGenerator(SRWWidget):
 
                     return
 
-            if not data_txt == "":
-                file = open(file_name, "w")
+            if len(components) > 0:
+                write_reflectivity_data_file(file_name, components)
 
-                file.write(data_txt)
-                file.flush()
-                file.close()
+                output_data.reflectivity_data.reflectivity_data = get_reflectivity_data(components)
 
             self.send("Reflectivity Data", output_data)
 
@@ -536,6 +506,8 @@ class OWReflectivityGenerator(SRWWidget):
                 self.plot_canvas[plot_canvas_index].setGraphYLimits(min(y), max(y)*1.01)
 
     def plot_data2D(self, data2D, dataX, dataY, tabs_canvas_index, plot_canvas_index, title="", xtitle="", ytitle=""):
+        from silx.gui.plot import Plot2D
+
         origin = (dataX[0],dataY[0])
         scale = (dataX[1]-dataX[0],dataY[1]-dataY[0])
 
@@ -16,7 +16,7 @@ from oasys.widgets import widget as oasyswidget
 
 from orangecontrib.srw.util.srw_objects import SRWData
 from wofrysrw.propagator.wavefront2D.srw_wavefront import SRWWavefront
-from orangecontrib.srw.util.srw_hdf5 import load_hdf5_2_wfr
+from orangecontrib.srw.util.srw_hdf5 import LazyWavefront
 
 class OWWavefrontFileReader(oasyswidget.OWWidget):
     name = "SRW Wavefront File Reader"
@@ -33,6 +33,13 @@ class OWWavefrontFileReader(oasyswidget.OWWidget):
     file_name = Setting("")
     data_path = Setting("")
 
+    use_range = Setting(0)
+    range_x_min = Setting(0.0)
+    range_x_max = Setting(0.0)
+    range_y_min = Setting(0.0)
+    range_y_max = Setting(0.0)
+    decimation = Setting(1)
+
 
     outputs = [{"name":"SRWData",
                 "type":SRWData,
@@ -49,7 +56,7 @@ class OWWavefrontFileReader(oasyswidget.OWWidget):
         self.addAction(self.runaction)
 
         self.setFixedWidth(590)
-        self.setFixedHeight(250)
+        self.setFixedHeight(400)
 
         left_box_1 = oasysgui.widgetBox(self.controlArea, "HDF5 Local File Selection", addSpace=True,
                                         orientation="vertical",width=570, height=100)
@@ -66,6 +73,27 @@ class OWWavefrontFileReader(oasyswidget.OWWidget):
 
         gui.separator(left_box_1, height=20)
 
+        left_box_2 = oasysgui.widgetBox(self.controlArea, "Region of Interest", addSpace=True,
+                                        orientation="vertical",width=570, height=140)
+
+        gui.comboBox(left_box_2, self, "use_range", label="Read Region of Interest", labelWidth=260,
+                     items=["No", "Yes"], callback=self.set_Range, sendSelectedValue=False, orientation="horizontal")
+
+        self.range_box_1 = oasysgui.widgetBox(left_box_2, "", addSpace=False, orientation="vertical", height=50)
+        self.range_box_2 = oasysgui.widgetBox(left_box_2, "", addSpace=False, orientation="vertical", height=50)
+
+        range_box_x = oasysgui.widgetBox(self.range_box_1, "", addSpace=False, orientation="horizontal")
+        oasysgui.lineEdit(range_box_x, self, "range_x_min", "X min [\u03bcm]", labelWidth=160, valueType=float, orientation="horizontal")
+        oasysgui.lineEdit(range_box_x, self, "range_x_max", "max [\u03bcm]", labelWidth=60, valueType=float, orientation="horizontal")
+
+        range_box_y = oasysgui.widgetBox(self.range_box_1, "", addSpace=False, orientation="horizontal")
+        oasysgui.lineEdit(range_box_y, self, "range_y_min", "Y min [\u03bcm]", labelWidth=160, valueType=float, orientation="horizontal")
+        oasysgui.lineEdit(range_box_y, self, "range_y_max", "max [\u03bcm]", labelWidth=60, valueType=float, orientation="horizontal")
+
+        self.set_Range()
+
+        oasysgui.lineEdit(left_box_2, self, "decimation", "Decimation (read 1 point every N)", labelWidth=260, valueType=int, orientation="horizontal")
+
         button = gui.button(self.controlArea, self, "Browse File and Send Data", callback=self.read_file)
         button.setFixedHeight(45)
         gui.separator(self.controlArea, height=20)
@@ -75,6 +103,10 @@ class OWWavefrontFileReader(oasyswidget.OWWidget):
         gui.rubber(self.controlArea)
 
 
+    def set_Range(self):
+        self.range_box_1.setVisible(self.use_range == 1)
+        self.range_box_2.setVisible(self.use_range == 0)
+
     def read_file(self):
         try:
             dialog = DataFileDialog(self)
@@ -101,7 +133,19 @@ class OWWavefrontFileReader(oasyswidget.OWWidget):
         try:
             congruence.checkEmptyString(self.file_name, "File Name")
             congruence.checkFile(self.file_name)
-            native_srw_wavefront = load_hdf5_2_wfr(self.file_name,self.data_path)
+            congruence.checkStrictlyPositiveNumber(self.decimation, "Decimation")
+
+            if self.use_range == 1:
+                congruence.checkGreaterThan(self.range_x_max, self.range_x_min, "X max", "X min")
+                congruence.checkGreaterThan(self.range_y_max, self.range_y_min, "Y max", "Y min")
+
+                roi = (self.range_x_min*1e-6, self.range_x_max*1e-6, self.range_y_min*1e-6, self.range_y_max*1e-6)
+            else:
+                roi = None
+
+            with LazyWavefront(self.file_name, self.data_path) as lazy_wavefront:
+                native_srw_wavefront = lazy_wavefront.get_srw_wfr(roi=roi, decimation=self.decimation)
+
             self.send("SRWData", SRWData(srw_wavefront=SRWWavefront.decorateSRWWF(native_srw_wavefront)))
         except Exception as e:
             QMessageBox.critical(self, "Error", str(e.args[0]), QMessageBox.Ok)
@@ -27,6 +27,10 @@ class OWSRWWavefrontFileWriter(widget.OWWidget):
     data_path = Setting("wfr")
     is_automatic_run= Setting(1)
 
+    compression = Setting(0)
+    compression_level = Setting(4)
+    shuffle = Setting(0)
+
 
     inputs = [("SRWData", SRWData, "set_input"),]
 
@@ -40,10 +44,10 @@ class OWSRWWavefrontFileWriter(widget.OWWidget):
         self.addAction(self.runaction)
 
         self.setFixedWidth(590)
-        self.setFixedHeight(300)
+        self.setFixedHeight(420)
 
         left_box_1 = oasysgui.widgetBox(self.controlArea, "HDF5 File Selection", addSpace=True, orientation="vertical",
-                                         width=570, height=200)
+                                         width=570, height=320)
 
         gui.checkBox(left_box_1, self, 'is_automatic_run', 'Automatic Execution')
 
@@ -67,6 +71,21 @@ class OWSRWWavefrontFileWriter(widget.OWWidget):
                                                     labelWidth=200, valueType=str, orientation="horizontal")
         self.le_data_path.setFixedWidth(330)
 
+        gui.separator(left_box_1, height=10)
+
+        gui.comboBox(left_box_1, self, "compression", label="Compression", labelWidth=200,
+                     items=["None", "gzip", "lzf"], callback=self.set_Compression,
+                     sendSelectedValue=False, orientation="horizontal")
+
+        self.compression_box = oasysgui.widgetBox(left_box_1, "", addSpace=False, orientation="vertical", height=60)
+
+        oasysgui.lineEdit(self.compression_box, self, "compression_level", "Compression level (gzip: 0-9)",
+                          labelWidth=260, valueType=int, orientation="horizontal")
+
+        gui.comboBox(self.compression_box, self, "shuffle", label="Shuffle filter", labelWidth=260,
+                     items=["No", "Yes"], sendSelectedValue=False, orientation="horizontal")
+
+        self.set_Compression()
 
 
         button = gui.button(self.controlArea, self, "Write File", callback=self.write_file)
@@ -77,6 +96,9 @@ class OWSRWWavefrontFileWriter(widget.OWWidget):
     def selectFile(self):
         self.le_file_name.setText(oasysgui.selectFileFromDialog(self, self.file_name, "Open HDF5 File"))
 
+    def set_Compression(self):
+        self.compression_box.setVisible(self.compression > 0)
+
     def set_input(self, data):
         if not data is None:
             self.input_data = data
@@ -95,8 +117,16 @@ class OWSRWWavefrontFileWriter(widget.OWWidget):
                 # the save_h5_file method.
 
                 srw_wavefront = self.input_data.get_srw_wavefront()
+                if self.compression == 1:
+                    congruence.checkPositiveNumber(self.compression_level, "Compression level")
+                    congruence.checkLessOrEqualThan(self.compression_level, 9, "Compression level", "9")
+
                 save_wfr_2_hdf5(self.input_data.get_srw_wavefront(),self.file_name,subgroupname=self.data_path,
-                                intensity=True,phase=False,overwrite=True)
+                                intensity=True,phase=False,overwrite=True,
+                                compression=[None, "gzip", "lzf"][self.compression],
+                                compression_opts=self.compression_level if self.compression == 1 else None,
+                                shuffle=self.compression > 0 and self.shuffle == 1,
+                                chunks=True if self.compression > 0 else None)
 
                 path, file_name = os.path.split(self.file_name)
 
@@ -64,7 +64,8 @@ ENTRY_POINTS = {
         "SRW Tools = orangecontrib.srw.widgets.tools",
         "SRW Native = orangecontrib.srw.widgets.native",
     ),
-    'oasys.menus' : ("srwmenu = orangecontrib.srw.menu",)
+    'oasys.menus' : ("srwmenu = orangecontrib.srw.menu",),
+    'console_scripts' : ("srw-batch = orangecontrib.srw.util.srw_batch:main",),
 }
 
 from oasys.application.addons import PipInstaller